@@ -6,30 +6,59 @@ Supports hot-reload for updated files with minimal disruption
 
 import os
 import asyncio
+import time
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 import json
-from typing import Dict, Set, Optional
+from typing import Dict, List, Optional, Set, Tuple
 import hashlib
 
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+    HAS_INOTIFY = True
+except ImportError:
+    HAS_INOTIFY = False
+
+DEBOUNCE_SECONDS = 1.0            # Quiet period before a changed file is acted on (editor save bursts)
+POLL_INTERVAL = 3.0               # Stat-fingerprint scan interval when inotify is unavailable
+SYNC_LOG_MAX_BYTES = 512 * 1024   # Rotate the append-only sync log past this size
+SYNC_LOG_BACKUPS = 3              # autosync_log.jsonl.1 .. .3
+RECENT_EVENTS_KEEP = 1000
+
+# (st_mtime_ns, st_size, st_ino) - content is only hashed when this changes
+Fingerprint = Tuple[int, int, int]
+
+
 class AutoSyncManager:
-    """Manages automatic file/folder synchronization and hot-reloading"""
+    """Manages automatic file/folder synchronization and hot-reloading
+
+    Changes are picked up from inotify when it is available (Linux with
+    inotify_simple installed), otherwise from a cheap os.scandir pass comparing
+    mtime/size/inode fingerprints. Either way a file is only read and hashed
+    once its fingerprint changed and it has been quiet for DEBOUNCE_SECONDS, and
+    only a real content change triggers a reload or data sync event.
+    """
     
     def __init__(self, bot, watch_path: str = '.'):
         self.bot = bot
         self.watch_path = Path(watch_path)
         self.cogs_path = self.watch_path / 'cogs'
+        self.data_path = self.watch_path / 'data'
         self.is_watching = False
         
         # File tracking
         self.file_hashes: Dict[str, str] = {}
+        self.fingerprints: Dict[str, Fingerprint] = {}
+        self.file_paths: Dict[str, Path] = {}
+        self.pending_changes: Dict[str, float] = {}  # file key -> monotonic time of last change
         self.loaded_cogs: Set[str] = set()
         self.watched_extensions = {'.py', '.json', '.yaml', '.yml'}
         
         # Directories to watch
         self.watch_dirs = [
             self.cogs_path,
-            self.watch_path / 'data',
+            self.data_path,
             self.watch_path / 'AI'
         ]
         
@@ -39,10 +68,25 @@ class AutoSyncManager:
             '__init__.py', '.pyc', '.pyo', '.egg-info'
         }
         
-        self.sync_log_file = 'data/autosync_log.json'
+        # Watcher state
+        self.watch_mode = 'idle'
+        self._watch_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._inotify = None
+        self._watch_descriptors: Dict[int, Path] = {}
+        self.watch_stats = {'scans': 0, 'inotify_events': 0, 'fingerprint_changes': 0,
+                            'hashes': 0, 'unchanged_touches': 0}
+        
+        # Append-only sync log (JSON lines, size-rotated)
+        self.sync_log_file = 'data/autosync_log.jsonl'
+        self.legacy_sync_log_file = 'data/autosync_log.json'
+        self.recent_events = deque(maxlen=RECENT_EVENTS_KEEP)
+        self.total_events_logged = 0
+        self._load_sync_log()
+        
         self.initial_scan_complete = False
         
-        print("[AutoSync] Manager initialized")
+        print(f"[AutoSync] Manager initialized (inotify {'available' if HAS_INOTIFY else 'unavailable'})")
     
     def _should_ignore(self, path_str: str) -> bool:
         """Check if path should be ignored"""
@@ -59,8 +103,56 @@ class AutoSyncManager:
         except Exception:
             return ""
     
+    def _file_key(self, filepath: Path) -> Optional[str]:
+        """Tracking key for a path: cog module name or data/<name>.json, None if not tracked"""
+        if self._should_ignore(filepath.name):
+            return None
+        if filepath.suffix == '.py' and self.cogs_path in filepath.parents:
+            rel_path = filepath.relative_to(self.watch_path)
+            return str(rel_path)[:-3].replace(os.sep, '.')
+        if filepath.suffix == '.json' and filepath.parent == self.data_path:
+            return f"data/{filepath.name}"
+        return None
+    
+    # ==================== SYNC LOG ====================
+    
+    def _load_sync_log(self):
+        """Load recent events from the JSONL log, migrating the legacy JSON array once"""
+        try:
+            if os.path.exists(self.legacy_sync_log_file) and not os.path.exists(self.sync_log_file):
+                with open(self.legacy_sync_log_file, 'r') as f:
+                    legacy = json.load(f)
+                with open(self.sync_log_file, 'w') as f:
+                    for event in legacy:
+                        f.write(json.dumps(event) + "\n")
+                os.replace(self.legacy_sync_log_file, f"{self.legacy_sync_log_file}.migrated")
+                print(f"[AutoSync] Migrated {len(legacy)} event(s) to {self.sync_log_file}")
+        except Exception as e:
+            print(f"[AutoSync] Error migrating sync log: {e}")
+        
+        if not os.path.exists(self.sync_log_file):
+            return
+        try:
+            with open(self.sync_log_file, 'r') as f:
+                for line in f:
+                    try:
+                        self.recent_events.append(json.loads(line))
+                        self.total_events_logged += 1
+                    except json.JSONDecodeError:
+                        continue  # Torn line from an interrupted write
+        except Exception as e:
+            print(f"[AutoSync] Error reading sync log: {e}")
+    
+    def _rotate_sync_log(self):
+        """Shift autosync_log.jsonl -> .1 -> .2 ..., dropping the oldest backup"""
+        for i in range(SYNC_LOG_BACKUPS - 1, 0, -1):
+            src = f"{self.sync_log_file}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.sync_log_file}.{i + 1}")
+        os.replace(self.sync_log_file, f"{self.sync_log_file}.1")
+    
     def _log_sync_event(self, event_type: str, file_path: str, status: str):
-        """Log sync event"""
+        """Log sync event (one appended line; the log is never rewritten)"""
         os.makedirs('data', exist_ok=True)
         
         event = {
@@ -69,22 +161,23 @@ class AutoSyncManager:
             'file': file_path,
             'status': status
         }
+        self.recent_events.append(event)
+        self.total_events_logged += 1
         
         try:
-            if os.path.exists(self.sync_log_file):
-                with open(self.sync_log_file, 'r') as f:
-                    logs = json.load(f)
-            else:
-                logs = []
-            
-            logs.append(event)
-            logs = logs[-1000:]  # Keep last 1000
-            
-            with open(self.sync_log_file, 'w') as f:
-                json.dump(logs, f, indent=2)
+            if os.path.exists(self.sync_log_file) and os.path.getsize(self.sync_log_file) >= SYNC_LOG_MAX_BYTES:
+                self._rotate_sync_log()
+            with open(self.sync_log_file, 'a') as f:
+                f.write(json.dumps(event) + "\n")
         except Exception as e:
             print(f"[AutoSync] Error logging event: {e}")
     
+    def get_recent_events(self, limit: int = 10) -> List[dict]:
+        """Most recent sync events, oldest first"""
+        if limit <= 0:
+            return []
+        return list(self.recent_events)[-limit:]
+    
     async def _discover_cogs(self, directory: Path = None) -> Set[str]:
         """Discover all cog modules"""
         if directory is None:
@@ -124,6 +217,12 @@ class AutoSyncManager:
                 self.loaded_cogs.add(cog)
                 continue
             
+            # Deferred by the cog loader (LAZY_COG_LOADING): its stub commands are still
+            # registered and load the module on first use, so loading it here would clash
+            loader = getattr(self.bot, 'cog_loader', None)
+            if loader is not None and cog in loader.lazy_modules:
+                continue
+            
             try:
                 await self.bot.load_extension(cog)
                 self.loaded_cogs.add(cog)
@@ -138,115 +237,275 @@ class AutoSyncManager:
         
         return loaded_count
     
-    async def _reload_updated_cogs(self) -> int:
-        """Reload cogs that have been updated"""
-        reloaded_count = 0
-        
-        for cog in list(self.loaded_cogs):
-            cog_path = (self.watch_path / cog.replace('.', os.sep)).with_suffix('.py')
-            
-            if not cog_path.exists():
-                continue
+    async def _reload_cog(self, cog: str) -> bool:
+        """Hot-reload one loaded cog"""
+        try:
+            await self.bot.reload_extension(cog)
+            print(f"[AutoSync] 🔄 Reloaded cog: {cog}")
+            self._log_sync_event('COG_RELOAD', cog, 'success')
+            return True
+        except Exception as e:
+            print(f"[AutoSync] ⚠️ Failed to reload {cog}: {str(e)[:60]}")
+            self._log_sync_event('COG_RELOAD', cog, f'failed: {str(e)[:50]}')
             
-            if self._should_ignore(str(cog_path)):
+            # Attempt to recover by reloading again
+            try:
+                await self.bot.reload_extension(cog)
+            except:
+                pass
+            return False
+    
+    async def _load_cog(self, cog: str) -> bool:
+        """Load a cog whose file appeared while watching"""
+        try:
+            await self.bot.load_extension(cog)
+            self.loaded_cogs.add(cog)
+            print(f"[AutoSync] ✅ Loaded new cog: {cog}")
+            self._log_sync_event('COG_LOAD', cog, 'success')
+            return True
+        except Exception as e:
+            print(f"[AutoSync] ❌ Failed to load {cog}: {str(e)[:60]}")
+            self._log_sync_event('COG_LOAD', cog, f'failed: {str(e)[:50]}')
+            return False
+    
+    # ==================== CHANGE DETECTION ====================
+    
+    @staticmethod
+    def _fingerprint(entry: os.DirEntry) -> Fingerprint:
+        st = entry.stat(follow_symlinks=False)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    
+    def _scan_fingerprints(self) -> Dict[str, Tuple[Path, Fingerprint]]:
+        """Stat every tracked file with os.scandir (no content reads)"""
+        found = {}
+        stack = [self.cogs_path]
+        while stack:
+            directory = stack.pop()
+            try:
+                entries = os.scandir(directory)
+            except OSError:
                 continue
-            
-            current_hash = self._get_file_hash(cog_path)
-            previous_hash = self.file_hashes.get(cog, "")
-            
-            # File has been updated
-            if current_hash and current_hash != previous_hash:
-                try:
-                    await self.bot.reload_extension(cog)
-                    self.file_hashes[cog] = current_hash
-                    reloaded_count += 1
-                    
-                    print(f"[AutoSync] 🔄 Reloaded cog: {cog}")
-                    self._log_sync_event('COG_RELOAD', cog, 'success')
-                    
-                except Exception as e:
-                    print(f"[AutoSync] ⚠️ Failed to reload {cog}: {str(e)[:60]}")
-                    self._log_sync_event('COG_RELOAD', cog, f'failed: {str(e)[:50]}')
-                    
-                    # Attempt to recover by reloading again
+            with entries:
+                for entry in entries:
                     try:
-                        await self.bot.reload_extension(cog)
-                    except:
-                        pass
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in self.ignore_patterns:
+                                stack.append(Path(entry.path))
+                            continue
+                        if not entry.name.endswith('.py'):
+                            continue
+                        path = Path(entry.path)
+                        key = self._file_key(path)
+                        if key:
+                            found[key] = (path, self._fingerprint(entry))
+                    except OSError:
+                        continue  # Removed mid-scan
         
-        return reloaded_count
+        try:
+            entries = os.scandir(self.data_path)
+        except OSError:
+            return found
+        with entries:
+            for entry in entries:
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    if entry.is_file(follow_symlinks=False) and not self._should_ignore(entry.name):
+                        found[f"data/{entry.name}"] = (Path(entry.path), self._fingerprint(entry))
+                except OSError:
+                    continue
+        return found
     
-    async def _check_new_folders(self) -> int:
-        """Check for new folder structures and cogs"""
-        discovered = await self._discover_cogs()
-        new_folders = discovered - self.loaded_cogs
-        
-        if new_folders:
-            print(f"[AutoSync] 🆕 Found {len(new_folders)} new cog module(s)")
-            return len(new_folders)
-        
-        return 0
+    def _record_fingerprints(self, found: Dict[str, Tuple[Path, Fingerprint]], mark_changes: bool) -> int:
+        """Store a scan result; changed or new fingerprints become pending changes"""
+        now = time.monotonic()
+        changed = 0
+        for key, (path, fingerprint) in found.items():
+            if self.fingerprints.get(key) == fingerprint:
+                continue
+            self.fingerprints[key] = fingerprint
+            self.file_paths[key] = path
+            if mark_changes:
+                self.pending_changes[key] = now
+                changed += 1
+        for key in [k for k in self.fingerprints if k not in found]:
+            self._forget(key)
+        self.watch_stats['fingerprint_changes'] += changed
+        return changed
     
-    async def _sync_data_files(self) -> int:
-        """Check for new/updated data files"""
-        data_dir = self.watch_path / 'data'
-        if not data_dir.exists():
-            return 0
+    def _forget(self, key: str):
+        """Drop state for a deleted file so a re-created one counts as new"""
+        self.fingerprints.pop(key, None)
+        self.file_paths.pop(key, None)
+        self.file_hashes.pop(key, None)
+        self.pending_changes.pop(key, None)
+    
+    async def _poll_fingerprints(self) -> int:
+        found = await asyncio.get_running_loop().run_in_executor(None, self._scan_fingerprints)
+        self.watch_stats['scans'] += 1
+        return self._record_fingerprints(found, mark_changes=True)
+    
+    async def _process_pending(self, force: bool = False) -> Dict[str, int]:
+        """Hash files that have been quiet for DEBOUNCE_SECONDS and act on real content changes"""
+        results = {'new_cogs': 0, 'reloaded_cogs': 0, 'synced_data': 0}
+        if not self.pending_changes:
+            return results
+        now = time.monotonic()
+        ready = [key for key, changed_at in self.pending_changes.items()
+                 if force or now - changed_at >= DEBOUNCE_SECONDS]
+        loop = asyncio.get_running_loop()
         
-        synced_count = 0
-        for file in data_dir.glob('*.json'):
-            if self._should_ignore(str(file)):
+        for key in ready:
+            self.pending_changes.pop(key, None)
+            path = self.file_paths.get(key)
+            if path is None or not path.exists():
+                self._forget(key)
                 continue
             
-            current_hash = self._get_file_hash(file)
-            file_key = f"data/{file.name}"
-            previous_hash = self.file_hashes.get(file_key, "")
+            current_hash = await loop.run_in_executor(None, self._get_file_hash, path)
+            self.watch_stats['hashes'] += 1
+            previous_hash = self.file_hashes.get(key)
+            if not current_hash or current_hash == previous_hash:
+                self.watch_stats['unchanged_touches'] += 1  # Touched or re-saved without edits
+                continue
+            self.file_hashes[key] = current_hash
             
-            if current_hash and current_hash != previous_hash:
-                self.file_hashes[file_key] = current_hash
-                synced_count += 1
-                self._log_sync_event('DATA_SYNC', str(file.relative_to(self.watch_path)), 'updated')
+            if key.startswith('data/'):
+                results['synced_data'] += 1
+                self._log_sync_event('DATA_SYNC', key, 'updated')
+            elif key in self.bot.extensions:
+                self.loaded_cogs.add(key)
+                if await self._reload_cog(key):
+                    results['reloaded_cogs'] += 1
+            elif previous_hash is None:
+                # A cog file that did not exist at the last scan
+                if await self._load_cog(key):
+                    results['new_cogs'] += 1
         
-        return synced_count
+        if results['new_cogs']:
+            print(f"[AutoSync] 🆕 Loaded {results['new_cogs']} new cog(s)")
+        if results['reloaded_cogs']:
+            print(f"[AutoSync] 🔄 Reloaded {results['reloaded_cogs']} cog(s)")
+        if results['synced_data']:
+            print(f"[AutoSync] 📊 Synced {results['synced_data']} data file(s)")
+        return results
+    
+    # ==================== INOTIFY ====================
+    
+    def _add_inotify_watch(self, directory: Path, recursive: bool):
+        mask = (inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO | inotify_flags.MOVED_FROM |
+                inotify_flags.CREATE | inotify_flags.DELETE)
+        wd = self._inotify.add_watch(str(directory), mask)
+        self._watch_descriptors[wd] = directory
+        if recursive:
+            for root, dirs, _ in os.walk(directory):
+                dirs[:] = [d for d in dirs if d not in self.ignore_patterns]
+                for d in dirs:
+                    sub = Path(root) / d
+                    self._watch_descriptors[self._inotify.add_watch(str(sub), mask)] = sub
+    
+    def _start_inotify(self) -> bool:
+        """Switch to inotify-driven watching; False means stay on stat polling"""
+        if not HAS_INOTIFY or self._inotify is not None:
+            return self._inotify is not None
+        try:
+            self._inotify = INotify()
+            self._add_inotify_watch(self.cogs_path, recursive=True)
+            if self.data_path.exists():
+                self._add_inotify_watch(self.data_path, recursive=False)
+            asyncio.get_running_loop().add_reader(self._inotify.fileno(), self._on_inotify_ready)
+            print(f"[AutoSync] 👁️  inotify watching {len(self._watch_descriptors)} director(ies)")
+            return True
+        except Exception as e:
+            print(f"[AutoSync] ⚠️ inotify unavailable ({e}), using stat polling")
+            self._stop_inotify()
+            return False
+    
+    def _stop_inotify(self):
+        if self._inotify is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._inotify.fileno())
+        except Exception:
+            pass
+        try:
+            self._inotify.close()
+        except Exception:
+            pass
+        self._inotify = None
+        self._watch_descriptors.clear()
+    
+    def _on_inotify_ready(self):
+        """Event loop reader callback: mark touched files pending, never read content here"""
+        try:
+            events = self._inotify.read(timeout=0)
+        except OSError:
+            return
+        now = time.monotonic()
+        for event in events:
+            self.watch_stats['inotify_events'] += 1
+            directory = self._watch_descriptors.get(event.wd)
+            if directory is None or not event.name:
+                continue
+            path = directory / event.name
+            if event.mask & inotify_flags.ISDIR:
+                if (event.mask & (inotify_flags.CREATE | inotify_flags.MOVED_TO)
+                        and self.cogs_path in path.parents and event.name not in self.ignore_patterns):
+                    try:
+                        self._add_inotify_watch(path, recursive=True)
+                        # Files written before the watch existed
+                        for root, dirs, files in os.walk(path):
+                            for name in files:
+                                key = self._file_key(Path(root) / name)
+                                if key:
+                                    self.file_paths[key] = Path(root) / name
+                                    self.pending_changes[key] = now
+                    except OSError:
+                        pass
+                continue
+            key = self._file_key(path)
+            if key:
+                self.file_paths[key] = path
+                self.pending_changes[key] = now
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    # ==================== WATCHER ====================
     
     async def _initial_scan(self):
         """Perform initial scan of all files"""
         print("[AutoSync] Running initial scan...")
+        loop = asyncio.get_running_loop()
         
-        # Get all currently loaded extensions from bot
-        discovered = await self._discover_cogs()
-        for cog in discovered:
-            # Mark as loaded if already in bot's extensions
-            if cog in self.bot.extensions:
-                self.loaded_cogs.add(cog)
+        found = await loop.run_in_executor(None, self._scan_fingerprints)
+        self._record_fingerprints(found, mark_changes=False)
         
-        # Hash all existing cogs
-        for cog in discovered:
-            cog_path = (self.watch_path / cog.replace('.', os.sep)).with_suffix('.py')
-            if cog_path.exists():
-                self.file_hashes[cog] = self._get_file_hash(cog_path)
+        # Mark as loaded if already in bot's extensions
+        for key in found:
+            if key in self.bot.extensions:
+                self.loaded_cogs.add(key)
         
-        # Hash data files
-        data_dir = self.watch_path / 'data'
-        if data_dir.exists():
-            for file in data_dir.glob('*.json'):
-                if not self._should_ignore(str(file)):
-                    file_key = f"data/{file.name}"
-                    self.file_hashes[file_key] = self._get_file_hash(file)
+        # Baseline hashes, so later fingerprint changes can be told apart from real edits
+        hashes = await loop.run_in_executor(
+            None, lambda: {key: self._get_file_hash(path) for key, (path, _) in found.items()}
+        )
+        self.file_hashes.update(hashes)
         
         print(f"[AutoSync] Initial scan complete. Tracking {len(self.file_hashes)} file(s)")
         self.initial_scan_complete = True
     
     def start_watching(self):
         """Start auto-sync watcher (background task)"""
+        if self._watch_task is not None and not self._watch_task.done():
+            self.is_watching = True
+            return
         self.is_watching = True
         print("[AutoSync] 👁️  Watcher started")
         
         # Create background task using asyncio
         if self.bot:
-            import asyncio
             try:
-                asyncio.create_task(self._watch_loop())
+                self._watch_task = asyncio.create_task(self._watch_loop())
             except RuntimeError:
                 # If no event loop is running, it will be handled later
                 pass
@@ -254,80 +513,72 @@ class AutoSyncManager:
     def stop_watching(self):
         """Stop auto-sync watcher"""
         self.is_watching = False
+        if self._wakeup is not None:
+            self._wakeup.set()
         print("[AutoSync] 👁️  Watcher stopped")
     
     async def _watch_loop(self):
-        """Main watch loop - runs periodically"""
+        """Main watch loop - sleeps until inotify reports a change (or the next stat scan)"""
         await self.bot.wait_until_ready()
         
         # Initial scan
         if not self.initial_scan_complete:
             await self._initial_scan()
         
-        iteration = 0
-        while self.is_watching:
-            try:
-                iteration += 1
-                
-                # Check for new cogs every 5 seconds
-                if iteration % 5 == 0:
-                    new_count = await self._load_new_cogs()
-                    if new_count > 0:
-                        print(f"[AutoSync] 🆕 Loaded {new_count} new cog(s)")
-                
-                # Check for updated cogs every 3 seconds
-                if iteration % 3 == 0:
-                    reload_count = await self._reload_updated_cogs()
-                    if reload_count > 0:
-                        print(f"[AutoSync] 🔄 Reloaded {reload_count} cog(s)")
-                
-                # Sync data files every 10 seconds
-                if iteration % 10 == 0:
-                    data_count = await self._sync_data_files()
-                    if data_count > 0:
-                        print(f"[AutoSync] 📊 Synced {data_count} data file(s)")
-                
-                # Reset iteration counter
-                if iteration > 1000:
-                    iteration = 0
+        self._wakeup = asyncio.Event()
+        self.watch_mode = 'inotify' if self._start_inotify() else 'scandir'
+        try:
+            while self.is_watching:
+                try:
+                    self._wakeup.clear()
+                    if self.watch_mode == 'scandir':
+                        await self._poll_fingerprints()
+                    await self._process_pending()
+                    
+                    if self.pending_changes:
+                        timeout = DEBOUNCE_SECONDS
+                    elif self.watch_mode == 'scandir':
+                        timeout = POLL_INTERVAL
+                    else:
+                        timeout = None
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
                 
-                await asyncio.sleep(1)
-            
-            except Exception as e:
-                print(f"[AutoSync] ❌ Error in watch loop: {e}")
-                await asyncio.sleep(5)
+                except Exception as e:
+                    print(f"[AutoSync] ❌ Error in watch loop: {e}")
+                    await asyncio.sleep(5)
+        finally:
+            self._stop_inotify()
+            self.watch_mode = 'idle'
     
     async def get_sync_stats(self) -> dict:
         """Get sync statistics"""
-        stats = {
+        return {
             'is_watching': self.is_watching,
+            'watch_mode': self.watch_mode,
             'tracked_files': len(self.file_hashes),
             'loaded_cogs': len(self.loaded_cogs),
-            'watch_directories': [str(d.relative_to(self.watch_path)) for d in self.watch_dirs if d.exists()]
+            'pending_changes': len(self.pending_changes),
+            'watch_directories': [str(d.relative_to(self.watch_path)) for d in self.watch_dirs if d.exists()],
+            'watch_stats': dict(self.watch_stats),
+            'recent_events': self.get_recent_events(10),
+            'total_events_logged': self.total_events_logged
         }
-        
-        # Get recent sync events
-        if os.path.exists(self.sync_log_file):
-            try:
-                with open(self.sync_log_file, 'r') as f:
-                    logs = json.load(f)
-                    stats['recent_events'] = logs[-10:]
-                    stats['total_events_logged'] = len(logs)
-            except:
-                stats['recent_events'] = []
-        
-        return stats
     
     async def force_sync(self) -> dict:
-        """Force immediate sync"""
-        results = {
-            'new_cogs': await self._load_new_cogs(),
-            'reloaded_cogs': await self._reload_updated_cogs(),
-            'synced_data': await self._sync_data_files(),
+        """Force immediate sync (skips the debounce window)"""
+        new_cogs = await self._load_new_cogs()
+        await self._poll_fingerprints()
+        results = await self._process_pending(force=True)
+        
+        return {
+            'new_cogs': new_cogs + results['new_cogs'],
+            'reloaded_cogs': results['reloaded_cogs'],
+            'synced_data': results['synced_data'],
             'timestamp': datetime.utcnow().isoformat()
         }
-        
-        return results
     
     async def watch_directory(self, directory: str):
         """Add additional directory to watch"""
@@ -8,6 +8,10 @@ from datetime import datetime
 import json
 import os
 from pathlib import Path
+import ast
+import bisect
+import re
+import time
 
 app = FastAPI(title="Sentinel SOC API", version="1.0.0", description="Enterprise Security Operations Center API")
 
@@ -642,53 +646,254 @@ def trigger_lockdown():
 
 # ==================== COMMANDS ENDPOINT ====================
 
-def scan_cog_files_for_commands() -> Dict[str, List[Dict]]:
-    """Scan all cog files and extract slash command information"""
-    import re
-    
-    commands_by_category = {}
-    cogs_dir = os.path.join(os.path.dirname(__file__), '..', 'cogs')
-    
-    if not os.path.exists(cogs_dir):
-        return commands_by_category
-    
-    # Command pattern for slash commands
-    command_pattern = r'@app_commands\.command\(name=["\']([^"\']+)["\'],\s*description=["\']([^"\']*)["\']'
-    param_pattern = r'@app_commands\.describe\((.*?)\)'
-    
-    for root, dirs, files in os.walk(cogs_dir):
-        # Skip certain directories
-        dirs[:] = [d for d in dirs if d not in {'.venv', '__pycache__', '.git', 'backups'}]
-        
-        for file in files:
-            if file.endswith('.py') and file != '__init__.py':
+COMMAND_INDEX_SKIP_DIRS = {'.venv', '__pycache__', '.git', 'backups'}
+COMMAND_INDEX_REFRESH_SECONDS = 2.0  # Re-stat cogs/ at most this often (not on every keystroke)
+COMMAND_TOKEN_REGEX = re.compile(r"[a-z0-9]+")
+
+# Field weights for ranked search
+NAME_EXACT_WEIGHT = 10.0
+NAME_TOKEN_WEIGHT = 3.0
+CATEGORY_TOKEN_WEIGHT = 1.0
+DESCRIPTION_TOKEN_WEIGHT = 1.0
+PREFIX_MATCH_FACTOR = 0.6  # A token that only prefixes an indexed term scores less than an exact one
+
+
+def _const(node) -> Optional[str]:
+    return node.value if isinstance(node, ast.Constant) and isinstance(node.value, str) else None
+
+
+def _decorator_kind(decorator) -> Optional[str]:
+    """slash / hybrid / prefix / group / subcommand for a command decorator, else None"""
+    func = decorator.func if isinstance(decorator, ast.Call) else decorator
+    dotted = ast.unparse(func)
+    if dotted.endswith('app_commands.command') or dotted.endswith('app_commands.context_menu'):
+        return 'slash'
+    if dotted.endswith('commands.hybrid_command') or dotted.endswith('commands.hybrid_group'):
+        return 'hybrid'
+    if dotted.endswith('commands.command'):
+        return 'prefix'
+    if dotted.endswith('commands.group'):
+        return 'group'
+    if isinstance(func, ast.Attribute) and func.attr == 'command' and isinstance(func.value, ast.Name):
+        return 'subcommand'
+    return None
+
+
+def extract_commands_from_source(source: str, source_file: str, category: str) -> List[Dict]:
+    """Slash, hybrid and prefix commands defined in a cog, found with ast (multi-line decorators included)"""
+    tree = ast.parse(source)
+    found = []
+    for cls in [n for n in ast.walk(tree) if isinstance(n, ast.ClassDef)] + [tree]:
+        # Group objects/functions in this scope: variable or method name -> (command name, prefix)
+        groups = {}
+        for item in cls.body:
+            if isinstance(item, ast.Assign) and isinstance(item.value, ast.Call):
+                if ast.unparse(item.value.func).endswith('app_commands.Group'):
+                    name = next((_const(k.value) for k in item.value.keywords if k.arg == 'name'), None)
+                    for target in item.targets:
+                        if isinstance(target, ast.Name):
+                            groups[target.id] = (name or target.id, '/')
+            elif isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                for decorator in item.decorator_list:
+                    if _decorator_kind(decorator) == 'group':
+                        name = item.name
+                        if isinstance(decorator, ast.Call):
+                            name = next((_const(k.value) for k in decorator.keywords if k.arg == 'name'), None) or name
+                        groups[item.name] = (name, '!')
+
+        for item in cls.body:
+            if not isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            kind = None
+            options = {}
+            params = {}
+            for decorator in item.decorator_list:
+                decorator_kind = _decorator_kind(decorator)
+                if decorator_kind:
+                    if decorator_kind == 'subcommand' and decorator.func.value.id not in groups:
+                        continue
+                    kind = decorator_kind
+                    if isinstance(decorator, ast.Call):
+                        options = {k.arg: k.value for k in decorator.keywords if k.arg}
+                        if kind == 'subcommand':
+                            options['_group'] = decorator.func.value.id
+                elif isinstance(decorator, ast.Call) and ast.unparse(decorator.func).endswith('app_commands.describe'):
+                    params = {k.arg: _const(k.value) or '' for k in decorator.keywords if k.arg}
+            if kind is None:
+                continue
+
+            name = _const(options.get('name')) or item.name
+            prefix = '!' if kind in ('prefix', 'group') else '/'
+            if kind == 'subcommand':
+                group_name, prefix = groups[options['_group']]
+                name = f"{group_name} {name}"
+            docstring = (ast.get_docstring(item) or '').strip().split('\n')[0]
+            description = (_const(options.get('description')) or _const(options.get('help'))
+                           or _const(options.get('brief')) or docstring or 'No description')
+            aliases = []
+            if isinstance(options.get('aliases'), (ast.List, ast.Tuple)):
+                aliases = [a for a in map(_const, options['aliases'].elts) if a]
+            found.append({
+                'name': name,
+                'description': description,
+                'type': 'hybrid' if kind == 'hybrid' else ('slash' if prefix == '/' else 'prefix'),
+                'prefix': prefix,
+                'aliases': aliases,
+                'parameters': params,
+                'source_file': source_file,
+                'category': category,
+                'line': item.lineno
+            })
+    return found
+
+
+class CommandIndex:
+    """In-memory command catalogue of cogs/, re-parsed per file only when its mtime/size changes
+
+    Search runs against a prebuilt inverted index (term -> {command: weight}) with a
+    sorted vocabulary for prefix matching, so a keystroke costs a few dictionary
+    lookups instead of reading and regex-scanning every cog file.
+    """
+
+    def __init__(self, cogs_dir: str):
+        self.cogs_dir = cogs_dir
+        self.files: Dict[str, Dict] = {}  # path -> {'fingerprint', 'commands'}
+        self.commands: List[Dict] = []
+        self.by_category: Dict[str, List[Dict]] = {}
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.vocabulary: List[str] = []
+        self.parse_errors: Dict[str, str] = {}
+        self.last_built: Optional[str] = None
+        self.stats = {'builds': 0, 'files_parsed': 0, 'refreshes': 0}
+        self._last_refresh = 0.0
+
+    def refresh(self, force: bool = False):
+        """Stat cogs/ (throttled), re-parse changed files and rebuild the index if anything changed"""
+        now = time.monotonic()
+        if not force and self.last_built and now - self._last_refresh < COMMAND_INDEX_REFRESH_SECONDS:
+            return
+        self._last_refresh = now
+        self.stats['refreshes'] += 1
+        if not os.path.exists(self.cogs_dir):
+            return
+
+        seen = set()
+        changed = False
+        for root, dirs, files in os.walk(self.cogs_dir):
+            dirs[:] = [d for d in dirs if d not in COMMAND_INDEX_SKIP_DIRS]
+            for file in files:
+                if not file.endswith('.py') or file == '__init__.py':
+                    continue
                 filepath = os.path.join(root, file)
                 try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    # Find all commands in this file
-                    matches = re.findall(command_pattern, content)
-                    
-                    # Get category from directory name
-                    category = os.path.basename(root)
-                    if category == 'cogs':
-                        category = 'core'
-                    
-                    if category not in commands_by_category:
-                        commands_by_category[category] = []
-                    
-                    for cmd_name, cmd_desc in matches:
-                        commands_by_category[category].append({
-                            'name': cmd_name,
-                            'description': cmd_desc or 'No description',
-                            'source_file': file,
-                            'category': category
-                        })
+                    st = os.stat(filepath)
+                except OSError:
+                    continue
+                seen.add(filepath)
+                fingerprint = (st.st_mtime_ns, st.st_size)
+                entry = self.files.get(filepath)
+                if entry and entry['fingerprint'] == fingerprint:
+                    continue
+                category = os.path.basename(root)
+                if category == 'cogs':
+                    category = 'core'
+                try:
+                    with open(filepath, 'r', encoding='utf-8-sig') as f:
+                        commands = extract_commands_from_source(f.read(), file, category)
+                    self.parse_errors.pop(filepath, None)
                 except Exception as e:
-                    pass
-    
-    return commands_by_category
+                    commands = []
+                    self.parse_errors[filepath] = str(e)[:200]
+                self.files[filepath] = {'fingerprint': fingerprint, 'commands': commands}
+                self.stats['files_parsed'] += 1
+                changed = True
+
+        for filepath in [p for p in self.files if p not in seen]:
+            del self.files[filepath]
+            self.parse_errors.pop(filepath, None)
+            changed = True
+
+        if changed or self.last_built is None:
+            self._build()
+
+    def _build(self):
+        self.commands = [cmd for path in sorted(self.files) for cmd in self.files[path]['commands']]
+        self.by_category = {}
+        postings: Dict[str, Dict[int, float]] = {}
+
+        def add(term: str, doc: int, weight: float):
+            bucket = postings.setdefault(term, {})
+            bucket[doc] = max(bucket.get(doc, 0.0), weight)
+
+        for doc, cmd in enumerate(self.commands):
+            self.by_category.setdefault(cmd['category'], []).append(cmd)
+            for name in [cmd['name'], *cmd['aliases']]:
+                add(name.lower(), doc, NAME_EXACT_WEIGHT)
+                for token in COMMAND_TOKEN_REGEX.findall(name.lower()):
+                    add(token, doc, NAME_TOKEN_WEIGHT)
+            for token in COMMAND_TOKEN_REGEX.findall(cmd['category'].lower()):
+                add(token, doc, CATEGORY_TOKEN_WEIGHT)
+            for token in COMMAND_TOKEN_REGEX.findall(cmd['description'].lower()):
+                add(token, doc, DESCRIPTION_TOKEN_WEIGHT)
+
+        self.postings = postings
+        self.vocabulary = sorted(postings)
+        self.last_built = datetime.utcnow().isoformat()
+        self.stats['builds'] += 1
+
+    def _term_scores(self, token: str) -> Dict[int, float]:
+        """Best weight per command for one query token: exact term, else any term it prefixes"""
+        scores = dict(self.postings.get(token, {}))
+        i = bisect.bisect_left(self.vocabulary, token)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(token):
+            term = self.vocabulary[i]
+            if term != token:
+                for doc, weight in self.postings[term].items():
+                    scores[doc] = max(scores.get(doc, 0.0), weight * PREFIX_MATCH_FACTOR)
+            i += 1
+        return scores
+
+    def search(self, query: str, limit: int = 100) -> List[Dict]:
+        """Commands matching every query token (as a word or word prefix), best first"""
+        self.refresh()
+        query = query.strip().lower()
+        if not query:
+            return sorted(self.commands, key=lambda c: c['name'])[:limit]
+
+        tokens = COMMAND_TOKEN_REGEX.findall(query)
+        totals: Optional[Dict[int, float]] = None
+        for token in tokens:
+            scores = self._term_scores(token)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {doc: totals[doc] + score for doc, score in scores.items() if doc in totals}
+            if not totals:
+                break
+        totals = totals or {}
+
+        if not totals:
+            # Mid-word fragments ("ban" in "unban"): substring match over the in-memory catalogue
+            totals = {doc: 1.0 for doc, cmd in enumerate(self.commands)
+                      if query in cmd['name'].lower() or query in cmd['description'].lower()}
+
+        for doc in totals:
+            name = self.commands[doc]['name'].lower()
+            if name == query:
+                totals[doc] += NAME_EXACT_WEIGHT
+            elif name.startswith(query):
+                totals[doc] += NAME_TOKEN_WEIGHT
+        ranked = sorted(totals.items(), key=lambda item: (-item[1], self.commands[item[0]]['name']))[:limit]
+        return [{**self.commands[doc], 'score': round(score, 2)} for doc, score in ranked]
+
+
+command_index = CommandIndex(os.path.join(os.path.dirname(__file__), '..', 'cogs'))
+
+
+def scan_cog_files_for_commands() -> Dict[str, List[Dict]]:
+    """All slash and prefix commands by category, served from the cached AST index"""
+    command_index.refresh()
+    return command_index.by_category
 
 @app.get("/dashboard/commands", response_class=HTMLResponse)
 async def get_all_commands():
@@ -983,7 +1188,7 @@ async def get_all_commands():
         
         for cmd in category['commands']:
             html_content += f'''                    <div class="command" data-name="{cmd['name']}" data-desc="{cmd['description']}">
-                        <div class="command-name">/{cmd['name']}</div>
+                        <div class="command-name">{cmd['prefix']}{cmd['name']}</div>
                         <div class="command-desc">{cmd['description']}</div>
                         <div class="command-file">{cmd['source_file']}</div>
                     </div>
@@ -1056,22 +1261,16 @@ async def get_all_commands():
     return html_content
 
 @app.get("/dashboard/commands/search")
-async def search_commands(query: str = ""):
-    """Search commands by name or description"""
-    commands_dict = scan_cog_files_for_commands()
-    results = []
-    
-    query_lower = query.lower()
-    
-    for category, commands in commands_dict.items():
-        for cmd in commands:
-            if query_lower in cmd['name'].lower() or query_lower in cmd['description'].lower():
-                results.append({
-                    'name': cmd['name'],
-                    'description': cmd['description'],
-                    'category': cmd['category'],
-                    'source_file': cmd['source_file']
-                })
+async def search_commands(query: str = "", limit: int = 100):
+    """Search commands by name, alias, category or description (ranked)"""
+    results = [{
+        'name': cmd['name'],
+        'description': cmd['description'],
+        'category': cmd['category'],
+        'source_file': cmd['source_file'],
+        'type': cmd['type'],
+        'score': cmd.get('score')
+    } for cmd in command_index.search(query, limit=max(1, min(limit, 1000)))]
     
     return {
         'query': query,
@@ -1086,15 +1285,22 @@ async def get_commands_stats():
     
     total = 0
     by_category = {}
+    by_type = {}
     
     for category, commands in commands_dict.items():
         count = len(commands)
         total += count
         by_category[category] = count
+        for cmd in commands:
+            by_type[cmd['type']] = by_type.get(cmd['type'], 0) + 1
     
     return {
         'total_commands': total,
         'total_categories': len(by_category),
         'by_category': by_category,
-        'last_scanned': datetime.utcnow().isoformat()
+        'by_type': by_type,
+        'indexed_files': len(command_index.files),
+        'indexed_terms': len(command_index.vocabulary),
+        'parse_errors': len(command_index.parse_errors),
+        'last_scanned': command_index.last_built
     }
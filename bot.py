@@ -14,7 +14,11 @@ from dotenv import load_dotenv
 import datetime
 from datetime import timezone
 import logging
+import time
 import pytz
+from cogs.core.cog_loader import CogLoader
+from cogs.core.command_sync import sync_command_tree, format_sync_results
+from cogs.core.webhook_delivery import webhook_delivery
 # Set PST timezone globally
 PST = pytz.timezone('America/Los_Angeles')
 UTC = timezone.utc
@@ -105,6 +109,9 @@ ENABLE_GPT_RESPONSES = os.getenv('ENABLE_GPT_RESPONSES', 'true').lower() == 'tru
 COMMAND_COOLDOWN = int(os.getenv('COMMAND_COOLDOWN', '5'))
 TIMEZONE = os.getenv('TIMEZONE', 'PST8PDT')
 SAFE_MODE = os.getenv('SAFE_MODE', 'false').lower() == 'true'
+LAZY_COG_LOADING = os.getenv('LAZY_COG_LOADING', 'false').lower() == 'true'
+COG_IMPORT_WORKERS = int(os.getenv('COG_IMPORT_WORKERS', '8'))
+FORCE_TREE_SYNC = os.getenv('FORCE_TREE_SYNC', 'false').lower() == 'true'
 AUTO_SYNC_ENABLED = os.getenv('AUTO_SYNC_ENABLED', 'false').lower() == 'true'
 SYNC_INTERVAL_HOURS = int(os.getenv('SYNC_INTERVAL_HOURS', '12'))
 MAINTENANCE_MODE = os.getenv('MAINTENANCE_MODE', 'false').lower() == 'true'
@@ -126,6 +133,7 @@ REPORT_GENERATION_SCHEDULE = os.getenv('REPORT_GENERATION_SCHEDULE', 'monthly')
 
 # Track bot start time for uptime
 bot_start_time = PST.localize(datetime.datetime.now())
+startup_clock = time.perf_counter()  # Time to on_ready
 
 # Track cog loading stats
 loaded_count = 0
@@ -201,6 +209,8 @@ async def load_cogs():
     essential_cogs = {
         # ========== CORE INFRASTRUCTURE (ALWAYS REQUIRED) ==========
         'signal_bus',                    # Central signal pipeline
+        'message_pipeline',              # Shared single-pass message inspection
+        'rate_windows',                  # Shared sliding-window rate counters
         'fast_logger',                   # High-performance logging system
         'command_sync',                  # Sync slash commands (owner only)
         'feature_flags',                 # Feature flag & kill switch system
@@ -494,30 +504,14 @@ async def load_cogs():
     }
     
     global loaded_count, failed_count
-    loaded_count = 0
-    failed_count = 0
     
-    for root, dirs, files in os.walk('./cogs'):
-        dirs[:] = [d for d in dirs if d not in skip_dirs]
-        
-        for file in files:
-            if file.endswith('.py') and file != '__init__.py':
-                cog_name = file[:-3]
-                
-                # Only load whitelisted cogs
-                if cog_name not in essential_cogs:
-                    continue
-                
-                rel_path = os.path.relpath(os.path.join(root, file), './cogs')
-                module_path = rel_path.replace(os.sep, '.')[:-3]
-                
-                try:
-                    await bot.load_extension(f'cogs.{module_path}')
-                    loaded_count += 1
-                    print(f"[Loader] ✅ {cog_name}")
-                except Exception as e:
-                    failed_count += 1
-                    print(f"[Loader] ❌ {cog_name}: {str(e)[:80]}")
+    # Plan by dependencies, warm third-party imports in a thread pool, defer command-only cogs if LAZY_COG_LOADING
+    loader = CogLoader(bot, workers=COG_IMPORT_WORKERS, lazy=LAZY_COG_LOADING)
+    bot.cog_loader = loader
+    await loader.load(loader.discover(essential_cogs, './cogs', skip_dirs))
+    loaded_count = loader.loaded
+    failed_count = loader.failed
+    loader.print_report()
     
     print(f"\n[Loader] ✅ Loaded {loaded_count} essential cogs ({failed_count} failed)")
     print(f"[Loader] Command count: {len(list(bot.tree._get_all_commands()))} total")
@@ -541,6 +535,10 @@ async def on_ready():
     # Set bot uptime tracking
     if not hasattr(bot, 'uptime'):
         bot.uptime = PST.localize(datetime.datetime.now())
+        ready_seconds = time.perf_counter() - startup_clock
+        print(f"[Startup] ⏱️ Time to on_ready: {ready_seconds:.2f}s")
+        if hasattr(bot, 'cog_loader'):
+            bot.cog_loader.record_ready(ready_seconds)
     
     # Update bot presence
     try:
@@ -561,11 +559,13 @@ async def on_ready():
     logger.info(f"Bot ready - {len(bot.guilds)} guilds, {sum(g.member_count for g in bot.guilds)} users")
     print("🎭 Dynamic status system will manage presence")
     
-    # Auto-sync commands on startup
+    # Sync slash commands only for scopes whose command tree fingerprint changed
+    sync_lines = []
     try:
-        print("[Sync] Syncing slash commands to Discord...")
-        synced = await bot.tree.sync()
-        print(f"[Sync] ✅ Successfully synced {len(synced)} slash commands to Discord!")
+        sync_results = await sync_command_tree(bot, force=FORCE_TREE_SYNC)
+        sync_lines = format_sync_results(sync_results)
+        for line in sync_lines:
+            print(f"[Sync] {line}")
     except Exception as e:
         print(f"[Sync] ❌ Failed to sync commands: {e}")
     
@@ -589,6 +589,11 @@ async def on_ready():
     print(f"  Level: {SECURITY_LEVEL.upper()} | 2FA: {'REQUIRED' if REQUIRE_2FA_FOR_ADMINS else 'OPTIONAL'} | Verification: {VERIFICATION_LEVEL.upper()} | Audit: {'✅' if AUDIT_LOG_ENABLED else '❌'}")
     print(f"  Credential Scanning: {'✅' if CREDENTIAL_EXPOSURE_SCANNING_ENABLED else '❌'} | Safe Mode: {'⚠️ ACTIVE' if SAFE_MODE else '🟢 NORMAL'}")
     print("="*70)
+    print("[Configuration] SLASH COMMAND SYNC")
+    print("="*70)
+    for line in sync_lines or ["sync did not run"]:
+        print(f"  {line}")
+    print("="*70)
     
     # Send startup embed to owner
     if OWNER_ID:
@@ -608,6 +613,7 @@ async def on_ready():
             embed.add_field(name="⚡ Slash Commands", value=str(len(list(bot.tree._get_all_commands()))), inline=True)
             embed.add_field(name="📦 Cogs Loaded", value=str(loaded_count), inline=True)
             embed.add_field(name="🎯 Commands", value=str(len(list(bot.tree._get_all_commands()))), inline=True)
+            embed.add_field(name="🔄 Slash Sync", value="\n".join(sync_lines)[:1024] or "Did not run", inline=False)
             embed.add_field(name="� API Server", value=f"http://{API_HOST}:{API_PORT}", inline=True)
             embed.add_field(name="📚 API Docs", value=f"http://{API_HOST}:{API_PORT}/docs", inline=True)
             embed.add_field(name="⚙️ TIER-1 Systems", value=f"Governance: {'✅' if AI_GOVERNANCE_ENABLED else '❌'} | Resilience: {'✅' if RESILIENCE_ENABLED else '❌'} | Crypto: {'✅' if CRYPTO_ENABLED else '❌'}", inline=False)
@@ -659,15 +665,15 @@ async def on_message(message):
     logger = logging.getLogger('soc_bot')
     logger.debug(f"[MESSAGE] {message.author} in {message.channel}: {message.content[:50]}")
     
-    logging_cog = bot.get_cog('FastLogger')
-    if logging_cog:
-        await logging_cog.log_event("MESSAGE_CREATED", {
-            "user": str(message.author),
-            "user_id": message.author.id,
-            "channel": str(message.channel),
-            "content_length": len(message.content)
-        }, message.guild)
+    # Parse once and run every registered detector/logging stage. The pipeline is looked up
+    # through its cog: load_extension executes the module itself, so that is the instance
+    # every stage registered on (an import made here would hold a different one)
+    pipeline_cog = bot.get_cog('MessagePipelineCog')
+    if pipeline_cog:
+        await pipeline_cog.message_pipeline.process(message)
     
+    # Commands run whatever the detectors decided, as they did when each detector was its
+    # own listener (keyword stages would otherwise swallow e.g. !killfeature or !rotate_secrets)
     await bot.process_commands(message)
 
 @bot.event
@@ -749,6 +755,9 @@ if __name__ == '__main__':
                 data_manager.save_data()
                 print("✅ Data saved successfully")
             
+            # Spill queued webhook notifications so they are retried on next start
+            await webhook_delivery.close()
+            
             if not bot.is_closed():
                 print("🔌 Closing connection...")
                 await bot.close()
@@ -15,28 +15,241 @@ This is the traffic controller that:
 import discord
 from discord.ext import commands
 import asyncio
+import hashlib
+import itertools
 import json
 import os
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Callable, Coroutine
-from collections import defaultdict
+from typing import Dict, List, Optional, Callable, Coroutine, Union
+from collections import defaultdict, deque, OrderedDict
 
 from cogs.architecture.unified_event_schema import (
     UnifiedSecurityEvent, EventType, EventSeverity, EventStatus, EventContext
 )
 from cogs.core.pst_timezone import get_now_pst
+from cogs.core.segmented_journal import SegmentedJournal
+
+FLUSH_DELAY = 1.0  # Seconds events are batched before a group commit
+QUERY_MAX_SEGMENTS = 4  # Older journal segments one history query may page in
+
+
+class EventStore:
+    """Recent events in memory with secondary indexes, backed by a segmented journal
+    
+    Only the newest segment is read at startup; older segments are read in an executor
+    when a history query needs more (at most QUERY_MAX_SEGMENTS per query). Loaded records stay as dicts until a caller asks for
+    them, so startup never re-hydrates the whole history through from_dict.
+    """
+    
+    INDEXES = ('event_type', 'severity', 'user_id', 'resource_id')
+    
+    def __init__(self, directory: str, max_events: int = 100000, legacy_file: str = None):
+        self.journal = SegmentedJournal(directory, segment_max_bytes=4 * 1024 * 1024,
+                                        segment_max_age=24 * 3600, max_segments=64)
+        self.max_events = max_events
+        self.records: Dict[int, Union[UnifiedSecurityEvent, Dict]] = {}  # seq -> event or raw record
+        self.order: deque = deque()          # seqs, oldest first
+        self.by_id: Dict[str, int] = {}      # event_id -> seq
+        self.indexes: Dict[str, Dict] = {name: defaultdict(deque) for name in self.INDEXES}
+        self._next_seq = 0
+        self._oldest_seq = 0
+        self._page_lock = asyncio.Lock()  # Segments must land oldest-last, one at a time
+        
+        if legacy_file and os.path.exists(legacy_file) and not self.journal.segments():
+            self._migrate_legacy(legacy_file)
+        
+        segments = self.journal.segments()
+        self.unloaded_segments: List[int] = segments[:-1]  # Older segments not yet paged in
+        if segments:
+            for record in self.journal.read_segment(segments[-1]):
+                self._put(record, newest=True)
+    
+    def __len__(self) -> int:
+        return len(self.order)
+    
+    def _migrate_legacy(self, legacy_file: str):
+        """One-time move of the old rewrite-everything JSON file into the journal"""
+        try:
+            with open(legacy_file, 'r') as f:
+                records = json.load(f).get('events', [])
+        except (OSError, ValueError, AttributeError):
+            records = []
+        self.journal.compact_sync(records)
+        os.replace(legacy_file, f"{legacy_file}.migrated")
+        print(f"[Orchestrator] ✅ Migrated {len(records)} events into the event journal")
+    
+    @staticmethod
+    def _index_keys(record) -> Dict:
+        if isinstance(record, dict):
+            context = record.get('context') or {}
+            return {
+                'event_type': record.get('event_type'),
+                'severity': record.get('severity'),
+                'user_id': context.get('user_id'),
+                'resource_id': context.get('resource_id')
+            }
+        return {
+            'event_type': record.event_type.value,
+            'severity': record.severity.value,
+            'user_id': record.context.user_id,
+            'resource_id': record.context.resource_id
+        }
+    
+    @staticmethod
+    def _event_id(record) -> str:
+        return record.get('event_id', '') if isinstance(record, dict) else record.event_id
+    
+    def _put(self, record, newest: bool = True):
+        """Index a record; a newer copy of a known event replaces it in place"""
+        event_id = self._event_id(record)
+        seq = self.by_id.get(event_id) if event_id else None
+        if seq is not None:
+            if not newest:
+                return  # Paging in history: the copy already loaded is newer
+            old_keys = self._index_keys(self.records[seq])
+            self.records[seq] = record
+            for name, key in self._index_keys(record).items():
+                if key != old_keys[name]:
+                    self._unindex(name, old_keys[name], seq)
+                    if key is not None:
+                        self.indexes[name][key] = deque(sorted((*self.indexes[name][key], seq)))
+            return
+        
+        if newest:
+            seq = self._next_seq
+            self._next_seq += 1
+            self.order.append(seq)
+        else:
+            self._oldest_seq -= 1
+            seq = self._oldest_seq
+            self.order.appendleft(seq)
+        self.records[seq] = record
+        if event_id:
+            self.by_id[event_id] = seq
+        for name, key in self._index_keys(record).items():
+            if key is not None:
+                if newest:
+                    self.indexes[name][key].append(seq)
+                else:
+                    self.indexes[name][key].appendleft(seq)
+        
+        if newest and len(self.order) > self.max_events:
+            self._evict_oldest()
+    
+    def _unindex(self, name: str, key, seq: int):
+        seqs = self.indexes[name].get(key)
+        if seqs is None:
+            return
+        if seqs and seqs[0] == seq:
+            seqs.popleft()
+        else:
+            try:
+                seqs.remove(seq)
+            except ValueError:
+                pass
+        if not seqs:
+            del self.indexes[name][key]
+    
+    def _evict_oldest(self):
+        seq = self.order.popleft()
+        record = self.records.pop(seq)
+        self.by_id.pop(self._event_id(record), None)
+        for name, key in self._index_keys(record).items():
+            if key is not None:
+                self._unindex(name, key, seq)  # Oldest seq is always at the head
+        self.unloaded_segments = []  # Memory window no longer reaches back to older segments
+    
+    async def page_older(self) -> bool:
+        """Read the next older segment in an executor and index it; False when nothing is left"""
+        async with self._page_lock:
+            if not self.unloaded_segments or len(self.order) >= self.max_events:
+                return False
+            number = self.unloaded_segments.pop()
+            records = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: list(self.journal.read_segment(number)))
+            for record in reversed(records):
+                if len(self.order) >= self.max_events:
+                    self.unloaded_segments = []
+                    break
+                self._put(record, newest=False)
+            return True
+    
+    def append(self, event: UnifiedSecurityEvent):
+        """Store a new (or updated) event and queue it for the journal"""
+        self._put(event, newest=True)
+        self.journal.append(event.to_dict())
+    
+    def get(self, seq: int) -> Optional[UnifiedSecurityEvent]:
+        """Hydrate a record on first access and keep the object"""
+        record = self.records.get(seq)
+        if isinstance(record, dict):
+            try:
+                record = UnifiedSecurityEvent.from_dict(record)
+            except Exception:
+                return None
+            self.records[seq] = record
+        return record
+    
+    def query(self, index: str, key, limit: int = 100) -> List[UnifiedSecurityEvent]:
+        """Most recent `limit` loaded events for an index key, oldest first (never reads disk)"""
+        seqs = self.indexes[index].get(key)
+        if not seqs:
+            return []
+        newest = list(itertools.islice(reversed(seqs), limit))
+        return [event for event in (self.get(seq) for seq in reversed(newest)) if event is not None]
+    
+    async def query_history(self, index: str, key, limit: int = 100,
+                            max_segments: int = QUERY_MAX_SEGMENTS) -> List[UnifiedSecurityEvent]:
+        """Like query(), paging in up to `max_segments` older segments when too few are loaded"""
+        paged = 0
+        while (paged < max_segments and len(self.indexes[index].get(key, ())) < limit
+               and await self.page_older()):
+            paged += 1
+        return self.query(index, key, limit)
+    
+    @staticmethod
+    def _status(record):
+        value = record.get('status') if isinstance(record, dict) else getattr(record, 'status', None)
+        return getattr(value, 'value', value)
+    
+    def count_where(self, index: str, key, exclude_status: EventStatus = None) -> int:
+        """Loaded events for an index key, optionally skipping a status (no hydration)"""
+        seqs = self.indexes[index].get(key, ())
+        if exclude_status is None:
+            return len(seqs)
+        return sum(1 for seq in seqs if self._status(self.records[seq]) != exclude_status.value)
+    
+    def with_status(self, status: EventStatus):
+        """Iterate events in a status, hydrating only the matches"""
+        for seq in list(self.order):
+            if self._status(self.records.get(seq)) == status.value:
+                event = self.get(seq)
+                if event is not None:
+                    yield event
+    
+    def recent(self, limit: int = None):
+        """Iterate events newest first"""
+        seqs = reversed(self.order) if limit is None else itertools.islice(reversed(self.order), limit)
+        for seq in list(seqs):
+            event = self.get(seq)
+            if event is not None:
+                yield event
 
 
 class EventOrchestrator:
     """Central event routing and orchestration"""
     
     def __init__(self):
-        self.events_file = 'data/orchestrated_events.json'
+        self.events_file = 'data/orchestrated_events.json'  # Legacy, migrated into the journal
+        self.events_dir = 'data/orchestrated_events'
         self.dedup_window = 300  # 5 minutes
         
         # Event storage
-        self.events: List[UnifiedSecurityEvent] = []
-        self.dedup_cache: Dict[str, datetime] = {}  # For deduplication
+        self.store: Optional[EventStore] = None
+        self.dedup_cache: "OrderedDict[bytes, float]" = OrderedDict()  # Hashed key -> monotonic expiry
+        self._flush_handle = None
+        self._flush_lock = asyncio.Lock()
         
         # Routing tables
         self.event_handlers: Dict[EventType, List[Callable]] = defaultdict(list)
@@ -51,23 +264,48 @@ class EventOrchestrator:
         self.load_events()
     
     def load_events(self):
-        """Load event history"""
-        if os.path.exists(self.events_file):
-            try:
-                with open(self.events_file, 'r') as f:
-                    data = json.load(f)
-                    # Reconstruct events
-                    self.events = [UnifiedSecurityEvent.from_dict(e) for e in data.get('events', [])]
-            except:
-                self.events = []
+        """Open the event journal (only the newest segment is read)"""
+        os.makedirs(os.path.dirname(self.events_file), exist_ok=True)
+        self.store = EventStore(self.events_dir, max_events=100000, legacy_file=self.events_file)
     
     def save_events(self):
-        """Save event history"""
-        os.makedirs(os.path.dirname(self.events_file), exist_ok=True)
-        with open(self.events_file, 'w') as f:
-            json.dump({
-                'events': [e.to_dict() for e in self.events[-10000:]]  # Keep last 10k
-            }, f, indent=2)
+        """Write queued events now (shutdown path; normal writes are group-committed)"""
+        self._cancel_flush()
+        self.store.journal.flush_sync()
+    
+    def _schedule_flush(self):
+        """Group-commit queued events shortly, off the event loop"""
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.store.journal.flush_sync()
+            return
+        self._flush_handle = loop.call_later(FLUSH_DELAY, lambda: asyncio.ensure_future(self._flush()))
+    
+    def _cancel_flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+    
+    async def _flush(self):
+        self._flush_handle = None
+        async with self._flush_lock:  # Keep batches in append order
+            try:
+                await self.store.journal.flush()
+            except Exception as e:
+                print(f"[Orchestrator] ❌ Event journal flush failed: {e}")
+    
+    def update_event(self, event: UnifiedSecurityEvent):
+        """Persist a status/assignment change; the newest copy wins on load"""
+        self.store.append(event)
+        self._schedule_flush()
+    
+    @property
+    def events(self) -> List[UnifiedSecurityEvent]:
+        """Loaded events, oldest first (hydrates every record; prefer the indexed getters)"""
+        return list(self.store.recent())[::-1]
     
     def register_handler(self, event_type: EventType, handler: Callable):
         """Register handler for specific event type"""
@@ -97,10 +335,8 @@ class EventOrchestrator:
             return False
         
         # 2. STORE
-        self.events.append(event)
-        if len(self.events) > 100000:
-            self.events = self.events[-100000:]
-        self.save_events()
+        self.store.append(event)
+        self._schedule_flush()
         
         # 3. ENRICHMENT PIPELINE
         for enricher in self.enrichers:
@@ -135,45 +371,51 @@ class EventOrchestrator:
     
     def _is_duplicate(self, event: UnifiedSecurityEvent) -> bool:
         """Check if event is duplicate"""
+        now = time.monotonic()
+        
+        # Expire old keys; insertion order is expiry order since the window is fixed
+        cache = self.dedup_cache
+        while cache:
+            oldest_key, expires_at = next(iter(cache.items()))
+            if expires_at > now:
+                break
+            del cache[oldest_key]
         
-        # Create dedup key
-        dedup_key = f"{event.context.source_module}:{event.event_type.value}:{event.payload.raw_data}"
+        # Create hashed dedup key
+        raw = json.dumps(event.payload.raw_data, sort_keys=True, default=str)
+        dedup_key = hashlib.blake2b(
+            f"{event.context.source_module}:{event.event_type.value}:{raw}".encode(), digest_size=16
+        ).digest()
         
-        # Check cache
-        if dedup_key in self.dedup_cache:
-            age = (get_now_pst() - self.dedup_cache[dedup_key]).seconds
-            if age < self.dedup_window:
-                return True  # Duplicate
-            else:
-                # Expired from cache
-                del self.dedup_cache[dedup_key]
+        if dedup_key in cache:
+            return True  # Duplicate
         
         # Not duplicate - add to cache
-        self.dedup_cache[dedup_key] = get_now_pst()
+        cache[dedup_key] = now + self.dedup_window
         return False
     
-    def get_events_by_type(self, event_type: EventType, limit: int = 100) -> List[UnifiedSecurityEvent]:
+    async def get_events_by_type(self, event_type: EventType, limit: int = 100) -> List[UnifiedSecurityEvent]:
         """Get recent events by type"""
-        return [e for e in self.events[-limit:] if e.event_type == event_type]
+        return await self.store.query_history('event_type', event_type.value, limit)
     
-    def get_events_by_severity(self, severity: EventSeverity, limit: int = 100) -> List[UnifiedSecurityEvent]:
+    async def get_events_by_severity(self, severity: EventSeverity, limit: int = 100) -> List[UnifiedSecurityEvent]:
         """Get recent events by severity"""
-        return [e for e in self.events[-limit:] if e.severity == severity]
+        return await self.store.query_history('severity', severity.value, limit)
     
-    def get_events_by_user(self, user_id: str, limit: int = 100) -> List[UnifiedSecurityEvent]:
+    async def get_events_by_user(self, user_id: str, limit: int = 100) -> List[UnifiedSecurityEvent]:
         """Get events for specific user"""
-        return [e for e in self.events[-limit:] if e.context.user_id == user_id]
+        return await self.store.query_history('user_id', user_id, limit)
     
-    def get_events_by_resource(self, resource_id: str, limit: int = 100) -> List[UnifiedSecurityEvent]:
+    async def get_events_by_resource(self, resource_id: str, limit: int = 100) -> List[UnifiedSecurityEvent]:
         """Get events for specific resource"""
-        return [e for e in self.events[-limit:] if e.context.resource_id == resource_id]
+        return await self.store.query_history('resource_id', resource_id, limit)
     
     def get_statistics(self) -> Dict:
         """Get event statistics"""
         now = get_now_pst()
         last_hour = now - timedelta(hours=1)
         
-        recent_events = [e for e in self.events if e.timestamp > last_hour]
+        recent_events = list(itertools.takewhile(lambda e: e.timestamp > last_hour, self.store.recent()))
         
         by_type = defaultdict(int)
         by_severity = defaultdict(int)
@@ -184,13 +426,11 @@ class EventOrchestrator:
             by_severity[event.severity.value] += 1
             by_status[event.status.value] += 1
         
-        critical_unresolved = len([
-            e for e in self.events
-            if e.severity == EventSeverity.CRITICAL and e.status != EventStatus.RESOLVED
-        ])
+        critical_unresolved = self.store.count_where('severity', EventSeverity.CRITICAL.value,
+                                                     exclude_status=EventStatus.RESOLVED)
         
         return {
-            'total_events': len(self.events),
+            'total_events': len(self.store),
             'last_hour_events': len(recent_events),
             'by_type': dict(by_type),
             'by_severity': dict(by_severity),
@@ -201,10 +441,7 @@ class EventOrchestrator:
     
     def _calculate_avg_tti(self) -> float:
         """Calculate average time to investigate"""
-        investigating = [
-            e for e in self.events
-            if e.status == EventStatus.INVESTIGATING
-        ]
+        investigating = list(self.store.with_status(EventStatus.INVESTIGATING))
         
         if not investigating:
             return 0.0
@@ -228,6 +465,9 @@ class EventOrchestratorCog(commands.Cog):
         self.bot = bot
         self.orchestrator = event_orchestrator
     
+    def cog_unload(self):
+        self.orchestrator.save_events()
+    
     @commands.command(name='eventstats')
     @commands.is_owner()
     async def event_stats(self, ctx):
@@ -244,6 +484,15 @@ class EventOrchestratorCog(commands.Cog):
         embed.add_field(name="Last Hour", value=str(stats['last_hour_events']), inline=True)
         embed.add_field(name="Critical Unresolved", value=str(stats['critical_unresolved']), inline=True)
         
+        store = self.orchestrator.store
+        embed.add_field(
+            name="Event Journal",
+            value=(f"{len(store.journal.segments())} segment(s), {store.journal.size_bytes() / 1024:.0f} KB\n"
+                   f"{len(store.unloaded_segments)} older segment(s) not loaded\n"
+                   f"Dedup keys: {len(self.orchestrator.dedup_cache)}"),
+            inline=False
+        )
+        
         embed.add_field(name="By Event Type", value="━" * 25, inline=False)
         for etype, count in sorted(stats['by_type'].items(), key=lambda x: x[1], reverse=True)[:5]:
             embed.add_field(name=f"• {etype}", value=str(count), inline=True)
@@ -121,12 +121,12 @@ class UnifiedSecurityEvent:
     """
     
     # Identity
-    event_id: str  # Unique event ID
-    event_type: EventType
+    event_id: str = ""  # Unique event ID (derived in __post_init__ when empty)
+    event_type: EventType = EventType.DETECTION
     timestamp: datetime = field(default_factory=get_now_pst)
     
     # Core information
-    severity: EventSeverity
+    severity: EventSeverity = EventSeverity.MEDIUM
     status: EventStatus = EventStatus.NEW
     title: str = ""
     description: str = ""
@@ -2,6 +2,10 @@
 Auto Threat Intel Updater - Automatically update threat intelligence feeds
 Periodically fetches latest IOCs from threat feeds and updates the threat intelligence hub
 Alerts SOC team on new critical threats
+
+Feeds with a `url` (streamed to disk) or a local `path` are ingested through the
+streaming pipeline in cogs.core.ioc_ingest; `format` is csv, stix or text and is
+detected from the file when omitted. Feeds without either are simulated.
 """
 
 import discord
@@ -13,6 +17,16 @@ from typing import Dict, List, Optional
 
 from cogs.core.signal_bus import signal_bus, Signal, SignalType
 from cogs.core.pst_timezone import get_now_pst
+from cogs.core.ioc_ingest import ioc_ingest, READ_SIZE
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+FEED_DOWNLOAD_DIR = 'data/threat_feeds'
+FEED_DOWNLOAD_TIMEOUT = 300
 
 class ThreatIntelUpdater(commands.Cog):
     """Automatically update threat intelligence from feeds"""
@@ -128,35 +142,77 @@ class ThreatIntelUpdater(commands.Cog):
             # Simulate feed update
             update = await self.fetch_feed(feed_name, feed_config)
             
-            if update['success']:
-                # Add IOCs to threat intel hub
-                new_iocs = await self.process_feed_iocs(threat_intel, feed_name, update)
-                
-                # Record update
-                self.feeds[feed_name]['last_updated'] = get_now_pst().isoformat()
-                self.feeds[feed_name]['ioc_count'] = update.get('ioc_count', 0)
-                self.save_feeds()
-                
-                # Log update
-                update_log = {
-                    'timestamp': get_now_pst().isoformat(),
-                    'feed': feed_name,
-                    'feed_type': feed_config['type'],
-                    'new_iocs': new_iocs,
-                    'total_iocs': update.get('ioc_count', 0),
-                    'critical_iocs': update.get('critical_count', 0)
-                }
-                self.feed_updates.append(update_log)
-                self.save_updates()
-                
-                # Alert if critical IOCs found
-                if update.get('critical_count', 0) > 0:
-                    await self.alert_critical_iocs(feed_name, update)
-                
-                print(f"[ThreatIntelUpdater] ✅ {feed_config['name']}: {new_iocs} new IOCs")
+            if not update['success']:
+                print(f"[ThreatIntelUpdater] ❌ {feed_config['name']}: {update.get('error')}")
+                continue
+            
+            # Add IOCs to threat intel hub
+            new_iocs = await self.process_feed_iocs(threat_intel, feed_name, update)
+            report = update['report']
+            if 'error' in report:
+                continue
+            
+            # Record update
+            self.feeds[feed_name]['last_updated'] = get_now_pst().isoformat()
+            self.feeds[feed_name]['ioc_count'] = update.get('ioc_count', 0)
+            self.save_feeds()
+            
+            # Log update
+            update_log = {
+                'timestamp': get_now_pst().isoformat(),
+                'feed': feed_name,
+                'feed_type': feed_config['type'],
+                'new_iocs': new_iocs,
+                'updated_iocs': report['updated'],
+                'unchanged_iocs': report['unchanged'],
+                'stale_iocs': report['stale'],
+                'duplicates': report['duplicates'],
+                'invalid': report['invalid'],
+                'total_iocs': update.get('ioc_count', 0),
+                'critical_iocs': update.get('critical_count', 0),
+                'duration_seconds': report['duration_seconds'],
+                'iocs_per_sec': report['iocs_per_sec']
+            }
+            self.feed_updates.append(update_log)
+            self.save_updates()
+            
+            # Alert if critical IOCs found
+            if update.get('critical_count', 0) > 0:
+                await self.alert_critical_iocs(feed_name, update)
+            
+            print(f"[ThreatIntelUpdater] ✅ {feed_config['name']}: {new_iocs} new IOCs "
+                  f"({report['iocs_per_sec']} IOCs/s)")
+    
+    async def download_feed(self, feed_name: str, url: str) -> str:
+        """Stream a feed to disk in chunks; returns the local path"""
+        os.makedirs(FEED_DOWNLOAD_DIR, exist_ok=True)
+        ext = os.path.splitext(url.split('?', 1)[0])[1].lower()
+        path = os.path.join(FEED_DOWNLOAD_DIR, f"{feed_name}{ext or '.feed'}")
+        tmp_path = f"{path}.download"
+        
+        timeout = aiohttp.ClientTimeout(total=FEED_DOWNLOAD_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                with open(tmp_path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(READ_SIZE):
+                        f.write(chunk)
+        os.replace(tmp_path, path)
+        return path
     
     async def fetch_feed(self, feed_name: str, feed_config: Dict) -> Dict:
-        """Fetch IOCs from threat feed (simulated)"""
+        """Fetch IOCs from threat feed (streamed from `url`/`path`, otherwise simulated)"""
+        if feed_config.get('url') or feed_config.get('path'):
+            try:
+                path = feed_config.get('path')
+                if feed_config.get('url'):
+                    if not HAS_AIOHTTP:
+                        return {'success': False, 'feed': feed_name, 'error': 'aiohttp not installed'}
+                    path = await self.download_feed(feed_name, feed_config['url'])
+                return {'success': True, 'feed': feed_name, 'source': path, 'format': feed_config.get('format')}
+            except Exception as e:
+                return {'success': False, 'feed': feed_name, 'error': f"{type(e).__name__}: {e}"}
+        
         # In production, this would call actual threat feeds (VirusTotal, abuse.ch, etc.)
         # For now, simulate feed data
         
@@ -190,31 +246,24 @@ class ThreatIntelUpdater(commands.Cog):
         }
     
     async def process_feed_iocs(self, threat_intel, feed_name: str, update: Dict) -> int:
-        """Process and add IOCs from feed to threat intel hub"""
-        new_iocs = 0
-        
-        for ioc in update.get('iocs', []):
-            ioc_value = ioc['value']
-            
-            # Check if already in database
-            if ioc_value not in threat_intel.iocs:
-                threat_intel.add_ioc(
-                    ioc_type=ioc.get('type', 'unknown'),
-                    value=ioc_value,
-                    category=ioc.get('category', 'unknown'),
-                    severity=ioc.get('severity', 'MEDIUM'),
-                    attributed_to=f"Feed: {feed_name}",
-                    description=f"From {feed_name} threat feed"
-                )
-                new_iocs += 1
-            else:
-                # Update existing IOC
-                if ioc_value in threat_intel.iocs:
-                    threat_intel.iocs[ioc_value]['last_seen'] = get_now_pst().isoformat()
-                    threat_intel.iocs[ioc_value]['hit_count'] = threat_intel.iocs[ioc_value].get('hit_count', 0) + 1
-        
-        threat_intel.save_threat_data()
-        return new_iocs
+        """Stream IOCs from feed into threat intel hub; returns the number of new IOCs"""
+        feed_config = self.feeds.get(feed_name, {})
+        report = await ioc_ingest.ingest(
+            threat_intel,
+            update.get('source', update.get('iocs', [])),
+            feed_name,
+            fmt=update.get('format'),
+            defaults={
+                'type': feed_config.get('type'),
+                'category': feed_config.get('type'),
+                'attributed_to': f"Feed: {feed_name}",
+                'description': f"From {feed_name} threat feed"
+            }
+        )
+        update['report'] = report
+        update.setdefault('ioc_count', report['unique'])
+        update.setdefault('critical_count', report['critical'])
+        return report['added']
     
     async def alert_critical_iocs(self, feed_name: str, update: Dict):
         """Alert SOC team of critical IOCs"""
@@ -301,6 +350,9 @@ class ThreatIntelUpdater(commands.Cog):
             
             field_value = f"**Feed:** {update['feed']}\n"
             field_value += f"**New IOCs:** {new_iocs}\n"
+            if 'iocs_per_sec' in update:
+                field_value += f"**Updated/Stale:** {update.get('updated_iocs', 0)}/{update.get('stale_iocs', 0)}\n"
+                field_value += f"**Throughput:** {update['iocs_per_sec']:,} IOCs/s\n"
             field_value += f"**Critical:** {critical}"
             
             emoji = "🔴" if critical > 0 else "🟢"
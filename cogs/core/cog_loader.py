@@ -0,0 +1,364 @@
+"""Cog Loader - Dependency-ordered, parallel-imported and optionally lazy extension loading
+
+Startup used to import and set up every whitelisted cog one after another. The loader:
+
+- Plans: reads each cog's imports and `bot.get_cog('Name')` lookups (AST, cached by
+  mtime/size) and orders modules so dependencies are set up first.
+- Pre-imports: warms the third-party packages each cog imports (the slow part of most
+  imports) in a thread pool. Cog modules themselves are only ever executed by
+  `load_extension`, in dependency order, so a cog importing another extension gets
+  the already-loaded module and its singletons.
+- Lazy mode: command-only cogs (no listeners, loops, slash commands or pipeline
+  stages) get lightweight prefix-command stubs and are imported on first use.
+- Reports: per-cog import and setup time, saved to data/startup_report.json.
+"""
+import ast
+import asyncio
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from discord.ext import commands
+
+CORE_PREFIXES = ('cogs.core.',)  # Never loaded lazily
+ANALYSIS_VERSION = 2               # Bump when analyze_source output changes
+
+# Source markers that make a cog unsafe to defer: it must be live to see events
+EAGER_MARKERS = (
+    'listener', 'tasks.loop', 'app_commands', 'hybrid_', 'register_stage', 'create_task',
+    'add_listener', 'add_view', 'add_check', 'bot.event', 'before_invoke', 'after_invoke',
+)
+
+
+def _decorator_command(decorator) -> Optional[str]:
+    """'command' / 'group' for @commands.command(...) style decorators, else None"""
+    func = decorator.func if isinstance(decorator, ast.Call) else decorator
+    if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == 'commands':
+        return func.attr if func.attr in ('command', 'group') else None
+    if isinstance(func, ast.Name) and func.id in ('command', 'group'):
+        return func.id
+    return None
+
+
+def analyze_source(source: str) -> Dict:
+    """Extract loader metadata from a cog's source without importing it"""
+    tree = ast.parse(source)
+    imports: Set[str] = set()
+    packages: Set[str] = set()
+    get_cogs: Set[str] = set()
+    cog_names: List[str] = []
+    prefix_commands: List[Dict] = []
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            if node.module.startswith('cogs.'):
+                imports.add(node.module)
+                imports.update(f"{node.module}.{alias.name}" for alias in node.names)
+            else:
+                packages.add(node.module)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                (imports if alias.name.startswith('cogs.') else packages).add(alias.name)
+        elif isinstance(node, ast.Call):
+            func = node.func
+            if (isinstance(func, ast.Attribute) and func.attr == 'get_cog' and node.args
+                    and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+                get_cogs.add(node.args[0].value)
+        elif isinstance(node, ast.ClassDef):
+            base_names = [ast.unparse(base) for base in node.bases]
+            if any(name.endswith('Cog') for name in base_names):
+                cog_name = node.name
+                for keyword in node.keywords:
+                    if keyword.arg == 'name' and isinstance(keyword.value, ast.Constant):
+                        cog_name = keyword.value.value
+                cog_names.append(cog_name)
+                for item in node.body:
+                    if not isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                        continue
+                    for decorator in item.decorator_list:
+                        if not _decorator_command(decorator):
+                            continue
+                        name, aliases = item.name, []
+                        if isinstance(decorator, ast.Call):
+                            for keyword in decorator.keywords:
+                                if keyword.arg == 'name' and isinstance(keyword.value, ast.Constant):
+                                    name = keyword.value.value
+                                elif keyword.arg == 'aliases' and isinstance(keyword.value, (ast.List, ast.Tuple)):
+                                    aliases = [e.value for e in keyword.value.elts if isinstance(e, ast.Constant)]
+                        doc = ast.get_docstring(item) or ""
+                        prefix_commands.append({'name': name, 'aliases': aliases,
+                                                'help': doc.strip().split('\n')[0]})
+
+    return {
+        'imports': sorted(imports),
+        'packages': sorted(packages),
+        'get_cogs': sorted(get_cogs),
+        'cog_names': cog_names,
+        'commands': prefix_commands,
+        'lazy_ok': bool(prefix_commands) and not any(marker in source for marker in EAGER_MARKERS),
+    }
+
+
+def _warm_imports(module: str, packages: List[str]):
+    """Thread pool worker: import a cog's third-party packages ahead of its load and time it
+
+    Failures are ignored; optional dependencies are the cog's own business at load time.
+    """
+    started = time.perf_counter()
+    for package in packages:
+        top = package.split('.', 1)[0]
+        if package in sys.modules or os.path.exists(f"{top}.py") or os.path.isdir(top):
+            continue  # Already imported, or part of this repo (never executed out of order)
+        try:
+            importlib.import_module(package)
+        except Exception:
+            pass
+    return module, (time.perf_counter() - started) * 1000
+
+
+class CogLoader:
+    """Plans, pre-imports, loads and profiles the bot's extensions"""
+
+    def __init__(self, bot, workers: int = 8, lazy: bool = False,
+                 cache_file: str = 'data/cog_plan_cache.json',
+                 report_file: str = 'data/startup_report.json'):
+        self.bot = bot
+        self.workers = max(1, workers)
+        self.lazy = lazy
+        self.cache_file = cache_file
+        self.report_file = report_file
+        self.analysis: Dict[str, Dict] = {}
+        self.lazy_modules: Dict[str, List[commands.Command]] = {}
+        self._lazy_locks: Dict[str, asyncio.Lock] = {}
+        self._dependents: Set[str] = set()
+        self.timings: Dict[str, Dict] = {}
+        self.report: Dict = {}
+        self.loaded = 0
+        self.failed = 0
+
+    # ==================== PLAN ====================
+
+    @staticmethod
+    def discover(names: Set[str], root: str = './cogs', skip_dirs: Set[str] = frozenset()) -> Dict[str, str]:
+        """Module name -> file path for every file whose basename is in `names`, in walk order"""
+        modules = {}
+        for dirpath, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if d not in skip_dirs]
+            for file in files:
+                if file.endswith('.py') and file != '__init__.py' and file[:-3] in names:
+                    rel_path = os.path.relpath(os.path.join(dirpath, file), root)
+                    modules[f"cogs.{rel_path.replace(os.sep, '.')[:-3]}"] = os.path.join(dirpath, file)
+        return modules
+
+    def _analyze_all(self, modules: Dict[str, str]):
+        try:
+            with open(self.cache_file, 'r') as f:
+                cache = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            cache = {}
+        fresh = {}
+        for module, path in modules.items():
+            try:
+                st = os.stat(path)
+                fingerprint = [st.st_mtime_ns, st.st_size, ANALYSIS_VERSION]
+                cached = cache.get(path)
+                if cached and cached.get('fingerprint') == fingerprint:
+                    info = cached['info']
+                else:
+                    with open(path, 'r', encoding='utf-8-sig') as f:
+                        info = analyze_source(f.read())
+                fresh[path] = {'fingerprint': fingerprint, 'info': info}
+            except (OSError, SyntaxError, UnicodeDecodeError, ValueError):
+                info = {'imports': [], 'packages': [], 'get_cogs': [], 'cog_names': [], 'commands': [], 'lazy_ok': False}
+            self.analysis[module] = info
+        if fresh != cache:
+            try:
+                os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+                with open(self.cache_file, 'w') as f:
+                    json.dump(fresh, f)
+            except OSError:
+                pass
+
+    def plan(self, modules: Dict[str, str]) -> List[List[str]]:
+        """Dependency levels: every module's planned dependencies sit in an earlier level"""
+        self._analyze_all(modules)
+        order = {module: i for i, module in enumerate(modules)}
+        cog_owner = {}
+        for module in modules:
+            for cog_name in self.analysis[module]['cog_names']:
+                cog_owner.setdefault(cog_name, module)
+
+        deps: Dict[str, Set[str]] = {}
+        for module in modules:
+            info = self.analysis[module]
+            wanted = {d for d in info['imports'] if d in order}
+            wanted.update(cog_owner[n] for n in info['get_cogs'] if n in cog_owner)
+            wanted.discard(module)
+            deps[module] = wanted
+
+        levels: List[List[str]] = []
+        placed: Set[str] = set()
+        remaining = list(modules)
+        while remaining:
+            level = [m for m in remaining if deps[m] <= placed]
+            if not level:
+                level = [remaining[0]]  # Dependency cycle: fall back to discovery order
+            levels.append(level)
+            placed.update(level)
+            remaining = [m for m in remaining if m not in placed]
+        self._dependents = {m for m in modules if any(m in deps[other] for other in modules)}
+        return levels
+
+    def _is_lazy(self, module: str) -> bool:
+        return (self.lazy and not module.startswith(CORE_PREFIXES)
+                and self.analysis.get(module, {}).get('lazy_ok', False)
+                and module not in self._dependents)
+
+    # ==================== LOAD ====================
+
+    async def _setup_timed(self, name: str):
+        started = time.perf_counter()
+        short = name.rsplit('.', 1)[-1]
+        try:
+            await self.bot.load_extension(name)
+            self.timings[name]['status'] = 'loaded'
+            self.loaded += 1
+            print(f"[Loader] ✅ {short}")
+        except Exception as e:
+            self.timings[name]['status'] = 'failed'
+            self.timings[name]['error'] = str(e)[:200]
+            self.failed += 1
+            print(f"[Loader] ❌ {short}: {str(e)[:80]}")
+        self.timings[name]['setup_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    async def load(self, modules: Dict[str, str]) -> Dict:
+        """Plan, warm third-party imports in parallel, then load every module in dependency order"""
+        started = time.perf_counter()
+        levels = self.plan(modules)
+        plan_ms = (time.perf_counter() - started) * 1000
+
+        eager_levels = []
+        for level in levels:
+            eager = []
+            for module in level:
+                if self._is_lazy(module) and self._register_stubs(module):
+                    self.timings[module] = {'mode': 'lazy', 'status': 'deferred', 'import_ms': 0.0, 'setup_ms': 0.0}
+                else:
+                    eager.append(module)
+                    self.timings[module] = {'mode': 'eager', 'status': 'pending', 'import_ms': 0.0, 'setup_ms': 0.0}
+            if eager:
+                eager_levels.append(eager)
+
+        # Warm every eager cog's packages at once; cog modules are left to load_extension
+        import_started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='cog-import') as pool:
+            results = await asyncio.gather(*[
+                loop.run_in_executor(pool, _warm_imports, module, self.analysis[module].get('packages', []))
+                for level in eager_levels for module in level
+            ])
+        for module, elapsed_ms in results:
+            self.timings[module]['import_ms'] = round(elapsed_ms, 2)
+        import_wall_ms = (time.perf_counter() - import_started) * 1000
+
+        setup_started = time.perf_counter()
+        for level in eager_levels:
+            for module in level:
+                await self._setup_timed(module)
+        setup_wall_ms = (time.perf_counter() - setup_started) * 1000
+
+        self.report = {
+            'generated_at': datetime.utcnow().isoformat(),
+            'workers': self.workers,
+            'lazy_mode': self.lazy,
+            'levels': len(levels),
+            'plan_ms': round(plan_ms, 2),
+            'import_wall_ms': round(import_wall_ms, 2),
+            'import_total_ms': round(sum(t['import_ms'] for t in self.timings.values()), 2),
+            'setup_wall_ms': round(setup_wall_ms, 2),
+            'total_ms': round((time.perf_counter() - started) * 1000, 2),
+            'loaded': self.loaded,
+            'failed': self.failed,
+            'lazy': len(self.lazy_modules),
+            'ready_seconds': None,
+            'cogs': self.timings,
+        }
+        self.save_report()
+        return self.report
+
+    # ==================== LAZY STUBS ====================
+
+    def _register_stubs(self, module: str) -> bool:
+        """Register placeholder prefix commands; False (and nothing registered) on any name clash"""
+        stubs = []
+        for info in self.analysis[module]['commands']:
+            if any(self.bot.get_command(n) for n in [info['name'], *info['aliases']]):
+                for stub in stubs:
+                    self.bot.remove_command(stub.name)
+                return False
+            stub = commands.Command(self._make_stub(module), name=info['name'], aliases=info['aliases'],
+                                    help=info['help'], brief=info['help'])
+            self.bot.add_command(stub)
+            stubs.append(stub)
+        self.lazy_modules[module] = stubs
+        return True
+
+    def _make_stub(self, module: str):
+        async def lazy_command(ctx, *, _args: str = None):
+            await self._load_lazy(module, ctx)
+        return lazy_command
+
+    async def _load_lazy(self, module: str, ctx):
+        """Import and set up a deferred cog, then re-dispatch the message to the real command"""
+        lock = self._lazy_locks.setdefault(module, asyncio.Lock())
+        async with lock:
+            stubs = self.lazy_modules.pop(module, None)
+            if stubs is not None:
+                for stub in stubs:
+                    self.bot.remove_command(stub.name)
+                _, elapsed_ms = await asyncio.get_running_loop().run_in_executor(
+                    None, _warm_imports, module, self.analysis[module].get('packages', []))
+                self.timings[module]['import_ms'] = round(elapsed_ms, 2)
+                await self._setup_timed(module)
+                self.save_report()
+                if self.timings[module]['status'] != 'loaded':
+                    await ctx.send(f"⚠️ `{ctx.invoked_with}` is unavailable: its module failed to load")
+                    return
+
+        new_ctx = await self.bot.get_context(ctx.message)
+        if new_ctx.command is not None and new_ctx.command.callback is not ctx.command.callback:
+            await self.bot.invoke(new_ctx)
+
+    # ==================== REPORT ====================
+
+    def record_ready(self, seconds: float):
+        self.report['ready_seconds'] = round(seconds, 2)
+        self.save_report()
+
+    def save_report(self):
+        if not self.report:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.report_file) or '.', exist_ok=True)
+            with open(self.report_file, 'w') as f:
+                json.dump(self.report, f, indent=2)
+        except OSError as e:
+            print(f"[Loader] ⚠️ Could not save startup report: {e}")
+
+    def print_report(self, top: int = 10):
+        r = self.report
+        print(f"\n[Loader] ⏱️ Startup profile: plan {r['plan_ms']:.0f}ms | "
+              f"import {r['import_wall_ms']:.0f}ms wall ({r['import_total_ms']:.0f}ms summed, {r['workers']} threads) | "
+              f"setup {r['setup_wall_ms']:.0f}ms | total {r['total_ms']:.0f}ms")
+        if r['lazy']:
+            print(f"[Loader] 💤 {r['lazy']} command-only cog(s) deferred until first use")
+        slowest = sorted(self.timings.items(), key=lambda item: item[1]['import_ms'] + item[1]['setup_ms'],
+                         reverse=True)[:top]
+        for module, t in slowest:
+            print(f"  {t['import_ms'] + t['setup_ms']:8.1f}ms  import {t['import_ms']:7.1f}  "
+                  f"setup {t['setup_ms']:7.1f}  {module}")
@@ -1,12 +1,192 @@
 """Command Sync
-Owner-only prefix command to sync slash commands.
+Owner-only prefix command to sync slash commands, plus the hash-gated startup sync:
+the command tree is fingerprinted per scope (global / guild) and only scopes whose
+fingerprint differs from the last successful sync are sent to Discord.
 """
 
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
 import discord
 from discord.ext import commands
 
 from cogs.core.pst_timezone import get_now_pst
 
+TREE_STATE_FILE = 'data/command_tree_state.json'
+GLOBAL_SCOPE = 'global'
+
+
+def _scope_key(guild_id: Optional[int]) -> str:
+    return GLOBAL_SCOPE if guild_id is None else f"guild:{guild_id}"
+
+
+def _digest(payload) -> str:
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+async def command_payloads(tree, guild: Optional[discord.abc.Snowflake] = None) -> Dict[str, dict]:
+    """The exact payloads tree.sync() would send for one scope, keyed by type:name
+
+    Includes options, default permissions, DM/NSFW flags and, when a translator is
+    installed, localizations.
+    """
+    translator = getattr(tree, 'translator', None)
+    payloads = {}
+    for command in tree.get_commands(guild=guild):
+        if translator:
+            payload = await command.get_translated_payload(tree, translator)
+        else:
+            try:
+                payload = command.to_dict(tree)
+            except TypeError:
+                payload = command.to_dict()  # discord.py < 2.4
+        payloads[f"{payload.get('type', 1)}:{payload['name']}"] = payload
+    return payloads
+
+
+def load_tree_state() -> Dict:
+    try:
+        with open(TREE_STATE_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_tree_state(state: Dict):
+    try:
+        os.makedirs(os.path.dirname(TREE_STATE_FILE), exist_ok=True)
+        with open(TREE_STATE_FILE, 'w') as f:
+            json.dump(state, f, indent=2)
+    except OSError as e:
+        print(f"[Sync] ⚠️ Could not save command tree state: {e}")
+
+
+def _scope_state(bot, payloads: Dict[str, dict]) -> Dict:
+    return {
+        'fingerprint': _digest(sorted(payloads.items())),
+        'commands': {key: _digest(payload) for key, payload in payloads.items()},
+        'application_id': getattr(bot, 'application_id', None),
+        'synced_at': datetime.utcnow().isoformat()
+    }
+
+
+def _diff(previous: Dict, current: Dict) -> Dict[str, List[str]]:
+    old, new = previous.get('commands', {}), current['commands']
+    return {
+        'added': sorted(k.split(':', 1)[1] for k in new.keys() - old.keys()),
+        'removed': sorted(k.split(':', 1)[1] for k in old.keys() - new.keys()),
+        'changed': sorted(k.split(':', 1)[1] for k in new.keys() & old.keys() if new[k] != old[k])
+    }
+
+
+async def record_tree_sync(bot, guild_id: Optional[int] = None, copied_global: bool = False):
+    """Store the current fingerprint for a scope after a manual sync
+
+    `copied_global` marks a guild scope filled by `tree.copy_global_to()`; that copy
+    only lives in memory, so the startup sync re-applies it instead of treating the
+    scope as emptied.
+    """
+    guild = discord.Object(id=guild_id) if guild_id else None
+    state = load_tree_state()
+    entry = _scope_state(bot, await command_payloads(bot.tree, guild))
+    if guild_id:
+        entry['copied_global'] = copied_global
+    state[_scope_key(guild_id)] = entry
+    save_tree_state(state)
+
+
+async def sync_command_tree(bot, force: bool = False) -> Dict[str, Dict]:
+    """Sync only the scopes whose command tree changed since the last successful sync
+
+    Scopes are global, every guild that has guild-specific commands in the tree, guilds
+    an owner filled with `!sync <guild_id>` (the global copy is re-applied first), and
+    guilds whose guild-specific commands were recorded at an earlier startup, so a guild
+    whose last guild command was removed from the code is synced once more (clearing
+    it on Discord) and then forgotten.
+    Returns per-scope results: status (unchanged/synced/failed), command count, the
+    added/removed/changed command names and the sync time in ms.
+    """
+    state = load_tree_state()
+    member_of = {guild.id for guild in bot.guilds}
+    copied, removable = set(), []
+    for key in list(state):
+        if not key.startswith('guild:'):
+            continue
+        try:
+            guild_id = int(key.split(':', 1)[1])
+        except ValueError:
+            guild_id = None
+        if guild_id not in member_of:
+            del state[key]  # Left the guild: nothing can be synced there any more
+        elif state[key].get('copied_global'):
+            bot.tree.copy_global_to(guild=discord.Object(id=guild_id))
+            copied.add(guild_id)
+        elif state[key].get('guild_commands'):
+            removable.append(guild_id)
+
+    scopes: List[Optional[int]] = [None]
+    scopes.extend(guild.id for guild in bot.guilds if bot.tree.get_commands(guild=guild))
+    scopes.extend(guild_id for guild_id in removable if guild_id not in scopes)
+
+    results = {}
+    for guild_id in scopes:
+        key = _scope_key(guild_id)
+        guild = discord.Object(id=guild_id) if guild_id else None
+        current = _scope_state(bot, await command_payloads(bot.tree, guild))
+        if guild_id:
+            current['copied_global'] = guild_id in copied
+            current['guild_commands'] = guild_id not in copied
+        previous = state.get(key, {})
+        result = {'count': len(current['commands']), **_diff(previous, current), 'ms': 0.0}
+
+        unchanged = (previous.get('fingerprint') == current['fingerprint']
+                     and previous.get('application_id') == current['application_id'])
+        if unchanged and not force:
+            result['status'] = 'unchanged'
+            results[key] = result
+            continue
+
+        started = time.perf_counter()
+        try:
+            await bot.tree.sync(guild=guild)
+            result['status'] = 'synced'
+            if guild_id and not current['commands'] and current['guild_commands']:
+                state.pop(key, None)  # Guild commands removed and cleared on Discord; stop tracking
+            else:
+                state[key] = current
+        except Exception as e:
+            result['status'] = 'failed'
+            result['error'] = str(e)[:200]
+        result['ms'] = round((time.perf_counter() - started) * 1000, 1)
+        results[key] = result
+
+    save_tree_state(state)
+    return results
+
+
+def format_sync_results(results: Dict[str, Dict]) -> List[str]:
+    """One summary line per scope for the startup log/embed"""
+    lines = []
+    for key, r in results.items():
+        if r['status'] == 'unchanged':
+            lines.append(f"{key}: unchanged ({r['count']} commands, sync skipped)")
+            continue
+        diff = f"+{len(r['added'])} -{len(r['removed'])} ~{len(r['changed'])}"
+        names = ", ".join([*(f"+{n}" for n in r['added']), *(f"-{n}" for n in r['removed']),
+                           *(f"~{n}" for n in r['changed'])][:10])
+        line = f"{key}: {r['status']} in {r['ms']:.0f}ms ({r['count']} commands, {diff})"
+        if names:
+            line += f" [{names}]"
+        if r['status'] == 'failed':
+            line += f" - {r.get('error', '')[:80]}"
+        lines.append(line)
+    return lines
+
 
 class CommandSync(commands.Cog):
     """Sync application commands to Discord"""
@@ -23,6 +203,7 @@ class CommandSync(commands.Cog):
                 guild = discord.Object(id=guild_id)
                 self.bot.tree.copy_global_to(guild=guild)
                 synced = await self.bot.tree.sync(guild=guild)
+                await record_tree_sync(self.bot, guild_id, copied_global=True)
 
                 embed = discord.Embed(
                     title="Commands Synced",
@@ -35,6 +216,7 @@ class CommandSync(commands.Cog):
                 embed.add_field(name="Commands", value=str(len(synced)), inline=True)
             else:
                 synced = await self.bot.tree.sync()
+                await record_tree_sync(self.bot)
 
                 embed = discord.Embed(
                     title="Commands Synced",
@@ -0,0 +1,564 @@
+"""
+Data Storage - Pluggable storage backends for DataManager
+Per-user sections are read as point lookups; everything else is stored as whole documents.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Sections keyed by user id that are accessed one row at a time
+USER_SECTIONS = ("warns", "reputation", "levels", "achievements", "consent")
+
+# Sections kept in memory and stored as a single document each
+DOCUMENT_SECTIONS = (
+    "reminders", "guild_settings", "user_settings", "suggestions", "trivia_scores",
+    "privacy_accepted", "tos_accepted", "custom_data"
+)
+
+def dumps(value):
+    """Compact JSON encoding that tolerates the event loop mutating `value` mid-dump."""
+    for attempt in range(3):
+        try:
+            return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+        except RuntimeError:
+            if attempt == 2:
+                raise
+            time.sleep(0.01)
+
+
+def _atomic_write(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+class StorageBackend:
+    """Interface implemented by DataManager storage backends.
+
+    load_* methods are called from the event loop and must be cheap.
+    write_batch runs in an executor thread.
+    """
+    name = "base"
+
+    def load_documents(self):
+        """Return {section: value} for every stored document section."""
+        raise NotImplementedError
+
+    def load_row(self, section, user_id):
+        """Return the stored value for one user, or None."""
+        raise NotImplementedError
+
+    def count_rows(self, section):
+        raise NotImplementedError
+
+    def iter_user_ids(self, section):
+        raise NotImplementedError
+
+    def write_batch(self, documents, rows):
+        """Persist {section: value} documents and {section: {user_id: value or None}} rows.
+
+        Returns the number of bytes written (approximate for SQLite).
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JSONStorageBackend(StorageBackend):
+    """One compact JSON file per section under `sections_dir`, held fully in memory."""
+    name = "json"
+
+    def __init__(self, sections_dir, legacy_file=None):
+        self.sections_dir = sections_dir
+        self.legacy_file = legacy_file
+        os.makedirs(self.sections_dir, exist_ok=True)
+        self.sections = {}
+        self.migrated_sections = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _path(self, section):
+        return os.path.join(self.sections_dir, f"{section}.json")
+
+    def _load(self):
+        legacy = None
+        for section in USER_SECTIONS + DOCUMENT_SECTIONS:
+            path = self._path(section)
+            if os.path.exists(path):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        self.sections[section] = json.load(f)
+                    continue
+                except Exception as e:
+                    print(f"[DataStorage] ⚠️ Error loading section {section}: {e}")
+
+            # Section not split out yet: take it from the legacy file and write it out on next flush
+            if legacy is None:
+                legacy = load_legacy_file(self.legacy_file)
+            if section in legacy:
+                self.sections[section] = legacy[section]
+                self.migrated_sections.add(section)
+
+        # One-time split of the legacy document into per-section files
+        for section in self.migrated_sections:
+            _atomic_write(self._path(section), dumps(self.sections[section]))
+        if self.migrated_sections:
+            print(f"[DataStorage] ✅ Split {len(self.migrated_sections)} sections out of {self.legacy_file}")
+
+    def load_documents(self):
+        return {s: self.sections[s] for s in DOCUMENT_SECTIONS if s in self.sections}
+
+    def load_row(self, section, user_id):
+        return self.sections.get(section, {}).get(user_id)
+
+    def count_rows(self, section):
+        return len(self.sections.get(section, {}))
+
+    def iter_user_ids(self, section):
+        return list(self.sections.get(section, {}))
+
+    def write_batch(self, documents, rows):
+        written = 0
+        with self._lock:
+            for section, value in documents.items():
+                self.sections[section] = value
+                payload = dumps(value)
+                _atomic_write(self._path(section), payload)
+                written += len(payload)
+            for section, changes in rows.items():
+                stored = self.sections.setdefault(section, {})
+                for user_id, value in changes.items():
+                    if value is None:
+                        stored.pop(user_id, None)
+                    else:
+                        stored[user_id] = value
+                payload = dumps(stored)
+                _atomic_write(self._path(section), payload)
+                written += len(payload)
+        return written
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    section TEXT PRIMARY KEY,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS warns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_warns_user ON warns(user_id);
+CREATE TABLE IF NOT EXISTS reputation (
+    user_id TEXT PRIMARY KEY,
+    rep INTEGER NOT NULL DEFAULT 0,
+    given TEXT NOT NULL DEFAULT '[]',
+    received TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS idx_reputation_rep ON reputation(rep);
+CREATE TABLE IF NOT EXISTS levels (
+    user_id TEXT PRIMARY KEY,
+    level INTEGER NOT NULL DEFAULT 1,
+    xp INTEGER NOT NULL DEFAULT 0,
+    messages INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_levels_rank ON levels(level, xp);
+CREATE TABLE IF NOT EXISTS achievements (
+    user_id TEXT NOT NULL,
+    achievement_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (user_id, achievement_id)
+);
+CREATE TABLE IF NOT EXISTS consent (
+    user_id TEXT PRIMARY KEY,
+    given INTEGER NOT NULL,
+    timestamp TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Point-lookup statements; sqlite3 caches the prepared form per connection
+ROW_SELECT = {
+    "warns": "SELECT payload FROM warns WHERE user_id = ? ORDER BY id",
+    "reputation": "SELECT rep, given, received FROM reputation WHERE user_id = ?",
+    "levels": "SELECT level, xp, messages FROM levels WHERE user_id = ?",
+    "achievements": "SELECT achievement_id FROM achievements WHERE user_id = ? ORDER BY position",
+    "consent": "SELECT given, timestamp FROM consent WHERE user_id = ?",
+}
+
+
+class SQLiteStorageBackend(StorageBackend):
+    """SQLite in WAL mode with one indexed table per user section.
+
+    Reads use a dedicated connection on the event loop thread; write_batch uses a
+    second connection from the executor so readers never wait on a commit.
+    """
+    name = "sqlite"
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._write_lock = threading.Lock()
+        self._writer = self._connect(check_same_thread=False)
+        self._writer.executescript(SQLITE_SCHEMA)
+        self._writer.commit()
+        self._reader = self._connect()
+
+    def _connect(self, check_same_thread=True):
+        conn = sqlite3.connect(self.db_path, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ---- reads ----
+
+    def load_documents(self):
+        documents = {}
+        for section, payload in self._reader.execute("SELECT section, payload FROM documents"):
+            try:
+                documents[section] = json.loads(payload)
+            except ValueError as e:
+                print(f"[DataStorage] ⚠️ Corrupt document {section}: {e}")
+        return documents
+
+    def load_row(self, section, user_id):
+        cursor = self._reader.execute(ROW_SELECT[section], (user_id,))
+        if section == "warns":
+            warns = [json.loads(payload) for (payload,) in cursor]
+            return warns or None
+        if section == "achievements":
+            achievements = [json.loads(achievement_id) for (achievement_id,) in cursor]
+            return achievements or None
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        if section == "reputation":
+            return {"rep": row[0], "given": json.loads(row[1]), "received": json.loads(row[2])}
+        if section == "levels":
+            return {"level": row[0], "xp": row[1], "messages": row[2]}
+        return {"given": bool(row[0]), "timestamp": row[1]}
+
+    def count_rows(self, section):
+        return self._reader.execute(f"SELECT COUNT(DISTINCT user_id) FROM {section}").fetchone()[0]
+
+    def iter_user_ids(self, section):
+        return [user_id for (user_id,) in self._reader.execute(f"SELECT DISTINCT user_id FROM {section}")]
+
+    def get_meta(self, key):
+        row = self._reader.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    # ---- writes ----
+
+    def write_batch(self, documents, rows):
+        written = 0
+        with self._write_lock:
+            conn = self._writer
+            with conn:  # one transaction for the whole batch
+                doc_params = []
+                for section, value in documents.items():
+                    payload = dumps(value)
+                    doc_params.append((section, payload))
+                    written += len(payload)
+                if doc_params:
+                    conn.executemany(
+                        "INSERT INTO documents(section, payload) VALUES(?, ?) "
+                        "ON CONFLICT(section) DO UPDATE SET payload = excluded.payload",
+                        doc_params
+                    )
+                for section, changes in rows.items():
+                    written += self._write_rows(conn, section, changes)
+        return written
+
+    def _write_rows(self, conn, section, changes):
+        written = 0
+        deleted = [(user_id,) for user_id, value in changes.items() if value is None]
+        present = {user_id: value for user_id, value in changes.items() if value is not None}
+
+        if section in ("warns", "achievements"):
+            # List sections: replace the user's rows wholesale
+            conn.executemany(f"DELETE FROM {section} WHERE user_id = ?", [(u,) for u in changes])
+            if section == "warns":
+                params = []
+                for user_id, warns in present.items():
+                    for warn in list(warns):
+                        payload = dumps(warn)
+                        params.append((user_id, payload))
+                        written += len(payload)
+                conn.executemany("INSERT INTO warns(user_id, payload) VALUES(?, ?)", params)
+            else:
+                params = [
+                    (user_id, dumps(achievement_id), position)
+                    for user_id, achievements in present.items()
+                    for position, achievement_id in enumerate(list(achievements))
+                ]
+                conn.executemany(
+                    "INSERT OR IGNORE INTO achievements(user_id, achievement_id, position) VALUES(?, ?, ?)",
+                    params
+                )
+                written += sum(len(p[1]) for p in params)
+            return written
+
+        if deleted:
+            conn.executemany(f"DELETE FROM {section} WHERE user_id = ?", deleted)
+        if section == "reputation":
+            params = []
+            for user_id, rep in present.items():
+                given, received = dumps(rep.get("given", [])), dumps(rep.get("received", []))
+                params.append((user_id, rep.get("rep", 0), given, received))
+                written += len(given) + len(received)
+            conn.executemany(
+                "INSERT INTO reputation(user_id, rep, given, received) VALUES(?, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET rep = excluded.rep, given = excluded.given, "
+                "received = excluded.received",
+                params
+            )
+        elif section == "levels":
+            params = [
+                (user_id, lv.get("level", 1), lv.get("xp", 0), lv.get("messages", 0))
+                for user_id, lv in present.items()
+            ]
+            conn.executemany(
+                "INSERT INTO levels(user_id, level, xp, messages) VALUES(?, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET level = excluded.level, xp = excluded.xp, "
+                "messages = excluded.messages",
+                params
+            )
+            written += 24 * len(params)
+        elif section == "consent":
+            params = [
+                (user_id, int(bool(c.get("given"))), c.get("timestamp"))
+                for user_id, c in present.items()
+            ]
+            conn.executemany(
+                "INSERT INTO consent(user_id, given, timestamp) VALUES(?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET given = excluded.given, timestamp = excluded.timestamp",
+                params
+            )
+            written += 40 * len(params)
+        return written
+
+    def migrate_from(self, legacy_data, source):
+        """One-shot import of a legacy JSON document into empty tables."""
+        if self.get_meta("migrated_from"):
+            return False
+        rows = {
+            section: {str(user_id): value for user_id, value in legacy_data.get(section, {}).items()}
+            for section in USER_SECTIONS
+        }
+        documents = {s: legacy_data[s] for s in DOCUMENT_SECTIONS if s in legacy_data}
+        self.write_batch(documents, rows)
+        with self._write_lock, self._writer:
+            self._writer.execute(
+                "INSERT OR REPLACE INTO meta(key, value) VALUES('migrated_from', ?)", (source,)
+            )
+        return True
+
+    def close(self):
+        for conn in (self._reader, self._writer):
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+def load_legacy_file(path):
+    """Read the pre-split bot_data.json document, or {} if missing/corrupt."""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[DataStorage] ⚠️ Error loading {path}: {e}")
+        return {}
+
+
+def migrate_json_to_sqlite(backend, legacy_file, sections_dir=None):
+    """Import data/bot_data.json (and any split section files) into a fresh SQLite backend.
+
+    Runs at most once per database; the source file is renamed to *.migrated afterwards.
+    """
+    if backend.get_meta("migrated_from"):
+        return False
+
+    legacy = load_legacy_file(legacy_file)
+    if sections_dir and os.path.isdir(sections_dir):
+        # Split files written by the JSON backend are newer than the legacy document
+        for section in USER_SECTIONS + DOCUMENT_SECTIONS:
+            path = os.path.join(sections_dir, f"{section}.json")
+            if os.path.exists(path):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        legacy[section] = json.load(f)
+                except Exception as e:
+                    print(f"[DataStorage] ⚠️ Skipping {path}: {e}")
+    if not legacy:
+        return False
+
+    started = time.perf_counter()
+    backend.migrate_from(legacy, legacy_file)
+    if legacy_file and os.path.exists(legacy_file):
+        os.replace(legacy_file, f"{legacy_file}.migrated")
+    elapsed = (time.perf_counter() - started) * 1000
+    users = sum(len(legacy.get(s, {})) for s in USER_SECTIONS)
+    print(f"[DataStorage] ✅ Migrated {users} user rows to {backend.db_path} in {elapsed:.0f}ms")
+    return True
+
+
+class UserRows:
+    """Dict-like view over one per-user section with a bounded read cache.
+
+    Reads hit the cache, then the backend as a point lookup. Writes stay in the
+    cache and are handed to the next flush via take_dirty().
+    """
+
+    def __init__(self, backend, section, max_cached=5000):
+        self.backend = backend
+        self.section = section
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self._dirty = set()
+        self._inflight = set()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, default=None):
+        user_id = str(user_id)
+        if user_id in self._cache:
+            self._cache.move_to_end(user_id)
+            self.hits += 1
+            value = self._cache[user_id]
+        else:
+            self.misses += 1
+            value = self.backend.load_row(self.section, user_id)
+            self._cache[user_id] = value
+            self._evict()
+        return default if value is None else value
+
+    def __getitem__(self, user_id):
+        value = self.get(user_id)
+        if value is None:
+            raise KeyError(user_id)
+        return value
+
+    def __setitem__(self, user_id, value):
+        user_id = str(user_id)
+        self._cache[user_id] = value
+        self._cache.move_to_end(user_id)
+        self._dirty.add(user_id)
+        self._evict()
+
+    def __delitem__(self, user_id):
+        user_id = str(user_id)
+        if self.get(user_id) is None:
+            raise KeyError(user_id)
+        self._cache[user_id] = None
+        self._dirty.add(user_id)
+
+    def __contains__(self, user_id):
+        return self.get(user_id) is not None
+
+    def cache_default(self, user_id, value):
+        """Cache a default for a missing user without scheduling a write."""
+        user_id = str(user_id)
+        self._cache[user_id] = value
+        self._cache.move_to_end(user_id)
+        self._evict()
+        return value
+
+    def mark_dirty(self, user_id):
+        self._dirty.add(str(user_id))
+
+    def take_dirty(self):
+        """Hand pending rows to a flush; they stay cached until the write lands."""
+        changes = {user_id: self._cache.get(user_id) for user_id in self._dirty}
+        self._inflight.update(self._dirty)
+        self._dirty.clear()
+        return changes
+
+    def flush_done(self, user_ids, failed=False):
+        self._inflight.difference_update(user_ids)
+        if failed:
+            self._dirty.update(user_ids)
+        self._evict()
+
+    @property
+    def pending(self):
+        return len(self._dirty)
+
+    def _evict(self):
+        # Only clean rows can be dropped; dirty/in-flight rows are the source of truth
+        excess = len(self._cache) - self.max_cached
+        if excess <= 0:
+            return
+        for user_id in list(self._cache):
+            if excess <= 0:
+                break
+            if user_id in self._dirty or user_id in self._inflight:
+                continue
+            del self._cache[user_id]
+            excess -= 1
+
+    def __len__(self):
+        """Number of users with persisted rows (excludes changes still waiting for a flush)."""
+        return self.backend.count_rows(self.section)
+
+    def keys(self):
+        user_ids = set(self.backend.iter_user_ids(self.section))
+        for user_id, value in self._cache.items():
+            if value is None:
+                user_ids.discard(user_id)
+            else:
+                user_ids.add(user_id)
+        return user_ids
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self):
+        for user_id in self.keys():
+            value = self.get(user_id)
+            if value is not None:
+                yield user_id, value
+
+    def values(self):
+        for _, value in self.items():
+            yield value
+
+
+def create_backend(kind, data_dir):
+    """Build the configured backend ('sqlite' or 'json')."""
+    if kind == "json":
+        return JSONStorageBackend(
+            os.path.join(data_dir, "bot_data"),
+            legacy_file=os.path.join(data_dir, "bot_data.json")
+        )
+    backend = SQLiteStorageBackend(os.path.join(data_dir, "bot_data.db"))
+    migrate_json_to_sqlite(
+        backend,
+        os.path.join(data_dir, "bot_data.json"),
+        sections_dir=os.path.join(data_dir, "bot_data")
+    )
+    return backend
+
+
+if __name__ == "__main__":
+    # Manual one-shot migration: python -m cogs.core.data_storage [data_dir]
+    import sys
+    target_dir = sys.argv[1] if len(sys.argv) > 1 else "data"
+    storage = SQLiteStorageBackend(os.path.join(target_dir, "bot_data.db"))
+    if not migrate_json_to_sqlite(
+        storage, os.path.join(target_dir, "bot_data.json"), os.path.join(target_dir, "bot_data")
+    ):
+        print("[DataStorage] ℹ️ Nothing to migrate")
+    storage.close()
@@ -0,0 +1,508 @@
+"""IOC Ingest - Streaming threat feed ingestion (CSV, STIX 2.x, plaintext)
+
+Feeds are parsed incrementally from a file or byte stream in a worker thread, where
+indicators are refanged, typed, normalized and deduplicated in chunks. Chunks reach
+the event loop through a small bounded queue (so a huge feed never sits in memory
+at once) and are bulk-upserted into the ThreatIntelHub store; its indexes are
+rebuilt and the store saved once per feed instead of once per indicator. Every run
+produces a report with throughput (IOCs/s) and diff counts against the store.
+"""
+import asyncio
+import concurrent.futures
+import csv
+import gc
+import hashlib
+import io
+import itertools
+import ipaddress
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Optional
+
+from cogs.core.pst_timezone import get_now_pst
+
+CHUNK_SIZE = 5000             # Normalized IOCs handed to the event loop per upsert
+MAX_PENDING_CHUNKS = 4        # Parser blocks once this many chunks wait for the loop
+READ_SIZE = 64 * 1024
+SNIFF_BYTES = 4096
+REPORT_HISTORY = 50
+INGEST_GC_GEN2_THRESHOLD = 100  # Full collections every 100 gen1 runs instead of 10 while ingesting
+
+FORMATS = ('csv', 'stix', 'text', 'records')
+EXTENSION_FORMATS = {'.csv': 'csv', '.json': 'stix', '.stix': 'stix', '.txt': 'text', '.list': 'text'}
+
+IOC_TYPES = {'ip_address', 'domain', 'url', 'file_hash', 'email', 'user_agent', 'registry_key', 'mutex'}
+TYPE_ALIASES = {
+    'ip': 'ip_address', 'ipv4': 'ip_address', 'ipv6': 'ip_address', 'ipv4-addr': 'ip_address',
+    'ipv6-addr': 'ip_address', 'dst_ip': 'ip_address', 'domain-name': 'domain', 'hostname': 'domain',
+    'host': 'domain', 'url_malware': 'url', 'phishing_url': 'url', 'uri': 'url', 'hash': 'file_hash',
+    'md5': 'file_hash', 'sha1': 'file_hash', 'sha256': 'file_hash', 'file': 'file_hash',
+    'email-addr': 'email', 'email-message': 'email', 'windows-registry-key': 'registry_key',
+}
+
+# CSV columns that hold the indicator, in order of preference, with the type they imply
+VALUE_COLUMNS = (
+    ('value', None), ('indicator', None), ('ioc', None), ('url', 'url'), ('sha256_hash', 'file_hash'),
+    ('sha1_hash', 'file_hash'), ('md5_hash', 'file_hash'), ('hash', 'file_hash'), ('dst_ip', 'ip_address'),
+    ('ip_address', 'ip_address'), ('ip', 'ip_address'), ('domain', 'domain'), ('host', 'domain'),
+)
+CATEGORY_COLUMNS = ('category', 'threat', 'threat_type')
+ATTRIBUTION_COLUMNS = ('attributed_to', 'malware', 'signature', 'malware_family')
+EXTRA_COLUMNS = ('confidence', 'ttl_days', 'tags')
+
+STIX_PATTERN = re.compile(r"([a-z0-9-]+):([\w.'\-]+)\s*=\s*'((?:[^'\\]|\\.)*)'")
+STIX_OBJECTS = re.compile(r'"objects"\s*:\s*\[')
+HASH_PATTERN = re.compile(r'^[0-9a-fA-F]{32}$|^[0-9a-fA-F]{40}$|^[0-9a-fA-F]{64}$|^[0-9a-fA-F]{128}$')
+DOMAIN_PATTERN = re.compile(r'^(?=.{1,253}$)([a-z0-9_]([a-z0-9\-_]{0,61}[a-z0-9])?\.)+[a-z]{2,63}$')
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[a-z]{2,63}$')
+REFANG = (('[.]', '.'), ('(.)', '.'), ('{.}', '.'), ('[dot]', '.'), ('[:]', ':'), ('[@]', '@'), ('[at]', '@'))
+SINKHOLE_PREFIXES = ('0.0.0.0', '127.0.0.1')  # hosts-file style blocklists
+URL_HEAD = re.compile(r'^[A-Za-z][A-Za-z0-9+.\-]*://[^/?#]*')  # scheme://netloc, lowercased
+_SEPARATORS = re.compile(r'[\s,]*')
+_WHITESPACE = re.compile(r'\s')
+
+
+# ==================== PARSERS ====================
+
+def detect_format(name: Optional[str], head: bytes) -> str:
+    """Pick a parser from the file extension, falling back to the first bytes"""
+    if name:
+        ext = os.path.splitext(name.lower())[1]
+        if ext in EXTENSION_FORMATS:
+            return EXTENSION_FORMATS[ext]
+    text = head.decode('utf-8-sig', errors='ignore').lstrip()
+    if text[:1] in ('{', '['):
+        return 'stix'
+    first_data_line = next((line for line in text.splitlines() if line.strip() and not line.startswith('#')), '')
+    return 'csv' if ',' in first_data_line else 'text'
+
+
+def _column_header(fields: List[str]) -> Optional[List[str]]:
+    header = [f.strip().lstrip('#').strip().lower() for f in fields]
+    return header if any(column in header for column, _ in VALUE_COLUMNS) else None
+
+
+def _row_plan(header: List[str]) -> Dict:
+    """Resolve column positions once per header instead of once per row"""
+    def first(columns):
+        return next((header.index(c) for c in columns if c in header), None)
+
+    value_columns = [(header.index(c), implied) for c, implied in VALUE_COLUMNS if c in header]
+    return {
+        'values': value_columns,
+        'type': first(('type',)),
+        'category': first(CATEGORY_COLUMNS),
+        'attributed_to': first(ATTRIBUTION_COLUMNS),
+        'severity': first(('severity',)),
+        'description': first(('description',)),
+        'extra': [(c, header.index(c)) for c in EXTRA_COLUMNS if c in header],
+    }
+
+
+def iter_csv(stream) -> Iterator[Dict]:
+    """Yield one dict per CSV row; headers may sit in a '#' comment (abuse.ch style)"""
+    comment_header = []
+
+    def data_lines():
+        for line in stream:
+            if line.startswith('#'):
+                fields = _column_header(next(csv.reader([line], skipinitialspace=True), []))
+                if fields:
+                    comment_header[:] = fields
+            elif line.strip():
+                yield line
+
+    plan = None
+    for row in csv.reader(data_lines(), skipinitialspace=True):
+        if plan is None:
+            header = _column_header(row)
+            plan = _row_plan(header or comment_header or ['value'])  # Headerless: first column
+            if header:
+                continue
+        width = len(row)
+
+        def cell(index):
+            return row[index] or None if index is not None and index < width else None
+
+        record = {'value': None}
+        for index, implied_type in plan['values']:
+            if index < width and row[index]:
+                record = {'value': row[index], 'type': cell(plan['type']) or implied_type}
+                break
+        else:
+            yield record
+            continue
+        for field in ('category', 'attributed_to', 'severity', 'description'):
+            record[field] = cell(plan[field])
+        for column, index in plan['extra']:
+            if index < width and row[index]:
+                record[column] = row[index]
+        yield record
+
+
+def iter_text(stream) -> Iterator[Dict]:
+    """Yield one indicator per line, skipping comments and hosts-file sinkhole addresses"""
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith(('#', ';', '//')):
+            continue
+        tokens = line.split()
+        if len(tokens) > 1 and tokens[0] in SINKHOLE_PREFIXES:
+            yield {'value': tokens[1]}
+        else:
+            yield {'value': tokens[0]}
+
+
+def _stix_records(obj: Dict) -> Iterator[Dict]:
+    if not isinstance(obj, dict):
+        return
+    obj_type = obj.get('type')
+    if obj_type == 'indicator' and obj.get('pattern'):
+        labels = obj.get('indicator_types') or obj.get('labels') or []
+        for object_type, prop, value in STIX_PATTERN.findall(obj['pattern']):
+            ioc_type = TYPE_ALIASES.get(object_type, object_type)
+            if ioc_type in IOC_TYPES or prop.startswith('hashes'):
+                yield {'value': value.replace("\\'", "'"), 'type': ioc_type,
+                       'category': labels[0] if labels else None,
+                       'description': obj.get('name') or obj.get('description')}
+    elif obj_type in ('ipv4-addr', 'ipv6-addr', 'domain-name', 'url', 'email-addr') and obj.get('value'):
+        yield {'value': obj['value'], 'type': TYPE_ALIASES.get(obj_type, obj_type)}
+
+
+def iter_stix(stream) -> Iterator[Dict]:
+    """Yield indicators from a STIX 2.x bundle (or bare object array) one object at a time"""
+    decoder = json.JSONDecoder()
+    buf = stream.read(READ_SIZE)
+    eof = not buf
+    while True:
+        stripped = buf.lstrip()
+        if stripped.startswith('['):
+            pos = len(buf) - len(stripped) + 1
+            break
+        match = STIX_OBJECTS.search(buf)
+        if match:
+            pos = match.end()
+            break
+        if eof:
+            return
+        chunk = stream.read(READ_SIZE)
+        eof = not chunk
+        buf += chunk
+
+    while True:
+        pos = _SEPARATORS.match(buf, pos).end()
+        if pos >= len(buf):
+            if eof:
+                return
+            buf, pos = buf[pos:], 0
+            chunk = stream.read(READ_SIZE)
+            eof = not chunk
+            buf += chunk
+            continue
+        if buf[pos] == ']':
+            return
+        try:
+            obj, pos = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError(f"Truncated STIX object at offset {pos}")
+            buf, pos = buf[pos:], 0
+            chunk = stream.read(READ_SIZE)
+            eof = not chunk
+            buf += chunk
+            continue
+        yield from _stix_records(obj)
+        if pos > READ_SIZE:
+            buf, pos = buf[pos:], 0
+
+
+# ==================== NORMALIZATION ====================
+
+def refang(value: str) -> str:
+    for defanged, plain in REFANG:
+        if defanged in value:
+            value = value.replace(defanged, plain)
+    lowered = value[:5].lower()
+    if lowered.startswith('hxxp'):
+        value = 'http' + value[4:]
+    elif lowered.startswith('fxp'):
+        value = 'ftp' + value[3:]
+    return value
+
+
+def detect_ioc_type(value: str) -> Optional[str]:
+    if '://' in value:
+        return 'url'
+    try:
+        ipaddress.ip_address(value)
+        return 'ip_address'
+    except ValueError:
+        pass
+    if HASH_PATTERN.match(value):
+        return 'file_hash'
+    lowered = value.lower()
+    if EMAIL_PATTERN.match(lowered):
+        return 'email'
+    if DOMAIN_PATTERN.match(lowered.rstrip('.')):
+        return 'domain'
+    return None
+
+
+def normalize_value(ioc_type: str, value: str) -> str:
+    if ioc_type == 'url':
+        head = URL_HEAD.match(value)
+        return head.group(0).lower() + value[head.end():] if head else value
+    if ioc_type == 'ip_address':
+        try:
+            return ipaddress.ip_address(value).compressed
+        except ValueError:
+            return value
+    if ioc_type in ('domain', 'file_hash', 'email'):
+        return value.lower().rstrip('.')
+    return value
+
+
+def normalize_record(record: Dict, defaults: Dict) -> Optional[Dict]:
+    """Refang, type and canonicalize one parsed record; None when it is not an indicator"""
+    value = record.get('value')
+    if not value or not isinstance(value, str):
+        return None
+    value = refang(value.strip().strip('"\''))
+    if not value or _WHITESPACE.search(value):
+        return None
+
+    # An explicit record type wins, then detection; the feed-wide default is a last resort
+    hint = (record.get('type') or '').strip().lower()
+    hint = TYPE_ALIASES.get(hint, hint)
+    fallback = (defaults.get('type') or '').strip().lower()
+    ioc_type = hint if hint in IOC_TYPES else (detect_ioc_type(value) or hint or TYPE_ALIASES.get(fallback, fallback))
+    if not ioc_type:
+        return None
+    value = normalize_value(ioc_type, value)
+
+    normalized = {
+        'id': hashlib.md5(f"{ioc_type}:{value}".encode()).hexdigest()[:12],
+        'type': ioc_type,
+        'value': value,
+        'category': record.get('category') or defaults.get('category') or 'unknown',
+        'severity': (record.get('severity') or defaults.get('severity') or 'MEDIUM').upper(),
+        'attributed_to': record.get('attributed_to') or defaults.get('attributed_to'),
+        'description': record.get('description') or defaults.get('description'),
+    }
+    extra = {}
+    if record.get('confidence'):
+        extra['confidence'] = float(record['confidence'])
+    if record.get('ttl_days'):
+        extra['ttl_days'] = int(record['ttl_days'])
+    if record.get('tags'):
+        tags = record['tags']
+        extra['tags'] = [t.strip() for t in tags.split(',') if t.strip()] if isinstance(tags, str) else list(tags)
+    if extra:
+        normalized['extra'] = extra
+    return normalized
+
+
+# ==================== PIPELINE ====================
+
+def _open_source(source):
+    """Return (binary stream, display name, owned) for a path, bytes or binary file object"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(bytes(source)), None, True
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb'), os.fspath(source), True
+    if hasattr(source, 'read'):
+        return source, getattr(source, 'name', None), False
+    raise TypeError(f"Unsupported feed source: {type(source).__name__}")
+
+
+def _sniff(stream) -> bytes:
+    if hasattr(stream, 'peek'):
+        return stream.peek(SNIFF_BYTES)[:SNIFF_BYTES]
+    if hasattr(stream, 'seekable') and stream.seekable():
+        position = stream.tell()
+        head = stream.read(SNIFF_BYTES)
+        stream.seek(position)
+        return head
+    return b''
+
+
+def iter_feed(source, fmt: Optional[str] = None, detected: Optional[Dict] = None) -> Iterator[Dict]:
+    """Parse a feed lazily; `source` is a path, bytes, binary stream or an iterable of dicts
+
+    The format actually used is written to `detected['format']` when given.
+    """
+    if fmt == 'records' or (fmt is None and isinstance(source, (list, tuple))):
+        if detected is not None:
+            detected['format'] = 'records'
+        yield from source
+        return
+    stream, name, owned = _open_source(source)
+    try:
+        fmt = fmt or detect_format(name, _sniff(stream))
+        if detected is not None:
+            detected['format'] = fmt
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+        try:
+            if fmt == 'csv':
+                yield from iter_csv(text)
+            elif fmt == 'stix':
+                yield from iter_stix(text)
+            elif fmt == 'text':
+                yield from iter_text(text)
+            else:
+                raise ValueError(f"Unknown feed format: {fmt}")
+        finally:
+            text.detach()
+    finally:
+        if owned:
+            stream.close()
+
+
+class IOCIngestPipeline:
+    """Streams feeds into ThreatIntelHub and keeps a history of ingest reports"""
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.reports = deque(maxlen=REPORT_HISTORY)
+        self.active: Dict[int, Dict] = {}  # ingest id -> feed and live counters while ingesting
+        self._ids = itertools.count(1)
+        self._gc_threshold = None
+
+    def _defer_full_gc(self):
+        # Hundreds of thousands of new IOC dicts trigger repeated full collections, each
+        # rescanning the whole store and stalling the event loop. Young generations keep
+        # being collected; only full collections are spaced out until the last ingest ends
+        if self._gc_threshold is None:
+            self._gc_threshold = gc.get_threshold()
+            gen0, gen1, gen2 = self._gc_threshold
+            gc.set_threshold(gen0, gen1, max(gen2, INGEST_GC_GEN2_THRESHOLD))
+
+    def _restore_gc(self):
+        if not self.active and self._gc_threshold is not None:
+            gc.set_threshold(*self._gc_threshold)
+            self._gc_threshold = None
+
+    def _produce(self, source, fmt, defaults, counters, seen, cancelled, emit, report):
+        """Worker thread: parse, normalize and dedup, emitting one chunk at a time"""
+        chunk = []
+        for record in iter_feed(source, fmt, report):
+            if cancelled.is_set():
+                return
+            counters['parsed'] += 1
+            try:
+                normalized = normalize_record(record, defaults)
+            except (TypeError, ValueError):
+                normalized = None
+            if normalized is None:
+                counters['invalid'] += 1
+                continue
+            if normalized['value'] in seen:
+                counters['duplicates'] += 1
+                continue
+            seen.add(normalized['value'])
+            if normalized['severity'] == 'CRITICAL':
+                counters['critical'] += 1
+            chunk.append(normalized)
+            if len(chunk) >= self.chunk_size:
+                emit(chunk)
+                chunk = []
+        if chunk:
+            emit(chunk)
+
+    async def ingest(self, hub, source, feed_name: str, fmt: Optional[str] = None,
+                     defaults: Optional[Dict] = None,
+                     on_chunk: Optional[Callable[[List[Dict]], None]] = None) -> Dict:
+        """Stream one feed into `hub`; returns the ingest report (with 'error' on failure)
+
+        `on_chunk` runs on the event loop after each chunk is upserted, for callers
+        that keep per-IOC state of their own (e.g. IOC Manager metadata).
+        """
+        if fmt is not None and fmt not in FORMATS:
+            raise ValueError(f"Unknown feed format: {fmt}")
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDING_CHUNKS)
+        cancelled = threading.Event()
+        counters = {'parsed': 0, 'invalid': 0, 'duplicates': 0, 'critical': 0}
+        diff = {'added': 0, 'updated': 0, 'unchanged': 0}
+        seen = set()
+        report = {'feed': feed_name, 'format': fmt, 'started_at': get_now_pst().isoformat(), 'chunks': 0}
+        ingest_id = next(self._ids)
+        self._defer_full_gc()
+        self.active[ingest_id] = {'feed': feed_name, 'counters': counters}
+        started = time.perf_counter()
+
+        def emit(chunk):
+            future = asyncio.run_coroutine_threadsafe(queue.put(chunk), loop)
+            while True:
+                try:
+                    return future.result(timeout=0.5)
+                except concurrent.futures.TimeoutError:
+                    if cancelled.is_set():  # Consumer is gone; stop parsing
+                        future.cancel()
+                        raise
+
+        def produce():
+            try:
+                self._produce(source, fmt, defaults or {}, counters, seen, cancelled, emit, report)
+            finally:
+                if not cancelled.is_set():
+                    emit(None)  # End of feed
+
+        try:
+            producer = loop.run_in_executor(None, produce)
+            try:
+                while True:
+                    chunk = await queue.get()
+                    if chunk is None:
+                        break
+                    for key, count in hub.bulk_upsert_iocs(chunk, source=feed_name).items():
+                        diff[key] += count
+                    report['chunks'] += 1
+                    if on_chunk:
+                        on_chunk(chunk)
+                await producer
+            except Exception as e:
+                report['error'] = f"{type(e).__name__}: {e}"
+            finally:
+                cancelled.set()
+                # The worker notices the flag within half a second; never leave it running
+                if not producer.done():
+                    await asyncio.gather(producer, return_exceptions=True)
+            duration = time.perf_counter() - started
+
+            await hub.rebuild_ioc_indexes_async()
+            stale = len(hub.ioc_indexes['source'].get(feed_name, set()) - seen) if 'error' not in report else 0
+        finally:
+            self.active.pop(ingest_id, None)
+            self._restore_gc()
+        saving = time.perf_counter()
+        await hub.save_threat_data_async()
+
+        report.update(counters)
+        report.update(diff)
+        report['unique'] = len(seen)
+        report['stale'] = stale  # Previously ingested from this feed but absent now
+        report['duration_seconds'] = round(duration, 3)  # Parse + upsert
+        report['iocs_per_sec'] = round(counters['parsed'] / duration) if duration > 0 else 0
+        report['save_seconds'] = round(time.perf_counter() - saving, 3)
+        self.reports.append(report)
+
+        if 'error' in report:
+            print(f"[IOCIngest] ❌ {feed_name}: {report['error']} after {counters['parsed']} records")
+        else:
+            print(f"[IOCIngest] ✅ {feed_name}: {counters['parsed']} parsed, {diff['added']} new, "
+                  f"{diff['updated']} updated, {diff['unchanged']} unchanged, {stale} stale "
+                  f"({report['iocs_per_sec']} IOCs/s)")
+        return report
+
+    def recent_reports(self, feed_name: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        reports = [r for r in self.reports if feed_name is None or r['feed'] == feed_name]
+        return reports[-limit:]
+
+
+# Global instance
+ioc_ingest = IOCIngestPipeline()
@@ -22,6 +22,7 @@ import io
 
 from cogs.core.signal_bus import signal_bus, Signal, SignalType
 from cogs.core.pst_timezone import get_now_pst
+from cogs.core.ioc_ingest import ioc_ingest, EXTENSION_FORMATS
 
 class IOCManager(commands.Cog):
     """Advanced IOC lifecycle management"""
@@ -84,37 +85,40 @@ class IOCManager(commands.Cog):
         if not threat_intel:
             return
         
-        expired_count = 0
-        for ioc_value, metadata in list(self.ioc_metadata.items()):
-            expiry = metadata.get('expires_at')
-            if expiry and datetime.fromisoformat(expiry) < get_now_pst():
-                # Mark as expired
-                if ioc_value in threat_intel.iocs:
-                    del threat_intel.iocs[ioc_value]
-                    expired_count += 1
+        now = get_now_pst()
+        expired = [
+            ioc_value for ioc_value, metadata in self.ioc_metadata.items()
+            if metadata.get('expires_at') and datetime.fromisoformat(metadata['expires_at']) < now
+        ]
+        expired_count = threat_intel.remove_iocs(expired)
         
         if expired_count > 0:
-            threat_intel.save_threat_data()
+            await threat_intel.save_threat_data_async()
             print(f"[IOC Manager] Cleaned up {expired_count} expired IOCs")
     
     def add_metadata(self, ioc_value: str, ttl_days: int = None, 
                     confidence: float = 1.0, tags: List[str] = None,
                     source_feed: str = 'internal'):
         """Add metadata to IOC"""
+        self.ioc_metadata[ioc_value] = self._metadata_entry(ttl_days, confidence, tags, source_feed)
+        self.save_manager_data()
+    
+    def _metadata_entry(self, ttl_days: int = None, confidence: float = 1.0,
+                        tags: List[str] = None, source_feed: str = 'internal',
+                        now: datetime = None) -> Dict:
+        now = now or get_now_pst()
         expires_at = None
         if ttl_days:
-            expires_at = (get_now_pst() + timedelta(days=ttl_days)).isoformat()
+            expires_at = (now + timedelta(days=ttl_days)).isoformat()
         
-        self.ioc_metadata[ioc_value] = {
-            'added_at': get_now_pst().isoformat(),
+        return {
+            'added_at': now.isoformat(),
             'expires_at': expires_at,
             'confidence': confidence,
             'tags': tags or [],
             'source_feed': source_feed,
-            'last_updated': get_now_pst().isoformat()
+            'last_updated': now.isoformat()
         }
-        
-        self.save_manager_data()
     
     def mark_false_positive(self, ioc_value: str, reason: str, reporter: str):
         """Mark IOC as false positive"""
@@ -142,50 +146,34 @@ class IOCManager(commands.Cog):
         
         self.save_manager_data()
     
-    def bulk_import_iocs(self, csv_content: str) -> Dict:
-        """Import IOCs from CSV"""
+    async def bulk_import_iocs(self, source, fmt: str = None, feed_name: str = 'bulk_import') -> Dict:
+        """Stream IOCs from CSV text, bytes or a CSV/STIX/plaintext file into the hub
+        
+        Parsing, normalization and dedup run in a worker thread (cogs.core.ioc_ingest);
+        metadata is recorded per chunk and both stores are saved once at the end.
+        """
         threat_intel = self.bot.get_cog('ThreatIntelHub')
         if not threat_intel:
             return {'error': 'Threat intel hub not available'}
         
-        reader = csv.DictReader(io.StringIO(csv_content))
-        imported = 0
-        failed = 0
+        if isinstance(source, str) and not os.path.exists(source):
+            source = source.encode('utf-8')  # CSV text, as accepted before
+            fmt = fmt or 'csv'
         
-        for row in reader:
-            try:
-                ioc_type = row.get('type')
-                value = row.get('value')
-                category = row.get('category', 'unknown')
-                severity = row.get('severity', 'MEDIUM')
-                attributed_to = row.get('attributed_to')
-                
-                if not ioc_type or not value:
-                    failed += 1
-                    continue
-                
-                threat_intel.add_ioc(
-                    ioc_type, value, category, 
-                    severity, attributed_to
+        def record_metadata(records: List[Dict]):
+            now = get_now_pst()
+            for record in records:
+                extra = record.get('extra', {})
+                self.ioc_metadata[record['value']] = self._metadata_entry(
+                    extra.get('ttl_days'), extra.get('confidence', 1.0), extra.get('tags'), feed_name, now
                 )
-                
-                # Add metadata
-                ttl_days = int(row.get('ttl_days', 0)) if row.get('ttl_days') else None
-                confidence = float(row.get('confidence', 1.0))
-                tags = row.get('tags', '').split(',') if row.get('tags') else None
-                
-                self.add_metadata(value, ttl_days, confidence, tags)
-                
-                imported += 1
-                
-            except Exception as e:
-                print(f"[IOC Manager] Failed to import IOC: {e}")
-                failed += 1
         
-        return {
-            'imported': imported,
-            'failed': failed
-        }
+        report = await ioc_ingest.ingest(threat_intel, source, feed_name, fmt=fmt, on_chunk=record_metadata)
+        self.save_manager_data()
+        
+        report['imported'] = report['added'] + report['updated'] + report['unchanged']
+        report['failed'] = report['invalid']
+        return report
     
     def export_iocs_csv(self) -> str:
         """Export IOCs to CSV"""
@@ -260,29 +248,41 @@ class IOCManager(commands.Cog):
             return
         
         if not ctx.message.attachments:
-            await ctx.send("❌ Please attach a CSV file\n"
-                          "Format: type,value,category,severity,attributed_to,confidence,ttl_days,tags")
+            await ctx.send("❌ Please attach a CSV, STIX (.json) or plaintext file\n"
+                          "CSV format: type,value,category,severity,attributed_to,confidence,ttl_days,tags")
             return
         
         attachment = ctx.message.attachments[0]
-        if not attachment.filename.endswith('.csv'):
-            await ctx.send("❌ File must be a CSV")
+        ext = os.path.splitext(attachment.filename.lower())[1]
+        if ext not in EXTENSION_FORMATS:
+            await ctx.send(f"❌ Supported files: {', '.join(sorted(EXTENSION_FORMATS))}")
             return
         
         try:
             content = await attachment.read()
-            csv_content = content.decode('utf-8')
             
-            result = self.bulk_import_iocs(csv_content)
+            result = await self.bulk_import_iocs(content, fmt=EXTENSION_FORMATS[ext],
+                                                 feed_name=f"import:{attachment.filename}")
+            if 'error' in result and 'imported' not in result:
+                await ctx.send(f"❌ Import failed: {result['error']}")
+                return
             
             embed = discord.Embed(
-                title="📥 IOC Import Complete",
-                color=discord.Color.green(),
+                title="📥 IOC Import Complete" if 'error' not in result else "⚠️ IOC Import Incomplete",
+                color=discord.Color.green() if 'error' not in result else discord.Color.orange(),
                 timestamp=get_now_pst()
             )
             
             embed.add_field(name="Imported", value=str(result['imported']), inline=True)
             embed.add_field(name="Failed", value=str(result['failed']), inline=True)
+            embed.add_field(name="Duplicates", value=str(result['duplicates']), inline=True)
+            embed.add_field(name="New", value=str(result['added']), inline=True)
+            embed.add_field(name="Updated", value=str(result['updated']), inline=True)
+            embed.add_field(name="Unchanged", value=str(result['unchanged']), inline=True)
+            embed.add_field(name="Throughput",
+                            value=f"{result['iocs_per_sec']:,} IOCs/s ({result['duration_seconds']}s)", inline=False)
+            if 'error' in result:
+                embed.add_field(name="Error", value=result['error'][:1024], inline=False)
             
             await ctx.send(embed=embed)
             
@@ -0,0 +1,234 @@
+"""Central Message Pipeline - Parse each message once and run detectors as prioritized stages"""
+import discord
+from discord.ext import commands
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+from enum import Enum
+import re
+import time
+import unicodedata
+from cogs.core.pst_timezone import get_now_pst
+
+URL_REGEX = re.compile(r"https?://[^\s<>\"']+", re.IGNORECASE)
+TOKEN_REGEX = re.compile(r"\w+")
+WHITESPACE_REGEX = re.compile(r"\s+")
+CUSTOM_EMOJI_REGEX = re.compile(r"<a?:\w+:\d+>")
+UNICODE_EMOJI_REGEX = re.compile(
+    "[\U0001F1E6-\U0001F1FF\U0001F300-\U0001FAFF\u2300-\u23FF\u2600-\u27BF\u2B00-\u2BFF]"
+)
+
+# Stage priorities: lower runs first. Cheap blocking detectors go early, observers last.
+# A deletion stops the pipeline, so scanners that record what they find (leaked
+# credentials) run ahead of every stage that can delete the message.
+PRIORITY_SCANNER = 8
+PRIORITY_BLOCKLIST = 10
+PRIORITY_CONTENT = 50
+PRIORITY_DEFAULT = 100
+PRIORITY_OBSERVER = 1000
+
+
+class PipelineAction(Enum):
+    """Stage verdicts; returning None means continue"""
+    CONTINUE = "continue"
+    DELETED = "deleted"  # Message was removed; later stages are skipped
+
+
+@dataclass(frozen=True)
+class MessageContext:
+    """Immutable, pre-parsed view of a message shared by every stage"""
+    message: object
+    content: str                    # Raw content
+    text: str                       # NFKC, casefolded, whitespace collapsed
+    urls: Tuple[str, ...]
+    domains: Tuple[str, ...]        # Lowercased hosts without port/credentials
+    mention_ids: FrozenSet[int]
+    role_mention_ids: FrozenSet[int]
+    mention_everyone: bool
+    tokens: FrozenSet[str]          # Word tokens of `text`
+    caps_ratio: float               # Uppercase characters / total characters
+    emoji_count: int                # Unicode + custom emoji
+    author_id: int
+    guild_id: Optional[int]
+    channel_id: Optional[int]
+    is_bot: bool
+    attachment_count: int
+
+    @property
+    def author(self):
+        return self.message.author
+
+    @property
+    def guild(self):
+        return self.message.guild
+
+    @property
+    def channel(self):
+        return self.message.channel
+
+    @property
+    def mention_count(self) -> int:
+        return len(self.mention_ids)
+
+
+def _domain_of(url: str) -> str:
+    host = url.split("://", 1)[-1].split("/", 1)[0].split("?", 1)[0].split("#", 1)[0]
+    host = host.rsplit("@", 1)[-1].split(":", 1)[0]
+    return host.lower().rstrip(".")
+
+
+def parse_message(message) -> MessageContext:
+    """Build the shared context for one message (the only place content is scanned generically)"""
+    content = message.content or ""
+    text = WHITESPACE_REGEX.sub(" ", unicodedata.normalize("NFKC", content).casefold()).strip()
+    urls = tuple(URL_REGEX.findall(content))
+    mentions = getattr(message, "mentions", None) or []
+    role_mentions = getattr(message, "role_mentions", None) or []
+    guild = getattr(message, "guild", None)
+    channel = getattr(message, "channel", None)
+    upper = sum(1 for c in content if c.isupper())
+
+    return MessageContext(
+        message=message,
+        content=content,
+        text=text,
+        urls=urls,
+        domains=tuple(dict.fromkeys(_domain_of(u) for u in urls)),
+        mention_ids=frozenset(m.id for m in mentions),
+        role_mention_ids=frozenset(r.id for r in role_mentions),
+        mention_everyone=bool(getattr(message, "mention_everyone", False)),
+        tokens=frozenset(TOKEN_REGEX.findall(text)),
+        caps_ratio=upper / len(content) if content else 0.0,
+        emoji_count=len(CUSTOM_EMOJI_REGEX.findall(content)) + len(UNICODE_EMOJI_REGEX.findall(content)),
+        author_id=message.author.id,
+        guild_id=guild.id if guild else None,
+        channel_id=getattr(channel, "id", None),
+        is_bot=bool(getattr(message.author, "bot", False)),
+        attachment_count=len(getattr(message, "attachments", None) or []),
+    )
+
+
+class Stage:
+    """A registered detector with its own latency counters"""
+    def __init__(self, name: str, callback: Callable, priority: int, guild_only: bool, include_bots: bool):
+        self.name = name
+        self.callback = callback
+        self.priority = priority
+        self.guild_only = guild_only
+        self.include_bots = include_bots
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.errors = 0
+        self.short_circuits = 0
+
+    def get_stats(self) -> Dict:
+        return {
+            'priority': self.priority,
+            'calls': self.calls,
+            'avg_ms': round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'errors': self.errors,
+            'short_circuits': self.short_circuits
+        }
+
+
+class MessagePipeline:
+    """Single on_message entry point shared by all detectors"""
+    def __init__(self):
+        self.stages: List[Stage] = []
+        self.messages_processed = 0
+        self.parse_total_ms = 0.0
+        self.parse_max_ms = 0.0
+
+    def register_stage(self, name: str, callback: Callable, priority: int = PRIORITY_DEFAULT,
+                       guild_only: bool = True, include_bots: bool = False) -> Stage:
+        """Register `async callback(ctx) -> Optional[PipelineAction]`; re-registering a name replaces it"""
+        self.unregister_stage(name)
+        stage = Stage(name, callback, priority, guild_only, include_bots)
+        self.stages.append(stage)
+        self.stages.sort(key=lambda s: s.priority)
+        print(f"[MessagePipeline] ✅ Stage registered: {name} (priority {priority})")
+        return stage
+
+    def unregister_stage(self, name: str):
+        self.stages = [s for s in self.stages if s.name != name]
+
+    async def process(self, message) -> PipelineAction:
+        """Parse once, then run stages in priority order until one deletes the message"""
+        started = time.perf_counter()
+        ctx = parse_message(message)
+        parse_ms = (time.perf_counter() - started) * 1000
+        self.messages_processed += 1
+        self.parse_total_ms += parse_ms
+        self.parse_max_ms = max(self.parse_max_ms, parse_ms)
+
+        for stage in list(self.stages):
+            if stage.guild_only and ctx.guild_id is None:
+                continue
+            if ctx.is_bot and not stage.include_bots:
+                continue
+            stage_started = time.perf_counter()
+            try:
+                result = await stage.callback(ctx)
+            except Exception as e:
+                stage.errors += 1
+                result = None
+                print(f"[MessagePipeline] ❌ Stage {stage.name} failed: {e}")
+            elapsed = (time.perf_counter() - stage_started) * 1000
+            stage.calls += 1
+            stage.total_ms += elapsed
+            stage.max_ms = max(stage.max_ms, elapsed)
+            if result is PipelineAction.DELETED:
+                stage.short_circuits += 1
+                return PipelineAction.DELETED
+        return PipelineAction.CONTINUE
+
+    def get_stats(self) -> Dict:
+        processed = self.messages_processed
+        return {
+            'messages_processed': processed,
+            'parse_avg_ms': round(self.parse_total_ms / processed, 3) if processed else 0.0,
+            'parse_max_ms': round(self.parse_max_ms, 3),
+            'stages': {s.name: s.get_stats() for s in self.stages}
+        }
+
+
+# Global message pipeline instance
+message_pipeline = MessagePipeline()
+
+
+async def delete_message(message) -> bool:
+    """Best-effort delete used by stages before returning PipelineAction.DELETED"""
+    try:
+        await message.delete()
+        return True
+    except (discord.Forbidden, discord.NotFound, discord.HTTPException):
+        return False
+
+
+class MessagePipelineCog(commands.Cog):
+    """Message pipeline infrastructure"""
+    def __init__(self, bot):
+        self.bot = bot
+        self.message_pipeline = message_pipeline
+
+    @commands.command(name="pipelinestats")
+    @commands.is_owner()
+    async def pipeline_stats(self, ctx):
+        """View message pipeline stage latency"""
+        stats = self.message_pipeline.get_stats()
+        embed = discord.Embed(title="📨 Message Pipeline", color=discord.Color.blue(), timestamp=get_now_pst())
+        embed.add_field(name="Messages", value=stats['messages_processed'], inline=True)
+        embed.add_field(name="Parse", value=f"avg {stats['parse_avg_ms']}ms / max {stats['parse_max_ms']}ms", inline=True)
+        embed.add_field(name="Stages", value=len(stats['stages']), inline=True)
+        embed.add_field(name="Stage Latency (run order)", value="\n".join([
+            f"`{name}` p{s['priority']} avg={s['avg_ms']}ms max={s['max_ms']}ms "
+            f"calls={s['calls']} del={s['short_circuits']} err={s['errors']}"
+            for name, s in stats['stages'].items()
+        ])[:1024] or "None", inline=False)
+        await ctx.send(embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(MessagePipelineCog(bot))
+    print(f"[MessagePipeline] ✅ Shared message pipeline initialized")
@@ -5,117 +5,302 @@ Machine learning-based behavioral anomaly detection for improved threat identifi
 Architecture:
 - Monitors behavioral patterns across systems
 - Detects deviations from baseline
-- Uses simple statistical models (mean/std dev)
+- Uses streaming statistical models (Welford mean/variance, EWMA, hour-of-day seasonality)
+- Fixed memory per source; baselines snapshot to disk on a timer
 - Integrates with signal bus
 - Provides anomaly scores and recommendations
 """
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+import asyncio
 import json
 import os
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
-from statistics import mean, stdev
+from typing import Dict, List, Optional, Tuple
+from statistics import mean
 import math
 
 from cogs.core.signal_bus import signal_bus, Signal, SignalType
 from cogs.core.pst_timezone import get_now_pst
 
+class RunningStats:
+    """Welford running mean/variance - O(1) update, constant memory"""
+    __slots__ = ('n', 'mean', 'm2', 'min', 'max')
+    
+    def __init__(self, n: int = 0, mean: float = 0.0, m2: float = 0.0,
+                 min: Optional[float] = None, max: Optional[float] = None):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+    
+    def update(self, x: float) -> None:
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+    
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+    
+    def to_list(self) -> List:
+        return [self.n, self.mean, self.m2, self.min, self.max]
+    
+    @classmethod
+    def from_list(cls, values: List) -> 'RunningStats':
+        return cls(*values) if values else cls()
+
+class StreamingBaseline:
+    """Per-source behavioural baseline with fixed memory
+    
+    - lifetime Welford stats of signal confidence (reporting)
+    - EWMA mean/variance of confidence (scoring; alpha ~ a 100-signal window)
+    - 24 hour-of-day Welford accumulators (seasonal confidence baseline)
+    - 24 hour-of-day EWMAs of signal volume per hour
+    - last-seen index per signal type (the type domain is a small enum)
+    """
+    ALPHA = 2 / (100 + 1)
+    MIN_SAMPLES = 5
+    
+    def __init__(self):
+        self.signal_count = 0
+        self.confidence = RunningStats()
+        self.ewma = 0.0
+        self.ewm_var = 0.0
+        self.hourly = [RunningStats() for _ in range(24)]
+        self.hourly_volume = [0.0] * 24
+        self.hourly_volume_seen = [0] * 24
+        self.current_hour = None  # 'YYYY-MM-DDTHH'
+        self.current_hour_count = 0
+        self.type_last_seen: Dict[str, int] = {}
+        self.last_signals = deque(maxlen=10)
+    
+    def _roll_hour(self, now: datetime) -> None:
+        hour_key = now.strftime('%Y-%m-%dT%H')
+        if hour_key == self.current_hour:
+            return
+        if self.current_hour is not None:
+            slot = int(self.current_hour[-2:])
+            if self.hourly_volume_seen[slot]:
+                self.hourly_volume[slot] += 0.3 * (self.current_hour_count - self.hourly_volume[slot])
+            else:
+                self.hourly_volume[slot] = float(self.current_hour_count)
+            self.hourly_volume_seen[slot] += 1
+        self.current_hour = hour_key
+        self.current_hour_count = 0
+    
+    def update(self, signal: Signal, now: datetime) -> None:
+        x = float(signal.confidence)
+        self.signal_count += 1
+        self.confidence.update(x)
+        self.hourly[now.hour].update(x)
+        
+        if self.confidence.n == 1:
+            self.ewma = x
+        else:
+            delta = x - self.ewma
+            self.ewma += self.ALPHA * delta
+            self.ewm_var = (1 - self.ALPHA) * (self.ewm_var + self.ALPHA * delta * delta)
+        
+        self._roll_hour(now)
+        self.current_hour_count += 1
+        self.type_last_seen[str(signal.signal_type)] = self.signal_count
+        self.last_signals.append({
+            'timestamp': now.isoformat(),
+            'type': str(signal.signal_type),
+            'confidence': signal.confidence,
+            'severity': signal.severity
+        })
+    
+    def expected(self, hour: int) -> Tuple[float, float]:
+        """Expected (mean, stdev) of confidence, seasonal when the hour slot has data"""
+        seasonal = self.hourly[hour]
+        if seasonal.n >= self.MIN_SAMPLES:
+            return seasonal.mean, seasonal.stdev
+        return self.ewma, math.sqrt(self.ewm_var)
+    
+    def type_is_unusual(self, type_name: str, before: int, window: int = 100) -> bool:
+        """True if the type was not seen among the last `window` signals before index `before`"""
+        last = self.type_last_seen.get(type_name)
+        return last is None or before - last >= window
+    
+    def volume_ratio(self) -> float:
+        """Current hour volume relative to the seasonal expectation for this hour"""
+        if self.current_hour is None:
+            return 0.0
+        slot = int(self.current_hour[-2:])
+        if self.hourly_volume_seen[slot] < 3:
+            return 0.0
+        return self.current_hour_count / max(1.0, self.hourly_volume[slot])
+    
+    def to_dict(self) -> Dict:
+        return {
+            'signal_count': self.signal_count,
+            'confidence': self.confidence.to_list(),
+            'ewma': self.ewma,
+            'ewm_var': self.ewm_var,
+            'hourly': [h.to_list() for h in self.hourly],
+            'hourly_volume': self.hourly_volume,
+            'hourly_volume_seen': self.hourly_volume_seen,
+            'current_hour': self.current_hour,
+            'current_hour_count': self.current_hour_count,
+            'type_last_seen': self.type_last_seen,
+            'last_signals': list(self.last_signals)
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'StreamingBaseline':
+        baseline = cls()
+        if 'confidence_scores' in data:
+            # Legacy list-based baseline: replay the retained window
+            for x in data.get('confidence_scores', []):
+                baseline.confidence.update(float(x))
+                if baseline.confidence.n == 1:
+                    baseline.ewma = float(x)
+                else:
+                    delta = float(x) - baseline.ewma
+                    baseline.ewma += cls.ALPHA * delta
+                    baseline.ewm_var = (1 - cls.ALPHA) * (baseline.ewm_var + cls.ALPHA * delta * delta)
+            recent = data.get('last_signals', [])
+            baseline.signal_count = max(data.get('signal_count', 0), len(recent))
+            offset = baseline.signal_count - len(recent)
+            for i, entry in enumerate(recent):
+                baseline.type_last_seen[entry.get('type')] = offset + i + 1
+            baseline.last_signals.extend(recent[-10:])
+            return baseline
+        
+        baseline.signal_count = data.get('signal_count', 0)
+        baseline.confidence = RunningStats.from_list(data.get('confidence'))
+        baseline.ewma = data.get('ewma', 0.0)
+        baseline.ewm_var = data.get('ewm_var', 0.0)
+        hourly = data.get('hourly') or []
+        if len(hourly) == 24:
+            baseline.hourly = [RunningStats.from_list(h) for h in hourly]
+        baseline.hourly_volume = data.get('hourly_volume') or [0.0] * 24
+        baseline.hourly_volume_seen = data.get('hourly_volume_seen') or [0] * 24
+        baseline.current_hour = data.get('current_hour')
+        baseline.current_hour_count = data.get('current_hour_count', 0)
+        baseline.type_last_seen = data.get('type_last_seen', {})
+        baseline.last_signals.extend(data.get('last_signals', []))
+        return baseline
+
 class MLAnomalyDetector(commands.Cog):
     """Machine learning-based anomaly detection"""
     
     def __init__(self, bot):
         self.bot = bot
         self.data_file = 'data/anomaly_detection.json'
-        self.baselines = {}
+        self.baselines: Dict[str, StreamingBaseline] = {}
         self.anomalies = []
+        self._dirty = False
         self.load_baselines()
         self.setup_signal_listeners()
+        self.snapshot_baselines.start()
+    
+    def cog_unload(self):
+        self.snapshot_baselines.cancel()
+        if self._dirty:
+            self.save_baselines()
     
     def load_baselines(self):
         """Load baseline behavioral data"""
+        self.baselines = {}
+        self.anomalies = []
         if os.path.exists(self.data_file):
             try:
                 with open(self.data_file, 'r') as f:
                     data = json.load(f)
-                    self.baselines = data.get('baselines', {})
+                    self.baselines = {
+                        system: StreamingBaseline.from_dict(raw)
+                        for system, raw in data.get('baselines', {}).items()
+                    }
                     self.anomalies = data.get('anomalies', [])
             except:
                 self.baselines = {}
                 self.anomalies = []
-        else:
-            self.baselines = {}
-            self.anomalies = []
+    
+    def _snapshot(self) -> Dict:
+        return {
+            'baselines': {system: b.to_dict() for system, b in self.baselines.items()},
+            'anomalies': list(self.anomalies)
+        }
+    
+    def _write_snapshot(self, payload: Dict):
+        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
+        tmp_file = f"{self.data_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(payload, f, separators=(',', ':'))
+        os.replace(tmp_file, self.data_file)
     
     def save_baselines(self):
         """Save baseline data to disk"""
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        with open(self.data_file, 'w') as f:
-            json.dump({
-                'baselines': self.baselines,
-                'anomalies': self.anomalies
-            }, f, indent=2)
+        self._dirty = False
+        self._write_snapshot(self._snapshot())
+    
+    @tasks.loop(seconds=60)
+    async def snapshot_baselines(self):
+        """Write a baseline snapshot off the event loop when anything changed"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        payload = self._snapshot()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_snapshot, payload)
+        except Exception as e:
+            self._dirty = True
+            print(f"[MLAnomalyDetector] ⚠️ Snapshot failed: {e}")
     
     def setup_signal_listeners(self):
-        """Subscribe to signal bus for all signals"""
-        signal_bus.subscribe('ml_anomaly_detector', self.on_signal)
+        """Subscribe to signal bus for all signals (batched)"""
+        signal_bus.subscribe_batch('ml_anomaly_detector', self.on_signals, max_batch=200, max_wait_ms=500)
     
     async def on_signal(self, signal: Signal):
-        """Analyze incoming signals for anomalies"""
-        system = signal.source
-        
-        # Update baselines
-        if system not in self.baselines:
-            self.baselines[system] = {
-                'signal_count': 0,
-                'confidence_scores': [],
-                'severity_levels': [],
-                'last_signals': []
-            }
-        
-        baseline = self.baselines[system]
-        
-        # Add to historical data
-        baseline['signal_count'] += 1
-        baseline['confidence_scores'].append(signal.confidence)
-        baseline['last_signals'].append({
-            'timestamp': get_now_pst().isoformat(),
-            'type': str(signal.signal_type),
-            'confidence': signal.confidence,
-            'severity': signal.severity
-        })
-        
-        # Keep only last 100 signals
-        if len(baseline['last_signals']) > 100:
-            baseline['last_signals'] = baseline['last_signals'][-100:]
-        if len(baseline['confidence_scores']) > 100:
-            baseline['confidence_scores'] = baseline['confidence_scores'][-100:]
-        
-        # Detect anomalies
-        anomaly_score = self.detect_anomaly(system, signal)
-        
-        if anomaly_score > 0.7:  # Anomaly threshold
-            await self.record_anomaly(system, signal, anomaly_score)
+        """Analyze a single incoming signal for anomalies"""
+        await self.on_signals([signal])
+    
+    async def on_signals(self, signals: List[Signal]):
+        """Analyze a batch of incoming signals; state is snapshotted by the timer"""
+        detected = []
+        for signal in signals:
+            system, anomaly_score = self.update_baseline(signal)
+            if anomaly_score > 0.7:  # Anomaly threshold
+                self.record_anomaly(system, signal, anomaly_score)
+                detected.append((system, signal, anomaly_score))
+        
+        self._dirty = True
+        
+        for system, signal, anomaly_score in detected:
             await self.emit_anomaly_signal(system, signal, anomaly_score)
-        
-        self.save_baselines()
     
-    def detect_anomaly(self, system: str, signal: Signal) -> float:
-        """Detect if a signal is anomalous using statistical methods"""
+    def update_baseline(self, signal: Signal) -> Tuple[str, float]:
+        """Score one signal against its source baseline, then fold it in"""
+        system = signal.source
+        baseline = self.baselines.get(system)
+        if baseline is None:
+            baseline = self.baselines[system] = StreamingBaseline()
+        
+        # Score against the baseline as it was before this signal
+        now = get_now_pst()
+        anomaly_score = self.detect_anomaly(system, signal, now)
+        baseline.update(signal, now)
+        return system, anomaly_score
+    
+    def detect_anomaly(self, system: str, signal: Signal, now: datetime = None) -> float:
+        """Detect if a signal is anomalous using streaming statistics - O(1)"""
         baseline = self.baselines[system]
+        now = now or get_now_pst()
         
         # Need at least 5 samples for meaningful statistics
-        if len(baseline['confidence_scores']) < 5:
+        if baseline.confidence.n < StreamingBaseline.MIN_SAMPLES:
             return 0.0  # Not enough data
         
-        scores = baseline['confidence_scores']
-        
-        try:
-            avg_confidence = mean(scores)
-            std_confidence = stdev(scores) if len(scores) > 1 else 0.0
-        except:
-            return 0.0
+        avg_confidence, std_confidence = baseline.expected(now.hour)
         
         # Z-score: how many standard deviations from mean
         if std_confidence == 0:
@@ -133,14 +318,17 @@ class MLAnomalyDetector(commands.Cog):
             anomaly_score = max(anomaly_score, 0.5)
         
         # Boost score if signal type is unusual
-        signal_types = [s['type'] for s in baseline['last_signals']]
-        if str(signal.signal_type) not in signal_types:
+        if baseline.type_is_unusual(str(signal.signal_type), baseline.signal_count):
             anomaly_score = max(anomaly_score, 0.4)
         
+        # Boost score on a volume surge versus this hour's seasonal norm
+        if baseline.current_hour_count >= 20 and baseline.volume_ratio() >= 5:
+            anomaly_score = max(anomaly_score, 0.75)
+        
         return anomaly_score
     
-    async def record_anomaly(self, system: str, signal: Signal, score: float):
-        """Record detected anomaly"""
+    def record_anomaly(self, system: str, signal: Signal, score: float):
+        """Record detected anomaly (persisted by the snapshot timer)"""
         anomaly = {
             'timestamp': get_now_pst().isoformat(),
             'system': system,
@@ -155,20 +343,15 @@ class MLAnomalyDetector(commands.Cog):
         # Keep last 500 anomalies
         if len(self.anomalies) > 500:
             self.anomalies = self.anomalies[-500:]
-        
-        self.save_baselines()
     
     def _generate_description(self, system: str, signal: Signal, score: float) -> str:
         """Generate human-readable anomaly description"""
         baseline = self.baselines[system]
         
-        if len(baseline['confidence_scores']) < 5:
+        if baseline.confidence.n < StreamingBaseline.MIN_SAMPLES:
             return "Insufficient data for analysis"
         
-        try:
-            avg_conf = mean(baseline['confidence_scores'])
-        except:
-            avg_conf = 0.5
+        avg_conf = baseline.ewma
         
         if signal.confidence < avg_conf - 0.2:
             return f"Unusually low confidence ({signal.confidence:.2%} vs avg {avg_conf:.2%})"
@@ -188,7 +371,7 @@ class MLAnomalyDetector(commands.Cog):
                 'original_signal_type': str(signal.type),
                 'original_confidence': signal.confidence,
                 'anomaly_score': score,
-                'detection_method': 'statistical_zscore',
+                'detection_method': 'streaming_zscore',
                 'confidence': min(0.99, 0.7 + score * 0.3)  # 0.7-0.99 range
             }
         )
@@ -244,29 +427,33 @@ class MLAnomalyDetector(commands.Cog):
             return {'status': 'insufficient_data'}
         
         baseline = self.baselines[system]
-        scores = baseline['confidence_scores']
+        stats = baseline.confidence
         
-        if len(scores) < 5:
+        if stats.n < StreamingBaseline.MIN_SAMPLES:
             return {
                 'status': 'insufficient_data',
-                'sample_count': len(scores),
-                'needed': 5
+                'sample_count': stats.n,
+                'needed': StreamingBaseline.MIN_SAMPLES
             }
         
-        try:
-            avg = mean(scores)
-            std = stdev(scores)
-        except:
-            return {'status': 'error'}
+        hour = get_now_pst().hour
+        seasonal_mean, seasonal_std = baseline.expected(hour)
         
         return {
             'status': 'valid',
-            'sample_count': len(scores),
-            'avg_confidence': avg,
-            'std_dev': std,
-            'min_confidence': min(scores),
-            'max_confidence': max(scores),
-            'recent_signals': baseline['last_signals'][-10:]
+            'sample_count': stats.n,
+            'avg_confidence': stats.mean,
+            'std_dev': stats.stdev,
+            'ewma_confidence': baseline.ewma,
+            'ewma_std_dev': math.sqrt(baseline.ewm_var),
+            'seasonal_hour': hour,
+            'seasonal_confidence': seasonal_mean,
+            'seasonal_std_dev': seasonal_std,
+            'hour_volume': baseline.current_hour_count,
+            'expected_hour_volume': baseline.hourly_volume[hour],
+            'min_confidence': stats.min,
+            'max_confidence': stats.max,
+            'recent_signals': list(baseline.last_signals)
         }
     
     @commands.command(name='anomalyreport')
@@ -367,6 +554,19 @@ class MLAnomalyDetector(commands.Cog):
             inline=True
         )
         
+        embed.add_field(
+            name="Recent (EWMA)",
+            value=f"`{baseline['ewma_confidence']:.2%}` ± `{baseline['ewma_std_dev']:.4f}`",
+            inline=True
+        )
+        
+        embed.add_field(
+            name=f"Seasonal ({baseline['seasonal_hour']:02d}:00)",
+            value=f"`{baseline['seasonal_confidence']:.2%}` ± `{baseline['seasonal_std_dev']:.4f}`\n"
+                  f"Volume: {baseline['hour_volume']} (expected ~{baseline['expected_hour_volume']:.0f})",
+            inline=True
+        )
+        
         embed.add_field(
             name="Range",
             value=f"{baseline['min_confidence']:.2%} - {baseline['max_confidence']:.2%}",
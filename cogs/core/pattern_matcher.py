@@ -0,0 +1,254 @@
+"""Shared multi-pattern matchers for keyword, domain and secret detection
+
+- KeywordMatcher: Aho-Corasick automaton over literal lists (one pass per message)
+- DomainMatcher: suffix-aware blocklist lookup (evil.bad.com matches bad.com, notbad.com does not)
+- PatternSet: one combined alternation regex for a named pattern set
+
+Matching cost depends on the message, not the list size, so blocklists can grow
+from a handful of entries to threat-feed scale without slowing the pipeline.
+"""
+import re
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class _Automaton:
+    """Immutable Aho-Corasick automaton built from a set of literals"""
+    __slots__ = ('goto', 'fail', 'out')
+
+    def __init__(self, words: Iterable[str]):
+        goto: List[Dict[str, int]] = [{}]
+        out: List[Tuple[str, ...]] = [()]
+        for word in words:
+            state = 0
+            for ch in word:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] = out[state] + (word,)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, target in goto[state].items():
+                queue.append(target)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                nxt = goto[f].get(ch, 0)
+                fail[target] = nxt if nxt != target else 0
+                if out[fail[target]]:
+                    out[target] = out[target] + out[fail[target]]
+
+        self.goto = goto
+        self.fail = fail
+        self.out = out
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield (start_index, word) for every occurrence, overlapping included"""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for word in out[state]:
+                    yield i - len(word) + 1, word
+
+
+class KeywordMatcher:
+    """Case-insensitive literal matcher with incremental updates
+
+    Additions go into a small delta automaton and removals into a tombstone set;
+    both are folded into the main automaton once they pass `rebuild_threshold`,
+    so editing a large list never rebuilds everything on every change.
+    """
+
+    def __init__(self, words: Iterable[str] = (), rebuild_threshold: int = 256):
+        self.rebuild_threshold = rebuild_threshold
+        self.words = {self._normalize(w) for w in words if w and self._normalize(w)}
+        self._main_words = set(self.words)
+        self._main = _Automaton(self._main_words)
+        self._delta_words = set()
+        self._delta: Optional[_Automaton] = None
+        self._removed = set()
+        self.rebuilds = 0
+
+    @staticmethod
+    def _normalize(word: str) -> str:
+        return word.casefold().strip()
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return self._normalize(word) in self.words
+
+    def add(self, words: Iterable[str]):
+        added = False
+        for word in words:
+            word = self._normalize(word)
+            if not word or word in self.words:
+                continue
+            self.words.add(word)
+            self._removed.discard(word)
+            if word not in self._main_words:
+                self._delta_words.add(word)
+            added = True
+        if added:
+            self._refresh()
+
+    def remove(self, words: Iterable[str]):
+        removed = False
+        for word in words:
+            word = self._normalize(word)
+            if word not in self.words:
+                continue
+            self.words.discard(word)
+            if word in self._delta_words:
+                self._delta_words.discard(word)
+            else:
+                self._removed.add(word)
+            removed = True
+        if removed:
+            self._refresh()
+
+    def replace(self, words: Iterable[str]):
+        """Swap the whole list, touching only the difference"""
+        new_words = {self._normalize(w) for w in words if w and self._normalize(w)}
+        self.remove(self.words - new_words)
+        self.add(new_words - self.words)
+
+    def _refresh(self):
+        if len(self._delta_words) + len(self._removed) > self.rebuild_threshold:
+            self._main_words = set(self.words)
+            self._main = _Automaton(self._main_words)
+            self._delta_words.clear()
+            self._removed.clear()
+            self._delta = None
+            self.rebuilds += 1
+        else:
+            self._delta = _Automaton(self._delta_words) if self._delta_words else None
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield (start_index, word) for each keyword occurrence in casefolded `text`"""
+        removed = self._removed
+        for pos, word in self._main.iter_matches(text):
+            if word not in removed:
+                yield pos, word
+        if self._delta is not None:
+            yield from self._delta.iter_matches(text)
+
+    def search(self, text: str) -> Optional[str]:
+        """First matching keyword, or None"""
+        for _, word in self.iter_matches(text):
+            return word
+        return None
+
+    def find_all(self, text: str) -> List[str]:
+        """Distinct matching keywords in first-seen order"""
+        return list(dict.fromkeys(word for _, word in self.iter_matches(text)))
+
+
+class DomainMatcher:
+    """Blocklist of domains matched by label suffix
+
+    A host matches when it equals a listed domain or is a subdomain of one, so
+    `evil.free-nitro.com` matches `free-nitro.com` while `notfree-nitro.com` does not.
+    Lookups cost one set probe per label of the host.
+    """
+
+    def __init__(self, domains: Iterable[str] = ()):
+        self.domains = set()
+        self.add(domains)
+
+    @staticmethod
+    def _normalize(domain: str) -> str:
+        domain = domain.strip().lower().rstrip('.')
+        if domain.startswith('*.'):
+            domain = domain[2:]
+        return domain.lstrip('.')
+
+    def __len__(self) -> int:
+        return len(self.domains)
+
+    def __contains__(self, domain: str) -> bool:
+        return self._normalize(domain) in self.domains
+
+    def add(self, domains: Iterable[str]) -> int:
+        before = len(self.domains)
+        self.domains.update(d for d in map(self._normalize, domains) if d)
+        return len(self.domains) - before
+
+    def remove(self, domains: Iterable[str]):
+        self.domains.difference_update(map(self._normalize, domains))
+
+    def match(self, host: str) -> Optional[str]:
+        """Return the listed domain covering `host`, or None"""
+        host = self._normalize(host)
+        if not host or not self.domains:
+            return None
+        if host in self.domains:
+            return host
+        dot = host.find('.')
+        while dot != -1:
+            suffix = host[dot + 1:]
+            if suffix in self.domains:
+                return suffix
+            dot = host.find('.', dot + 1)
+        return None
+
+
+class PatternSet:
+    """Named regexes compiled into one alternation and scanned in a single pass
+
+    Each pattern becomes a named group of the combined regex. Patterns must not
+    use numbered backreferences. Matches are leftmost and non-overlapping across
+    the whole set. The regex is recompiled lazily after the set changes.
+    """
+
+    def __init__(self, patterns: Dict[str, str] = None, flags: int = 0):
+        self.flags = flags
+        self.patterns: Dict[str, str] = {}
+        self._regex = None
+        self._group_names: Dict[str, str] = {}
+        for name, pattern in (patterns or {}).items():
+            self.set(name, pattern)
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def set(self, name: str, pattern: str):
+        re.compile(pattern, self.flags)  # Reject invalid patterns before they poison the set
+        self.patterns[name] = pattern
+        self._regex = None
+
+    def remove(self, name: str):
+        if self.patterns.pop(name, None) is not None:
+            self._regex = None
+
+    def _compile(self):
+        self._group_names = {f"_p{i}": name for i, name in enumerate(self.patterns)}
+        combined = "|".join(f"(?P<_p{i}>{pattern})" for i, pattern in enumerate(self.patterns.values()))
+        self._regex = re.compile(combined, self.flags) if combined else None
+
+    def finditer(self, text: str) -> Iterator[Tuple[str, 're.Match']]:
+        """Yield (pattern_name, match) for each match in `text`"""
+        if self._regex is None:
+            self._compile()
+            if self._regex is None:
+                return
+        group_names = self._group_names
+        for match in self._regex.finditer(text):
+            yield group_names[match.lastgroup], match
+
+    def search(self, text: str) -> Optional[str]:
+        for name, _ in self.finditer(text):
+            return name
+        return None
@@ -0,0 +1,231 @@
+"""Rate Windows - Shared memory-bounded sliding-window counters for spam, raid and flood detection
+
+Each counter keeps a fixed ring of time buckets per key on the monotonic clock, so
+"how many in the last N seconds" costs at most one pass over the ring no matter how
+many events were recorded. Keys idle for a whole window hold no information and are
+evicted; heavy hitters are tracked approximately with a bounded Space-Saving table.
+"""
+import discord
+from discord.ext import commands
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Tuple
+import math
+import sys
+import time
+from cogs.core.pst_timezone import get_now_pst
+
+MAINTENANCE_EVERY = 1024  # Hits between opportunistic idle sweeps
+
+
+class HeavyHitters:
+    """Approximate top-k (Space-Saving): counts over-estimate by at most the recorded error"""
+
+    def __init__(self, capacity: int = 32):
+        self.capacity = capacity
+        self.counts: Dict[Hashable, float] = {}
+        self.errors: Dict[Hashable, float] = {}
+
+    def add(self, key: Hashable, amount: int = 1):
+        counts = self.counts
+        if key in counts:
+            counts[key] += amount
+            return
+        if len(counts) < self.capacity:
+            counts[key] = amount
+            self.errors[key] = 0
+            return
+        victim = min(counts, key=counts.get)
+        floor = counts.pop(victim)
+        self.errors.pop(victim, None)
+        counts[key] = floor + amount
+        self.errors[key] = floor
+
+    def top(self, n: int = 10) -> List[Tuple[Hashable, int]]:
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [(key, int(count)) for key, count in ranked]
+
+    def decay(self):
+        """Halve all counts so the table follows recent traffic"""
+        for key in list(self.counts):
+            self.counts[key] /= 2
+            self.errors[key] = self.errors.get(key, 0) / 2
+            if self.counts[key] < 1:
+                del self.counts[key]
+                self.errors.pop(key, None)
+
+
+class _KeyWindow:
+    __slots__ = ('counts', 'stamps', 'last_seen')
+
+    def __init__(self, num_buckets: int):
+        self.counts = [0] * num_buckets
+        self.stamps = [-1] * num_buckets  # Absolute bucket number each slot holds
+        self.last_seen = 0.0
+
+
+class RateCounter:
+    """Sliding-window event counts per key, accurate to one bucket"""
+
+    def __init__(self, name: str, window_seconds: float = 60, bucket_seconds: float = 1.0,
+                 max_keys: int = 100000, top_k: int = 32):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = max(1, math.ceil(window_seconds / bucket_seconds))
+        self.max_keys = max_keys
+        self.keys: "OrderedDict[Hashable, _KeyWindow]" = OrderedDict()  # Least recently hit first
+        self.heavy_hitters = HeavyHitters(top_k) if top_k else None
+        self.stats = {'hits': 0, 'idle_evictions': 0, 'capacity_evictions': 0}
+        self._hits_since_maintenance = 0
+        self._last_decay = time.monotonic()
+
+    def hit(self, key: Hashable, amount: int = 1, now: float = None):
+        """Record `amount` events for `key`"""
+        now = time.monotonic() if now is None else now
+        bucket = int(now / self.bucket_seconds)
+        window = self.keys.get(key)
+        if window is None:
+            window = self.keys[key] = _KeyWindow(self.num_buckets)
+            if len(self.keys) > self.max_keys:
+                self.keys.popitem(last=False)
+                self.stats['capacity_evictions'] += 1
+        else:
+            self.keys.move_to_end(key)
+
+        slot = bucket % self.num_buckets
+        if window.stamps[slot] != bucket:
+            window.stamps[slot] = bucket
+            window.counts[slot] = amount
+        else:
+            window.counts[slot] += amount
+        window.last_seen = now
+
+        if self.heavy_hitters is not None:
+            self.heavy_hitters.add(key, amount)
+        self.stats['hits'] += 1
+        self._hits_since_maintenance += 1
+        if self._hits_since_maintenance >= MAINTENANCE_EVERY:
+            self.maintain(now)
+
+    def count(self, key: Hashable, seconds: float = None, now: float = None) -> int:
+        """Events for `key` in the last `seconds` (defaults to the full window)"""
+        window = self.keys.get(key)
+        if window is None:
+            return 0
+        now = time.monotonic() if now is None else now
+        bucket = int(now / self.bucket_seconds)
+        span = self.num_buckets if seconds is None else min(self.num_buckets, max(1, math.ceil(seconds / self.bucket_seconds)))
+        n = self.num_buckets
+        stamps, counts = window.stamps, window.counts
+        total = 0
+        for b in range(bucket - span + 1, bucket + 1):
+            slot = b % n
+            if stamps[slot] == b:
+                total += counts[slot]
+        return total
+
+    def hit_and_count(self, key: Hashable, seconds: float = None, amount: int = 1) -> int:
+        now = time.monotonic()
+        self.hit(key, amount, now)
+        return self.count(key, seconds, now)
+
+    def reset(self, key: Hashable):
+        self.keys.pop(key, None)
+
+    def maintain(self, now: float = None):
+        """Evict keys idle for a full window (their count is zero) and decay heavy hitters"""
+        now = time.monotonic() if now is None else now
+        self._hits_since_maintenance = 0
+        cutoff = now - self.window_seconds
+        keys = self.keys
+        while keys:
+            key, window = next(iter(keys.items()))
+            if window.last_seen >= cutoff:
+                break
+            del keys[key]
+            self.stats['idle_evictions'] += 1
+        if self.heavy_hitters is not None and now - self._last_decay >= self.window_seconds:
+            self.heavy_hitters.decay()
+            self._last_decay = now
+
+    def memory_bytes(self) -> int:
+        """Approximate footprint of the per-key state"""
+        if not self.keys:
+            return sys.getsizeof(self.keys)
+        sample = next(iter(self.keys.values()))
+        per_key = sys.getsizeof(sample) + sys.getsizeof(sample.counts) + sys.getsizeof(sample.stamps)
+        return sys.getsizeof(self.keys) + len(self.keys) * (per_key + 64)  # + key object and dict slot
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'keys': len(self.keys),
+            'window_seconds': self.window_seconds,
+            'buckets': self.num_buckets,
+            'memory_bytes': self.memory_bytes(),
+            'top': self.heavy_hitters.top(5) if self.heavy_hitters is not None else []
+        }
+
+
+class RateWindowService:
+    """Registry of named rate counters shared by all detectors"""
+
+    def __init__(self):
+        self.counters: Dict[str, RateCounter] = {}
+
+    def counter(self, name: str, window_seconds: float = 60, bucket_seconds: float = 1.0,
+                max_keys: int = 100000, top_k: int = 32) -> RateCounter:
+        """Get or create a counter; a reloaded cog gets its existing counts back"""
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = self.counters[name] = RateCounter(name, window_seconds, bucket_seconds, max_keys, top_k)
+        return counter
+
+    def maintain(self):
+        now = time.monotonic()
+        for counter in self.counters.values():
+            counter.maintain(now)
+
+    def get_stats(self) -> Dict:
+        return {name: counter.get_stats() for name, counter in self.counters.items()}
+
+
+# Global rate window service instance
+rate_windows = RateWindowService()
+
+
+class RateWindowsCog(commands.Cog):
+    """Rate window service administration"""
+    def __init__(self, bot):
+        self.bot = bot
+        self.rate_windows = rate_windows
+
+    @commands.command(name="ratewindows")
+    @commands.is_owner()
+    async def rate_windows_stats(self, ctx):
+        """View rate counter keys, memory and heavy hitters"""
+        self.rate_windows.maintain()
+        stats = self.rate_windows.get_stats()
+        total_bytes = sum(s['memory_bytes'] for s in stats.values())
+        embed = discord.Embed(
+            title="⏱️ Rate Windows",
+            description=f"{len(stats)} counter(s) • ~{total_bytes / 1024:.1f} KB",
+            color=discord.Color.blue(),
+            timestamp=get_now_pst()
+        )
+        for name, s in list(stats.items())[:20]:
+            top = ", ".join(f"{key}:{count}" for key, count in s['top'][:3]) or "None"
+            embed.add_field(
+                name=name,
+                value=(f"Keys: {s['keys']} • {s['memory_bytes'] / 1024:.1f} KB\n"
+                       f"Window: {s['window_seconds']}s / {s['buckets']} buckets\n"
+                       f"Evicted: {s['idle_evictions']} idle, {s['capacity_evictions']} cap\n"
+                       f"Top: {top}")[:1024],
+                inline=True
+            )
+        await ctx.send(embed=embed)
+
+
+async def setup(bot):
+    await bot.add_cog(RateWindowsCog(bot))
+    print(f"[RateWindows] ✅ Shared rate window service initialized")
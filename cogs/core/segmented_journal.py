@@ -0,0 +1,169 @@
+"""Segmented JSONL journal - append-only records with group commit and compaction
+
+Records are buffered on the event loop and written in batches from an executor,
+one write per batch. Files rotate into numbered segments (by size or age) so
+compaction only ever rewrites the retained records and retention drops whole
+segment files.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List
+
+SEGMENT_PREFIX = "segment_"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+class SegmentedJournal:
+    """Append-only JSONL journal split across size-bounded segment files"""
+
+    def __init__(self, directory: str, segment_max_bytes: int = 4 * 1024 * 1024, fsync: bool = False,
+                 segment_max_age: float = None, max_segments: int = None):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age = segment_max_age  # Seconds before a segment is closed, regardless of size
+        self.max_segments = max_segments        # Oldest segments beyond this are deleted on rotation
+        self.fsync = fsync
+        self.pending: List[Dict] = []
+        self._io_lock = threading.Lock()  # Serializes executor writes with compaction
+        self.stats = {'appended': 0, 'written': 0, 'batches': 0, 'compactions': 0, 'torn_lines': 0,
+                      'rotations': 0, 'dropped_segments': 0}
+        os.makedirs(directory, exist_ok=True)
+        segments = self.segments()
+        self.current_segment = segments[-1] if segments else 1
+        self._segment_opened_at = time.time()
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}")
+
+    def segments(self) -> List[int]:
+        """Segment numbers on disk, oldest first"""
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    numbers.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        return sorted(numbers)
+
+    def size_bytes(self) -> int:
+        total = 0
+        for number in self.segments():
+            try:
+                total += os.path.getsize(self._segment_path(number))
+            except OSError:
+                pass
+        return total
+
+    def append(self, record: Dict):
+        """Queue a record; it reaches disk on the next flush"""
+        self.pending.append(record)
+        self.stats['appended'] += 1
+
+    def read_segment(self, number: int) -> Iterator[Dict]:
+        """Yield one segment's records in append order, skipping torn lines"""
+        try:
+            with open(self._segment_path(number), 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        self.stats['torn_lines'] += 1
+        except OSError:
+            return
+
+    def replay(self) -> Iterator[Dict]:
+        """Yield every committed record in append order"""
+        for number in self.segments():
+            yield from self.read_segment(number)
+
+    def _rotate(self):
+        self.current_segment += 1
+        self._segment_opened_at = time.time()
+        self.stats['rotations'] += 1
+        if self.max_segments:
+            for number in self.segments()[:-self.max_segments]:
+                try:
+                    os.remove(self._segment_path(number))
+                    self.stats['dropped_segments'] += 1
+                except OSError:
+                    pass
+
+    def _write_batch(self, batch: List[Dict]):
+        payload = "".join(json.dumps(r, separators=(',', ':'), default=str) + "\n" for r in batch)
+        with self._io_lock:
+            path = self._segment_path(self.current_segment)
+            try:
+                expired = self.segment_max_age and time.time() - self._segment_opened_at >= self.segment_max_age
+                if os.path.getsize(path) >= self.segment_max_bytes or expired:
+                    self._rotate()
+                    path = self._segment_path(self.current_segment)
+            except OSError:
+                pass
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(payload)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        self.stats['written'] += len(batch)
+        self.stats['batches'] += 1
+
+    def flush_sync(self):
+        """Write all pending records from the calling thread (shutdown path)"""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        self._write_batch(batch)
+
+    async def flush(self):
+        """Group-commit pending records off the event loop"""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_batch, batch)
+        except Exception:
+            self.pending[:0] = batch  # Retry on the next flush
+            raise
+
+    def _compact(self, records: List[Dict]):
+        with self._io_lock:
+            old_segments = self.segments()
+            target = (old_segments[-1] if old_segments else 0) + 1
+            path = self._segment_path(target)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, separators=(',', ':'), default=str) + "\n")
+            os.replace(tmp_path, path)
+            for number in old_segments:
+                try:
+                    os.remove(self._segment_path(number))
+                except OSError:
+                    pass
+            self.current_segment = target
+            self._segment_opened_at = time.time()
+        self.stats['compactions'] += 1
+
+    async def compact(self, records: Iterable[Dict]):
+        """Replace all committed segments with `records` (the retained set)
+
+        Pending records are flushed first so nothing queued is lost. Records appended
+        while that flush was in flight are still pending: they are left out of the
+        snapshot (taken in the same step, with no await in between) and reach the new
+        segment through the next flush, so replay never sees them twice. Call it from
+        the same task that flushes so a concurrent batch cannot land twice.
+        """
+        await self.flush()
+        still_pending = {id(record) for record in self.pending}
+        snapshot = [record for record in records if id(record) not in still_pending]
+        await asyncio.get_running_loop().run_in_executor(None, self._compact, snapshot)
+
+    def compact_sync(self, records: Iterable[Dict]):
+        self.flush_sync()
+        self._compact(list(records))
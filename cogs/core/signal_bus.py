@@ -4,8 +4,12 @@ from discord.ext import commands
 from datetime import datetime
 from typing import Dict, List, Callable, Any
 import asyncio
+from collections import Counter, OrderedDict, deque
 from enum import Enum
+from itertools import islice
 import json
+import os
+import time
 from cogs.core.pst_timezone import get_now_pst
 
 class SignalType(Enum):
@@ -42,6 +46,11 @@ class Signal:
         self.requires_human_review = severity in ['critical', 'high']
         self.deduplication_key = data.get('dedup_key', None)
     
+    @property
+    def signal_type(self) -> SignalType:
+        """Alias for .type (several consumers read signal.signal_type)"""
+        return self.type
+    
     def to_dict(self) -> Dict:
         return {
             'id': self.id,
@@ -53,68 +62,357 @@ class Signal:
             'data': self.data
         }
 
+class OverflowPolicy(Enum):
+    """What a subscriber queue does when it is full"""
+    DROP_OLDEST = "drop_oldest"  # Evict the oldest queued signal
+    COALESCE = "coalesce"        # Replace a queued signal with the same key, else drop oldest
+    BLOCK = "block"              # Make the emitter wait (bounded by block_timeout)
+
+class Subscription:
+    """A single subscriber with its own bounded queue and worker task"""
+    def __init__(self, name: str, callback: Callable, signal_type: SignalType = None,
+                 max_queue: int = 1000, overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+                 block_timeout: float = 5.0):
+        self.name = name
+        self.callback = callback
+        self.signal_type = signal_type  # None = wildcard
+        self.max_queue = max(1, max_queue)
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        
+        # seq -> (signal, enqueued_at); insertion order is delivery order
+        self.pending: "OrderedDict[int, tuple]" = OrderedDict()
+        self.coalesce_index: Dict[str, int] = {}
+        self._seq = 0
+        self._has_items = asyncio.Event()
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self.worker: asyncio.Task = None
+        
+        # Stats
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.max_depth = 0
+    
+    @staticmethod
+    def coalesce_key(signal: Signal) -> str:
+        return signal.deduplication_key or f"{signal.type.value}:{signal.source}"
+    
+    def _pop_oldest(self):
+        seq, item = self.pending.popitem(last=False)
+        key = self.coalesce_key(item[0])
+        if self.coalesce_index.get(key) == seq:
+            del self.coalesce_index[key]
+        return item
+    
+    async def put(self, signal: Signal) -> None:
+        """Queue a signal for this subscriber, applying the overflow policy"""
+        now = time.monotonic()
+        if len(self.pending) >= self.max_queue:
+            if self.overflow == OverflowPolicy.COALESCE:
+                seq = self.coalesce_index.get(self.coalesce_key(signal))
+                if seq is not None:
+                    # Keep the queue position, deliver the newest payload
+                    self.pending[seq] = (signal, self.pending[seq][1])
+                    self.coalesced += 1
+                    return
+            elif self.overflow == OverflowPolicy.BLOCK:
+                self._has_space.clear()
+                try:
+                    await asyncio.wait_for(self._has_space.wait(), timeout=self.block_timeout)
+                except asyncio.TimeoutError:
+                    pass  # Fall through to drop-oldest so an emitter can never hang forever
+            
+            if len(self.pending) >= self.max_queue:
+                self._pop_oldest()
+                self.dropped += 1
+        
+        self._seq += 1
+        self.pending[self._seq] = (signal, now)
+        if self.overflow == OverflowPolicy.COALESCE:
+            self.coalesce_index[self.coalesce_key(signal)] = self._seq
+        self.max_depth = max(self.max_depth, len(self.pending))
+        self._has_items.set()
+        self.ensure_worker()
+    
+    def ensure_worker(self) -> None:
+        """Start the worker task on the running loop if it is not alive"""
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.get_running_loop().create_task(self._run())
+    
+    async def deliver(self, signal: Signal, enqueued_at: float = None) -> None:
+        """Invoke the callback, isolating and counting failures"""
+        self._track_lag(enqueued_at)
+        try:
+            await self.callback(signal)
+            self.delivered += 1
+        except Exception as e:
+            self.errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+    
+    def _track_lag(self, enqueued_at: float = None) -> None:
+        if enqueued_at is not None:
+            self.last_lag = time.monotonic() - enqueued_at
+            self.max_lag = max(self.max_lag, self.last_lag)
+    
+    async def _run(self) -> None:
+        while True:
+            if not self.pending:
+                self._has_items.clear()
+                await self._has_items.wait()
+                continue
+            signal, enqueued_at = self._pop_oldest()
+            self._has_space.set()
+            await self.deliver(signal, enqueued_at)
+    
+    def stop(self) -> None:
+        if self.worker and not self.worker.done():
+            self.worker.cancel()
+        self.worker = None
+    
+    def get_stats(self) -> Dict:
+        return {
+            'type': self.signal_type.value if self.signal_type else '*',
+            'policy': self.overflow.value,
+            'queue_depth': len(self.pending),
+            'max_queue': self.max_queue,
+            'max_depth': self.max_depth,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'last_lag_ms': round(self.last_lag * 1000, 1),
+            'max_lag_ms': round(self.max_lag * 1000, 1)
+        }
+
+class BatchSubscription(Subscription):
+    """Subscription that delivers lists of signals collected over a micro-window
+    
+    The worker waits for the first queued signal, then keeps collecting until
+    either max_batch signals are queued or max_wait_ms has elapsed, and hands
+    the whole list to the callback in one call.
+    """
+    def __init__(self, name: str, callback: Callable, signal_type: SignalType = None,
+                 max_batch: int = 100, max_wait_ms: float = 250, **kwargs):
+        super().__init__(name, callback, signal_type, **kwargs)
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.batches = 0
+        self.last_batch_size = 0
+    
+    async def deliver(self, signals, enqueued_at: float = None) -> None:
+        if isinstance(signals, Signal):
+            signals = [signals]  # Inline dispatch hands over one signal at a time
+        self._track_lag(enqueued_at)
+        try:
+            await self.callback(signals)
+            self.delivered += len(signals)
+            self.batches += 1
+            self.last_batch_size = len(signals)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+    
+    async def _run(self) -> None:
+        while True:
+            if not self.pending:
+                self._has_items.clear()
+                await self._has_items.wait()
+                continue
+            
+            # Micro-window: give the batch a chance to fill up
+            deadline = time.monotonic() + self.max_wait
+            while len(self.pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._has_items.clear()
+                try:
+                    await asyncio.wait_for(self._has_items.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            
+            batch = []
+            first_enqueued = None
+            while self.pending and len(batch) < self.max_batch:
+                signal, enqueued_at = self._pop_oldest()
+                if first_enqueued is None:
+                    first_enqueued = enqueued_at
+                batch.append(signal)
+            self._has_space.set()
+            await self.deliver(batch, first_enqueued)
+    
+    def get_stats(self) -> Dict:
+        stats = super().get_stats()
+        stats.update({
+            'max_batch': self.max_batch,
+            'batches': self.batches,
+            'last_batch_size': self.last_batch_size
+        })
+        return stats
+
 class SignalBus:
     """Central event bus for all signals"""
-    def __init__(self):
-        self.subscribers: Dict[SignalType, List[Callable]] = {}
-        self.wildcard_subscribers: List[Callable] = []  # Subscribe to all signals
-        self.signal_history: List[Signal] = []
+    def __init__(self, dispatch_mode: str = None):
+        self.subscribers: Dict[SignalType, List[Subscription]] = {}
+        self.wildcard_subscribers: List[Subscription] = []  # Subscribe to all signals
+        self.subscriptions: Dict[str, Subscription] = {}  # name -> subscription
         self.deduplication_window = 300  # 5 minutes
         self.max_history = 10000
+        
+        # 'queued': each subscriber gets a bounded queue + worker, emit returns immediately
+        # 'inline': emit awaits every subscriber (legacy behaviour)
+        self.dispatch_mode = (dispatch_mode or os.getenv('SIGNAL_BUS_DISPATCH', 'queued')).lower()
+        
+        # Ring buffer of recent signals plus per-type views of the same window
+        self.signal_history: deque = deque(maxlen=self.max_history)
+        self.history_by_type: Dict[SignalType, deque] = {t: deque() for t in SignalType}
+        
+        # Running counters, updated on append/evict so stats never rescan history
+        self.type_counts: Counter = Counter()
+        self.severity_counts: Counter = Counter()
+        self.suppressed_count = 0
+        
+        # dedup_key -> monotonic time it was accepted, oldest first
+        self.dedup_index: "OrderedDict[str, float]" = OrderedDict()
+    
+    def _expire_dedup_keys(self, now: float) -> None:
+        """Drop dedup keys older than the deduplication window"""
+        cutoff = now - self.deduplication_window
+        while self.dedup_index:
+            _, accepted_at = next(iter(self.dedup_index.items()))
+            if accepted_at > cutoff:
+                break
+            self.dedup_index.popitem(last=False)
+    
+    def is_duplicate(self, signal: Signal) -> bool:
+        """Check (and record) a signal's dedup key against the time-bounded index"""
+        key = signal.deduplication_key
+        if not key:
+            return False
+        
+        now = time.monotonic()
+        self._expire_dedup_keys(now)
+        if key in self.dedup_index:
+            return True
+        
+        self.dedup_index[key] = now
+        return False
+    
+    def _record(self, signal: Signal) -> None:
+        """Append a signal to the ring buffer and keep counters/type views in sync"""
+        if len(self.signal_history) == self.signal_history.maxlen:
+            evicted = self.signal_history[0]
+            self.history_by_type[evicted.type].popleft()
+            self.type_counts[evicted.type] -= 1
+            self.severity_counts[str(evicted.severity).lower()] -= 1
+        
+        self.signal_history.append(signal)
+        self.history_by_type[signal.type].append(signal)
+        self.type_counts[signal.type] += 1
+        self.severity_counts[str(signal.severity).lower()] += 1
     
     async def emit(self, signal: Signal) -> None:
         """Emit a signal to all subscribers"""
         # Deduplication
-        if signal.deduplication_key:
-            recent = [s for s in self.signal_history[-100:] 
-                     if s.deduplication_key == signal.deduplication_key 
-                     and (get_now_pst() - s.timestamp).seconds < self.deduplication_window]
-            if recent:
-                return  # Duplicate, suppress
+        if self.is_duplicate(signal):
+            self.suppressed_count += 1
+            return  # Duplicate, suppress
         
         # Store in history
-        self.signal_history.append(signal)
-        if len(self.signal_history) > self.max_history:
-            self.signal_history = self.signal_history[-self.max_history:]
+        self._record(signal)
         
-        # Notify wildcard subscribers first
-        if self.wildcard_subscribers:
-            await asyncio.gather(*[sub(signal) for sub in self.wildcard_subscribers], return_exceptions=True)
+        # Wildcard subscribers first, then type-specific ones
+        targets = self.wildcard_subscribers + self.subscribers.get(signal.type, [])
+        if not targets:
+            return
+        
+        if self.dispatch_mode == 'inline':
+            await asyncio.gather(*[sub.deliver(signal) for sub in targets])
+            return
+        
+        for sub in targets:
+            await sub.put(signal)
+    
+    def subscribe(self, signal_type, callback: Callable, name: str = None,
+                  max_queue: int = 1000, overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST) -> Subscription:
+        """Subscribe to signals - accepts string name for wildcard or SignalType enum
         
-        # Notify type-specific subscribers
-        subscribers = self.subscribers.get(signal.type, [])
-        if subscribers:
-            await asyncio.gather(*[sub(signal) for sub in subscribers], return_exceptions=True)
+        Re-subscribing under an existing name (e.g. after a cog reload) replaces
+        the previous subscription instead of delivering twice.
+        """
+        signal_type, name = self._resolve_subscription(signal_type, callback, name)
+        return self._register(Subscription(name, callback, signal_type,
+                                           max_queue=max_queue, overflow=overflow))
     
-    def subscribe(self, signal_type, callback: Callable) -> None:
-        """Subscribe to signals - accepts string name for wildcard or SignalType enum"""
-        # Wildcard subscription (all signals)
+    def subscribe_batch(self, signal_type, callback: Callable, max_batch: int = 100,
+                        max_wait_ms: float = 250, name: str = None, max_queue: int = 5000,
+                        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST) -> BatchSubscription:
+        """Subscribe with batched delivery - callback receives a List[Signal]
+        
+        Signals are collected for up to max_wait_ms (or until max_batch are
+        queued) so bulk consumers can do their bookkeeping and disk writes
+        once per batch instead of once per signal.
+        """
+        signal_type, name = self._resolve_subscription(signal_type, callback, name)
+        return self._register(BatchSubscription(name, callback, signal_type, max_batch=max_batch,
+                                                max_wait_ms=max_wait_ms, max_queue=max_queue,
+                                                overflow=overflow))
+    
+    def _resolve_subscription(self, signal_type, callback: Callable, name: str = None):
         if isinstance(signal_type, str):
-            self.wildcard_subscribers.append(callback)
-        # Type-specific subscription
-        elif isinstance(signal_type, SignalType):
-            if signal_type not in self.subscribers:
-                self.subscribers[signal_type] = []
-            self.subscribers[signal_type].append(callback)
+            # Wildcard subscription (all signals); the string doubles as the subscriber name
+            return None, name or signal_type
+        if not isinstance(signal_type, SignalType):
+            raise TypeError(f"Unsupported signal_type: {signal_type!r}")
+        return signal_type, name or getattr(callback, '__qualname__', repr(callback))
+    
+    def _register(self, sub: Subscription) -> Subscription:
+        self.unsubscribe(sub.name)
+        self.subscriptions[sub.name] = sub
+        if sub.signal_type is None:
+            self.wildcard_subscribers.append(sub)
+        else:
+            self.subscribers.setdefault(sub.signal_type, []).append(sub)
+        return sub
+    
+    def unsubscribe(self, name: str) -> bool:
+        """Remove a subscription by name and stop its worker"""
+        sub = self.subscriptions.pop(name, None)
+        if not sub:
+            return False
+        sub.stop()
+        if sub.signal_type is None:
+            self.wildcard_subscribers.remove(sub)
+        else:
+            self.subscribers[sub.signal_type].remove(sub)
+        return True
     
     def get_recent_signals(self, signal_type: SignalType = None, limit: int = 100) -> List[Signal]:
-        """Get recent signals, optionally filtered by type"""
-        if signal_type:
-            return [s for s in self.signal_history[-limit:] if s.type == signal_type]
-        return self.signal_history[-limit:]
+        """Get the most recent signals (oldest first), optionally filtered by type"""
+        source = self.history_by_type[signal_type] if signal_type else self.signal_history
+        recent = list(islice(reversed(source), max(0, limit)))
+        recent.reverse()
+        return recent
     
     def get_stats(self) -> Dict:
         """Get signal statistics"""
+        by_severity = {sev: 0 for sev in ('critical', 'high', 'medium', 'low')}
+        by_severity.update({sev: c for sev, c in self.severity_counts.items() if c > 0})
         return {
             'total_signals': len(self.signal_history),
-            'by_type': {t.value: len([s for s in self.signal_history if s.type == t]) 
-                       for t in SignalType},
-            'by_severity': {
-                'critical': len([s for s in self.signal_history if s.severity == 'critical']),
-                'high': len([s for s in self.signal_history if s.severity == 'high']),
-                'medium': len([s for s in self.signal_history if s.severity == 'medium']),
-                'low': len([s for s in self.signal_history if s.severity == 'low']),
-            }
+            'by_type': {t.value: self.type_counts[t] for t in SignalType},
+            'by_severity': by_severity,
+            'suppressed_duplicates': self.suppressed_count,
+            'active_dedup_keys': len(self.dedup_index),
+            'dispatch_mode': self.dispatch_mode,
+            'subscribers': {name: sub.get_stats() for name, sub in self.subscriptions.items()}
         }
 
 # Global signal bus instance
@@ -135,10 +433,23 @@ class SignalBusCog(commands.Cog):
         embed.add_field(name="Total Signals", value=stats['total_signals'], inline=False)
         embed.add_field(name="By Type", value="\n".join([
             f"{t}: {c}" for t, c in stats['by_type'].items() if c > 0
-        ]), inline=False)
+        ]) or "None", inline=False)
         embed.add_field(name="By Severity", value="\n".join([
             f"{sev}: {c}" for sev, c in stats['by_severity'].items() if c > 0
-        ]), inline=False)
+        ]) or "None", inline=False)
+        embed.add_field(name="Deduplication", value=(
+            f"Suppressed: {stats['suppressed_duplicates']}\n"
+            f"Active keys: {stats['active_dedup_keys']}"
+        ), inline=False)
+        
+        # Per-subscriber queue health, slowest first
+        subs = sorted(stats['subscribers'].items(), key=lambda x: x[1]['max_lag_ms'], reverse=True)
+        if subs:
+            embed.add_field(name=f"Subscribers ({stats['dispatch_mode']})", value="\n".join([
+                f"`{name}` q={s['queue_depth']}/{s['max_queue']} lag={s['last_lag_ms']}ms "
+                f"(max {s['max_lag_ms']}ms) drop={s['dropped']} coal={s['coalesced']} err={s['errors']}"
+                for name, s in subs[:10]
+            ])[:1024], inline=False)
         await ctx.send(embed=embed)
 
 async def setup(bot):
@@ -3,18 +3,123 @@ Signal Correlation Rules
 Create and manage correlation rules that watch the signal bus and emit aggregated signals.
 """
 
+import asyncio
 import json
 import os
-from datetime import datetime, timedelta
+import time
+from collections import deque
+from datetime import datetime
 from typing import Dict, List, Optional
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 from cogs.core.signal_bus import signal_bus, Signal, SignalType
 from cogs.core.pst_timezone import get_now_pst
 
 
+GROUP_BY_FIELDS = {
+    "guild": "guild_id",
+    "user": "user_id",
+    "channel": "channel_id",
+}
+
+
+class CompiledRule:
+    """Runtime state for one correlation rule.
+
+    Count rules keep a deque of monotonic timestamps per group key and evict
+    from the left, so each signal costs amortized O(1). Sequence rules
+    ("A then B within N seconds") track, per group, the latest start time of
+    a partial match that has completed each step.
+    """
+
+    def __init__(self, rule: Dict):
+        self.rule = rule
+        self.id = rule["id"]
+        self.window = rule["window_seconds"]
+        self.cooldown = rule["cooldown_seconds"]
+        self.min_count = rule["min_count"]
+        self.group_by = rule.get("group_by")
+        self.sequence = rule.get("mode") == "sequence"
+        self.steps: List[SignalType] = rule["signal_types"]
+        self.buffers: Dict[str, deque] = {}
+        self.progress: Dict[str, List[Optional[float]]] = {}
+        self.last_fired: Dict[str, float] = {}
+
+        # Carry the persisted cooldown over a restart for the ungrouped bucket
+        last_triggered = rule.get("last_triggered")
+        if last_triggered:
+            try:
+                elapsed = (get_now_pst() - datetime.fromisoformat(last_triggered)).total_seconds()
+                if elapsed < self.cooldown:
+                    self.last_fired["*"] = time.monotonic() - elapsed
+            except (TypeError, ValueError):
+                pass
+
+    def group_key(self, signal: Signal) -> str:
+        if not self.group_by:
+            return "*"
+        if self.group_by == "source":
+            return str(signal.source)
+        value = (signal.data or {}).get(GROUP_BY_FIELDS.get(self.group_by, self.group_by))
+        return "*" if value is None else str(value)
+
+    def observe(self, signal_type: SignalType, signal: Signal, now: float) -> Optional[tuple]:
+        """Fold a signal into the rule; returns (group, count) when the rule fires"""
+        group = self.group_key(signal)
+        count = self._observe_sequence(signal_type, group, now) if self.sequence else self._observe_count(group, now)
+        if not count:
+            return None
+
+        last = self.last_fired.get(group)
+        if last is not None and now - last < self.cooldown:
+            return None
+        self.last_fired[group] = now
+        if self.sequence:
+            self.progress.pop(group, None)
+        return group, count
+
+    def _observe_count(self, group: str, now: float) -> int:
+        buffer = self.buffers.get(group)
+        if buffer is None:
+            buffer = self.buffers[group] = deque()
+        buffer.append(now)
+        cutoff = now - self.window
+        while buffer[0] <= cutoff:
+            buffer.popleft()
+        return len(buffer) if len(buffer) >= self.min_count else 0
+
+    def _observe_sequence(self, signal_type: SignalType, group: str, now: float) -> int:
+        starts = self.progress.get(group)
+        if starts is None:
+            starts = self.progress[group] = [None] * len(self.steps)
+        cutoff = now - self.window
+        # Walk steps backwards so one signal never satisfies two consecutive steps
+        for i in range(len(self.steps) - 1, -1, -1):
+            if self.steps[i] != signal_type:
+                continue
+            if i == 0:
+                starts[0] = now
+            elif starts[i - 1] is not None and starts[i - 1] > cutoff:
+                starts[i] = starts[i - 1] if starts[i] is None else max(starts[i], starts[i - 1])
+        last = starts[-1]
+        return len(self.steps) if last is not None and last > cutoff else 0
+
+    def sweep(self, now: float) -> None:
+        """Drop idle group state so per-user/per-guild keys do not accumulate"""
+        cutoff = now - self.window
+        for group in [g for g, buf in self.buffers.items() if not buf or buf[-1] <= cutoff]:
+            del self.buffers[group]
+        for group in [g for g, st in self.progress.items() if all(t is None or t <= cutoff for t in st)]:
+            del self.progress[group]
+        for group in [g for g, t in self.last_fired.items() if now - t >= self.cooldown]:
+            del self.last_fired[group]
+
+    def active_groups(self) -> int:
+        return len(self.buffers) + len(self.progress)
+
+
 class SignalCorrelationRules(commands.Cog):
     """Correlation rules for signal aggregation"""
 
@@ -22,8 +127,17 @@ class SignalCorrelationRules(commands.Cog):
         self.bot = bot
         self.rules_file = "data/correlation_rules.json"
         self.rules: Dict[str, Dict] = self._load_rules()
-        self.buffers: Dict[str, List[datetime]] = {}
+        self.compiled: Dict[str, CompiledRule] = {}
+        self.rules_by_type: Dict[SignalType, List[CompiledRule]] = {}
+        self._dirty = False
+        self._compile_rules()
         self.setup_signal_listeners()
+        self.persist_rules.start()
+
+    def cog_unload(self):
+        self.persist_rules.cancel()
+        if self._dirty:
+            self._save_rules()
 
     def setup_signal_listeners(self):
         """Subscribe to all signals"""
@@ -74,6 +188,10 @@ class SignalCorrelationRules(commands.Cog):
         cooldown_seconds = int(rule.get("cooldown_seconds", window_seconds))
         severity = str(rule.get("severity", "medium")).lower()
         confidence = float(rule.get("confidence", 0.75))
+        mode = "sequence" if str(rule.get("mode", "count")).lower() == "sequence" else "count"
+        group_by = rule.get("group_by") or None
+        if mode == "sequence" and len(normalized_types) < 2:
+            mode = "count"
 
         return {
             "id": rule_id,
@@ -81,6 +199,8 @@ class SignalCorrelationRules(commands.Cog):
             "signal_types": normalized_types,
             "window_seconds": max(10, window_seconds),
             "min_count": max(2, min_count),
+            "mode": mode,
+            "group_by": str(group_by).lower() if group_by else None,
             "severity": severity,
             "emit_type": emit_resolved,
             "confidence": max(0.0, min(1.0, confidence)),
@@ -95,6 +215,8 @@ class SignalCorrelationRules(commands.Cog):
             "signal_types": [t.value if isinstance(t, SignalType) else str(t) for t in rule.get("signal_types", [])],
             "window_seconds": rule.get("window_seconds"),
             "min_count": rule.get("min_count"),
+            "mode": rule.get("mode", "count"),
+            "group_by": rule.get("group_by"),
             "severity": rule.get("severity"),
             "emit_type": rule.get("emit_type").value if isinstance(rule.get("emit_type"), SignalType) else str(rule.get("emit_type")),
             "confidence": rule.get("confidence"),
@@ -120,42 +242,78 @@ class SignalCorrelationRules(commands.Cog):
                 normalized[rule_id] = normalized_rule
         return normalized
 
-    def _save_rules(self) -> None:
+    def _serialize_rules(self) -> Dict:
+        return {rule_id: self._serialize_rule(rule) for rule_id, rule in self.rules.items()}
+
+    def _write_rules(self, payload: Dict) -> None:
         os.makedirs(os.path.dirname(self.rules_file), exist_ok=True)
-        payload = {rule_id: self._serialize_rule(rule) for rule_id, rule in self.rules.items()}
-        with open(self.rules_file, "w") as f:
+        tmp_file = f"{self.rules_file}.tmp"
+        with open(tmp_file, "w") as f:
             json.dump(payload, f, indent=2)
+        os.replace(tmp_file, self.rules_file)
 
-    async def on_signal(self, signal: Signal):
-        signal_type = self._get_signal_type(signal)
-        if not signal_type:
-            return
+    def _save_rules(self) -> None:
+        self._dirty = False
+        self._write_rules(self._serialize_rules())
 
-        now = get_now_pst()
+    def _compile_rules(self) -> None:
+        """Rebuild the per-SignalType rule index (keeps state of unchanged rules)"""
+        compiled = {}
+        by_type: Dict[SignalType, List[CompiledRule]] = {}
         for rule_id, rule in self.rules.items():
+            existing = self.compiled.get(rule_id)
+            if existing and existing.rule is rule:
+                engine = existing
+            else:
+                engine = CompiledRule(rule)
+            compiled[rule_id] = engine
             if not rule.get("enabled", True):
                 continue
-            if signal_type not in rule["signal_types"]:
-                continue
+            for signal_type in set(rule["signal_types"]):
+                by_type.setdefault(signal_type, []).append(engine)
+        self.compiled = compiled
+        self.rules_by_type = by_type
 
-            buffer = self.buffers.setdefault(rule_id, [])
-            window = timedelta(seconds=rule["window_seconds"])
-            cutoff = now - window
-            buffer.append(now)
-            buffer[:] = [ts for ts in buffer if ts > cutoff]
+    def _rules_changed(self) -> None:
+        self._compile_rules()
+        self._save_rules()
+
+    @tasks.loop(seconds=15)
+    async def persist_rules(self):
+        """Write rule state off the event loop and sweep idle group buffers"""
+        now = time.monotonic()
+        for engine in self.compiled.values():
+            engine.sweep(now)
+        if not self._dirty:
+            return
+        self._dirty = False
+        payload = self._serialize_rules()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_rules, payload)
+        except Exception as e:
+            self._dirty = True
+            print(f"[CorrelationRules] ⚠️ Failed to persist rule state: {e}")
+
+    async def on_signal(self, signal: Signal):
+        signal_type = self._get_signal_type(signal)
+        if not signal_type:
+            return
 
-            last_triggered = rule.get("last_triggered")
-            if last_triggered:
-                last_triggered_dt = datetime.fromisoformat(last_triggered)
-                if (now - last_triggered_dt).total_seconds() < rule["cooldown_seconds"]:
-                    continue
+        engines = self.rules_by_type.get(signal_type)
+        if not engines:
+            return
 
-            if len(buffer) >= rule["min_count"]:
-                await self.emit_correlated_signal(rule, signal, len(buffer))
-                rule["last_triggered"] = now.isoformat()
-                self._save_rules()
+        now = time.monotonic()
+        for engine in engines:
+            fired = engine.observe(signal_type, signal, now)
+            if not fired:
+                continue
+            group, count = fired
+            engine.rule["last_triggered"] = get_now_pst().isoformat()
+            self._dirty = True
+            await self.emit_correlated_signal(engine.rule, signal, count, group)
 
-    async def emit_correlated_signal(self, rule: Dict, signal: Signal, count: int) -> None:
+    async def emit_correlated_signal(self, rule: Dict, signal: Signal, count: int, group: str = "*") -> None:
         emit_type = rule.get("emit_type", SignalType.ANOMALY_DETECTED)
         correlated = Signal(
             signal_type=emit_type,
@@ -167,8 +325,11 @@ class SignalCorrelationRules(commands.Cog):
                 "matched_signal": emit_type.value,
                 "signal_count": count,
                 "window_seconds": rule["window_seconds"],
+                "mode": rule.get("mode", "count"),
+                "group_by": rule.get("group_by"),
+                "group": group,
                 "confidence": rule.get("confidence", 0.75),
-                "dedup_key": f"corr:{rule['id']}"
+                "dedup_key": f"corr:{rule['id']}" if group == "*" else f"corr:{rule['id']}:{group}"
             }
         )
         await signal_bus.emit(correlated)
@@ -189,10 +350,12 @@ class SignalCorrelationRules(commands.Cog):
         )
 
         for rule_id, rule in sorted(self.rules.items()):
-            signal_types = ", ".join([t.value for t in rule["signal_types"]])
+            joiner = " → " if rule.get("mode") == "sequence" else ", "
+            signal_types = joiner.join([t.value for t in rule["signal_types"]])
             status = "✅ enabled" if rule.get("enabled", True) else "⏸️ disabled"
             value = (
                 f"Signals: {signal_types}\n"
+                f"Mode: {rule.get('mode', 'count')} | Group by: {rule.get('group_by') or 'none'}\n"
                 f"Window: {rule['window_seconds']}s | Count: {rule['min_count']}\n"
                 f"Severity: {rule['severity']} | Emit: {rule['emit_type'].value}\n"
                 f"Cooldown: {rule['cooldown_seconds']}s | {status}"
@@ -219,6 +382,10 @@ class SignalCorrelationRules(commands.Cog):
         embed.add_field(name="Signals", value=", ".join([t.value for t in rule["signal_types"]]), inline=False)
         embed.add_field(name="Window", value=f"{rule['window_seconds']} seconds", inline=True)
         embed.add_field(name="Min Count", value=str(rule["min_count"]), inline=True)
+        embed.add_field(name="Mode", value=rule.get("mode", "count"), inline=True)
+        embed.add_field(name="Group By", value=rule.get("group_by") or "none", inline=True)
+        engine = self.compiled.get(rule_id)
+        embed.add_field(name="Active Groups", value=str(engine.active_groups() if engine else 0), inline=True)
         embed.add_field(name="Severity", value=rule["severity"], inline=True)
         embed.add_field(name="Emit Type", value=rule["emit_type"].value, inline=True)
         embed.add_field(name="Confidence", value=f"{rule['confidence']:.2f}", inline=True)
@@ -268,7 +435,7 @@ class SignalCorrelationRules(commands.Cog):
             return
 
         self.rules[rule_id] = normalized
-        self._save_rules()
+        self._rules_changed()
         await ctx.send(f"✅ Created correlation rule `{rule_id}`")
 
     @commands.command(name="corr_remove")
@@ -279,7 +446,7 @@ class SignalCorrelationRules(commands.Cog):
             await ctx.send("❌ Rule not found")
             return
         del self.rules[rule_id]
-        self._save_rules()
+        self._rules_changed()
         await ctx.send(f"✅ Removed correlation rule `{rule_id}`")
 
     @commands.command(name="corr_enable")
@@ -291,7 +458,7 @@ class SignalCorrelationRules(commands.Cog):
             await ctx.send("❌ Rule not found")
             return
         rule["enabled"] = True
-        self._save_rules()
+        self._rules_changed()
         await ctx.send(f"✅ Enabled correlation rule `{rule_id}`")
 
     @commands.command(name="corr_disable")
@@ -303,7 +470,7 @@ class SignalCorrelationRules(commands.Cog):
             await ctx.send("❌ Rule not found")
             return
         rule["enabled"] = False
-        self._save_rules()
+        self._rules_changed()
         await ctx.send(f"✅ Disabled correlation rule `{rule_id}`")
 
     @commands.command(name="corr_set")
@@ -332,6 +499,13 @@ class SignalCorrelationRules(commands.Cog):
             rule["confidence"] = max(0.0, min(1.0, float(value)))
         elif field_key in {"cooldown", "cooldown_seconds"}:
             rule["cooldown_seconds"] = max(10, int(value))
+        elif field_key == "mode":
+            if value.lower() not in {"count", "sequence"}:
+                await ctx.send("❌ Mode must be `count` or `sequence`")
+                return
+            rule["mode"] = value.lower()
+        elif field_key in {"group", "group_by"}:
+            rule["group_by"] = None if value.lower() in {"none", "off", "-"} else value.lower()
         else:
             await ctx.send("❌ Unsupported field")
             return
@@ -341,7 +515,7 @@ class SignalCorrelationRules(commands.Cog):
             await ctx.send("❌ Invalid rule configuration")
             return
         self.rules[rule_id] = normalized
-        self._save_rules()
+        self._rules_changed()
         await ctx.send(f"✅ Updated correlation rule `{rule_id}`")
 
 
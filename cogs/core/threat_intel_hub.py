@@ -19,6 +19,7 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from enum import Enum
 import hashlib
+import asyncio
 
 from cogs.core.signal_bus import signal_bus, Signal, SignalType
 from cogs.core.pst_timezone import get_now_pst
@@ -47,6 +48,9 @@ class ThreatCategory(Enum):
     INSIDER_THREAT = "insider_threat"
     VULNERABILITY_EXPLOIT = "vulnerability_exploit"
 
+# IOC fields with a value -> set(IOC values) index, and the bucket used when a field is missing
+IOC_INDEX_DEFAULTS = {'type': 'unknown', 'category': 'unknown', 'severity': 'MEDIUM', 'source': None}
+
 class ThreatIntelHub(commands.Cog):
     """Advanced threat intelligence and IOC management"""
     
@@ -57,7 +61,12 @@ class ThreatIntelHub(commands.Cog):
         self.threat_actors = {}  # Actor name -> Actor data
         self.campaigns = {}  # Campaign ID -> Campaign data
         self.correlations = []  # Signal correlations
+        self.ioc_indexes = {field: {} for field in IOC_INDEX_DEFAULTS}  # field -> value -> set(IOC values)
+        self._index_backlog = None  # Single-IOC index changes made while a rebuild runs
+        self._saving = False      # An executor save is in flight
+        self._save_again = False  # A save was requested meanwhile
         self.load_threat_data()
+        self.rebuild_ioc_indexes()
         self.setup_signal_listeners()
     
     def load_threat_data(self):
@@ -83,39 +92,123 @@ class ThreatIntelHub(commands.Cog):
         self.correlations = []
         self.save_threat_data()
     
+    def _snapshot(self) -> Dict:
+        return {
+            'iocs': dict(self.iocs),
+            'threat_actors': dict(self.threat_actors),
+            'campaigns': dict(self.campaigns),
+            'correlations': list(self.correlations)
+        }
+    
+    def _write_threat_data(self, snapshot: Dict):
+        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
+        tmp_file = f"{self.data_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(tmp_file, self.data_file)
+    
     def save_threat_data(self):
         """Save threat data to disk"""
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        with open(self.data_file, 'w') as f:
-            json.dump({
-                'iocs': self.iocs,
-                'threat_actors': self.threat_actors,
-                'campaigns': self.campaigns,
-                'correlations': self.correlations
-            }, f, indent=2)
+        if self._saving:
+            self._save_again = True  # The in-flight executor save writes once more
+            return
+        self._write_threat_data(self._snapshot())
+    
+    async def save_threat_data_async(self):
+        """Save threat data from an executor (large stores after a feed ingest)"""
+        if self._saving:
+            self._save_again = True
+            return
+        self._saving = True
+        try:
+            while True:
+                self._save_again = False
+                await asyncio.get_running_loop().run_in_executor(None, self._write_threat_data, self._snapshot())
+                if not self._save_again:
+                    break
+        finally:
+            self._saving = False
+    
+    @staticmethod
+    def _apply_index(indexes: Dict, value: str, ioc: Dict, add: bool = True):
+        for field, default in IOC_INDEX_DEFAULTS.items():
+            key = ioc.get(field, default)
+            if add:
+                indexes[field].setdefault(key, set()).add(value)
+            elif key in indexes[field]:
+                indexes[field][key].discard(value)
+    
+    def _index_ioc(self, value: str, ioc: Dict):
+        self._apply_index(self.ioc_indexes, value, ioc)
+        if self._index_backlog is not None:
+            self._index_backlog.append((value, dict(ioc), True))
+    
+    def _unindex_ioc(self, value: str, ioc: Dict):
+        self._apply_index(self.ioc_indexes, value, ioc, add=False)
+        if self._index_backlog is not None:
+            self._index_backlog.append((value, dict(ioc), False))
+    
+    @staticmethod
+    def _build_indexes(items: List) -> Dict:
+        indexes = {field: {} for field in IOC_INDEX_DEFAULTS}
+        for field, default in IOC_INDEX_DEFAULTS.items():
+            buckets = indexes[field]
+            for value, ioc in items:
+                key = ioc.get(field, default)
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = bucket = set()
+                bucket.add(value)
+        return indexes
+    
+    def rebuild_ioc_indexes(self):
+        """Rebuild the type/category/severity/source indexes in one pass over the store"""
+        self.ioc_indexes = self._build_indexes(list(self.iocs.items()))
+    
+    async def rebuild_ioc_indexes_async(self):
+        """Rebuild the indexes from an executor, then replay changes made meanwhile"""
+        items = list(self.iocs.items())
+        self._index_backlog = []
+        try:
+            indexes = await asyncio.get_running_loop().run_in_executor(None, self._build_indexes, items)
+            for value, ioc, add in self._index_backlog:
+                self._apply_index(indexes, value, ioc, add)
+            self.ioc_indexes = indexes
+        finally:
+            self._index_backlog = None
     
     def setup_signal_listeners(self):
-        """Subscribe to signal bus for correlation"""
-        signal_bus.subscribe('threat_intel_hub', self.on_signal)
+        """Subscribe to signal bus for correlation (batched)"""
+        signal_bus.subscribe_batch('threat_intel_hub', self.on_signals, max_batch=200, max_wait_ms=500)
     
     async def on_signal(self, signal: Signal):
-        """Correlate incoming signals with threat intelligence"""
-        # Extract IOCs from signal data
-        iocs_found = self.extract_iocs_from_signal(signal)
-        
-        if iocs_found:
-            # Check against known IOCs
-            matches = []
-            for ioc_value in iocs_found:
-                if ioc_value in self.iocs:
-                    matches.append(self.iocs[ioc_value])
+        """Correlate a single incoming signal with threat intelligence"""
+        await self.on_signals([signal])
+    
+    async def on_signals(self, signals: List[Signal]):
+        """Correlate a batch of signals, persisting correlations once per batch"""
+        correlated = []
+        for signal in signals:
+            # Extract IOCs from signal data
+            iocs_found = self.extract_iocs_from_signal(signal)
+            if not iocs_found:
+                continue
             
+            # Check against known IOCs
+            matches = [self.iocs[ioc_value] for ioc_value in iocs_found if ioc_value in self.iocs]
             if matches:
-                # Emit enriched threat signal
-                await self.emit_enriched_threat(signal, matches)
-                
                 # Record correlation
                 self.record_correlation(signal, matches)
+                correlated.append((signal, matches))
+        
+        if not correlated:
+            return
+        
+        self.save_threat_data()
+        
+        # Emit enriched threat signals
+        for signal, matches in correlated:
+            await self.emit_enriched_threat(signal, matches)
     
     def extract_iocs_from_signal(self, signal: Signal) -> List[str]:
         """Extract potential IOCs from signal data"""
@@ -183,7 +276,7 @@ class ThreatIntelHub(commands.Cog):
         await signal_bus.emit(enriched_signal)
     
     def record_correlation(self, signal: Signal, matches: List[Dict]):
-        """Record correlation for analytics"""
+        """Record correlation for analytics (persisted by the caller)"""
         correlation = {
             'timestamp': get_now_pst().isoformat(),
             'signal_type': str(signal.type),
@@ -198,8 +291,6 @@ class ThreatIntelHub(commands.Cog):
         # Keep last 1000 correlations
         if len(self.correlations) > 1000:
             self.correlations = self.correlations[-1000:]
-        
-        self.save_threat_data()
     
     def add_ioc(self, ioc_type: str, value: str, category: str, 
                 severity: str = 'MEDIUM', attributed_to: str = None,
@@ -207,6 +298,8 @@ class ThreatIntelHub(commands.Cog):
         """Add IOC to threat intelligence database"""
         ioc_id = hashlib.md5(f"{ioc_type}:{value}".encode()).hexdigest()[:12]
         
+        if value in self.iocs:
+            self._unindex_ioc(value, self.iocs[value])
         self.iocs[value] = {
             'id': ioc_id,
             'type': ioc_type,
@@ -220,10 +313,60 @@ class ThreatIntelHub(commands.Cog):
             'last_seen': None,
             'hit_count': 0
         }
+        self._index_ioc(value, self.iocs[value])
         
         self.save_threat_data()
         return ioc_id
     
+    def bulk_upsert_iocs(self, records: List[Dict], source: str = None) -> Dict[str, int]:
+        """Insert new IOCs and refresh known ones from normalized feed records
+        
+        Neither indexes nor saves per record: call rebuild_ioc_indexes() and save once
+        after the last batch of a feed (see cogs.core.ioc_ingest).
+        """
+        now = get_now_pst().isoformat()
+        counts = {'added': 0, 'updated': 0, 'unchanged': 0}
+        for record in records:
+            value = record['value']
+            existing = self.iocs.get(value)
+            if existing is None:
+                self.iocs[value] = {
+                    'id': record['id'],
+                    'type': record['type'],
+                    'value': value,
+                    'category': record['category'],
+                    'severity': record['severity'],
+                    'attributed_to': record.get('attributed_to'),
+                    'description': record.get('description'),
+                    'source': source,
+                    'added_date': now,
+                    'last_seen': None,
+                    'hit_count': 0
+                }
+                counts['added'] += 1
+                continue
+            
+            changed = False
+            for field in ('id', 'type', 'category', 'severity', 'attributed_to', 'description'):
+                new_value = record.get(field)
+                if new_value is not None and existing.get(field) != new_value:
+                    existing[field] = new_value
+                    changed = True
+            existing['last_seen'] = now
+            existing['hit_count'] = existing.get('hit_count', 0) + 1
+            counts['updated' if changed else 'unchanged'] += 1
+        return counts
+    
+    def remove_iocs(self, values: List[str]) -> int:
+        """Remove IOCs and their index entries (persisted by the caller)"""
+        removed = 0
+        for value in values:
+            ioc = self.iocs.pop(value, None)
+            if ioc is not None:
+                self._unindex_ioc(value, ioc)
+                removed += 1
+        return removed
+    
     def add_threat_actor(self, name: str, aliases: List[str] = None,
                         origin: str = None, motivation: str = None,
                         techniques: List[str] = None) -> str:
@@ -270,22 +413,9 @@ class ThreatIntelHub(commands.Cog):
     
     def get_ioc_stats(self) -> Dict:
         """Get IOC statistics"""
-        by_type = {}
-        by_category = {}
-        by_severity = {}
-        
-        for ioc in self.iocs.values():
-            # By type
-            ioc_type = ioc.get('type', 'unknown')
-            by_type[ioc_type] = by_type.get(ioc_type, 0) + 1
-            
-            # By category
-            category = ioc.get('category', 'unknown')
-            by_category[category] = by_category.get(category, 0) + 1
-            
-            # By severity
-            severity = ioc.get('severity', 'MEDIUM')
-            by_severity[severity] = by_severity.get(severity, 0) + 1
+        by_type = {t: len(v) for t, v in self.ioc_indexes['type'].items() if v}
+        by_category = {c: len(v) for c, v in self.ioc_indexes['category'].items() if v}
+        by_severity = {s: len(v) for s, v in self.ioc_indexes['severity'].items() if v}
         
         return {
             'total_iocs': len(self.iocs),
@@ -331,7 +461,15 @@ class ThreatIntelHub(commands.Cog):
         """Search IOCs"""
         results = []
         
-        for ioc in self.iocs.values():
+        # Narrow to indexed candidates when filtering by type/category
+        candidates = None
+        for field, wanted in (('type', ioc_type), ('category', category)):
+            if wanted:
+                bucket = self.ioc_indexes[field].get(wanted, set())
+                candidates = bucket if candidates is None else candidates & bucket
+        iocs = self.iocs.values() if candidates is None else (self.iocs[v] for v in candidates if v in self.iocs)
+        
+        for ioc in iocs:
             # Filter by query
             if query and query.lower() not in ioc.get('value', '').lower():
                 continue
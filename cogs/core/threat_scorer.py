@@ -7,20 +7,73 @@ Architecture:
 - Factors: signal severity, confidence, frequency, system health
 - Provides risk categorization (LOW/MEDIUM/HIGH/CRITICAL)
 - Integrates with signal bus for continuous updates
-- Offers trend tracking and recommendations
+- Scores signal batches at once (NumPy when available)
+- Per-source per-minute hit buckets for pattern bonuses
+- Offers trend tracking from pre-aggregated hourly rollups
 """
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+import asyncio
 import json
 import os
+import time
+from collections import deque
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple
 from statistics import mean
 
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
 from cogs.core.signal_bus import signal_bus, Signal, SignalType
 from cogs.core.pst_timezone import get_now_pst
 
+# Score components (see calculate_threat_score)
+SEVERITY_POINTS = {
+    'CRITICAL': 25,
+    'HIGH': 20,
+    'MEDIUM': 10,
+    'LOW': 5
+}
+TYPE_POINTS = {
+    SignalType.THREAT_DETECTED: 15,
+    SignalType.UNAUTHORIZED_ACCESS: 20,
+    SignalType.ESCALATION_REQUIRED: 10,
+    SignalType.POLICY_VIOLATION: 5,
+    SignalType.ANOMALY_DETECTED: 15  # Anomaly bonus
+}
+PATTERN_WINDOW_MINUTES = 60
+ROLLUP_RETENTION_HOURS = 24 * 7
+
+class SourceHitIndex:
+    """Per-source hit counts in one-minute buckets over a sliding hour"""
+    __slots__ = ('buckets', 'total')
+    
+    def __init__(self):
+        self.buckets = deque()  # [minute, hits], oldest first
+        self.total = 0
+    
+    def _evict(self, minute: int) -> None:
+        cutoff = minute - PATTERN_WINDOW_MINUTES
+        while self.buckets and self.buckets[0][0] <= cutoff:
+            self.total -= self.buckets.popleft()[1]
+    
+    def count(self, minute: int) -> int:
+        self._evict(minute)
+        return self.total
+    
+    def hit(self, minute: int) -> None:
+        self._evict(minute)
+        if self.buckets and self.buckets[-1][0] == minute:
+            self.buckets[-1][1] += 1
+        else:
+            self.buckets.append([minute, 1])
+        self.total += 1
+
 class ThreatScorer(commands.Cog):
     """Dynamic threat risk scoring system"""
     
@@ -29,8 +82,17 @@ class ThreatScorer(commands.Cog):
         self.data_file = 'data/threat_scores.json'
         self.threat_history = {}
         self.current_threats = {}
+        self.hourly_rollups: Dict[str, Dict[str, List[float]]] = {}  # source -> hour -> [count, sum, min, max]
+        self.source_hits: Dict[str, SourceHitIndex] = {}
+        self._dirty = False
         self.load_threat_data()
         self.setup_signal_listeners()
+        self.persist_threat_data.start()
+    
+    def cog_unload(self):
+        self.persist_threat_data.cancel()
+        if self._dirty:
+            self.save_threat_data()
     
     def load_threat_data(self):
         """Load threat scoring history"""
@@ -40,6 +102,7 @@ class ThreatScorer(commands.Cog):
                     data = json.load(f)
                     self.threat_history = data.get('history', {})
                     self.current_threats = data.get('current', {})
+                    self.hourly_rollups = data.get('hourly_rollups') or self._rollups_from_history()
             except:
                 self.threat_history = {}
                 self.current_threats = {}
@@ -47,28 +110,99 @@ class ThreatScorer(commands.Cog):
             self.threat_history = {}
             self.current_threats = {}
     
+    def _rollups_from_history(self) -> Dict[str, Dict[str, List[float]]]:
+        """Build hourly rollups once from legacy history (pre-rollup data files)"""
+        rollups = {}
+        for history in self.threat_history.values():
+            for threat in history:
+                try:
+                    hour = datetime.fromisoformat(threat['timestamp']).strftime('%Y-%m-%d %H:00')
+                except (KeyError, TypeError, ValueError):
+                    continue
+                self._add_to_rollup(rollups, threat.get('source', 'unknown'), hour, threat.get('threat_score', 0.0))
+        return rollups
+    
+    @staticmethod
+    def _add_to_rollup(rollups: Dict, source: str, hour: str, score: float):
+        by_hour = rollups.setdefault(source, {})
+        bucket = by_hour.get(hour)
+        if bucket is None:
+            by_hour[hour] = [1, score, score, score]
+            # Hours arrive in order, so the oldest are first in the dict
+            while len(by_hour) > ROLLUP_RETENTION_HOURS:
+                del by_hour[next(iter(by_hour))]
+        else:
+            bucket[0] += 1
+            bucket[1] += score
+            bucket[2] = min(bucket[2], score)
+            bucket[3] = max(bucket[3], score)
+    
+    def _snapshot(self) -> Dict:
+        return {
+            'history': {k: list(v) for k, v in self.threat_history.items()},
+            'current': dict(self.current_threats),
+            'hourly_rollups': {src: {h: list(b) for h, b in hours.items()} for src, hours in self.hourly_rollups.items()}
+        }
+    
+    def _write_snapshot(self, payload: Dict):
+        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
+        tmp_file = f"{self.data_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(payload, f, separators=(',', ':'))
+        os.replace(tmp_file, self.data_file)
+    
     def save_threat_data(self):
         """Save threat data to disk"""
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        with open(self.data_file, 'w') as f:
-            json.dump({
-                'history': self.threat_history,
-                'current': self.current_threats
-            }, f, indent=2)
+        self._dirty = False
+        self._write_snapshot(self._snapshot())
+    
+    @tasks.loop(seconds=30)
+    async def persist_threat_data(self):
+        """Persist threat data off the event loop when it changed"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        payload = self._snapshot()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_snapshot, payload)
+        except Exception as e:
+            self._dirty = True
+            print(f"[ThreatScorer] ⚠️ Failed to persist threat data: {e}")
     
     def setup_signal_listeners(self):
-        """Subscribe to signal bus"""
-        signal_bus.subscribe('threat_scorer', self.on_signal)
+        """Subscribe to signal bus (batched)"""
+        signal_bus.subscribe_batch('threat_scorer', self.on_signals, max_batch=200, max_wait_ms=500)
     
     async def on_signal(self, signal: Signal):
-        """Update threat score based on signal"""
+        """Update threat score based on a single signal"""
+        await self.on_signals([signal])
+    
+    async def on_signals(self, signals: List[Signal]):
+        """Update threat scores for a batch of signals"""
+        scores = self.score_batch(signals)
+        now = get_now_pst()
+        critical = []
+        for signal, threat_score in zip(signals, scores):
+            self.record_threat(signal, threat_score, now)
+            # Emit escalation if score is critical
+            if threat_score >= 85:
+                critical.append((signal, threat_score))
+        
+        self._dirty = True
+        
+        for signal, threat_score in critical:
+            await self.emit_critical_threat(signal, threat_score)
+    
+    def record_threat(self, signal: Signal, threat_score: float = None, now: datetime = None) -> float:
+        """Fold one scored signal into current threats, history and hourly rollups"""
+        if threat_score is None:
+            threat_score = self.calculate_threat_score(signal)
+        now = now or get_now_pst()
         threat_key = f"{signal.source}_{signal.signal_type}"
         
-        threat_score = self.calculate_threat_score(signal)
-        
         # Update current threat
         self.current_threats[threat_key] = {
-            'timestamp': get_now_pst().isoformat(),
+            'timestamp': now.isoformat(),
             'source': signal.source,
             'signal_type': str(signal.signal_type),
             'severity': signal.severity,
@@ -87,52 +221,53 @@ class ThreatScorer(commands.Cog):
         if len(self.threat_history[threat_key]) > 100:
             self.threat_history[threat_key] = self.threat_history[threat_key][-100:]
         
-        # Emit escalation if score is critical
-        if threat_score >= 85:
-            await self.emit_critical_threat(signal, threat_score)
-        
-        self.save_threat_data()
+        self._add_to_rollup(self.hourly_rollups, signal.source, now.strftime('%Y-%m-%d %H:00'), threat_score)
+        return threat_score
+    
+    def _pattern_bonuses(self, signals: List[Signal]) -> List[float]:
+        """Pattern bonus per signal, counting hits before it (earlier batch items included)"""
+        minute = int(time.monotonic() // 60)
+        bonuses = []
+        for signal in signals:
+            index = self.source_hits.get(signal.source)
+            if index is None:
+                index = self.source_hits[signal.source] = SourceHitIndex()
+            bonuses.append(self._pattern_bonus_for_count(index.count(minute)))
+            index.hit(minute)
+        return bonuses
+    
+    def score_batch(self, signals: List[Signal]) -> List[float]:
+        """Score a batch of signals at once (0-100 each)"""
+        if not signals:
+            return []
+        
+        severity = [SEVERITY_POINTS.get(s.severity, 10) for s in signals]
+        confidence = [float(s.confidence) for s in signals]
+        type_points = [TYPE_POINTS.get(s.signal_type, 0) for s in signals]
+        pattern = self._pattern_bonuses(signals)
+        intel = [self.get_threat_intel_bonus(s) for s in signals]
+        
+        if HAS_NUMPY:
+            scores = (np.asarray(severity, dtype=np.float64)
+                      + np.asarray(confidence, dtype=np.float64) * 35
+                      + np.asarray(type_points, dtype=np.float64)
+                      + np.asarray(pattern, dtype=np.float64) * 10
+                      + np.asarray(intel, dtype=np.float64))
+            return np.minimum(scores, 100.0).tolist()
+        
+        return [
+            min(100.0, sev + conf * 35 + typ + pat * 10 + ti)
+            for sev, conf, typ, pat, ti in zip(severity, confidence, type_points, pattern, intel)
+        ]
     
     def calculate_threat_score(self, signal: Signal) -> float:
-        """Calculate threat risk score (0-100)"""
-        score = 0.0
-        
-        # Base on severity (25 points)
-        severity_scores = {
-            'CRITICAL': 25,
-            'HIGH': 20,
-            'MEDIUM': 10,
-            'LOW': 5
-        }
-        score += severity_scores.get(signal.severity, 10)
-        
-        # Base on confidence (35 points)
-        confidence_score = signal.confidence * 35
-        score += confidence_score
-        
-        # Bonus for specific threat types (15 points)
-        threat_bonuses = {
-            SignalType.THREAT_DETECTED: 15,
-            SignalType.UNAUTHORIZED_ACCESS: 20,
-            SignalType.ESCALATION_REQUIRED: 10,
-            SignalType.POLICY_VIOLATION: 5
-        }
-        score += threat_bonuses.get(signal.signal_type, 0)
-        
-        # Pattern analysis bonus (10 points)
-        pattern_bonus = self.get_pattern_bonus(signal.source) * 10
-        score += pattern_bonus
+        """Calculate threat risk score (0-100)
         
-        # Anomaly bonus (15 points)
-        if signal.signal_type == SignalType.ANOMALY_DETECTED:
-            score += 15
-        
-        # Threat intel enrichment bonus (15 points)
-        threat_intel_bonus = self.get_threat_intel_bonus(signal)
-        score += threat_intel_bonus
-        
-        # Cap at 100
-        return min(100.0, score)
+        Severity (5-25) + confidence (0-35) + type bonus (0-20, anomalies 15)
+        + repeated-source pattern bonus (0-10) + threat intel bonus (0-15).
+        Note: this records a hit for the signal's source in the pattern index.
+        """
+        return self.score_batch([signal])[0]
     
     def get_threat_intel_bonus(self, signal: Signal) -> float:
         """Calculate bonus based on threat intelligence correlation"""
@@ -151,22 +286,14 @@ class ThreatScorer(commands.Cog):
         return 0.0
     
     def get_pattern_bonus(self, source: str) -> float:
-        """Calculate bonus based on repeated threats from same source"""
-        threat_keys = [k for k in self.current_threats.keys() if k.startswith(source)]
-        
-        if not threat_keys:
+        """Calculate bonus based on repeated threats from same source in the last hour"""
+        index = self.source_hits.get(source)
+        if index is None:
             return 0.0
-        
-        # Count threats in last hour
-        cutoff = get_now_pst() - timedelta(hours=1)
-        recent_count = 0
-        
-        for key in threat_keys:
-            threat = self.current_threats[key]
-            ts = datetime.fromisoformat(threat['timestamp'])
-            if ts > cutoff:
-                recent_count += 1
-        
+        return self._pattern_bonus_for_count(index.count(int(time.monotonic() // 60)))
+    
+    @staticmethod
+    def _pattern_bonus_for_count(recent_count: int) -> float:
         # Bonus increases with repeated threats
         if recent_count >= 5:
             return 1.0  # 100% bonus (10 points)
@@ -239,23 +366,28 @@ class ThreatScorer(commands.Cog):
         }
     
     def get_threat_trend(self, system: str = None, hours: int = 24) -> List[Dict]:
-        """Get threat trend for visualization"""
-        cutoff = get_now_pst() - timedelta(hours=hours)
+        """Get hourly threat trend for visualization from the pre-aggregated rollups"""
+        cutoff = (get_now_pst() - timedelta(hours=hours)).strftime('%Y-%m-%d %H:00')
         
         trend = []
-        for key, history in self.threat_history.items():
-            if system and not key.startswith(system):
+        for source, by_hour in self.hourly_rollups.items():
+            if system and not source.startswith(system):
                 continue
             
-            for threat in history:
-                ts = datetime.fromisoformat(threat['timestamp'])
-                if ts > cutoff:
-                    trend.append({
-                        'timestamp': threat['timestamp'],
-                        'source': threat['source'],
-                        'score': threat['threat_score'],
-                        'risk_level': threat['risk_level']
-                    })
+            for hour, (count, total, low, high) in by_hour.items():
+                if hour < cutoff:
+                    continue
+                avg = total / count if count else 0.0
+                trend.append({
+                    'timestamp': hour,
+                    'source': source,
+                    'count': count,
+                    'total': total,
+                    'score': avg,
+                    'min': low,
+                    'max': high,
+                    'risk_level': self.get_risk_level(avg)
+                })
         
         return sorted(trend, key=lambda x: x['timestamp'])
     
@@ -360,22 +492,17 @@ class ThreatScorer(commands.Cog):
         if system:
             embed.description += f"\nSystem: `{system}`"
         
-        # Group by hour and show trend
+        # Merge per-source rollups into one series per hour
         hourly_data = {}
-        for threat in trend:
-            ts = datetime.fromisoformat(threat['timestamp'])
-            hour = ts.strftime('%Y-%m-%d %H:00')
-            
-            if hour not in hourly_data:
-                hourly_data[hour] = []
-            
-            hourly_data[hour].append(threat['score'])
+        for point in trend:
+            bucket = hourly_data.setdefault(point['timestamp'], [0, 0.0])
+            bucket[0] += point['count']
+            bucket[1] += point['total']
         
         timeline_text = ""
         for hour in sorted(hourly_data.keys())[-6:]:  # Last 6 hours
-            scores = hourly_data[hour]
-            avg_score = mean(scores)
-            count = len(scores)
+            count, total = hourly_data[hour]
+            avg_score = total / count if count else 0.0
             
             # Create visual bar
             bar_length = int(avg_score / 10)
@@ -390,12 +517,13 @@ class ThreatScorer(commands.Cog):
         )
         
         # Statistics
-        all_scores = [t['score'] for t in trend]
+        total_count = sum(p['count'] for p in trend)
+        total_score = sum(p['total'] for p in trend)
         embed.add_field(
             name="Statistics",
-            value=f"Min: {min(all_scores):.0f}\n"
-                  f"Avg: {mean(all_scores):.0f}\n"
-                  f"Max: {max(all_scores):.0f}",
+            value=f"Min: {min(p['min'] for p in trend):.0f}\n"
+                  f"Avg: {(total_score / total_count if total_count else 0.0):.0f}\n"
+                  f"Max: {max(p['max'] for p in trend):.0f}",
             inline=False
         )
         
@@ -0,0 +1,358 @@
+"""Webhook Delivery - Shared outbound webhook engine (pooled, batched, retried, spilled)
+
+One long-lived aiohttp session keeps TLS connections alive per host. Every endpoint
+gets its own queue and worker: Discord payloads are merged into one request of up to
+10 embeds, Slack payloads into one message of blocks/attachments, and other JSON
+payloads are sent one per request. Failed requests are retried with jittered
+exponential backoff, 429s wait out `Retry-After`, and anything still undelivered
+is appended to a spill file and replayed on the next start.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+BATCH_WINDOW = 0.5            # Seconds a worker waits to fill a batch after the first payload
+MAX_BATCH_ITEMS = 10          # Payloads collected per batch
+DISCORD_MAX_EMBEDS = 10
+DISCORD_MAX_CONTENT = 2000
+SLACK_MAX_BLOCKS = 50
+SLACK_MAX_ATTACHMENTS = 20
+QUEUE_MAX_SIZE = 5000         # Per endpoint; overflow goes straight to the spill file
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+MAX_RETRY_AFTER = 60.0        # A longer 429 wait spills the batch instead of stalling the queue
+REQUEST_TIMEOUT = 15
+SPILL_FILE = 'data/webhook_spill.jsonl'
+
+
+def _jitter_backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def _discord_requests(payloads: List[Dict]) -> List[Tuple[List[int], Dict]]:
+    """Merge Discord payloads into as few requests as the 10-embed / 2000-char limits allow"""
+    requests = []
+    current, indexes = None, []
+    for i, payload in enumerate(payloads):
+        embeds = payload.get('embeds') or ([payload['embed']] if payload.get('embed') else [])
+        content = payload.get('message', payload.get('content', '')) or ''
+        identity = (payload.get('username', 'SOC Bot'), payload.get('avatar_url', ''))
+        if current is not None:
+            joined = f"{current['content']}\n{content}" if current['content'] and content else current['content'] + content
+            fits = (current['_identity'] == identity
+                    and len(current['embeds']) + len(embeds) <= DISCORD_MAX_EMBEDS
+                    and len(joined) <= DISCORD_MAX_CONTENT)
+            if fits:
+                current['content'] = joined
+                current['embeds'].extend(embeds)
+                indexes.append(i)
+                continue
+            requests.append((indexes, current))
+        current = {'_identity': identity, 'content': content[:DISCORD_MAX_CONTENT], 'username': identity[0],
+                   'avatar_url': identity[1], 'embeds': list(embeds[:DISCORD_MAX_EMBEDS])}
+        indexes = [i]
+    if current is not None:
+        requests.append((indexes, current))
+
+    for _, body in requests:
+        body.pop('_identity')
+        if not body['embeds']:
+            body.pop('embeds')
+        if not body['avatar_url']:
+            body.pop('avatar_url')
+    return requests
+
+
+def _slack_requests(payloads: List[Dict]) -> List[Tuple[List[int], Dict]]:
+    """Merge Slack payloads into messages of blocks (plus colored attachments)"""
+    requests = []
+    current, indexes = None, []
+    for i, payload in enumerate(payloads):
+        text = payload.get('message', payload.get('text', '')) or ''
+        blocks = payload.get('blocks') or ([{'type': 'section', 'text': {'type': 'mrkdwn', 'text': text[:3000]}}]
+                                           if text and 'color' not in payload else [])
+        attachments = list(payload.get('attachments', []))
+        if 'color' in payload:
+            attachments.append({'color': payload['color'], 'text': text})
+        username = payload.get('username', 'SOC Bot')
+        if current is not None:
+            extra_blocks = len(blocks) + (1 if blocks and current['blocks'] else 0)
+            fits = (current['username'] == username
+                    and len(current['blocks']) + extra_blocks <= SLACK_MAX_BLOCKS
+                    and len(current['attachments']) + len(attachments) <= SLACK_MAX_ATTACHMENTS)
+            if fits:
+                if blocks and current['blocks']:
+                    current['blocks'].append({'type': 'divider'})
+                current['blocks'].extend(blocks)
+                current['attachments'].extend(attachments)
+                current['text'] = f"{current['text']}\n{text}" if current['text'] else text
+                indexes.append(i)
+                continue
+            requests.append((indexes, current))
+        current = {'text': text, 'username': username, 'blocks': list(blocks), 'attachments': attachments}
+        indexes = [i]
+    if current is not None:
+        requests.append((indexes, current))
+
+    for _, body in requests:
+        for key in ('blocks', 'attachments'):
+            if not body[key]:
+                body.pop(key)
+    return requests
+
+
+class _Endpoint:
+    """Queue, worker and counters for one destination URL"""
+
+    def __init__(self, kind: str, url: str, auth_env: Optional[str]):
+        self.kind = kind
+        self.url = url
+        self.auth_env = auth_env
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_MAX_SIZE)
+        self.worker: Optional[asyncio.Task] = None
+        self.in_flight: List[Tuple[Dict, asyncio.Future]] = []
+        self.stats = {'queued': 0, 'delivered': 0, 'requests': 0, 'retries': 0, 'rate_limited': 0,
+                      'failed': 0, 'spilled': 0, 'last_latency_ms': None, 'last_error': None}
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        # Credentials come from the environment at send time and are never written to disk
+        token = os.getenv(self.auth_env) if self.auth_env else None
+        return {'Authorization': token} if token else {}
+
+
+class WebhookDeliveryEngine:
+    """Pooled, batched and retried delivery for every outbound webhook"""
+
+    def __init__(self, spill_file: str = SPILL_FILE):
+        self.spill_file = spill_file
+        self.endpoints: Dict[Tuple[str, str], _Endpoint] = {}
+        self.session = None
+        self._spill_replayed = False
+
+    # ==================== SESSION ====================
+
+    async def _get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=100, limit_per_host=8, ttl_dns_cache=300, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+        return self.session
+
+    # ==================== ENQUEUE ====================
+
+    def _endpoint(self, kind: str, url: str, auth_env: Optional[str] = None) -> _Endpoint:
+        key = (kind, url)
+        endpoint = self.endpoints.get(key)
+        if endpoint is None:
+            endpoint = self.endpoints[key] = _Endpoint(kind, url, auth_env)
+        elif auth_env:
+            endpoint.auth_env = auth_env
+        if endpoint.worker is None or endpoint.worker.done():
+            endpoint.worker = asyncio.get_running_loop().create_task(self._run(endpoint))
+        return endpoint
+
+    def enqueue(self, kind: str, url: str, payload: Dict, auth_env: str = None) -> asyncio.Future:
+        """Queue a payload ('discord', 'slack' or 'json'); the future resolves to True once delivered
+
+        A False result means the payload was rejected or spilled for a later retry.
+        Must be called from the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not HAS_AIOHTTP:
+            future.set_result(False)
+            return future
+        if not self._spill_replayed:
+            self._spill_replayed = True
+            self.replay_spill()
+        endpoint = self._endpoint(kind, url, auth_env)
+        try:
+            endpoint.queue.put_nowait((payload, future))
+            endpoint.stats['queued'] += 1
+        except asyncio.QueueFull:
+            self._spill(endpoint, [payload], 'queue full')
+            future.set_result(False)
+        return future
+
+    async def deliver(self, kind: str, url: str, payload: Dict, auth_env: str = None) -> bool:
+        """Queue a payload and wait for its delivery result"""
+        return await self.enqueue(kind, url, payload, auth_env)
+
+    def queue_depth(self, url: str = None) -> int:
+        return sum(e.queue.qsize() for e in self.endpoints.values() if url is None or e.url == url)
+
+    # ==================== WORKER ====================
+
+    async def _run(self, endpoint: _Endpoint):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await endpoint.queue.get()]
+            if endpoint.kind in ('discord', 'slack'):
+                deadline = loop.time() + BATCH_WINDOW
+                while len(batch) < MAX_BATCH_ITEMS:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(endpoint.queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+            endpoint.in_flight = batch
+            payloads = [payload for payload, _ in batch]
+            if endpoint.kind == 'discord':
+                requests = _discord_requests(payloads)
+            elif endpoint.kind == 'slack':
+                requests = _slack_requests(payloads)
+            else:
+                requests = [([i], payload) for i, payload in enumerate(payloads)]
+
+            for indexes, body in requests:
+                try:
+                    delivered, error, retryable = await self._post(endpoint, body)
+                except Exception as e:
+                    delivered, error, retryable = False, str(e), True
+                if delivered:
+                    endpoint.stats['delivered'] += len(indexes)
+                else:
+                    endpoint.stats['failed'] += len(indexes)
+                    endpoint.stats['last_error'] = error
+                    if retryable:
+                        self._spill(endpoint, [payloads[i] for i in indexes], error)
+                    print(f"[WebhookDelivery] ❌ {endpoint.kind} delivery failed ({len(indexes)} payload(s)): {error}")
+                for i in indexes:
+                    future = batch[i][1]
+                    if not future.done():
+                        future.set_result(delivered)
+            endpoint.in_flight = []
+
+    @staticmethod
+    async def _retry_after(resp) -> float:
+        for header in ('Retry-After', 'X-RateLimit-Reset-After'):
+            value = resp.headers.get(header)
+            if value:
+                try:
+                    return float(value)
+                except ValueError:
+                    pass
+        try:
+            body = await resp.json(content_type=None)
+            return float(body.get('retry_after', 1.0))
+        except Exception:
+            return 1.0
+
+    async def _post(self, endpoint: _Endpoint, body: Dict) -> Tuple[bool, Optional[str], bool]:
+        """POST with retries; returns (delivered, error, retryable)"""
+        session = await self._get_session()
+        error = None
+        for attempt in range(MAX_ATTEMPTS):
+            if attempt:
+                endpoint.stats['retries'] += 1
+            started = time.perf_counter()
+            try:
+                async with session.post(endpoint.url, json=body, headers=endpoint.headers) as resp:
+                    endpoint.stats['requests'] += 1
+                    endpoint.stats['last_latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+                    if 200 <= resp.status < 300:
+                        return True, None, False
+                    error = f"HTTP {resp.status}"
+                    if resp.status == 429:
+                        endpoint.stats['rate_limited'] += 1
+                        wait = await self._retry_after(resp)
+                        if wait > MAX_RETRY_AFTER:
+                            return False, f"rate limited for {wait:.0f}s", True
+                        delay = wait * random.uniform(1.0, 1.1)  # Spread retries of parallel workers
+                    elif resp.status >= 500:
+                        delay = _jitter_backoff(attempt)
+                    else:
+                        return False, error, False  # 4xx: the payload or URL is wrong, retrying won't help
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = f"{type(e).__name__}: {e}"[:200]
+                delay = _jitter_backoff(attempt)
+            if attempt < MAX_ATTEMPTS - 1:
+                await asyncio.sleep(delay)
+        return False, error, True
+
+    # ==================== SPILL ====================
+
+    def _spill(self, endpoint: _Endpoint, payloads: List[Dict], error: str):
+        try:
+            os.makedirs(os.path.dirname(self.spill_file) or '.', exist_ok=True)
+            with open(self.spill_file, 'a', encoding='utf-8') as f:
+                for payload in payloads:
+                    f.write(json.dumps({
+                        'kind': endpoint.kind, 'url': endpoint.url, 'auth_env': endpoint.auth_env,
+                        'payload': payload, 'error': error, 'spilled_at': datetime.utcnow().isoformat()
+                    }, default=str) + "\n")
+            endpoint.stats['spilled'] += len(payloads)
+        except OSError as e:
+            print(f"[WebhookDelivery] ❌ Could not spill {len(payloads)} payload(s): {e}")
+
+    def replay_spill(self) -> int:
+        """Re-queue spilled payloads (called automatically on first use)"""
+        if not HAS_AIOHTTP or not os.path.exists(self.spill_file):
+            return 0
+        replay_path = f"{self.spill_file}.replay"
+        try:
+            os.replace(self.spill_file, replay_path)
+            with open(replay_path, 'r', encoding='utf-8') as f:
+                records = []
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+            os.remove(replay_path)
+        except OSError as e:
+            print(f"[WebhookDelivery] ⚠️ Could not replay spill file: {e}")
+            return 0
+        self._spill_replayed = True
+        for record in records:
+            self.enqueue(record['kind'], record['url'], record['payload'], record.get('auth_env'))
+        if records:
+            print(f"[WebhookDelivery] 🔁 Re-queued {len(records)} spilled payload(s)")
+        return len(records)
+
+    async def close(self):
+        """Stop workers, spill whatever is still queued and close the session"""
+        for endpoint in self.endpoints.values():
+            if endpoint.worker is not None:
+                endpoint.worker.cancel()
+            pending = []
+            items = [item for item in endpoint.in_flight if not item[1].done()]
+            while not endpoint.queue.empty():
+                items.append(endpoint.queue.get_nowait())
+            for payload, future in items:
+                pending.append(payload)
+                if not future.done():
+                    future.set_result(False)
+            endpoint.in_flight = []
+            if pending:
+                self._spill(endpoint, pending, 'shutdown')
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def get_stats(self) -> Dict:
+        totals = {'endpoints': len(self.endpoints), 'queued_now': self.queue_depth()}
+        for endpoint in self.endpoints.values():
+            for key in ('delivered', 'requests', 'retries', 'rate_limited', 'failed', 'spilled'):
+                totals[key] = totals.get(key, 0) + endpoint.stats[key]
+        return totals
+
+
+# Global webhook delivery engine instance
+webhook_delivery = WebhookDeliveryEngine()
@@ -3,9 +3,18 @@ import discord
 from discord.ext import commands, tasks
 import json
 import os
+import time
 from datetime import datetime
 import asyncio
 from cogs.core.pst_timezone import get_now_pst
+from cogs.core.data_storage import USER_SECTIONS, UserRows, create_backend
+
+# Seconds a change may sit in memory before the write-behind flush picks it up
+FLUSH_INTERVAL_SECONDS = 5
+
+# Storage backend: "sqlite" (default, data/bot_data.db) or "json" (data/bot_data/*.json)
+DATA_BACKEND = os.getenv('DATA_BACKEND', 'sqlite').lower()
+
 
 class DataManager(commands.Cog):
     def __init__(self, bot):
@@ -33,46 +42,125 @@ class DataManager(commands.Cog):
             "custom_data": {}  # For other cogs to store data
         }
         
+        # Write-behind state
+        self.dirty_sections = set()
+        self._flush_lock = asyncio.Lock()
+        self.write_stats = {
+            "flushes": 0,
+            "sections_written": 0,
+            "rows_written": 0,
+            "bytes_written": 0,
+            "errors": 0,
+            "last_flush_ms": 0.0,
+            "last_flush": None
+        }
+        
         # Load data on startup
         self.load_data()
         
-        # Start auto-save task
+        # Start background tasks
+        self.flush_dirty.start()
         self.auto_save.start()
     
     def cog_unload(self):
-        """Save data when cog is unloaded."""
+        """Flush pending changes when cog is unloaded."""
+        self.flush_dirty.cancel()
         self.auto_save.cancel()
         self.save_data()
+        self.backend.close()
     
     def load_data(self):
-        """Load all data from JSON file."""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    loaded_data = json.load(f)
-                    # Merge loaded data with defaults
-                    for key in self.data:
-                        if key in loaded_data:
-                            self.data[key] = loaded_data[key]
-                print(f"[DataManager] ✅ Loaded data from {self.data_file}")
-            except Exception as e:
-                print(f"[DataManager] ⚠️ Error loading data: {e}")
-        else:
-            print(f"[DataManager] ℹ️ No existing data file, starting fresh")
+        """Open the storage backend; per-user sections are loaded lazily, one row at a time."""
+        started = time.perf_counter()
+        try:
+            self.backend = create_backend(DATA_BACKEND, self.data_dir)
+        except Exception as e:
+            print(f"[DataManager] ⚠️ {DATA_BACKEND} backend unavailable ({e}), falling back to json")
+            self.backend = create_backend("json", self.data_dir)
+        
+        for section in USER_SECTIONS:
+            self.data[section] = UserRows(self.backend, section)
+        for section, value in self.backend.load_documents().items():
+            self.data[section] = value
+        
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"[DataManager] ✅ Loaded data via {self.backend.name} backend in {elapsed:.0f}ms")
     
-    def save_data(self):
-        """Save all data to JSON file."""
+    # ==================== WRITE-BEHIND PERSISTENCE ====================
+    
+    def mark_dirty(self, section, user_id=None):
+        """Queue a section (or one user's row in a per-user section) for the next flush."""
+        if section in USER_SECTIONS:
+            self.data[section].mark_dirty(user_id)
+        else:
+            self.dirty_sections.add(section)
+    
+    def _collect_changes(self):
+        documents = {section: self.data[section] for section in self.dirty_sections}
+        self.dirty_sections.clear()
+        rows = {
+            section: self.data[section].take_dirty()
+            for section in USER_SECTIONS
+            if self.data[section].pending
+        }
+        return documents, rows
+    
+    def _finish_flush(self, documents, rows, written_bytes, started):
+        failed = written_bytes is None
+        for section, changes in rows.items():
+            self.data[section].flush_done(changes, failed=failed)
+        if failed:
+            self.dirty_sections.update(documents)
+            self.write_stats["errors"] += 1
+            return
+        self.write_stats["flushes"] += 1
+        self.write_stats["sections_written"] += len(documents)
+        self.write_stats["rows_written"] += sum(len(changes) for changes in rows.values())
+        self.write_stats["bytes_written"] += written_bytes
+        self.write_stats["last_flush_ms"] = (time.perf_counter() - started) * 1000
+        self.write_stats["last_flush"] = get_now_pst().isoformat()
+    
+    def _write_changes(self, documents, rows):
+        """Runs in a worker thread; returns bytes written or None on failure."""
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=2, ensure_ascii=False)
-            print(f"[DataManager] ✅ Data saved to {self.data_file}")
+            return self.backend.write_batch(documents, rows)
         except Exception as e:
             print(f"[DataManager] ❌ Error saving data: {e}")
+            return None
+    
+    async def flush(self):
+        """Write pending changes in an executor thread. Safe to call concurrently."""
+        async with self._flush_lock:
+            documents, rows = self._collect_changes()
+            if not documents and not rows:
+                return 0
+            started = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            written_bytes = await loop.run_in_executor(None, self._write_changes, documents, rows)
+            self._finish_flush(documents, rows, written_bytes, started)
+            return len(documents) + sum(len(changes) for changes in rows.values())
+    
+    def save_data(self):
+        """Synchronously write pending changes (shutdown and emergency paths)."""
+        documents, rows = self._collect_changes()
+        if not documents and not rows:
+            return
+        started = time.perf_counter()
+        written_bytes = self._write_changes(documents, rows)
+        self._finish_flush(documents, rows, written_bytes, started)
+        if written_bytes is not None:
+            print(f"[DataManager] ✅ Data saved via {self.backend.name} backend")
+    
+    @tasks.loop(seconds=FLUSH_INTERVAL_SECONDS)
+    async def flush_dirty(self):
+        """Coalesce changes made since the last tick into one background write."""
+        await self.flush()
     
     @tasks.loop(minutes=5)
     async def auto_save(self):
-        """Auto-save data every 5 minutes."""
-        self.save_data()
+        """Periodic safety net for settings mutated in place through get_* accessors."""
+        self.dirty_sections.update(("guild_settings", "user_settings"))
+        await self.flush()
     
     @auto_save.before_loop
     async def before_auto_save(self):
@@ -92,22 +180,22 @@ class DataManager(commands.Cog):
         if user_id_str not in self.data["warns"]:
             self.data["warns"][user_id_str] = []
         self.data["warns"][user_id_str].append(warn_data)
-        self.save_data()
+        self.mark_dirty("warns", user_id_str)
     
     def clear_warns(self, user_id):
         """Clear all warnings for a user."""
         user_id_str = str(user_id)
         if user_id_str in self.data["warns"]:
             del self.data["warns"][user_id_str]
-            self.save_data()
     
     # Reputation
     def get_reputation(self, user_id):
         """Get reputation for a user."""
         user_id_str = str(user_id)
-        if user_id_str not in self.data["reputation"]:
-            self.data["reputation"][user_id_str] = {"rep": 0, "given": [], "received": []}
-        return self.data["reputation"][user_id_str]
+        rep_data = self.data["reputation"].get(user_id_str)
+        if rep_data is None:
+            rep_data = self.data["reputation"].cache_default(user_id_str, {"rep": 0, "given": [], "received": []})
+        return rep_data
     
     def add_reputation(self, user_id, amount, from_user_id, reason):
         """Add reputation to a user."""
@@ -121,15 +209,15 @@ class DataManager(commands.Cog):
             "timestamp": get_now_pst().isoformat()
         })
         self.data["reputation"][user_id_str] = rep_data
-        self.save_data()
     
     # Levels
     def get_level_data(self, user_id):
         """Get level data for a user."""
         user_id_str = str(user_id)
-        if user_id_str not in self.data["levels"]:
-            self.data["levels"][user_id_str] = {"level": 1, "xp": 0, "messages": 0}
-        return self.data["levels"][user_id_str]
+        level_data = self.data["levels"].get(user_id_str)
+        if level_data is None:
+            level_data = self.data["levels"].cache_default(user_id_str, {"level": 1, "xp": 0, "messages": 0})
+        return level_data
     
     def add_xp(self, user_id, xp_amount):
         """Add XP to a user and level them up if needed."""
@@ -144,7 +232,6 @@ class DataManager(commands.Cog):
             level_data["level"] += 1
             level_data["xp"] = 0
             self.data["levels"][user_id_str] = level_data
-            self.save_data()
             return True  # Leveled up
         
         self.data["levels"][user_id_str] = level_data
@@ -159,7 +246,7 @@ class DataManager(commands.Cog):
             "time": time,
             "channel_id": str(channel_id)
         })
-        self.save_data()
+        self.mark_dirty("reminders")
     
     def get_reminders(self, user_id=None):
         """Get all reminders or reminders for a specific user."""
@@ -171,7 +258,7 @@ class DataManager(commands.Cog):
         """Remove a reminder by index."""
         if 0 <= index < len(self.data["reminders"]):
             del self.data["reminders"][index]
-            self.save_data()
+            self.mark_dirty("reminders")
     
     # Guild Settings
     def get_guild_setting(self, guild_id, key, default=None):
@@ -187,7 +274,7 @@ class DataManager(commands.Cog):
         if guild_id_str not in self.data["guild_settings"]:
             self.data["guild_settings"][guild_id_str] = {}
         self.data["guild_settings"][guild_id_str][key] = value
-        self.save_data()
+        self.mark_dirty("guild_settings")
     
     # User Settings
     def get_user_setting(self, user_id, key, default=None):
@@ -203,7 +290,7 @@ class DataManager(commands.Cog):
         if user_id_str not in self.data["user_settings"]:
             self.data["user_settings"][user_id_str] = {}
         self.data["user_settings"][user_id_str][key] = value
-        self.save_data()
+        self.mark_dirty("user_settings")
     
     # Achievements
     def add_achievement(self, user_id, achievement_id):
@@ -213,7 +300,7 @@ class DataManager(commands.Cog):
             self.data["achievements"][user_id_str] = []
         if achievement_id not in self.data["achievements"][user_id_str]:
             self.data["achievements"][user_id_str].append(achievement_id)
-            self.save_data()
+            self.mark_dirty("achievements", user_id_str)
             return True
         return False
     
@@ -230,7 +317,7 @@ class DataManager(commands.Cog):
             "timestamp": get_now_pst().isoformat(),
             "status": "pending"
         })
-        self.save_data()
+        self.mark_dirty("suggestions")
     
     def get_suggestions(self):
         """Get all suggestions."""
@@ -245,7 +332,7 @@ class DataManager(commands.Cog):
         self.data["trivia_scores"][user_id_str]["total"] += 1
         if correct:
             self.data["trivia_scores"][user_id_str]["correct"] += 1
-        self.save_data()
+        self.mark_dirty("trivia_scores")
     
     def get_trivia_score(self, user_id):
         """Get trivia score for a user."""
@@ -259,7 +346,6 @@ class DataManager(commands.Cog):
             "given": given,
             "timestamp": get_now_pst().isoformat()
         }
-        self.save_data()
     
     def get_consent(self, user_id):
         """Get user consent status."""
@@ -268,18 +354,18 @@ class DataManager(commands.Cog):
     def accept_privacy(self, user_id):
         """Mark privacy policy as accepted."""
         self.data["privacy_accepted"][str(user_id)] = get_now_pst().isoformat()
-        self.save_data()
+        self.mark_dirty("privacy_accepted")
     
     def accept_tos(self, user_id):
         """Mark ToS as accepted."""
         self.data["tos_accepted"][str(user_id)] = get_now_pst().isoformat()
-        self.save_data()
+        self.mark_dirty("tos_accepted")
     
     # Custom data for other cogs
     def set_custom_data(self, key, value):
         """Set custom data for other cogs."""
         self.data["custom_data"][key] = value
-        self.save_data()
+        self.mark_dirty("custom_data")
     
     def get_custom_data(self, key, default=None):
         """Get custom data for other cogs."""
@@ -290,8 +376,8 @@ class DataManager(commands.Cog):
     @commands.is_owner()
     async def savedata(self, ctx):
         """Manually save all data (owner only)."""
-        self.save_data()
-        await ctx.send("✅ All data saved successfully!")
+        written = await self.flush()
+        await ctx.send(f"✅ All data saved successfully! ({written} pending changes written)")
     
     @commands.command()
     @commands.is_owner()
@@ -305,8 +391,26 @@ class DataManager(commands.Cog):
         embed.add_field(name="Suggestions", value=len(self.data["suggestions"]), inline=True)
         embed.add_field(name="Guilds Configured", value=len(self.data["guild_settings"]), inline=True)
         embed.add_field(name="Consents Given", value=len(self.data["consent"]), inline=True)
-        embed.add_field(name="Auto-Save", value="Every 5 minutes", inline=True)
-        embed.set_footer(text=f"Data file: {self.data_file}")
+        embed.add_field(name="Write-Behind", value=f"Every {FLUSH_INTERVAL_SECONDS}s", inline=True)
+        pending_rows = sum(self.data[section].pending for section in USER_SECTIONS)
+        embed.add_field(
+            name="Pending",
+            value=f"Sections: {', '.join(sorted(self.dirty_sections)) or 'None'} | Rows: {pending_rows}",
+            inline=False
+        )
+        embed.add_field(
+            name="Flushes",
+            value=f"{self.write_stats['flushes']} ({self.write_stats['sections_written']} sections, "
+                  f"{self.write_stats['rows_written']} rows, {self.write_stats['bytes_written'] / 1024:.1f} KB)",
+            inline=True
+        )
+        embed.add_field(name="Last Flush", value=f"{self.write_stats['last_flush_ms']:.1f} ms", inline=True)
+        embed.add_field(name="Write Errors", value=self.write_stats["errors"], inline=True)
+        hits = sum(self.data[section].hits for section in USER_SECTIONS)
+        misses = sum(self.data[section].misses for section in USER_SECTIONS)
+        hit_rate = hits / (hits + misses) * 100 if hits + misses else 0
+        embed.add_field(name="Row Cache", value=f"{hit_rate:.1f}% hits ({misses} lookups)", inline=True)
+        embed.set_footer(text=f"Storage backend: {self.backend.name}")
         await ctx.send(embed=embed)
 
 async def setup(bot):
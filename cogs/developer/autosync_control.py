@@ -46,6 +46,8 @@ class AutoSyncControlCog(commands.Cog):
         embed.add_field(name="Watcher Status", value=watching_status, inline=True)
         embed.add_field(name="Tracked Files", value=f"📋 {stats['tracked_files']}", inline=True)
         embed.add_field(name="Loaded Cogs", value=f"⚙️ {stats['loaded_cogs']}", inline=True)
+        embed.add_field(name="Watch Mode", value=f"🔭 {stats.get('watch_mode', 'unknown')}", inline=True)
+        embed.add_field(name="Pending Changes", value=f"⏳ {stats.get('pending_changes', 0)}", inline=True)
         
         embed.add_field(name="Watch Directories", value="━" * 25, inline=False)
         for dir_path in stats.get('watch_directories', []):
@@ -128,19 +130,22 @@ class AutoSyncControlCog(commands.Cog):
     @commands.is_owner()
     async def autosync_log(self, ctx, lines: int = 20):
         """Show auto-sync log"""
-        log_file = 'data/autosync_log.json'
-        
-        if not os.path.exists(log_file):
+        manager = self.get_auto_sync_manager()
+        log_file = 'data/autosync_log.jsonl'
+        
+        if manager:
+            logs = manager.get_recent_events(lines)
+        elif os.path.exists(log_file):
+            try:
+                with open(log_file, 'r') as f:
+                    logs = [json.loads(line) for line in f if line.strip()][-lines:]
+            except:
+                await ctx.send("❌ Error reading sync log")
+                return
+        else:
             await ctx.send("📭 No sync log yet")
             return
         
-        try:
-            with open(log_file, 'r') as f:
-                logs = json.load(f)
-        except:
-            await ctx.send("❌ Error reading sync log")
-            return
-        
         if not logs:
             await ctx.send("📭 Sync log is empty")
             return
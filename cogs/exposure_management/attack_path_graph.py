@@ -19,9 +19,13 @@ class AttackPathGraph(commands.Cog):
         self.bot = bot
         self.threat_graph = threat_graph
     
-    def analyze_paths_to_target(self, threat_node_id: str, target_node_id: str) -> Dict:
-        """Find all attack paths from threat to target"""
-        paths = self.threat_graph.find_paths(threat_node_id, target_node_id)
+    def cog_unload(self):
+        """Persist pending graph changes"""
+        self.threat_graph.flush()
+    
+    def analyze_paths_to_target(self, threat_node_id: str, target_node_id: str, max_paths: int = 10) -> Dict:
+        """Find the shortest attack paths from threat to target"""
+        paths = self.threat_graph.find_paths(threat_node_id, target_node_id, max_paths=max_paths)
         
         return {
             'threat': threat_node_id,
@@ -31,6 +35,10 @@ class AttackPathGraph(commands.Cog):
             'shortest_path_length': min(len(p) for p in paths) if paths else 0
         }
     
+    def analyze_paths_to_crown_jewels(self, threat_node_id: str, paths_per_target: int = 3) -> Dict:
+        """Find attack paths from threat to every reachable crown jewel"""
+        return self.threat_graph.get_threat_paths(threat_node_id, paths_per_target=paths_per_target)
+    
     def calculate_blast_radius(self, compromised_node: str) -> Dict:
         """Calculate impact of node compromise"""
         return self.threat_graph.get_blast_radius(compromised_node)
@@ -10,9 +10,11 @@ Enterprise threat graph for:
 This is Neo4j-like but in-memory for Discord scale.
 """
 
+import asyncio
 import json
 import os
-from typing import Dict, List, Set, Optional, Tuple
+from contextlib import contextmanager
+from typing import Dict, List, Set, Optional, Tuple, Iterable
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
 from collections import defaultdict, deque
@@ -20,6 +22,14 @@ from collections import defaultdict, deque
 from cogs.core.pst_timezone import get_now_pst
 
 
+# Hard limits for path enumeration
+DEFAULT_MAX_PATHS = 10
+MAX_PATH_EXPANSIONS = 50000  # BFS node expansions per k-shortest-paths query
+
+# Seconds to wait after the last mutation before persisting
+SAVE_DELAY_SECONDS = 10
+
+
 class RelationshipType:
     """Entity relationship types"""
     ACCESSED = "accessed"
@@ -57,19 +67,214 @@ class GraphEdge:
     weight: float = 1.0  # For importance scoring
 
 
+class GraphCore:
+    """Compact directed graph: string names interned to integer ids, deduplicated adjacency.
+
+    Adjacency is a list of insertion-ordered dicts used as sets, so neighbour
+    iteration is deterministic and duplicate edges collapse to one entry.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._out: List[Dict[int, None]] = []
+        self._in: List[Dict[int, None]] = []
+        self.edge_count = 0
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name: str):
+        return name in self._ids
+
+    def intern(self, name: str) -> int:
+        node = self._ids.get(name)
+        if node is None:
+            node = len(self._names)
+            self._ids[name] = node
+            self._names.append(name)
+            self._out.append({})
+            self._in.append({})
+        return node
+
+    def add_link(self, source: str, target: str) -> bool:
+        """Add source -> target; returns False if the link already existed."""
+        s, t = self.intern(source), self.intern(target)
+        if t in self._out[s]:
+            return False
+        self._out[s][t] = None
+        self._in[t][s] = None
+        self.edge_count += 1
+        return True
+
+    def successors(self, name: str) -> List[str]:
+        node = self._ids.get(name)
+        return [self._names[n] for n in self._out[node]] if node is not None else []
+
+    def predecessors(self, name: str) -> List[str]:
+        node = self._ids.get(name)
+        return [self._names[n] for n in self._in[node]] if node is not None else []
+
+    def names(self) -> List[str]:
+        return list(self._names)
+
+    # ---- traversal ----
+
+    def reachable(self, source: str, max_hops: int = 3, reverse: bool = False,
+                  max_nodes: Optional[int] = None) -> Dict[str, int]:
+        """Level-synchronous BFS; returns {name: hop distance} including the source."""
+        start = self._ids.get(source)
+        if start is None:
+            return {source: 0}
+        adjacency = self._in if reverse else self._out
+        dist = {start: 0}
+        frontier = [start]
+        for hop in range(1, max_hops + 1):
+            next_frontier = []
+            for node in frontier:
+                for neighbor in adjacency[node]:
+                    if neighbor not in dist:
+                        dist[neighbor] = hop
+                        next_frontier.append(neighbor)
+                        if max_nodes and len(dist) >= max_nodes:
+                            return {self._names[n]: d for n, d in dist.items()}
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return {self._names[n]: d for n, d in dist.items()}
+
+    def shortest_paths_to(self, source: str, targets: Iterable[str], max_depth: int = 5) -> Dict[str, List[str]]:
+        """One shared BFS frontier from `source`; returns a shortest path to each reachable target.
+
+        `max_depth` is the maximum number of nodes in a path (as in find_paths).
+        """
+        start = self._ids.get(source)
+        if start is None:
+            return {}
+        wanted = {self._ids[t] for t in targets if t in self._ids}
+        if not wanted:
+            return {}
+
+        parent = {start: -1}
+        found = {}
+        if start in wanted:
+            found[start] = None
+        frontier = [start]
+        depth = 1
+        while frontier and depth < max_depth and len(found) < len(wanted):
+            next_frontier = []
+            for node in frontier:
+                for neighbor in self._out[node]:
+                    if neighbor in parent:
+                        continue
+                    parent[neighbor] = node
+                    next_frontier.append(neighbor)
+                    if neighbor in wanted:
+                        found[neighbor] = None
+            frontier = next_frontier
+            depth += 1
+
+        return {self._names[t]: self._unwind(parent, t) for t in found}
+
+    def _unwind(self, parent: Dict[int, int], node: int) -> List[str]:
+        path = []
+        while node != -1:
+            path.append(self._names[node])
+            node = parent[node]
+        path.reverse()
+        return path
+
+    def _bfs_path(self, start: int, goal: int, max_nodes: int, banned_nodes: Set[int],
+                  banned_edges: Set[Tuple[int, int]], budget: List[int]) -> Optional[List[int]]:
+        """Shortest path avoiding banned nodes/edges, charging expansions to `budget`."""
+        if start == goal:
+            return [start]
+        parent = {start: -1}
+        frontier = [start]
+        length = 1
+        while frontier and length < max_nodes:
+            next_frontier = []
+            for node in frontier:
+                budget[0] -= 1
+                if budget[0] < 0:
+                    return None
+                for neighbor in self._out[node]:
+                    if neighbor in parent or neighbor in banned_nodes or (node, neighbor) in banned_edges:
+                        continue
+                    parent[neighbor] = node
+                    if neighbor == goal:
+                        path = [neighbor]
+                        while node != -1:
+                            path.append(node)
+                            node = parent[node]
+                        path.reverse()
+                        return path
+                    next_frontier.append(neighbor)
+            frontier = next_frontier
+            length += 1
+        return None
+
+    def k_shortest_paths(self, source: str, target: str, k: int = DEFAULT_MAX_PATHS, max_depth: int = 5,
+                         max_expansions: int = MAX_PATH_EXPANSIONS) -> List[List[str]]:
+        """Up to k loop-free paths in order of length (Yen's algorithm on hop count).
+
+        Paths have at most `max_depth` nodes; the search stops early once
+        `max_expansions` BFS expansions have been spent.
+        """
+        start, goal = self._ids.get(source), self._ids.get(target)
+        if start is None or goal is None or k <= 0:
+            return []
+        budget = [max_expansions]
+        first = self._bfs_path(start, goal, max_depth, set(), set(), budget)
+        if first is None:
+            return []
+
+        accepted = [first]
+        seen = {tuple(first)}
+        candidates: List[List[int]] = []
+        while len(accepted) < k:
+            previous = accepted[-1]
+            for i in range(len(previous) - 1):
+                spur, root = previous[i], previous[:i + 1]
+                banned_edges = {
+                    (path[i], path[i + 1]) for path in accepted
+                    if len(path) > i + 1 and path[:i + 1] == root
+                }
+                banned_nodes = set(root[:-1])
+                spur_path = self._bfs_path(spur, goal, max_depth - i, banned_nodes, banned_edges, budget)
+                if spur_path is not None:
+                    candidate = root[:-1] + spur_path
+                    key = tuple(candidate)
+                    if key not in seen:
+                        seen.add(key)
+                        candidates.append(candidate)
+                if budget[0] < 0:
+                    break
+            if not candidates or budget[0] < 0:
+                break
+            candidates.sort(key=len)
+            accepted.append(candidates.pop(0))
+
+        return [[self._names[n] for n in path] for path in accepted]
+
+
 class ThreatGraph:
     """In-memory threat graph for correlation & analysis"""
-    
+
     def __init__(self):
         self.file = 'data/threat_graph.json'
         self.nodes: Dict[str, GraphNode] = {}
-        self.edges: List[GraphEdge] = []
-        self.adjacency: Dict[str, List[str]] = defaultdict(list)
-        self.reverse_adjacency: Dict[str, List[str]] = defaultdict(list)
+        self.edges: Dict[Tuple[str, str, str], GraphEdge] = {}  # (source, target, type) -> edge
+        self.core = GraphCore()
         self.node_index: Dict[str, Set[str]] = defaultdict(set)  # Type -> node IDs
-        
+
+        # Deferred persistence
+        self._dirty = False
+        self._batch_depth = 0
+        self._save_handle = None
+
         self.load_graph()
-    
+
     def load_graph(self):
         """Load graph from disk"""
         if os.path.exists(self.file):
@@ -88,8 +293,9 @@ class ThreatGraph:
                         )
                         self.nodes[node_id] = node
                         self.node_index[node.node_type].add(node_id)
-                    
-                    # Reconstruct edges
+                        self.core.intern(node_id)
+
+                    # Reconstruct edges (older files may contain duplicates)
                     for edge_data in data.get('edges', []):
                         edge = GraphEdge(
                             source_id=edge_data['source_id'],
@@ -99,16 +305,12 @@ class ThreatGraph:
                             created_at=datetime.fromisoformat(edge_data['created_at']),
                             weight=edge_data.get('weight', 1.0)
                         )
-                        self.edges.append(edge)
-                        self.adjacency[edge.source_id].append(edge.target_id)
-                        self.reverse_adjacency[edge.target_id].append(edge.source_id)
+                        self.edges[(edge.source_id, edge.target_id, edge.edge_type)] = edge
+                        self.core.add_link(edge.source_id, edge.target_id)
             except Exception as e:
                 print(f"[Graph Engine] Load error: {e}")
-    
-    def save_graph(self):
-        """Save graph to disk"""
-        os.makedirs(os.path.dirname(self.file), exist_ok=True)
-        
+
+    def _snapshot(self) -> Dict:
         nodes_dict = {}
         for node_id, node in self.nodes.items():
             nodes_dict[node_id] = {
@@ -118,9 +320,9 @@ class ThreatGraph:
                 'last_seen': node.last_seen.isoformat(),
                 'risk_score': node.risk_score
             }
-        
+
         edges_list = []
-        for edge in self.edges:
+        for edge in self.edges.values():
             edges_list.append({
                 'source_id': edge.source_id,
                 'target_id': edge.target_id,
@@ -129,19 +331,77 @@ class ThreatGraph:
                 'created_at': edge.created_at.isoformat(),
                 'weight': edge.weight
             })
-        
-        with open(self.file, 'w') as f:
-            json.dump({
-                'nodes': nodes_dict,
-                'edges': edges_list
-            }, f, indent=2)
-    
+
+        return {'nodes': nodes_dict, 'edges': edges_list}
+
+    def _write_snapshot(self, snapshot: Dict):
+        os.makedirs(os.path.dirname(self.file), exist_ok=True)
+        tmp_file = f"{self.file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(tmp_file, self.file)
+
+    def save_graph(self):
+        """Save graph to disk (synchronous; use for shutdown paths)"""
+        if self._save_handle:
+            self._save_handle.cancel()
+            self._save_handle = None
+        self._dirty = False
+        self._write_snapshot(self._snapshot())
+
+    def _mark_dirty(self):
+        """Record a mutation; persistence is coalesced and deferred"""
+        self._dirty = True
+        if self._batch_depth == 0:
+            self._schedule_save()
+
+    def _schedule_save(self):
+        if self._save_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts/tests): write immediately
+            self.save_graph()
+            return
+        self._save_handle = loop.call_later(SAVE_DELAY_SECONDS, self._start_background_save)
+
+    def _start_background_save(self):
+        self._save_handle = None
+        if not self._dirty:
+            return
+        self._dirty = False
+        snapshot = self._snapshot()
+        future = asyncio.get_running_loop().run_in_executor(None, self._write_snapshot, snapshot)
+        future.add_done_callback(self._on_saved)
+
+    def _on_saved(self, future):
+        if future.exception():
+            print(f"[Graph Engine] Save error: {future.exception()}")
+            self._mark_dirty()
+
+    def flush(self):
+        """Persist now if anything changed since the last save"""
+        if self._dirty:
+            self.save_graph()
+
+    @contextmanager
+    def batch(self):
+        """Group many mutations into one deferred save: `with threat_graph.batch(): ...`"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._dirty:
+                self._schedule_save()
+
     def add_node(self, node_id: str, node_type: str, properties: Dict = None) -> GraphNode:
         """Add node to graph"""
         if node_id in self.nodes:
             self.nodes[node_id].last_seen = get_now_pst()
             return self.nodes[node_id]
-        
+
         node = GraphNode(
             node_id=node_id,
             node_type=node_type,
@@ -149,89 +409,80 @@ class ThreatGraph:
         )
         self.nodes[node_id] = node
         self.node_index[node_type].add(node_id)
-        self.save_graph()
+        self.core.intern(node_id)
+        self._mark_dirty()
         return node
-    
-    def add_edge(self, source_id: str, target_id: str, edge_type: str, 
+
+    def add_edge(self, source_id: str, target_id: str, edge_type: str,
                  properties: Dict = None, weight: float = 1.0) -> GraphEdge:
-        """Add relationship edge"""
-        
+        """Add relationship edge (repeat edges of the same type update the existing one)"""
+
         # Ensure nodes exist
         if source_id not in self.nodes:
             self.add_node(source_id, "unknown")
         if target_id not in self.nodes:
             self.add_node(target_id, "unknown")
-        
-        # Create edge
-        edge = GraphEdge(
-            source_id=source_id,
-            target_id=target_id,
-            edge_type=edge_type,
-            properties=properties or {},
-            weight=weight
-        )
-        
-        self.edges.append(edge)
-        self.adjacency[source_id].append(target_id)
-        self.reverse_adjacency[target_id].append(source_id)
-        self.save_graph()
+
+        key = (source_id, target_id, edge_type)
+        edge = self.edges.get(key)
+        if edge:
+            edge.properties.update(properties or {})
+            edge.weight = weight
+        else:
+            edge = GraphEdge(
+                source_id=source_id,
+                target_id=target_id,
+                edge_type=edge_type,
+                properties=properties or {},
+                weight=weight
+            )
+            self.edges[key] = edge
+            self.core.add_link(source_id, target_id)
+        self._mark_dirty()
         return edge
-    
-    def find_paths(self, source_id: str, target_id: str, max_depth: int = 5) -> List[List[str]]:
-        """Find all paths between two nodes (BFS)"""
-        paths = []
-        queue = deque([(source_id, [source_id])])
-        visited = {source_id}
-        
-        while queue:
-            current, path = queue.popleft()
-            
-            if len(path) > max_depth:
-                continue
-            
-            if current == target_id:
-                paths.append(path)
-                continue
-            
-            for neighbor in self.adjacency.get(current, []):
-                if neighbor not in visited or len(path) < 3:
-                    queue.append((neighbor, path + [neighbor]))
-        
-        return paths
-    
+
+    def add_edges(self, edges: Iterable[Tuple]) -> int:
+        """Bulk-add (source_id, target_id, edge_type[, properties[, weight]]) tuples with one save"""
+        count = 0
+        with self.batch():
+            for edge in edges:
+                self.add_edge(*edge)
+                count += 1
+        return count
+
+    def find_paths(self, source_id: str, target_id: str, max_depth: int = 5,
+                   max_paths: int = DEFAULT_MAX_PATHS) -> List[List[str]]:
+        """Find up to max_paths loop-free paths between two nodes, shortest first"""
+        return self.core.k_shortest_paths(source_id, target_id, k=max_paths, max_depth=max_depth)
+
     def get_blast_radius(self, node_id: str, max_hops: int = 3) -> Dict:
         """Calculate blast radius from compromised node"""
-        affected = {node_id}
-        current_level = {node_id}
-        
-        for hop in range(max_hops):
-            next_level = set()
-            for node in current_level:
-                for neighbor in self.adjacency.get(node, []):
-                    if neighbor not in affected:
-                        next_level.add(neighbor)
-            affected.update(next_level)
-            current_level = next_level
-        
+        affected = set(self.core.reachable(node_id, max_hops=max_hops))
+
         return {
             'compromised_node': node_id,
             'affected_nodes': list(affected),
             'affected_count': len(affected),
             'by_type': self._count_by_type(affected)
         }
-    
-    def get_threat_paths(self, threat_id: str) -> Dict:
-        """Get all paths from threat to high-value targets"""
+
+    def get_threat_paths(self, threat_id: str, paths_per_target: int = 3) -> Dict:
+        """Get paths from threat to high-value targets"""
         crown_jewels = self._identify_crown_jewels()
+        # One BFS finds which crown jewels are reachable at all
+        reachable = self.core.shortest_paths_to(threat_id, crown_jewels, max_depth=4)
         threat_paths = {}
-        
-        for target_id in crown_jewels:
-            paths = self.find_paths(threat_id, target_id, max_depth=4)
-            if paths:
-                threat_paths[target_id] = paths
-        
+
+        for target_id, shortest in reachable.items():
+            if paths_per_target <= 1:
+                threat_paths[target_id] = [shortest]
+            else:
+                threat_paths[target_id] = self.find_paths(
+                    threat_id, target_id, max_depth=4, max_paths=paths_per_target
+                )
+
         return threat_paths
-    
+
     def _identify_crown_jewels(self) -> List[str]:
         """Identify high-value targets (nodes with high risk score)"""
         high_risk = [
@@ -239,7 +490,7 @@ class ThreatGraph:
             if node.risk_score > 0.8
         ]
         return high_risk
-    
+
     def _count_by_type(self, node_ids: Set[str]) -> Dict:
         """Count nodes by type"""
         counts = defaultdict(int)
@@ -247,48 +498,48 @@ class ThreatGraph:
             if node_id in self.nodes:
                 counts[self.nodes[node_id].node_type] += 1
         return dict(counts)
-    
+
     def get_node_relationships(self, node_id: str) -> Dict:
         """Get all relationships for a node"""
-        incoming = self.reverse_adjacency.get(node_id, [])
-        outgoing = self.adjacency.get(node_id, [])
-        
+        incoming = self.core.predecessors(node_id)
+        outgoing = self.core.successors(node_id)
+
         return {
             'node_id': node_id,
             'incoming': incoming,
             'outgoing': outgoing,
             'total_connections': len(incoming) + len(outgoing)
         }
-    
+
     def search_nodes(self, node_type: str = None, properties: Dict = None) -> List[GraphNode]:
         """Search nodes by type and properties"""
         results = []
-        
+
         if node_type:
             candidates = [self.nodes[nid] for nid in self.node_index.get(node_type, [])]
         else:
             candidates = list(self.nodes.values())
-        
+
         for node in candidates:
             if properties:
                 if all(node.properties.get(k) == v for k, v in properties.items()):
                     results.append(node)
             else:
                 results.append(node)
-        
+
         return results
-    
+
     def get_statistics(self) -> Dict:
         """Get graph statistics"""
         node_types = defaultdict(int)
         edge_types = defaultdict(int)
-        
-        for node in self.nodes.values():
-            node_types[node.node_type] += 1
-        
-        for edge in self.edges:
+
+        for node_type, node_ids in self.node_index.items():
+            node_types[node_type] += len(node_ids)
+
+        for edge in self.edges.values():
             edge_types[edge.edge_type] += 1
-        
+
         return {
             'total_nodes': len(self.nodes),
             'total_edges': len(self.edges),
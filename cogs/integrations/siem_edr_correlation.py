@@ -2,17 +2,25 @@
 SIEM/EDR Event Correlation: Link Discord activity to enterprise SIEM/EDR for full traceability.
 """
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import json
 import os
 from datetime import datetime
 from cogs.core.pst_timezone import get_now_pst
+from cogs.core.webhook_delivery import webhook_delivery
 
 class SIEMEDRCorrelationCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.data_file = "data/siem_edr_correlation.json"
         self.data = self.load_data()
+        self.data_dirty = False
+        self.flush_data.start()
+
+    def cog_unload(self):
+        self.flush_data.cancel()
+        if self.data_dirty:
+            self.save_data(self.data)
 
     def load_data(self):
         if os.path.exists(self.data_file):
@@ -41,6 +49,23 @@ class SIEMEDRCorrelationCog(commands.Cog):
         os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
         with open(self.data_file, 'w') as f:
             json.dump(data, f, indent=2)
+        self.data_dirty = False
+
+    @tasks.loop(seconds=30)
+    async def flush_data(self):
+        """Persist delivery counters in batches instead of once per delivery result"""
+        if self.data_dirty:
+            self.save_data(self.data)
+
+    def _record_delivery(self, platform: str, delivered: bool):
+        connector = self.data["siem_connectors"].get(platform)
+        if connector is None:
+            return
+        if delivered:
+            connector["events_sent"] += 1
+        else:
+            connector["events_failed"] = connector.get("events_failed", 0) + 1
+        self.data_dirty = True
 
     async def is_staff(self, ctx):
         return ctx.author.guild_permissions.manage_messages or ctx.author.id == int(os.getenv('BOT_OWNER_ID', '0'))
@@ -148,7 +173,13 @@ class SIEMEDRCorrelationCog(commands.Cog):
         for plat in platforms_to_sync:
             if plat in self.data["siem_connectors"]:
                 connector = self.data["siem_connectors"][plat]
-                connector["events_sent"] += 1
+                if connector.get("url"):
+                    # Delivered by the shared engine; the API key is read from SIEM_<PLATFORM>_AUTH
+                    future = webhook_delivery.enqueue("json", connector["url"], siem_event,
+                                                      auth_env=f"SIEM_{plat.upper()}_AUTH")
+                    future.add_done_callback(lambda f, p=plat: self._record_delivery(p, f.result()))
+                else:
+                    connector["events_sent"] += 1
                 connector["last_sync"] = get_now_pst().isoformat()
                 synced_platforms.append(plat)
         
@@ -1,20 +1,19 @@
 # Slack Integration: Push alerts and notifications to Slack
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from datetime import datetime
 import json
 import os
 from cogs.core.pst_timezone import get_now_pst
+from cogs.core.webhook_delivery import webhook_delivery
 
 class SlackIntegrationCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.slack_config = {}
         self.slack_channels = {}
-        self.notification_queue = []
         self.data_file = "data/slack_integration.json"
         self.load_slack_config()
-        self.slack_sender.start()
 
     def load_slack_config(self):
         """Load Slack configuration."""
@@ -36,6 +35,17 @@ class SlackIntegrationCog(commands.Cog):
                 'channels': self.slack_channels
             }, f, indent=2)
 
+    def _record_delivery(self, notification_type: str, delivered: bool):
+        """Count a delivered notification against its channel mapping"""
+        if not delivered:
+            print(f"[Slack] ❌ Failed to deliver {notification_type} notification")
+            return
+        if notification_type in self.slack_channels:
+            self.slack_channels[notification_type]['message_count'] += 1
+        self.slack_config['notifications_sent'] = self.slack_config.get('notifications_sent', 0) + 1
+        self.slack_config['last_sent'] = get_now_pst().isoformat()
+        self.save_slack_config()
+
     @commands.command()
     @commands.has_permissions(administrator=True)
     async def setupslack(self, ctx, webhook_url: str):
@@ -103,15 +113,16 @@ class SlackIntegrationCog(commands.Cog):
             await ctx.send(f"❌ No Slack channel mapped for '{notification_type}'")
             return
         
-        notification = {
-            "type": notification_type.lower(),
-            "message": message,
-            "timestamp": get_now_pst().isoformat(),
-            "sent_by": ctx.author.id,
-            "status": "queued"
+        notification_type = notification_type.lower()
+        payload = {
+            "message": f"*[{notification_type.upper()}]* {message}",
+            "username": "SOC Bot",
+            "channel": self.slack_channels[notification_type]["slack_channel"]
         }
         
-        self.notification_queue.append(notification)
+        # Batched, retried and pooled by the shared delivery engine
+        future = webhook_delivery.enqueue("slack", self.slack_config["webhook_url"], payload)
+        future.add_done_callback(lambda f: self._record_delivery(notification_type, f.result()))
         
         embed = discord.Embed(
             title="✅ Notification Queued",
@@ -119,7 +130,7 @@ class SlackIntegrationCog(commands.Cog):
             color=discord.Color.green()
         )
         embed.add_field(name="Type", value=notification_type, inline=True)
-        embed.add_field(name="Queue Position", value=len(self.notification_queue), inline=True)
+        embed.add_field(name="Queue Position", value=webhook_delivery.queue_depth(self.slack_config["webhook_url"]), inline=True)
         
         await ctx.send(embed=embed)
 
@@ -142,7 +153,7 @@ class SlackIntegrationCog(commands.Cog):
             embed.add_field(name="Notifications Sent", value=self.slack_config.get('notifications_sent', 0), inline=True)
             embed.add_field(name="Mapped Channels", value=len(self.slack_channels), inline=True)
         
-        embed.add_field(name="Queue Length", value=len(self.notification_queue), inline=True)
+        embed.add_field(name="Queue Length", value=webhook_delivery.queue_depth(self.slack_config.get("webhook_url")) if self.slack_config else 0, inline=True)
         
         await ctx.send(embed=embed)
 
@@ -182,30 +193,5 @@ class SlackIntegrationCog(commands.Cog):
         
         await ctx.send(f"✅ Slack integration {status}")
 
-    @tasks.loop(minutes=1)
-    async def slack_sender(self):
-        """Process notification queue and send to Slack."""
-        # Simulated Slack sender (would normally call Slack API)
-        if not self.slack_config.get('enabled'):
-            return
-        
-        for notification in self.notification_queue[:5]:
-            notification['status'] = 'sent'
-            
-            if notification['type'] in self.slack_channels:
-                self.slack_channels[notification['type']]['message_count'] += 1
-        
-        # Remove processed notifications
-        self.notification_queue = [n for n in self.notification_queue if n['status'] != 'sent']
-        
-        if self.notification_queue:
-            self.slack_config['notifications_sent'] = self.slack_config.get('notifications_sent', 0) + 5
-            self.slack_config['last_sent'] = get_now_pst().isoformat()
-            self.save_slack_config()
-
-    @slack_sender.before_loop
-    async def before_slack_sender(self):
-        await self.bot.wait_until_ready()
-
 async def setup(bot):
     await bot.add_cog(SlackIntegrationCog(bot))
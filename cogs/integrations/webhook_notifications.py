@@ -1,9 +1,9 @@
 import discord
-from discord.ext import commands
-import aiohttp
+from discord.ext import commands, tasks
 import json
 import datetime
 from pathlib import Path
+from cogs.core.webhook_delivery import webhook_delivery
 
 class WebhookNotifications(commands.Cog):
     """Webhook notification system for external integrations"""
@@ -13,6 +13,8 @@ class WebhookNotifications(commands.Cog):
         self.data_dir = Path('./data')
         self.data_dir.mkdir(exist_ok=True)
         self.webhook_file = self.data_dir / 'webhooks.json'
+        self.delivery = webhook_delivery
+        self.stats_dirty = False
         
         self.webhooks = {
             'endpoints': {},  # {name: {url, type, triggers}}
@@ -24,6 +26,12 @@ class WebhookNotifications(commands.Cog):
         }
         
         self.load_webhooks()
+        self.flush_stats.start()
+    
+    def cog_unload(self):
+        self.flush_stats.cancel()
+        if self.stats_dirty:
+            self.save_webhooks()
     
     def load_webhooks(self):
         """Load webhooks from file"""
@@ -35,76 +43,41 @@ class WebhookNotifications(commands.Cog):
         """Save webhooks to file"""
         with open(self.webhook_file, 'w') as f:
             json.dump(self.webhooks, f, indent=2)
+        self.stats_dirty = False
     
-    async def send_webhook(self, name: str, payload: dict):
-        """Send webhook notification"""
-        if name not in self.webhooks['endpoints']:
-            return False
-        
-        webhook = self.webhooks['endpoints'][name]
-        webhook_type = webhook.get('type', 'discord')
-        
-        try:
-            if webhook_type == 'discord':
-                await self.send_discord_webhook(webhook['url'], payload)
-            elif webhook_type == 'slack':
-                await self.send_slack_webhook(webhook['url'], payload)
-            elif webhook_type == 'custom':
-                await self.send_custom_webhook(webhook['url'], payload)
-            
-            self.webhooks['stats']['total_sent'] += 1
-            self.webhooks['stats']['last_sent'] = datetime.datetime.now().isoformat()
-            self.save_webhooks()
-            return True
-        except Exception as e:
-            self.webhooks['stats']['failed'] += 1
+    @tasks.loop(seconds=30)
+    async def flush_stats(self):
+        """Persist delivery counters in batches instead of once per notification"""
+        if self.stats_dirty:
             self.save_webhooks()
-            print(f"[Webhook] Error sending to {name}: {e}")
-            return False
     
-    async def send_discord_webhook(self, url: str, payload: dict):
-        """Send Discord webhook"""
-        async with aiohttp.ClientSession() as session:
-            # Discord webhook format
-            data = {
-                'content': payload.get('message', ''),
-                'username': payload.get('username', 'SOC Bot'),
-                'avatar_url': payload.get('avatar_url', '')
-            }
-            
-            # Add embed if provided
-            if 'embed' in payload:
-                data['embeds'] = [payload['embed']]
-            
-            async with session.post(url, json=data) as resp:
-                if resp.status not in [200, 204]:
-                    raise Exception(f"Discord webhook failed: {resp.status}")
+    def _record_result(self, name: str, delivered: bool):
+        stats = self.webhooks['stats']
+        if delivered:
+            stats['total_sent'] += 1
+            stats['last_sent'] = datetime.datetime.now().isoformat()
+        else:
+            stats['failed'] += 1
+            print(f"[Webhook] Error sending to {name}: delivery failed")
+        self.stats_dirty = True
     
-    async def send_slack_webhook(self, url: str, payload: dict):
-        """Send Slack webhook"""
-        async with aiohttp.ClientSession() as session:
-            # Slack webhook format
-            data = {
-                'text': payload.get('message', ''),
-                'username': payload.get('username', 'SOC Bot')
-            }
-            
-            if 'color' in payload:
-                data['attachments'] = [{
-                    'color': payload['color'],
-                    'text': payload.get('message', '')
-                }]
-            
-            async with session.post(url, json=data) as resp:
-                if resp.status != 200:
-                    raise Exception(f"Slack webhook failed: {resp.status}")
+    def queue_webhook(self, name: str, payload: dict):
+        """Queue a notification on the shared delivery engine without waiting for it"""
+        if name not in self.webhooks['endpoints']:
+            return None
+        
+        webhook = self.webhooks['endpoints'][name]
+        kind = {'discord': 'discord', 'slack': 'slack'}.get(webhook.get('type', 'discord'), 'json')
+        future = self.delivery.enqueue(kind, webhook['url'], payload)
+        future.add_done_callback(lambda f: self._record_result(name, f.result()))
+        return future
     
-    async def send_custom_webhook(self, url: str, payload: dict):
-        """Send custom webhook (raw JSON)"""
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload) as resp:
-                if resp.status not in [200, 201, 204]:
-                    raise Exception(f"Custom webhook failed: {resp.status}")
+    async def send_webhook(self, name: str, payload: dict):
+        """Send webhook notification and wait for the delivery result"""
+        future = self.queue_webhook(name, payload)
+        if future is None:
+            return False
+        return await future
     
     async def notify_error(self, error_data: dict):
         """Send error notification to all webhooks with 'error' trigger"""
@@ -115,7 +88,7 @@ class WebhookNotifications(commands.Cog):
                     'username': 'SOC Bot - Errors',
                     'color': '#ff0000'
                 }
-                await self.send_webhook(name, payload)
+                self.queue_webhook(name, payload)
     
     async def notify_alert(self, alert_data: dict):
         """Send security alert to all webhooks with 'alert' trigger"""
@@ -126,7 +99,7 @@ class WebhookNotifications(commands.Cog):
                     'username': 'SOC Bot - Alerts',
                     'color': '#ffa500'
                 }
-                await self.send_webhook(name, payload)
+                self.queue_webhook(name, payload)
     
     @commands.command(name='add_webhook')
     @commands.is_owner()
@@ -255,6 +228,15 @@ class WebhookNotifications(commands.Cog):
         
         embed.add_field(name="Active Webhooks", value=str(len(self.webhooks['endpoints'])), inline=True)
         
+        delivery = self.delivery.get_stats()
+        embed.add_field(
+            name="📦 Delivery Engine",
+            value=(f"Queued: {delivery['queued_now']} • Requests: {delivery.get('requests', 0)}\n"
+                   f"Retries: {delivery.get('retries', 0)} • 429s: {delivery.get('rate_limited', 0)}\n"
+                   f"Spilled: {delivery.get('spilled', 0)}"),
+            inline=False
+        )
+        
         await ctx.send(embed=embed)
     
     @commands.command(name='webhook_info')
@@ -1,19 +1,22 @@
 """
 Fast Logger System - High-performance comprehensive event logging
 Replaces slow external logger bots with optimized in-bot logging
-Features: Async operations, event batching, smart caching, minimal latency
+Features: Async operations, per-channel batching (up to 10 embeds per send),
+coalescing of repeated events, adaptive flush interval, minimal latency
 """
 
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
 import asyncio
+import time
 from datetime import timedelta
 from typing import Optional, Dict, List
 import json
 import os
 from collections import deque
 from cogs.core.pst_timezone import get_now_pst
+from cogs.core.message_pipeline import message_pipeline, PRIORITY_OBSERVER
 
 class FastLogger(commands.Cog):
     """High-performance comprehensive event logger"""
@@ -24,10 +27,18 @@ class FastLogger(commands.Cog):
         self.cache_file = 'data/fast_logger_cache.json'
         
         # Performance optimizations
-        self.log_queue = deque(maxlen=1000)  # Queue for batching
+        self.channel_queues: Dict[int, Dict] = {}  # channel_id -> {'channel', 'entries': deque}
+        self.channel_backoff: Dict[int, float] = {}  # channel_id -> monotonic time sends may resume
         self.channel_cache = {}  # Cache log channels
         self.config = {}
-        self.stats = {'logs_sent': 0, 'logs_queued': 0, 'errors': 0}
+        self.stats = {
+            'logs_sent': 0, 'logs_queued': 0, 'errors': 0,
+            'messages_sent': 0,  # channel.send calls (each carries up to 10 embeds)
+            'coalesced': 0,      # events merged into an already-queued identical event
+            'dropped': 0,        # events evicted because a channel queue was full
+            'unrouted': 0,       # events with no configured log channel
+            'rate_limited': 0
+        }
         
         # Load config
         self.load_config()
@@ -36,11 +47,15 @@ class FastLogger(commands.Cog):
         self.batch_processor.change_interval(seconds=self.config.get('batch_interval', 2.0))
         self.batch_processor.start()
         self.cache_cleanup.start()
+        
+        # Message logging runs last in the shared message pipeline
+        message_pipeline.register_stage('fast_logger', self.log_message_stage, priority=PRIORITY_OBSERVER)
     
     def cog_unload(self):
         """Cleanup on unload"""
         self.batch_processor.cancel()
         self.cache_cleanup.cancel()
+        message_pipeline.unregister_stage('fast_logger')
     
     def load_config(self):
         """Load logging configuration"""
@@ -57,8 +72,9 @@ class FastLogger(commands.Cog):
         if not self.config:
             self.config = {
                 'enabled': True,
-                'batch_size': 5,  # Process logs in batches
-                'batch_interval': 2.0,  # Seconds between batches
+                'batch_size': 10,  # Embeds per message (Discord max 10)
+                'batch_interval': 2.0,  # Seconds between batches when idle
+                'max_queue_per_channel': 1000,
                 'guilds': {}  # Per-guild config
             }
             self.save_config()
@@ -114,8 +130,14 @@ class FastLogger(commands.Cog):
         
         return channel
     
-    async def queue_log(self, guild: discord.Guild, log_type: str, embed: discord.Embed):
-        """Queue log for batch processing (NON-BLOCKING)"""
+    async def queue_log(self, guild: discord.Guild, log_type: str, embed: discord.Embed,
+                        coalesce_key: Optional[str] = None):
+        """Queue log for batch processing (NON-BLOCKING)
+        
+        Entries are grouped by destination channel. If coalesce_key matches the
+        newest entry already queued for that channel, the two are merged and
+        the flushed embed shows an occurrence count instead.
+        """
         if not self.config.get('enabled', True):
             return
         
@@ -123,15 +145,39 @@ class FastLogger(commands.Cog):
         if not guild_config.get('enabled', True):
             return
         
+        channel = self.get_log_channel(guild, log_type)
+        if not channel:
+            self.stats['unrouted'] += 1
+            return
+        
+        queue = self.channel_queues.get(channel.id)
+        if queue is None:
+            queue = self.channel_queues[channel.id] = {'channel': channel, 'entries': deque()}
+        queue['channel'] = channel
+        entries = queue['entries']
+        
+        if coalesce_key and entries and entries[-1]['coalesce_key'] == coalesce_key:
+            entries[-1]['count'] += 1
+            self.stats['coalesced'] += 1
+            return
+        
+        if len(entries) >= self.config.get('max_queue_per_channel', 1000):
+            entries.popleft()
+            self.stats['dropped'] += 1
+        
         # Add to queue
-        self.log_queue.append({
-            'guild': guild,
-            'log_type': log_type,
+        entries.append({
             'embed': embed,
+            'coalesce_key': coalesce_key,
+            'count': 1,
             'timestamp': get_now_pst()
         })
         
         self.stats['logs_queued'] += 1
+    
+    def queue_depth(self) -> int:
+        """Total queued entries across all channels"""
+        return sum(len(q['entries']) for q in self.channel_queues.values())
 
     async def log_command(self, ctx: commands.Context, command_name: str, args: str, status: str):
         """Log command execution to moderation logs"""
@@ -167,88 +213,169 @@ class FastLogger(commands.Cog):
         }
         resolved_type = log_type or log_type_map.get(event_type, "server")
         
+        # Skip building the embed when nothing would be sent
+        if not self.config.get('enabled', True) or not self.get_guild_config(guild.id).get('enabled', True):
+            return
+        if not self.get_log_channel(guild, resolved_type):
+            self.stats['unrouted'] += 1
+            return
+        
         embed = discord.Embed(
             title=f"📌 {event_type.replace('_', ' ').title()}",
             color=discord.Color.blue(),
             timestamp=get_now_pst()
         )
         
+        rendered = []
         for key, value in data.items():
             val = str(value)
             if len(val) > 1024:
                 val = val[:1020] + "..."
             embed.add_field(name=key.replace('_', ' ').title(), value=val, inline=True)
+            rendered.append(f"{key}={val}")
         
-        await self.queue_log(guild, resolved_type, embed)
+        # Only back-to-back events with the exact same payload (user, channel, target,
+        # content...) collapse into one entry; anything that differs is logged on its own
+        coalesce_key = f"{event_type}|" + "|".join(rendered)
+        await self.queue_log(guild, resolved_type, embed, coalesce_key=coalesce_key)
+    
+    async def log_message_stage(self, ctx):
+        """Message pipeline stage: log created messages"""
+        await self.log_event("MESSAGE_CREATED", {
+            "user": str(ctx.author),
+            "user_id": ctx.author_id,
+            "channel": str(ctx.channel),
+            "content_length": len(ctx.content)
+        }, ctx.guild)
     
     @commands.Cog.listener()
     async def on_ready(self):
         """Bot ready - cache warming"""
         print(f"[FastLogger] ⚡ High-performance logger ready")
-        print(f"[FastLogger] 📊 Batch size: {self.config.get('batch_size', 5)}, Interval: {self.config.get('batch_interval', 2.0)}s")
+        print(f"[FastLogger] 📊 Embeds/message: {self._embeds_per_message()}, Interval: {self.config.get('batch_interval', 2.0)}s")
     
     # ==================== BACKGROUND TASKS ====================
     
-@tasks.loop(seconds=2.0)
-async def batch_processor(self):
-    """Process log queue in batches (PERFORMANCE)"""
-    try:
-        batch_size = self.config.get('batch_size', 5)
-        
-        if len(self.log_queue) > 0:
-            # Process batch
-            batch = []
-            for _ in range(min(batch_size, len(self.log_queue))):
-                if self.log_queue:
-                    batch.append(self.log_queue.popleft())
+    def _embeds_per_message(self) -> int:
+        return max(1, min(10, int(self.config.get('batch_size', 10))))
+    
+    def _next_interval(self) -> float:
+        """Flush faster while a backlog exists, relax back to the configured interval"""
+        base = float(self.config.get('batch_interval', 2.0))
+        depth = self.queue_depth()
+        if depth >= 100:
+            return max(0.5, base / 4)
+        if depth >= 20:
+            return max(1.0, base / 2)
+        return base
+    
+    @tasks.loop(seconds=2.0)
+    async def batch_processor(self):
+        """Flush each channel's queue as one message of up to 10 embeds (PERFORMANCE)"""
+        try:
+            now = time.monotonic()
+            sends = []
+            for channel_id, queue in list(self.channel_queues.items()):
+                if not queue['entries']:
+                    del self.channel_queues[channel_id]
+                    continue
+                if self.channel_backoff.get(channel_id, 0) > now:
+                    continue
+                sends.append(self.send_channel_batch(channel_id, queue))
             
-            # Send logs concurrently
-            tasks_list = []
-            for log_entry in batch:
-                task = self.send_log_entry(log_entry)
-                tasks_list.append(task)
+            if sends:
+                await asyncio.gather(*sends, return_exceptions=True)
             
-            if tasks_list:
-                await asyncio.gather(*tasks_list, return_exceptions=True)
+            interval = self._next_interval()
+            if interval != self.batch_processor.seconds:
+                self.batch_processor.change_interval(seconds=interval)
         
-    except Exception as e:
-        print(f"[FastLogger] ??? Batch processor error: {e}")
-
-@batch_processor.before_loop
-async def before_batch_processor(self):
-    await self.bot.wait_until_ready()
-
-@tasks.loop(minutes=5.0)
-async def cache_cleanup(self):
-    """Clean expired cache entries"""
-    try:
-        now = get_now_pst()
-        expired = [k for k, v in self.channel_cache.items() if v['expires'] < now]
-        for key in expired:
-            del self.channel_cache[key]
-    except Exception:
-        pass
-
-@cache_cleanup.before_loop
-async def before_cache_cleanup(self):
-    await self.bot.wait_until_ready()
-
-async def send_log_entry(self, log_entry: Dict):
-    """Send single log entry"""
-    try:
-        guild = log_entry['guild']
-        log_type = log_entry['log_type']
-        embed = log_entry['embed']
+        except Exception as e:
+            print(f"[FastLogger] ❌ Batch processor error: {e}")
+    
+    @batch_processor.before_loop
+    async def before_batch_processor(self):
+        await self.bot.wait_until_ready()
+    
+    @tasks.loop(minutes=5.0)
+    async def cache_cleanup(self):
+        """Clean expired cache entries"""
+        try:
+            now = get_now_pst()
+            expired = [k for k, v in self.channel_cache.items() if v['expires'] < now]
+            for key in expired:
+                del self.channel_cache[key]
+            mono = time.monotonic()
+            for channel_id in [c for c, until in self.channel_backoff.items() if until <= mono]:
+                del self.channel_backoff[channel_id]
+        except Exception:
+            pass
+    
+    @cache_cleanup.before_loop
+    async def before_cache_cleanup(self):
+        await self.bot.wait_until_ready()
+    
+    def _take_batch(self, entries: deque) -> List[Dict]:
+        """Pop up to 10 entries that fit Discord's 6000-character per-message embed budget"""
+        batch = []
+        total = 0
+        limit = self._embeds_per_message()
+        while entries and len(batch) < limit:
+            size = len(entries[0]['embed'])
+            if batch and total + size > 6000:
+                break
+            batch.append(entries.popleft())
+            total += size
+        return batch
+    
+    async def send_channel_batch(self, channel_id: int, queue: Dict):
+        """Send one packed message for a channel, backing off when rate limited"""
+        batch = self._take_batch(queue['entries'])
+        if not batch:
+            return
         
-        channel = self.get_log_channel(guild, log_type)
-        if channel:
-            await channel.send(embed=embed)
-            self.stats['logs_sent'] += 1
-    except discord.Forbidden:
-        self.stats['errors'] += 1
-    except Exception as e:
-        self.stats['errors'] += 1
-        print(f"[FastLogger] ❌ Error sending log: {e}")
+        embeds = []
+        for entry in batch:
+            embed = entry['embed']
+            if entry['count'] > 1:
+                # A rate-limited batch is re-queued and sent again: update the field in place
+                if 'occurrences_field' in entry:
+                    embed.set_field_at(entry['occurrences_field'], name="Occurrences",
+                                       value=f"×{entry['count']}", inline=True)
+                else:
+                    entry['occurrences_field'] = len(embed.fields)
+                    embed.add_field(name="Occurrences", value=f"×{entry['count']}", inline=True)
+            embeds.append(embed)
+        
+        started = time.monotonic()
+        try:
+            await queue['channel'].send(embeds=embeds)
+            self.stats['logs_sent'] += len(embeds)
+            self.stats['messages_sent'] += 1
+            
+            # discord.py sleeps through 429s inside send(); a slow send means
+            # the channel bucket is exhausted, so give it room before the next batch
+            elapsed = time.monotonic() - started
+            if elapsed > 1.0:
+                self.stats['rate_limited'] += 1
+                self.channel_backoff[channel_id] = time.monotonic() + elapsed
+        except discord.RateLimited as e:
+            self.stats['rate_limited'] += 1
+            self.channel_backoff[channel_id] = time.monotonic() + e.retry_after
+            queue['entries'].extendleft(reversed(batch))
+        except discord.Forbidden:
+            self.stats['errors'] += len(embeds)
+        except discord.HTTPException as e:
+            if e.status == 429:
+                self.stats['rate_limited'] += 1
+                self.channel_backoff[channel_id] = time.monotonic() + 5.0
+                queue['entries'].extendleft(reversed(batch))
+            else:
+                self.stats['errors'] += len(embeds)
+                print(f"[FastLogger] ❌ Error sending logs: {e}")
+        except Exception as e:
+            self.stats['errors'] += len(embeds)
+            print(f"[FastLogger] ❌ Error sending logs: {e}")
     
     # ==================== MESSAGE EVENTS ====================
     
@@ -620,13 +747,17 @@ async def send_log_entry(self, log_entry: Dict):
         )
         
         embed.add_field(name="Status", value="✅ ENABLED" if guild_config['enabled'] else "❌ DISABLED", inline=True)
-        embed.add_field(name="Queue Size", value=str(len(self.log_queue)), inline=True)
-        embed.add_field(name="Batch Size", value=str(self.config.get('batch_size', 5)), inline=True)
+        embed.add_field(name="Queue Size", value=f"{self.queue_depth()} ({len(self.channel_queues)} channels)", inline=True)
+        embed.add_field(name="Embeds / Message", value=str(self._embeds_per_message()), inline=True)
         
         embed.add_field(name="Performance", value="━" * 25, inline=False)
-        embed.add_field(name="Logs Sent", value=str(self.stats['logs_sent']), inline=True)
+        embed.add_field(name="Logs Sent", value=f"{self.stats['logs_sent']} in {self.stats['messages_sent']} messages", inline=True)
         embed.add_field(name="Logs Queued", value=str(self.stats['logs_queued']), inline=True)
         embed.add_field(name="Errors", value=str(self.stats['errors']), inline=True)
+        embed.add_field(name="Coalesced", value=str(self.stats['coalesced']), inline=True)
+        embed.add_field(name="Dropped", value=str(self.stats['dropped']), inline=True)
+        embed.add_field(name="Rate Limited", value=str(self.stats['rate_limited']), inline=True)
+        embed.add_field(name="Flush Interval", value=f"{self.batch_processor.seconds:.1f}s", inline=True)
         
         # Channel configuration
         channels_config = []
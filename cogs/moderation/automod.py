@@ -4,52 +4,115 @@ Coordinates between bot automod and Discord's native automod rules
 Centralized violation tracking and enforcement
 """
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from cogs.core.signal_bus import signal_bus, Signal, SignalType
+from cogs.core.message_pipeline import message_pipeline, PRIORITY_DEFAULT
+from cogs.core.segmented_journal import SegmentedJournal
 import json
 import os
+from collections import deque
 from datetime import datetime, timedelta
-import re
 from cogs.core.pst_timezone import get_now_pst
 
 CAPS_THRESHOLD = 0.7  # 70% caps
 EMOJI_SPAM_THRESHOLD = 5
 MENTION_SPAM_THRESHOLD = 5
-LINK_REGEX = r"https?://\S+"
+MAX_VIOLATIONS_PER_GUILD = 500
+JOURNAL_COMPACT_RATIO = 2  # Compact once the journal holds 2x the retained records
 
 class AutoModCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.violations_file = 'data/automod_violations.json'
+        self.violations_file = 'data/automod_violations.json'  # Legacy, migrated into the journal
         self.rules_file = 'data/automod_rules.json'
+        self.journal = SegmentedJournal('data/automod_journal')
+        self.guild_violations = {}  # guild_id -> deque of recent violations (oldest first)
+        self.user_violations = {}   # guild_id -> {user_id -> deque of that user's violations}
+        self.journal_records = 0    # Records on disk, compacted against the retained count
         self.discord_automod_cache = {}
         self.load_data()
+        self.commit_journal.start()
+        message_pipeline.register_stage('automod', self.inspect_message, priority=PRIORITY_DEFAULT)
+    
+    def cog_unload(self):
+        message_pipeline.unregister_stage('automod')
+        self.commit_journal.cancel()
+        self.journal.flush_sync()
     
     def load_data(self):
-        """Load violation and rule data"""
+        """Load rule data and rebuild the violation index from the journal"""
         os.makedirs('data', exist_ok=True)
         
-        if not os.path.exists(self.violations_file):
-            with open(self.violations_file, 'w') as f:
-                json.dump({}, f)
-        
         if not os.path.exists(self.rules_file):
             with open(self.rules_file, 'w') as f:
                 json.dump({}, f)
+        
+        for record in self.journal.replay():
+            self.journal_records += 1
+            self._index_violation(record['guild_id'], record)
+        
+        if os.path.exists(self.violations_file):
+            self._migrate_legacy_violations()
+    
+    def _migrate_legacy_violations(self):
+        """One-time import of the old read-modify-write violations.json"""
+        try:
+            with open(self.violations_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            data = {}
+        for guild_key, violations in data.items():
+            for violation in violations:
+                record = {'guild_id': int(guild_key), **violation}
+                self._index_violation(record['guild_id'], record)
+        self.journal.compact_sync(self._retained_records())
+        self.journal_records = self.retained_count()
+        os.replace(self.violations_file, f"{self.violations_file}.migrated")
+        print(f"[AutoMod] ✅ Migrated {self.journal_records} violations into the journal")
+    
+    def _index_violation(self, guild_id, violation):
+        """Add a violation to the per-guild and per-user indexes, evicting the oldest past the cap"""
+        records = self.guild_violations.setdefault(guild_id, deque())
+        by_user = self.user_violations.setdefault(guild_id, {})
+        records.append(violation)
+        by_user.setdefault(violation['user_id'], deque()).append(violation)
+        
+        if len(records) > MAX_VIOLATIONS_PER_GUILD:
+            oldest = records.popleft()
+            user_records = by_user.get(oldest['user_id'])
+            if user_records:
+                user_records.popleft()  # Per-user deques share the guild's order
+                if not user_records:
+                    del by_user[oldest['user_id']]
+    
+    def _retained_records(self):
+        for records in self.guild_violations.values():
+            yield from records
+    
+    def retained_count(self):
+        return sum(len(records) for records in self.guild_violations.values())
     
     def get_violations(self, guild_id):
         """Get violations for guild"""
-        with open(self.violations_file, 'r') as f:
-            data = json.load(f)
-        return data.get(str(guild_id), [])
+        return list(self.guild_violations.get(guild_id, ()))
     
-    def save_violations(self, guild_id, violations):
-        """Save violations"""
-        with open(self.violations_file, 'r') as f:
-            data = json.load(f)
-        data[str(guild_id)] = violations
-        with open(self.violations_file, 'w') as f:
-            json.dump(data, f, indent=2)
+    def get_user_violations(self, guild_id, user_id):
+        """Get one member's violations in a guild"""
+        return list(self.user_violations.get(guild_id, {}).get(user_id, ()))
+    
+    @tasks.loop(seconds=2)
+    async def commit_journal(self):
+        """Group-commit queued violations and compact once the journal outgrows the index"""
+        try:
+            pending = len(self.journal.pending)
+            await self.journal.flush()
+            self.journal_records += pending
+            retained = self.retained_count()
+            if self.journal_records > max(retained * JOURNAL_COMPACT_RATIO, 1000):
+                await self.journal.compact(list(self._retained_records()))
+                self.journal_records = retained
+        except Exception as e:
+            print(f"[AutoMod] ❌ Journal commit failed: {e}")
     
     def get_rules(self, guild_id):
         """Get automod rules for guild"""
@@ -96,28 +159,23 @@ class AutoModCog(commands.Cog):
             signal_type=SignalType.POLICY_VIOLATION,
             severity=severity,
             source='automod',
-            data={'violation': msg, 'author': str(author), 'channel': str(channel)},
-            confidence=0.90,
-            dedup_key=f'automod:{msg}:{author}'
+            data={'violation': msg, 'author': str(author), 'channel': str(channel),
+                  'confidence': 0.90, 'dedup_key': f'automod:{msg}:{author}'}
         ))
     
     def log_violation(self, guild_id, user_id, violation_type, severity, details):
-        """Log violation for tracking"""
-        violations = self.get_violations(guild_id)
-        
+        """Log violation for tracking (indexed now, journaled on the next group commit)"""
         violation = {
             'timestamp': get_now_pst().isoformat(),
+            'guild_id': guild_id,
             'user_id': user_id,
             'type': violation_type,
             'severity': severity,
             'details': details
         }
         
-        violations.append(violation)
-        
-        # Keep only last 500 per guild
-        violations = violations[-500:]
-        self.save_violations(guild_id, violations)
+        self._index_violation(guild_id, violation)
+        self.journal.append(violation)
     
     @commands.Cog.listener()
     async def on_ready(self):
@@ -162,64 +220,54 @@ class AutoModCog(commands.Cog):
             execution.channel
         )
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
-            return
-        
-        guild = message.guild
-        if not guild:
-            return
+    async def inspect_message(self, ctx):
+        """Message pipeline stage: caps, emoji, mention and link spam checks"""
+        guild = ctx.guild
         
         # Check caps lock spam
-        if len(message.content) > 10:
-            caps_count = sum(1 for c in message.content if c.isupper())
-            caps_ratio = caps_count / len(message.content)
-            if caps_ratio > CAPS_THRESHOLD:
-                self.log_violation(
-                    guild.id,
-                    message.author.id,
-                    'excessive_caps_lock',
-                    'low',
-                    {'message': message.content[:100]}
-                )
-                await self.emit_violation("excessive_caps_lock", "low", message.author, message.channel)
+        if len(ctx.content) > 10 and ctx.caps_ratio > CAPS_THRESHOLD:
+            self.log_violation(
+                guild.id,
+                ctx.author_id,
+                'excessive_caps_lock',
+                'low',
+                {'message': ctx.content[:100]}
+            )
+            await self.emit_violation("excessive_caps_lock", "low", ctx.author, ctx.channel)
         
         # Check emoji spam
-        emoji_count = sum(message.content.count(e) for e in ["🔥", "⚠️", "❌", "💀", "😂"])
-        if emoji_count > EMOJI_SPAM_THRESHOLD:
+        if ctx.emoji_count > EMOJI_SPAM_THRESHOLD:
             self.log_violation(
                 guild.id,
-                message.author.id,
+                ctx.author_id,
                 'emoji_spam',
                 'low',
-                {'emoji_count': emoji_count}
+                {'emoji_count': ctx.emoji_count}
             )
-            await self.emit_violation("emoji_spam", "low", message.author, message.channel)
+            await self.emit_violation("emoji_spam", "low", ctx.author, ctx.channel)
         
         # Check mention spam
-        mention_count = len(message.mentions)
-        if mention_count > MENTION_SPAM_THRESHOLD:
+        if ctx.mention_count > MENTION_SPAM_THRESHOLD:
             self.log_violation(
                 guild.id,
-                message.author.id,
+                ctx.author_id,
                 'mention_spam',
                 'medium',
-                {'mention_count': mention_count}
+                {'mention_count': ctx.mention_count}
             )
-            await self.emit_violation("mention_spam", "medium", message.author, message.channel)
+            await self.emit_violation("mention_spam", "medium", ctx.author, ctx.channel)
         
         # Check for excessive links
-        link_count = len(re.findall(LINK_REGEX, message.content))
+        link_count = len(ctx.urls)
         if link_count > 3:
             self.log_violation(
                 guild.id,
-                message.author.id,
+                ctx.author_id,
                 'link_spam',
                 'medium',
                 {'link_count': link_count}
             )
-            await self.emit_violation("link_spam", "medium", message.author, message.channel)
+            await self.emit_violation("link_spam", "medium", ctx.author, ctx.channel)
     
     @commands.command(name='automodrules')
     async def show_automod_rules_cmd(self, ctx):
@@ -258,7 +306,7 @@ class AutoModCog(commands.Cog):
     async def show_violations_cmd(self, ctx, days: int = 7):
         """Show recent automod violations"""
         guild = ctx.guild
-        violations = self.get_violations(guild.id)
+        violations = self.guild_violations.get(guild.id)
         
         if not violations:
             await ctx.send("✅ No violations recorded.")
@@ -287,9 +335,10 @@ class AutoModCog(commands.Cog):
         
         # Top violators
         user_counts = {}
-        for v in recent:
-            uid = v['user_id']
-            user_counts[uid] = user_counts.get(uid, 0) + 1
+        for uid, user_records in self.user_violations.get(guild.id, {}).items():
+            count = sum(1 for v in user_records if v['timestamp'] > cutoff)
+            if count:
+                user_counts[uid] = count
         
         embed.add_field(name="Top Violators", value="━" * 25, inline=False)
         for uid, count in sorted(user_counts.items(), key=lambda x: x[1], reverse=True)[:5]:
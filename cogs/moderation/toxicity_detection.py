@@ -1,25 +1,28 @@
 import discord
 from discord.ext import commands
+from cogs.core.message_pipeline import message_pipeline, PipelineAction, PRIORITY_CONTENT, delete_message
+from cogs.core.pattern_matcher import KeywordMatcher
 
 class ToxicityDetection(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         # Placeholder: In production, integrate with a real ML API or model
         self.toxic_words = ["hate", "idiot", "stupid", "kill", "racist"]
+        self.toxic_matcher = KeywordMatcher(self.toxic_words)
+        message_pipeline.register_stage('toxicity_detection', self.inspect_message, priority=PRIORITY_CONTENT)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
-            return
-        content = message.content.lower()
-        if any(word in content for word in self.toxic_words):
-            try:
-                await message.delete()
-            except Exception:
-                pass
-            staff_role = discord.utils.get(message.guild.roles, name="Staff")
+    def cog_unload(self):
+        message_pipeline.unregister_stage('toxicity_detection')
+
+    async def inspect_message(self, ctx):
+        """Message pipeline stage: remove messages containing toxic words"""
+        if self.toxic_matcher.search(ctx.text):
+            if not await delete_message(ctx.message):
+                return
+            staff_role = discord.utils.get(ctx.guild.roles, name="Staff")
             staff_ping = staff_role.mention if staff_role else "@here"
-            await message.channel.send(f"⚠️ {message.author.mention}, your message was removed for toxic language. {staff_ping}")
+            await ctx.channel.send(f"⚠️ {ctx.author.mention}, your message was removed for toxic language. {staff_ping}")
+            return PipelineAction.DELETED
 
 async def setup(bot):
     await bot.add_cog(ToxicityDetection(bot))
@@ -8,6 +8,7 @@ from discord.ext import commands
 from datetime import datetime
 from typing import Dict, List, Set
 from cogs.core.pst_timezone import get_now_pst
+from cogs.graph_engine.threat_graph import GraphCore
 
 class BlastRadiusAnalyzer(commands.Cog):
     """Analyze cascade failures and system dependencies"""
@@ -16,38 +17,28 @@ class BlastRadiusAnalyzer(commands.Cog):
         self.bot = bot
         # Define dependency graph: component -> [dependent components]
         self.dependency_graph = {
-            'signal_bus': ['threat_detector', 'incident_manager', 'compliance_monitor'],
+            'signal_bus': ['threat_detector', 'incident_manager', 'compliance_monitor', 'all_security_systems'],
             'data_manager': ['security_dashboard', 'audit_log_analyzer'],
             'threat_intel_hub': ['phishing_detector', 'ioc_analyzer'],
-            'signal_bus': ['all_security_systems'],
             'discord_api': ['all_cogs']
         }
+        self.graph = GraphCore()
+        for dependency, dependents in self.dependency_graph.items():
+            for dependent in dependents:
+                self.graph.add_link(dependency, dependent)
     
     def analyze_blast_radius(self, failed_component: str) -> Dict:
         """Analyze what would break if a component fails"""
-        affected = set()
-        to_process = [failed_component]
-        processed = set()
-        
-        while to_process:
-            current = to_process.pop(0)
-            if current in processed:
-                continue
-            
-            processed.add(current)
-            
-            # Find all dependents
-            for dependency, dependents in self.dependency_graph.items():
-                if current in dependents or dependency == current:
-                    affected.update(dependents)
-                    to_process.extend(dependents)
+        # Everything downstream of the failed component, however deep
+        reached = self.graph.reachable(failed_component, max_hops=len(self.graph))
+        affected = [name for name in reached if name != failed_component]
         
         return {
             'failed_component': failed_component,
-            'direct_dependents': self.dependency_graph.get(failed_component, []),
-            'cascade_affected': list(affected),
+            'direct_dependents': self.graph.successors(failed_component),
+            'cascade_affected': affected,
             'total_affected': len(affected),
-            'blast_radius_percentage': len(affected) / len(self.dependency_graph) * 100
+            'blast_radius_percentage': len(affected) / len(self.graph) * 100 if len(self.graph) else 0
         }
     
     def find_critical_nodes(self) -> List[str]:
@@ -68,13 +59,11 @@ class BlastRadiusAnalyzer(commands.Cog):
         
         # Traverse up the dependency tree
         for _ in range(10):  # Max depth
-            for dependency, dependents in self.dependency_graph.items():
-                if current in dependents:
-                    chain.append(dependency)
-                    current = dependency
-                    break
-            else:
+            parents = [p for p in self.graph.predecessors(current) if p not in chain]
+            if not parents:
                 break
+            current = parents[0]
+            chain.append(current)
         
         return chain
     
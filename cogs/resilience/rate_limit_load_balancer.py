@@ -7,6 +7,8 @@ import json
 import os
 from typing import List, Dict
 from cogs.core.pst_timezone import get_now_pst
+from cogs.core.message_pipeline import message_pipeline, PRIORITY_BLOCKLIST
+from cogs.core.rate_windows import rate_windows
 
 try:
     from cogs.core.feature_flags import flags
@@ -32,9 +34,17 @@ class RateLimitLoadBalancer(commands.Cog):
             "deferred_messages": []
         }
         self._load_data()
-        self.reset_counters.start()
+        self.load_rates = rate_windows.counter('load_balancer', window_seconds=60, top_k=0)
         self.evaluate_load.start()
         self.process_deferred.start()
+        # Count load ahead of detectors that may short-circuit the pipeline
+        message_pipeline.register_stage('rate_limit_load_balancer', self.count_message, priority=PRIORITY_BLOCKLIST - 5,
+                                        guild_only=False)
+
+    def cog_unload(self):
+        self.evaluate_load.cancel()
+        self.process_deferred.cancel()
+        message_pipeline.unregister_stage('rate_limit_load_balancer')
 
     def _load_data(self):
         if os.path.exists(self.data_file):
@@ -58,24 +68,22 @@ class RateLimitLoadBalancer(commands.Cog):
         self.data["deferred_messages"] = self.data["deferred_messages"][-200:]
         self._save_data()
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
-        if message.author.bot:
-            return
-        self.data["msg_count"] += 1
+    async def count_message(self, ctx):
+        """Message pipeline stage: count message load"""
+        self.load_rates.hit("messages")
 
     @commands.Cog.listener()
     async def on_command(self, ctx):
-        self.data["cmd_count"] += 1
+        self.load_rates.hit("commands")
 
-    @tasks.loop(minutes=1)
-    async def reset_counters(self):
-        self.data["msg_count"] = 0
-        self.data["cmd_count"] = 0
-        self._save_data()
+    def _refresh_counts(self):
+        """Copy the sliding one-minute rates into the persisted status fields"""
+        self.data["msg_count"] = self.load_rates.count("messages")
+        self.data["cmd_count"] = self.load_rates.count("commands")
 
     @tasks.loop(minutes=1)
     async def evaluate_load(self):
+        self._refresh_counts()
         msgs = self.data["msg_count"]
         cmds = self.data["cmd_count"]
         thresholds = self.data["thresholds"]
@@ -88,7 +96,7 @@ class RateLimitLoadBalancer(commands.Cog):
         if mode != self.data.get("mode"):
             self.data["mode"] = mode
             self._apply_degradation(mode)
-            self._save_data()
+        self._save_data()
 
     def _apply_degradation(self, mode: str):
         if not flags:
@@ -122,6 +130,7 @@ class RateLimitLoadBalancer(commands.Cog):
 
     @app_commands.command(name="loadbalancer_status", description="View load balancer status")
     async def loadbalancer_status(self, interaction: discord.Interaction):
+        self._refresh_counts()
         embed = discord.Embed(title="?? Load Balancer Status", color=discord.Color.orange())
         embed.add_field(name="Mode", value=self.data.get("mode"), inline=True)
         embed.add_field(name="Message Rate", value=str(self.data.get("msg_count")), inline=True)
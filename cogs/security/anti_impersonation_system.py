@@ -6,92 +6,394 @@ Part of Sentinel Security Operations Center
 
 import discord
 from discord.ext import commands
+import asyncio
 import json
 import os
+import re
+import time
+import unicodedata
+from collections import Counter
 from datetime import datetime
 from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Set, Tuple
+
+SIMILARITY_THRESHOLD = 0.8  # >80% skeleton match is suspicious
+SWEEP_BATCH_SIZE = 500       # Members checked between yields to the event loop
+CANDIDATE_LIMIT = 20         # Trigram candidates re-scored per lookup
+
+# Members with any of these permissions (or roles) are protected from impersonation
+PROTECTED_PERMISSIONS = ('administrator', 'manage_guild', 'manage_roles', 'ban_members',
+                         'kick_members', 'moderate_members', 'manage_messages')
+PROTECTED_ROLE_NAMES = {'owner', 'admin', 'administrator', 'moderator', 'mod', 'staff', 'trusted', 'verified staff'}
+
+# Visually confusable characters folded onto one ASCII representative (after casefold)
+CONFUSABLES = str.maketrans({
+    # Digits and symbols
+    '0': 'o', '1': 'l', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b', '9': 'g',
+    '@': 'a', '$': 's', '|': 'l', '!': 'l', 'i': 'l',
+    # Cyrillic
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'к': 'k', 'м': 'm', 'н': 'h', 'о': 'o', 'р': 'p',
+    'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'ѕ': 's', 'і': 'l', 'ї': 'l', 'ј': 'j', 'ԁ': 'd',
+    'ɡ': 'g', 'һ': 'h', 'ӏ': 'l', 'ԛ': 'q', 'ԝ': 'w',
+    # Greek
+    'α': 'a', 'β': 'b', 'ε': 'e', 'η': 'n', 'ι': 'l', 'κ': 'k', 'ν': 'v', 'ο': 'o', 'ρ': 'p',
+    'τ': 't', 'υ': 'u', 'χ': 'x', 'ω': 'w',
+    # Latin look-alikes
+    'ı': 'l', 'ł': 'l', 'ø': 'o', 'đ': 'd', 'ħ': 'h', 'ß': 'b',
+})
+MULTI_CHAR_CONFUSABLES = (('rn', 'm'), ('vv', 'w'), ('cl', 'd'))
+NON_ALNUM_REGEX = re.compile(r'[\W_]+')
+
+
+def name_skeleton(name: str) -> str:
+    """Fold a display name to its confusable skeleton: 'Аdm1n_Ѕam' and 'admin sam' collide"""
+    text = name or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = NON_ALNUM_REGEX.sub('', text.casefold().translate(CONFUSABLES))
+    for sequence, replacement in MULTI_CHAR_CONFUSABLES:
+        text = text.replace(sequence, replacement)
+    return text
+
+
+def trigrams(skeleton: str) -> Set[str]:
+    padded = f"  {skeleton} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """Trigram index over member name skeletons with incremental add/remove"""
+
+    def __init__(self):
+        self.entries: Dict[int, Tuple[str, ...]] = {}  # member_id -> skeletons
+        self.labels: Dict[int, str] = {}               # member_id -> name shown in alerts
+        self.postings: Dict[str, Set[int]] = {}        # trigram -> member ids
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, member_id: int) -> bool:
+        return member_id in self.entries
+
+    def add(self, member_id: int, names: Iterable[str], label: str):
+        self.remove(member_id)
+        skeletons = tuple(dict.fromkeys(s for s in map(name_skeleton, names) if s))
+        if not skeletons:
+            return
+        self.entries[member_id] = skeletons
+        self.labels[member_id] = label
+        for gram in set().union(*(trigrams(s) for s in skeletons)):
+            self.postings.setdefault(gram, set()).add(member_id)
+
+    def remove(self, member_id: int):
+        skeletons = self.entries.pop(member_id, None)
+        self.labels.pop(member_id, None)
+        if not skeletons:
+            return
+        for gram in set().union(*(trigrams(s) for s in skeletons)):
+            members = self.postings.get(gram)
+            if members is not None:
+                members.discard(member_id)
+                if not members:
+                    del self.postings[gram]
+
+    def search(self, name: str, limit: int = 5, min_score: float = SIMILARITY_THRESHOLD,
+               exclude: int = None, skeleton: str = None) -> List[Tuple[int, str, float]]:
+        """Best (member_id, label, score) matches for `name`, highest score first"""
+        skeleton = skeleton if skeleton is not None else name_skeleton(name)
+        if not skeleton:
+            return []
+        query_grams = trigrams(skeleton)
+        shared = Counter()
+        for gram in query_grams:
+            members = self.postings.get(gram)
+            if members:
+                shared.update(members)
+        shared.pop(exclude, None)
+        if not shared:
+            return []
+
+        # One matcher per query: the query's lookup tables are built once, and the exact
+        # upper bounds reject most candidates before the full ratio is computed
+        matcher = SequenceMatcher(None, autojunk=False)
+        matcher.set_seq2(skeleton)
+        results = []
+        for member_id, _ in shared.most_common(CANDIDATE_LIMIT):
+            score = 0.0
+            for candidate in self.entries[member_id]:
+                matcher.set_seq1(candidate)
+                if matcher.real_quick_ratio() < min_score or matcher.quick_ratio() < min_score:
+                    continue
+                score = max(score, matcher.ratio())
+            if score >= min_score:
+                results.append((member_id, self.labels[member_id], round(score, 3)))
+        results.sort(key=lambda r: r[2], reverse=True)
+        return results[:limit]
+
 
 class AntiImpersonationSystem(commands.Cog):
     """Detect and prevent impersonation attacks"""
-    
+
     def __init__(self, bot):
         self.bot = bot
         self.imperson_file = 'data/anti_impersonation.json'
+        self.config = {}  # guild_id -> {'index_everyone': bool, 'threshold': float}
+        self.protected_indexes: Dict[int, NameIndex] = {}  # guild_id -> staff / high-trust names
+        self.member_indexes: Dict[int, NameIndex] = {}     # guild_id -> everyone (opt-in)
         self.load_imperson_data()
-    
+
     def load_imperson_data(self):
         os.makedirs('data', exist_ok=True)
         if not os.path.exists(self.imperson_file):
             with open(self.imperson_file, 'w') as f:
                 json.dump({}, f)
-    
+        try:
+            with open(self.imperson_file, 'r') as f:
+                self.config = {int(k): v for k, v in json.load(f).items()}
+        except (OSError, ValueError, AttributeError):
+            self.config = {}
+
+    def save_imperson_data(self):
+        with open(self.imperson_file, 'w') as f:
+            json.dump({str(k): v for k, v in self.config.items()}, f, indent=2)
+
     def similarity(self, a, b):
-        """Calculate string similarity"""
-        return SequenceMatcher(None, a.lower(), b.lower()).ratio()
-    
+        """Calculate confusable-aware string similarity"""
+        return SequenceMatcher(None, name_skeleton(a), name_skeleton(b)).ratio()
+
+    def threshold(self, guild_id: int) -> float:
+        return self.config.get(guild_id, {}).get('threshold', SIMILARITY_THRESHOLD)
+
+    def index_everyone(self, guild_id: int) -> bool:
+        return self.config.get(guild_id, {}).get('index_everyone', False)
+
+    @staticmethod
+    def is_protected(member) -> bool:
+        """Staff and high-trust members whose names are worth impersonating"""
+        if member.bot:
+            return False
+        if member.guild.owner_id == member.id:
+            return True
+        permissions = member.guild_permissions
+        if any(getattr(permissions, name, False) for name in PROTECTED_PERMISSIONS):
+            return True
+        return any(role.name.lower() in PROTECTED_ROLE_NAMES for role in member.roles)
+
+    @staticmethod
+    def member_names(member) -> Tuple[str, ...]:
+        return tuple(n for n in (member.name, getattr(member, 'global_name', None), member.display_name) if n)
+
+    def _build_indexes(self, guild):
+        protected, everyone = NameIndex(), NameIndex() if self.index_everyone(guild.id) else None
+        for member in guild.members:
+            if member.bot:
+                continue
+            names = self.member_names(member)
+            if self.is_protected(member):
+                protected.add(member.id, names, member.display_name)
+            if everyone is not None:
+                everyone.add(member.id, names, member.display_name)
+        self.protected_indexes[guild.id] = protected
+        if everyone is not None:
+            self.member_indexes[guild.id] = everyone
+        else:
+            self.member_indexes.pop(guild.id, None)
+        return protected
+
+    def get_index(self, guild) -> NameIndex:
+        """Protected-name index for a guild, built once from the member list"""
+        index = self.protected_indexes.get(guild.id)
+        if index is None:
+            index = self._build_indexes(guild)
+        return index
+
+    def update_member(self, member):
+        """Re-index one member after a join, rename or role change"""
+        protected = self.get_index(member.guild)
+        if member.bot:
+            return
+        names = self.member_names(member)
+        if self.is_protected(member):
+            protected.add(member.id, names, member.display_name)
+        else:
+            protected.remove(member.id)
+        everyone = self.member_indexes.get(member.guild.id)
+        if everyone is not None:
+            everyone.add(member.id, names, member.display_name)
+
+    def remove_member(self, guild_id: int, member_id: int):
+        for indexes in (self.protected_indexes, self.member_indexes):
+            index = indexes.get(guild_id)
+            if index is not None:
+                index.remove(member_id)
+
+    def find_impersonation(self, member, limit: int = 3) -> List[Tuple[int, str, float]]:
+        """Protected (and optionally all) members whose names this member resembles"""
+        guild_id = member.guild.id
+        threshold = self.threshold(guild_id)
+        indexes = [self.get_index(member.guild)]
+        if guild_id in self.member_indexes:
+            indexes.append(self.member_indexes[guild_id])
+        best: Dict[int, Tuple[int, str, float]] = {}
+        for name in self.member_names(member):
+            skeleton = name_skeleton(name)
+            for index in indexes:
+                for match in index.search(name, limit, threshold, exclude=member.id, skeleton=skeleton):
+                    if match[0] not in best or match[2] > best[match[0]][2]:
+                        best[match[0]] = match
+        return sorted(best.values(), key=lambda m: m[2], reverse=True)[:limit]
+
+    async def check_member(self, member, reason: str):
+        """Flag a member whose name resembles a protected member"""
+        if member.bot or self.is_protected(member):
+            return
+        matches = self.find_impersonation(member)
+        if not matches:
+            return
+        _, similar_to, score = matches[0]
+
+        # Log suspicious activity
+        embed = discord.Embed(
+            title="⚠️ Suspicious Name Change Detected" if reason != "join" else "⚠️ Suspicious Member Joined",
+            description="Possible impersonation attempt",
+            color=discord.Color.orange()
+        )
+
+        embed.add_field(name="User", value=member.mention, inline=True)
+        embed.add_field(name="New Name", value=member.display_name, inline=True)
+        embed.add_field(name="Similar to", value=similar_to, inline=True)
+        embed.add_field(name="Similarity", value=f"{score:.0%}", inline=True)
+        embed.add_field(name="Trigger", value=reason, inline=True)
+        embed.add_field(name="Action", value="⚠️ Flagged for review", inline=False)
+
+        # Send to mod channel
+        mod_channel = discord.utils.get(member.guild.text_channels, name="mod-logs")
+        if mod_channel:
+            try:
+                await mod_channel.send(embed=embed)
+            except:
+                pass
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        """Index new members and check their names"""
+        self.update_member(member)
+        await self.check_member(member, "join")
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.remove_member(member.guild.id, member.id)
+
     @commands.Cog.listener()
     async def on_member_update(self, before, after):
-        """Monitor for impersonation attempts"""
-        if before.name == after.name:
+        """Monitor nickname and role changes"""
+        if before.display_name == after.display_name and before.roles == after.roles:
             return
-        
-        guild = after.guild
-        
-        # Check if new name is similar to admin/moderator names
-        suspicious = False
-        similar_to = None
-        
-        for member in guild.members:
-            if member.id == after.id:
-                continue
-            if member.bot:
+        self.update_member(after)
+        if before.display_name != after.display_name:
+            await self.check_member(after, "nickname change")
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before, after):
+        """Monitor username changes across every shared guild"""
+        if before.name == after.name and getattr(before, 'global_name', None) == getattr(after, 'global_name', None):
+            return
+        for guild in self.bot.guilds:
+            member = guild.get_member(after.id)
+            if member is None:
                 continue
-            
-            # Check similarity (>80% match is suspicious)
-            if self.similarity(after.name, member.name) > 0.8:
-                suspicious = True
-                similar_to = member.name
-                break
-        
-        if suspicious and similar_to:
-            # Log suspicious activity
-            embed = discord.Embed(
-                title="⚠️ Suspicious Name Change Detected",
-                description="Possible impersonation attempt",
-                color=discord.Color.orange()
-            )
-            
-            embed.add_field(name="User", value=after.mention, inline=True)
-            embed.add_field(name="New Name", value=after.name, inline=True)
-            embed.add_field(name="Similar to", value=similar_to, inline=True)
-            embed.add_field(name="Similarity", value="80%+", inline=True)
-            embed.add_field(name="Action", value="⚠️ Flagged for review", inline=False)
-            
-            # Send to mod channel
-            mod_channel = discord.utils.get(guild.text_channels, name="mod-logs")
-            if mod_channel:
-                try:
-                    await mod_channel.send(embed=embed)
-                except:
-                    pass
-    
+            self.update_member(member)
+            await self.check_member(member, "username change")
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.protected_indexes.pop(guild.id, None)
+        self.member_indexes.pop(guild.id, None)
+
+    async def sweep_guild(self, guild) -> List[Tuple[discord.Member, str, float]]:
+        """Check every member against the protected index in one batched pass"""
+        protected = self.get_index(guild)
+        threshold = self.threshold(guild.id)
+        memo: Dict[str, List[Tuple[int, str, float]]] = {}  # name -> matches (names repeat across members)
+        flagged = []
+        for i, member in enumerate(guild.members, 1):
+            if not member.bot and member.id not in protected:
+                best = None
+                for name in set(self.member_names(member)):
+                    if name not in memo:
+                        memo[name] = protected.search(name, 2, threshold)
+                    for match_id, label, score in memo[name]:
+                        if match_id != member.id and (best is None or score > best[2]):
+                            best = (member, label, score)
+                if best:
+                    flagged.append(best)
+            if i % SWEEP_BATCH_SIZE == 0:
+                await asyncio.sleep(0)
+        flagged.sort(key=lambda f: f[2], reverse=True)
+        return flagged
+
     @commands.command(name='impersonation_check')
     @commands.has_permissions(administrator=True)
     async def impersonation_check(self, ctx):
-        """Check anti-impersonation status"""
+        """Sweep the whole guild for members impersonating staff"""
+        started = time.perf_counter()
+        flagged = await self.sweep_guild(ctx.guild)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
         embed = discord.Embed(
-            title="🛡️ Anti-Impersonation Status",
-            description="Impersonation detection active",
-            color=discord.Color.blue()
+            title="🛡️ Anti-Impersonation Sweep",
+            description=f"Checked {ctx.guild.member_count or len(ctx.guild.members)} members in {elapsed_ms:.0f}ms",
+            color=discord.Color.orange() if flagged else discord.Color.green()
         )
-        
+
         embed.add_field(name="Status", value="✅ ACTIVE", inline=True)
-        embed.add_field(name="Detection Method", value="String similarity analysis", inline=True)
-        embed.add_field(name="Threshold", value="80% similarity", inline=True)
-        embed.add_field(name="Monitoring", value="Username changes", inline=False)
-        embed.add_field(name="Action", value="Flag and log suspicious changes", inline=False)
-        
+        embed.add_field(name="Protected Names", value=str(len(self.get_index(ctx.guild))), inline=True)
+        embed.add_field(name="Threshold", value=f"{self.threshold(ctx.guild.id):.0%} similarity", inline=True)
+        embed.add_field(name="Detection Method", value="Confusable skeletons + trigram index", inline=True)
+        embed.add_field(name="Index Everyone", value="Yes" if self.index_everyone(ctx.guild.id) else "No", inline=True)
+        embed.add_field(name="Flagged", value=str(len(flagged)), inline=True)
+
+        if flagged:
+            embed.add_field(
+                name="Suspicious Members",
+                value="\n".join(
+                    f"{member.mention} ≈ **{label}** ({score:.0%})" for member, label, score in flagged[:15]
+                )[:1024],
+                inline=False
+            )
+
         await ctx.send(embed=embed)
 
+    @commands.command(name='impersonation_lookup')
+    @commands.has_permissions(manage_messages=True)
+    async def impersonation_lookup(self, ctx, *, name: str):
+        """Show which protected members a name resembles"""
+        started = time.perf_counter()
+        index = self.get_index(ctx.guild)
+        matches = index.search(name, 5, min_score=0.5)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        embed = discord.Embed(
+            title="🔎 Impersonation Lookup",
+            description=f"`{name}` → skeleton `{name_skeleton(name) or '—'}` ({elapsed_ms:.1f}ms)",
+            color=discord.Color.blue()
+        )
+        embed.add_field(
+            name="Closest Protected Names",
+            value="\n".join(f"**{label}** — {score:.0%}" for _, label, score in matches) or "None",
+            inline=False
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command(name='impersonation_everyone')
+    @commands.has_permissions(administrator=True)
+    async def impersonation_everyone(self, ctx, enabled: bool):
+        """Also index every member's name, not just staff"""
+        self.config.setdefault(ctx.guild.id, {})['index_everyone'] = enabled
+        self.save_imperson_data()
+        self._build_indexes(ctx.guild)
+        await ctx.send(f"✅ Everyone-index {'enabled' if enabled else 'disabled'}")
+
 async def setup(bot):
     await bot.add_cog(AntiImpersonationSystem(bot))
@@ -1,7 +1,8 @@
 import discord
 from discord.ext import commands
-import re
 from cogs.core.signal_bus import signal_bus, Signal, SignalType
+from cogs.core.message_pipeline import message_pipeline, PipelineAction, PRIORITY_BLOCKLIST, delete_message
+from cogs.core.pattern_matcher import DomainMatcher
 
 # Example list of known phishing domains (expand with real data or use a threat feed)
 PHISHING_DOMAINS = [
@@ -12,38 +13,42 @@ PHISHING_DOMAINS = [
     "gift-discord.com"
 ]
 
-PHISHING_REGEX = re.compile(r"https?://([\w.-]+)")
-
 class AntiPhishing(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # Suffix-aware: subdomains of a listed domain match, look-alike prefixes do not
+        self.domain_matcher = DomainMatcher(PHISHING_DOMAINS)
+        message_pipeline.register_stage('anti_phishing', self.inspect_message, priority=PRIORITY_BLOCKLIST,
+                                        guild_only=False)
+    
+    def cog_unload(self):
+        message_pipeline.unregister_stage('anti_phishing')
     
+    def add_phishing_domains(self, domains) -> int:
+        """Extend the blocklist (e.g. from a threat feed); returns how many were new"""
+        return self.domain_matcher.add(domains)
+
+    def remove_phishing_domains(self, domains):
+        self.domain_matcher.remove(domains)
+
     async def emit_threat_signal(self, url: str):
         """Emit threat detected signal for phishing"""
         await signal_bus.emit(Signal(
             signal_type=SignalType.THREAT_DETECTED,
             severity='critical',
             source='anti_phishing',
-            data={'phishing_url': url},
-            confidence=0.98,
-            dedup_key=f'phishing:{url}'
+            data={'phishing_url': url, 'confidence': 0.98, 'dedup_key': f'phishing:{url}'}
         ))
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
-            return
-        urls = PHISHING_REGEX.findall(message.content)
-        for url in urls:
-            for domain in PHISHING_DOMAINS:
-                if domain in url:
-                    try:
-                        await message.delete()
-                    except Exception:
-                        pass
-                    await self.emit_threat_signal(url)
-                    await message.channel.send(f"⚠️ {message.author.mention}, phishing link detected and removed.")
+    async def inspect_message(self, ctx):
+        """Message pipeline stage: remove messages linking to phishing domains"""
+        for host in ctx.domains:
+            if self.domain_matcher.match(host):
+                await self.emit_threat_signal(host)
+                if not await delete_message(ctx.message):
                     return
+                await ctx.channel.send(f"⚠️ {ctx.author.mention}, phishing link detected and removed.")
+                return PipelineAction.DELETED
 
 async def setup(bot):
     await bot.add_cog(AntiPhishing(bot))
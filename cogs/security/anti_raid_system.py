@@ -8,9 +8,11 @@ import discord
 from discord.ext import commands
 import json
 import os
-from datetime import datetime, timedelta
-from collections import defaultdict
 from cogs.core.pst_timezone import get_now_pst
+from cogs.core.rate_windows import rate_windows
+
+RAID_WINDOW_SECONDS = 10
+RAID_THRESHOLD = 10  # More than this many joins in the window
 
 class AntiRaidSystem(commands.Cog):
     """Detect and prevent raid attacks"""
@@ -18,8 +20,7 @@ class AntiRaidSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.raid_file = 'data/anti_raid.json'
-        self.join_cache = defaultdict(list)
-        self.ban_cache = defaultdict(list)
+        self.join_rates = rate_windows.counter('anti_raid_joins', window_seconds=60)
         self.load_raid_data()
     
     def load_raid_data(self):
@@ -32,24 +33,12 @@ class AntiRaidSystem(commands.Cog):
     async def on_member_join(self, member):
         """Monitor for mass joins (raid)"""
         guild = member.guild
-        guild_key = str(guild.id)
         now = get_now_pst()
         
-        self.join_cache[guild_key].append(now)
-        
-        # Clean old joins (older than 1 minute)
-        self.join_cache[guild_key] = [
-            join_time for join_time in self.join_cache[guild_key]
-            if (now - join_time).total_seconds() < 60
-        ]
-        
         # Check for raid pattern: more than 10 joins in 10 seconds
-        recent_joins = [
-            join_time for join_time in self.join_cache[guild_key]
-            if (now - join_time).total_seconds() < 10
-        ]
+        recent_joins = self.join_rates.hit_and_count(guild.id, RAID_WINDOW_SECONDS)
         
-        if len(recent_joins) > 10:
+        if recent_joins > RAID_THRESHOLD:
             # Raid detected
             embed = discord.Embed(
                 title="🚨 RAID DETECTED!",
@@ -57,7 +46,7 @@ class AntiRaidSystem(commands.Cog):
                 color=discord.Color.red()
             )
             embed.add_field(name="Alert Type", value="🔴 CRITICAL", inline=True)
-            embed.add_field(name="Joins in 10s", value=str(len(recent_joins)), inline=True)
+            embed.add_field(name="Joins in 10s", value=str(recent_joins), inline=True)
             embed.add_field(name="Timestamp", value=now.strftime('%H:%M:%S'), inline=True)
             embed.add_field(name="Action", value="⚠️ Manual review recommended", inline=False)
             
@@ -73,8 +62,6 @@ class AntiRaidSystem(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def raid_check(self, ctx):
         """Check raid detection status"""
-        guild_key = str(ctx.guild.id)
-        
         embed = discord.Embed(
             title="📊 Anti-Raid Status",
             description="Raid detection system active",
@@ -82,7 +69,7 @@ class AntiRaidSystem(commands.Cog):
         )
         embed.add_field(name="Status", value="✅ ACTIVE", inline=True)
         embed.add_field(name="Threshold", value="10 joins/10 seconds", inline=True)
-        embed.add_field(name="Recent Joins", value=str(len(self.join_cache.get(guild_key, []))), inline=True)
+        embed.add_field(name="Recent Joins", value=str(self.join_rates.count(ctx.guild.id)), inline=True)
         embed.add_field(name="Detection Method", value="Real-time join monitoring", inline=False)
         embed.add_field(name="Alert Channels", value="mod-logs, alerts", inline=False)
         
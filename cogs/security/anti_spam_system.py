@@ -8,9 +8,11 @@ import discord
 from discord.ext import commands
 import json
 import os
-from datetime import datetime, timedelta
-from collections import defaultdict
-from cogs.core.pst_timezone import get_now_pst
+from cogs.core.message_pipeline import message_pipeline, PipelineAction, PRIORITY_BLOCKLIST, delete_message
+from cogs.core.rate_windows import rate_windows
+
+SPAM_WINDOW_SECONDS = 10
+SPAM_THRESHOLD = 10  # More than this many messages in the window
 
 class AntiSpamSystem(commands.Cog):
     """Detect and prevent spam messages"""
@@ -18,8 +20,12 @@ class AntiSpamSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.spam_file = 'data/anti_spam.json'
-        self.message_cache = defaultdict(list)
+        self.message_rates = rate_windows.counter('anti_spam_messages', window_seconds=SPAM_WINDOW_SECONDS)
         self.load_spam_data()
+        message_pipeline.register_stage('anti_spam_system', self.inspect_message, priority=PRIORITY_BLOCKLIST)
+    
+    def cog_unload(self):
+        message_pipeline.unregister_stage('anti_spam_system')
     
     def load_spam_data(self):
         os.makedirs('data', exist_ok=True)
@@ -27,46 +33,31 @@ class AntiSpamSystem(commands.Cog):
             with open(self.spam_file, 'w') as f:
                 json.dump({}, f)
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Monitor for spam"""
-        if message.author.bot or not message.guild:
-            return
-        
-        # Track messages per user
-        user_key = f"{message.guild.id}_{message.author.id}"
-        now = get_now_pst()
-        
-        self.message_cache[user_key].append(now)
-        
-        # Clean old messages (older than 1 minute)
-        self.message_cache[user_key] = [
-            msg_time for msg_time in self.message_cache[user_key]
-            if (now - msg_time).total_seconds() < 60
-        ]
+    async def inspect_message(self, ctx):
+        """Message pipeline stage: monitor for spam"""
+        message = ctx.message
         
-        # Check for spam (more than 10 messages in 10 seconds)
-        recent = [
-            msg_time for msg_time in self.message_cache[user_key]
-            if (now - msg_time).total_seconds() < 10
-        ]
+        # Track messages per user; check for spam (more than 10 messages in 10 seconds)
+        recent = self.message_rates.hit_and_count((ctx.guild_id, ctx.author_id))
         
-        if len(recent) > 10:
+        if recent > SPAM_THRESHOLD:
             # Spam detected
+            if not await delete_message(message):
+                return
             try:
-                await message.delete()
                 embed = discord.Embed(
                     title="🚫 Spam Detected",
                     description=f"User: {message.author.mention}\nReason: Sending messages too fast",
                     color=discord.Color.red()
                 )
-                embed.add_field(name="Messages in 10s", value=str(len(recent)), inline=True)
+                embed.add_field(name="Messages in 10s", value=str(recent), inline=True)
                 embed.add_field(name="Action", value="Message deleted", inline=True)
                 
                 if message.channel.permissions_for(message.guild.me).send_messages:
                     await message.channel.send(embed=embed, delete_after=5)
             except:
                 pass
+            return PipelineAction.DELETED
     
     @commands.command(name='spam_check')
     @commands.has_permissions(administrator=True)
@@ -80,7 +71,7 @@ class AntiSpamSystem(commands.Cog):
         embed.add_field(name="Status", value="✅ ACTIVE", inline=True)
         embed.add_field(name="Threshold", value="10 messages/10 seconds", inline=True)
         embed.add_field(name="Action", value="Auto-delete + warn", inline=True)
-        embed.add_field(name="Coverage", value=f"Monitoring {len(self.message_cache)} users", inline=False)
+        embed.add_field(name="Coverage", value=f"Monitoring {len(self.message_rates.keys)} active users", inline=False)
         
         await ctx.send(embed=embed)
 
@@ -4,14 +4,156 @@ Supports keywords, regex patterns, users, domains with custom actions
 """
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
+import asyncio
+import functools
 import json
+import multiprocessing
 import os
 import re
+import threading
+from collections import deque
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict
 from cogs.core.pst_timezone import get_now_pst
+from cogs.core.message_pipeline import message_pipeline, PipelineAction, PRIORITY_CONTENT, delete_message
+from cogs.core.pattern_matcher import KeywordMatcher
+
+REGEX_TIME_BUDGET = 0.25      # Seconds an admin regex may run per message
+REGEX_MAX_TIMEOUTS = 3        # Timeouts before a regex rule is disabled
+VIOLATION_LOG_KEEP = 10000    # Violations kept in memory / after compaction
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_rule_regex(pattern: str):
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _regex_matches(pattern: str, content: str) -> bool:
+    """Runs in the regex worker process"""
+    return _compile_rule_regex(pattern).search(content) is not None
+
+
+def _regex_worker_main(conn):
+    """Regex worker process: answer (pattern, content) requests until the pipe closes"""
+    while True:
+        try:
+            pattern, content = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            conn.send(_regex_matches(pattern, content))
+        except re.error as e:
+            conn.send(ValueError(f"invalid regex: {e}"))
+
+
+class RegexWorker:
+    """One child process that evaluates admin regexes, one call at a time
+
+    Calls queue on the event loop rather than inside the process, so the time budget
+    covers only the regex actually running and a timeout is charged to that rule.
+    `re` cannot be interrupted, so a call over budget terminates the process; the
+    next call starts a fresh one (start-up is not billed to the budget).
+    """
+
+    def __init__(self):
+        self.process: Optional[multiprocessing.Process] = None
+        self.conn = None
+        self._queue = asyncio.Lock()        # Callers wait here, outside the budget
+        self._io_lock = threading.Lock()    # Guards the pipe if a waiting caller is cancelled
+
+    def _start(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_regex_worker_main, args=(child_conn,),
+                                               name='automod-regex', daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.conn.send(('', ''))  # Wait for the process to come up before any budget starts
+        self.conn.recv()
+
+    def _call(self, pattern: str, content: str, budget: float) -> Optional[bool]:
+        """Executor thread: one request; None when it ran past `budget`"""
+        with self._io_lock:
+            try:
+                if self.process is None or not self.process.is_alive():
+                    self._start()
+                self.conn.send((pattern, content))
+                if not self.conn.poll(budget):
+                    self.stop()
+                    return None
+                result = self.conn.recv()
+            except Exception:
+                self.stop()
+                raise
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def search(self, pattern: str, content: str, budget: float) -> Optional[bool]:
+        async with self._queue:
+            return await asyncio.get_running_loop().run_in_executor(None, self._call, pattern, content, budget)
+
+    def stop(self):
+        process, conn = self.process, self.conn
+        self.process = self.conn = None
+        if process is not None and process.is_alive():
+            process.terminate()
+            process.join(timeout=1)
+        if conn is not None:
+            conn.close()
+
+
+class RuleProgram:
+    """Compiled form of one guild's enabled rules, rebuilt when the rules change
+
+    Keyword and domain rules share one Aho-Corasick matcher, user rules become a
+    frozenset lookup and regexes are validated once. The earliest rule in the list
+    still wins when several match.
+    """
+
+    def __init__(self, rules: List[Dict]):
+        self.rules = [rule for rule in rules if rule.get('enabled')]
+        self.literal_index: Dict[str, int] = {}   # Casefolded literal -> rule index
+        self.user_index: Dict[int, int] = {}      # Mentioned user id -> rule index
+        self.regexes: List[tuple] = []            # (rule index, pattern) in rule order
+
+        for i, rule in enumerate(self.rules):
+            rule_type, pattern = rule['type'], rule['pattern']
+            if rule_type in ('keyword', 'domain'):
+                literal = pattern.casefold().strip()
+                if literal:
+                    self.literal_index.setdefault(literal, i)
+            elif rule_type == 'regex':
+                try:
+                    _compile_rule_regex(pattern)
+                except re.error:
+                    continue
+                self.regexes.append((i, pattern))
+            elif rule_type == 'user':
+                try:
+                    self.user_index.setdefault(int(pattern), i)
+                except ValueError:
+                    continue
+
+        self.matcher = KeywordMatcher(self.literal_index) if self.literal_index else None
+        self.user_ids = frozenset(self.user_index)
+
+    def match_static(self, ctx) -> Optional[int]:
+        """Index of the first keyword/domain/user rule hit, without touching regexes"""
+        best = None
+        if self.matcher is not None:
+            for _, literal in self.matcher.iter_matches(ctx.text):
+                index = self.literal_index[literal]
+                if best is None or index < best:
+                    best = index
+        for user_id in self.user_ids & ctx.mention_ids:
+            index = self.user_index[user_id]
+            if best is None or index < best:
+                best = index
+        return best
+
 
 class CustomAutomod(commands.Cog):
     """Create and manage custom automod rules"""
@@ -19,31 +161,116 @@ class CustomAutomod(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.data_file = "data/custom_automod_rules.json"
+        self.violations_file = "data/custom_automod_violations.jsonl"  # Append-only log
         self.rules = {}  # guild_id -> [rules]
-        self.violations = []  # Track violations
+        self.programs: Dict[str, RuleProgram] = {}  # guild_id -> compiled rules
+        self.violations = deque(maxlen=VIOLATION_LOG_KEEP)  # Recent violations (tail of the log)
+        self._rules_dirty = False
+        self.regex_worker = RegexWorker()
         self.load_data()
+        self.flush_rules.start()
+        message_pipeline.register_stage('custom_automod_rules', self.inspect_message, priority=PRIORITY_CONTENT)
+    
+    def cog_unload(self):
+        message_pipeline.unregister_stage('custom_automod_rules')
+        self.flush_rules.cancel()
+        if self._rules_dirty:
+            self.save_data()
+        self.regex_worker.stop()
     
     def load_data(self):
-        """Load custom rules"""
+        """Load custom rules and the tail of the violation log"""
         os.makedirs("data", exist_ok=True)
+        legacy_violations = []
         if os.path.exists(self.data_file):
             try:
                 with open(self.data_file, 'r') as f:
                     data = json.load(f)
                     self.rules = data.get('rules', {})
-                    self.violations = data.get('violations', [])
+                    legacy_violations = data.get('violations', [])
             except:
                 self.rules = {}
-                self.violations = []
+        
+        if os.path.exists(self.violations_file):
+            try:
+                line_count = 0
+                with open(self.violations_file, 'r') as f:
+                    for line in f:
+                        line_count += 1
+                        try:
+                            self.violations.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            continue  # Torn final line from a crash
+                if line_count > VIOLATION_LOG_KEEP * 2:
+                    self._compact_violation_log()
+            except OSError:
+                pass
+        
+        if legacy_violations:
+            # One-time move of violations out of the rules file
+            for violation in legacy_violations[-VIOLATION_LOG_KEEP:]:
+                self._append_violation(violation)
+            self.save_data()
+        
+        for guild_key in self.rules:
+            self.compile_rules(guild_key)
     
     def save_data(self):
-        """Save custom rules"""
+        """Save custom rules (violations live in the append-only log)"""
+        self._rules_dirty = False
         with open(self.data_file, 'w') as f:
             json.dump({
-                'rules': self.rules,
-                'violations': self.violations[-10000:]  # Keep last 10k
+                'rules': self.rules
             }, f, indent=2)
     
+    def compile_rules(self, guild_key: str):
+        """Rebuild one guild's rule program after rules are added, removed or disabled"""
+        rules = self.rules.get(guild_key)
+        if rules and any(rule['enabled'] for rule in rules):
+            self.programs[guild_key] = RuleProgram(rules)
+        else:
+            self.programs.pop(guild_key, None)
+    
+    def _append_violation(self, violation: Dict):
+        self.violations.append(violation)
+        with open(self.violations_file, 'a') as f:
+            f.write(json.dumps(violation, separators=(',', ':')) + "\n")
+    
+    def _compact_violation_log(self):
+        """Rewrite the log with only the retained tail"""
+        tmp_file = f"{self.violations_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            for violation in self.violations:
+                f.write(json.dumps(violation, separators=(',', ':')) + "\n")
+        os.replace(tmp_file, self.violations_file)
+    
+    @tasks.loop(seconds=30)
+    async def flush_rules(self):
+        """Persist violation counters without rewriting the file on every hit"""
+        if self._rules_dirty:
+            self.save_data()
+    
+    async def _regex_search(self, guild_key: str, rule: Dict, pattern: str, content: str) -> bool:
+        """Run an admin-supplied regex in the worker process under REGEX_TIME_BUDGET"""
+        try:
+            matched = await self.regex_worker.search(pattern, content, REGEX_TIME_BUDGET)
+        except Exception as e:
+            print(f"[CustomAutomod] ❌ Regex worker failed: {e}")
+            return False
+        if matched is not None:
+            return matched
+        
+        rule['regex_timeouts'] = rule.get('regex_timeouts', 0) + 1
+        print(f"[CustomAutomod] ⚠️ Regex rule {rule['id']} exceeded {REGEX_TIME_BUDGET}s "
+              f"({rule['regex_timeouts']}/{REGEX_MAX_TIMEOUTS})")
+        if rule['regex_timeouts'] >= REGEX_MAX_TIMEOUTS:
+            rule['enabled'] = False
+            rule['disabled_reason'] = 'regex exceeded time budget'
+            self.compile_rules(guild_key)
+            print(f"[CustomAutomod] ❌ Disabled regex rule {rule['id']}")
+        self._rules_dirty = True
+        return False
+    
     def add_rule(self, guild_id: int, rule_type: str, pattern: str, 
                  action: str, duration_minutes: Optional[int] = None) -> str:
         """Add custom rule"""
@@ -67,49 +294,34 @@ class CustomAutomod(commands.Cog):
         
         self.rules[guild_key].append(rule)
         self.save_data()
+        self.compile_rules(guild_key)
         return rule_id
     
-    def check_message(self, guild_id: int, message: discord.Message) -> Optional[Dict]:
-        """Check if message violates any rules"""
+    async def check_message(self, guild_id: int, ctx) -> Optional[Dict]:
+        """Check if a parsed message (MessageContext) violates any rules"""
         guild_key = str(guild_id)
+        program = self.programs.get(guild_key)
         
-        if guild_key not in self.rules:
+        if program is None:
             return None
         
-        for rule in self.rules[guild_key]:
-            if not rule['enabled']:
-                continue
-            
-            triggered = False
-            
-            if rule['type'] == 'keyword':
-                # Case-insensitive keyword match
-                if rule['pattern'].lower() in message.content.lower():
-                    triggered = True
-            
-            elif rule['type'] == 'regex':
-                # Regex pattern match
-                try:
-                    if re.search(rule['pattern'], message.content, re.IGNORECASE):
-                        triggered = True
-                except:
-                    pass
-            
-            elif rule['type'] == 'domain':
-                # Check if domain is in message
-                if rule['pattern'] in message.content:
-                    triggered = True
-            
-            elif rule['type'] == 'user':
-                # Check if user is mentioned
-                if int(rule['pattern']) in [m.id for m in message.mentions]:
-                    triggered = True
-            
-            if triggered:
-                rule['violations_count'] += 1
-                return rule
+        best = program.match_static(ctx)
+        
+        # Only regexes ranked ahead of the static hit can change the outcome
+        for index, pattern in program.regexes:
+            if best is not None and index > best:
+                break
+            if await self._regex_search(guild_key, program.rules[index], pattern, ctx.content):
+                best = index
+                break
         
-        return None
+        if best is None:
+            return None
+        
+        rule = program.rules[best]
+        rule['violations_count'] += 1
+        self._rules_dirty = True
+        return rule
     
     def log_violation(self, guild_id: int, rule_id: str, user_id: int, 
                       message_id: int, action_taken: str):
@@ -123,17 +335,14 @@ class CustomAutomod(commands.Cog):
             'action_taken': action_taken
         }
         
-        self.violations.append(violation)
-        self.save_data()
+        self._append_violation(violation)
     
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Check messages against custom rules"""
-        if message.author.bot or not message.guild:
-            return
+    async def inspect_message(self, ctx):
+        """Message pipeline stage: check messages against custom rules"""
+        message = ctx.message
         
         # Check rules
-        rule = self.check_message(message.guild.id, message)
+        rule = await self.check_message(ctx.guild_id, ctx)
         
         if not rule:
             return
@@ -142,8 +351,9 @@ class CustomAutomod(commands.Cog):
         action = rule['action']
         
         if action == 'delete':
+            if not await delete_message(message):
+                return
             try:
-                await message.delete()
                 self.log_violation(message.guild.id, rule['id'], message.author.id, 
                                   message.id, 'deleted')
                 
@@ -162,6 +372,7 @@ class CustomAutomod(commands.Cog):
                     await mod_channel.send(embed=embed, delete_after=60)
             except:
                 pass
+            return PipelineAction.DELETED
         
         elif action == 'warn':
             # Would integrate with infraction system
@@ -189,6 +400,17 @@ class CustomAutomod(commands.Cog):
             await ctx.send("❌ Invalid action. Use: warn, mute, kick, ban, delete")
             return
         
+        if rule_type == 'regex':
+            try:
+                re.compile(pattern, re.IGNORECASE)
+            except re.error as e:
+                await ctx.send(f"❌ Invalid regex: {e}")
+                return
+        
+        if rule_type == 'user' and not pattern.isdigit():
+            await ctx.send("❌ User rules take a numeric user ID")
+            return
+        
         rule_id = self.add_rule(ctx.guild.id, rule_type, pattern, action, duration)
         
         embed = discord.Embed(
@@ -255,6 +477,7 @@ class CustomAutomod(commands.Cog):
             if rule['id'] == rule_id:
                 deleted_rule = self.rules[guild_key].pop(i)
                 self.save_data()
+                self.compile_rules(guild_key)
                 
                 embed = discord.Embed(
                     title="🗑️ Rule Deleted",
@@ -1,5 +1,7 @@
 import discord
 from discord.ext import commands
+from cogs.core.message_pipeline import message_pipeline, PipelineAction, PRIORITY_CONTENT, delete_message
+from cogs.core.pattern_matcher import KeywordMatcher
 
 class DataLeakPrevention(commands.Cog):
     def __init__(self, bot):
@@ -7,18 +9,20 @@ class DataLeakPrevention(commands.Cog):
         self.sensitive_keywords = [
             'ssn', 'credit card', 'password', 'secret', 'api_key', 'token', 'private key', 'confidential'
         ]
+        self.keyword_matcher = KeywordMatcher(self.sensitive_keywords)
+        message_pipeline.register_stage('data_leak_prevention', self.inspect_message, priority=PRIORITY_CONTENT,
+                                        guild_only=False)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
-            return
-        content = message.content.lower()
-        if any(keyword in content for keyword in self.sensitive_keywords):
-            try:
-                await message.delete()
-            except discord.Forbidden:
-                pass
-            await message.channel.send(f"{message.author.mention}, sharing sensitive information is not allowed.", delete_after=10)
+    def cog_unload(self):
+        message_pipeline.unregister_stage('data_leak_prevention')
+
+    async def inspect_message(self, ctx):
+        """Message pipeline stage: remove messages containing sensitive keywords"""
+        if self.keyword_matcher.search(ctx.text):
+            if not await delete_message(ctx.message):
+                return
+            await ctx.channel.send(f"{ctx.author.mention}, sharing sensitive information is not allowed.", delete_after=10)
+            return PipelineAction.DELETED
 
 async def setup(bot):
     await bot.add_cog(DataLeakPrevention(bot))
@@ -1,6 +1,7 @@
 import discord
 from discord.ext import commands
 import re
+from cogs.core.message_pipeline import message_pipeline, PipelineAction, PRIORITY_CONTENT, delete_message
 
 EMAIL_REGEX = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
 PHONE_REGEX = re.compile(r"\b\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b")
@@ -9,26 +10,27 @@ ADDRESS_REGEX = re.compile(r"\d+\s+([A-Za-z0-9]+\s?)+,?\s*[A-Za-z]+,?\s*[A-Za-z]
 class PIIDetector(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        message_pipeline.register_stage('pii_detector', self.inspect_message, priority=PRIORITY_CONTENT)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
-            return
+    def cog_unload(self):
+        message_pipeline.unregister_stage('pii_detector')
+
+    async def inspect_message(self, ctx):
+        """Message pipeline stage: remove messages containing PII"""
         found = []
-        if EMAIL_REGEX.search(message.content):
+        if EMAIL_REGEX.search(ctx.content):
             found.append("email address")
-        if PHONE_REGEX.search(message.content):
+        if PHONE_REGEX.search(ctx.content):
             found.append("phone number")
-        if ADDRESS_REGEX.search(message.content):
+        if ADDRESS_REGEX.search(ctx.content):
             found.append("address")
         if found:
-            try:
-                await message.delete()
-            except Exception:
-                pass
-            staff_role = discord.utils.get(message.guild.roles, name="Staff")
+            if not await delete_message(ctx.message):
+                return
+            staff_role = discord.utils.get(ctx.guild.roles, name="Staff")
             staff_ping = staff_role.mention if staff_role else "@here"
-            await message.channel.send(f"⚠️ {message.author.mention}, your message was removed for containing: {', '.join(found)}. {staff_ping}")
+            await ctx.channel.send(f"⚠️ {ctx.author.mention}, your message was removed for containing: {', '.join(found)}. {staff_ping}")
+            return PipelineAction.DELETED
 
 async def setup(bot):
     await bot.add_cog(PIIDetector(bot))
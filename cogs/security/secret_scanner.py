@@ -7,6 +7,8 @@ import re
 import json
 import os
 from cogs.core.pst_timezone import get_now_pst
+from cogs.core.message_pipeline import message_pipeline, PipelineAction, PRIORITY_SCANNER, delete_message
+from cogs.core.pattern_matcher import PatternSet
 
 class SecretScanGroup(app_commands.Group):
     def __init__(self, cog):
@@ -159,6 +161,7 @@ class SecretScannerVerificationCog(commands.Cog):
         self.bot = bot
         self.detected_secrets = []
         self.patterns = {"discord_token": r"[MN][A-Za-z\d]{23}\.[\w-]{6}\.[\w-]{27}", "github_token": r"ghp_[0-9a-zA-Z]{36}", "aws_key": r"AKIA[0-9A-Z]{16}", "slack_token": r"xox[baprs]-[0-9a-zA-Z]{10,48}", "api_key": r"api[_-]?key['\"]?\s*[:=]\s*['\"]?[0-9a-zA-Z]{20,}", "private_key": r"-----BEGIN (RSA |DSA )?PRIVATE KEY-----", "jwt": r"eyJ[A-Za-z0-9-_=]+\.eyJ[A-Za-z0-9-_=]+\.[A-Za-z0-9-_.+/=]+"}
+        self.pattern_set = PatternSet(self.patterns, re.IGNORECASE)
         self.whitelist = set()
         self.auto_delete = True
         self.verify_channels = {}
@@ -173,6 +176,7 @@ class SecretScannerVerificationCog(commands.Cog):
         self.verify_group = VerifyGroup(self)
         bot.tree.add_command(self.secretscan_group)
         bot.tree.add_command(self.verify_group)
+        message_pipeline.register_stage('secret_scanner', self.inspect_message, priority=PRIORITY_SCANNER, guild_only=False)
 
     def load_data(self):
         if os.path.exists(self.data_file_secrets):
@@ -201,28 +205,27 @@ class SecretScannerVerificationCog(commands.Cog):
         with open(self.data_file_verify, 'w') as f:
             json.dump({'verify_channels': {str(k): v for k, v in self.verify_channels.items()}, 'verified_roles': {str(k): v for k, v in self.verified_roles.items()}, 'unverified_roles': {str(k): v for k, v in self.unverified_roles.items()}, 'verification_methods': self.verification_methods, 'verification_log': self.verification_log[-500:]}, f, indent=2)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot or not message.content:
+    async def inspect_message(self, ctx):
+        """Message pipeline stage: detect and remove leaked secrets"""
+        if not ctx.content:
             return
         detected = []
-        for secret_type, pattern in self.patterns.items():
-            matches = re.finditer(pattern, message.content, re.IGNORECASE)
-            for match in matches:
-                secret_value = match.group()
-                if secret_value not in self.whitelist:
-                    detected.append({"type": secret_type, "value": secret_value[:10] + "***", "timestamp": datetime.get_now_pst().isoformat()})
+        for secret_type, match in self.pattern_set.finditer(ctx.content):
+            secret_value = match.group()
+            if secret_value not in self.whitelist:
+                detected.append({"type": secret_type, "value": secret_value[:10] + "***", "timestamp": get_now_pst().isoformat()})
         if detected:
             for secret in detected:
                 self.detected_secrets.append(secret)
             self.save_data()
-            if self.auto_delete:
+            if self.auto_delete and await delete_message(ctx.message):
                 try:
-                    await message.delete()
-                    await message.channel.send(f"🚨 {message.author.mention} - Your message contained potential secrets and was deleted.", delete_after=10)
+                    await ctx.channel.send(f"🚨 {ctx.author.mention} - Your message contained potential secrets and was deleted.", delete_after=10)
                 except: pass
+                return PipelineAction.DELETED
 
     async def cog_unload(self):
+        message_pipeline.unregister_stage('secret_scanner')
         self.bot.tree.remove_command(self.secretscan_group.name)
         self.bot.tree.remove_command(self.verify_group.name)
 
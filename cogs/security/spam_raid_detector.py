@@ -1,34 +1,30 @@
 import discord
 from discord.ext import commands
-import time
+from cogs.core.message_pipeline import message_pipeline, PipelineAction, PRIORITY_BLOCKLIST, delete_message
+from cogs.core.rate_windows import rate_windows
 
 # Simple heuristic/ML placeholder for spam/raid detection
 class SpamRaidDetector(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.user_message_times = {}
         self.spam_threshold = 5  # messages
         self.time_window = 10    # seconds
+        self.message_rates = rate_windows.counter('spam_raid_messages', window_seconds=self.time_window)
+        message_pipeline.register_stage('spam_raid_detector', self.inspect_message, priority=PRIORITY_BLOCKLIST)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
-            return
-        now = time.time()
-        user_id = message.author.id
-        times = self.user_message_times.get(user_id, [])
-        times = [t for t in times if now - t < self.time_window]
-        times.append(now)
-        self.user_message_times[user_id] = times
-        if len(times) > self.spam_threshold:
-            try:
-                await message.delete()
-            except Exception:
-                pass
-            staff_role = discord.utils.get(message.guild.roles, name="Staff")
+    def cog_unload(self):
+        message_pipeline.unregister_stage('spam_raid_detector')
+
+    async def inspect_message(self, ctx):
+        """Message pipeline stage: flag users sending too many messages"""
+        if self.message_rates.hit_and_count(ctx.author_id) > self.spam_threshold:
+            deleted = await delete_message(ctx.message)
+            staff_role = discord.utils.get(ctx.guild.roles, name="Staff")
             staff_ping = staff_role.mention if staff_role else "@here"
-            await message.channel.send(f"🚨 {message.author.mention} flagged for spam/raid. {staff_ping}")
-            self.user_message_times[user_id] = []
+            await ctx.channel.send(f"🚨 {ctx.author.mention} flagged for spam/raid. {staff_ping}")
+            self.message_rates.reset(ctx.author_id)
+            if deleted:
+                return PipelineAction.DELETED
 
 async def setup(bot):
     await bot.add_cog(SpamRaidDetector(bot))
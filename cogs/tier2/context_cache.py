@@ -7,148 +7,275 @@ Part of Sentinel Advanced Intelligence Platform
 import discord
 from discord.ext import commands, tasks
 from datetime import datetime, timedelta
+import asyncio
+import heapq
 import json
 import os
+import time
 from typing import Dict, List, Optional, Any
 from collections import OrderedDict
 from cogs.core.pst_timezone import get_now_pst
 
+
+def estimate_size(value: Any) -> int:
+    """Approximate serialized size of a cached value in bytes"""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if value is None or isinstance(value, (bool, int, float)):
+        return 8
+    try:
+        return len(json.dumps(value, separators=(',', ':'), default=str))
+    except (TypeError, ValueError):
+        return len(str(value))
+
+
+class CacheEntry:
+    __slots__ = ('value', 'expires_at', 'created_at', 'access_count', 'size')
+
+    def __init__(self, value: Any, expires_at: float, size: int, created_at: float = None):
+        self.value = value
+        self.expires_at = expires_at  # time.monotonic() deadline
+        self.created_at = created_at if created_at is not None else time.time()
+        self.access_count = 0
+        self.size = size
+
+
 class ContextCache(commands.Cog):
     """Context caching system for reduced latency"""
-    
+
     def __init__(self, bot):
         self.bot = bot
         self.cache_file = 'data/context_cache.json'
-        self.memory = {}  # In-memory cache
-        self.access_stats = {}  # Track cache hits/misses
+        self.memory: "OrderedDict[str, CacheEntry]" = OrderedDict()  # LRU order: oldest first
+        self.expiry_heap: List[tuple] = []  # (expires_at, key); stale items skipped lazily
         self.ttl_seconds = 3600  # Default 1 hour TTL
         self.max_cache_size = 10000
-        
+        self.max_cache_bytes = 32 * 1024 * 1024
+        self.snapshot_enabled = True
+        self.current_bytes = 0
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'snapshots': 0
+        }
+        self._dirty = False
+
         os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
         self.load_cache()
         self.cleanup_expired.start()
-    
+        self.snapshot_cache.start()
+
+    def cog_unload(self):
+        self.cleanup_expired.cancel()
+        self.snapshot_cache.cancel()
+        if self.snapshot_enabled and self._dirty:
+            self._write_snapshot(self._snapshot())
+
     def load_cache(self):
-        """Load cache from disk"""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r') as f:
-                    self.memory = json.load(f)
-                print(f"[ContextCache] ✅ Loaded {len(self.memory)} cached items")
-            except:
-                self.memory = {}
-    
-    def save_cache(self):
-        """Save cache to disk"""
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.memory, f, indent=2, default=str)
-    
+        """Load cache snapshot from disk, converting wall-clock expiry back to monotonic"""
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except Exception:
+            return
+
+        now_wall, now_mono = time.time(), time.monotonic()
+        items = data.get('entries', []) if isinstance(data, dict) and 'entries' in data else None
+        if items is None:
+            # Legacy format: {key: {value, expires_at (ISO), created_at, access_count}}
+            items = []
+            for key, entry in data.items():
+                try:
+                    expires_wall = datetime.fromisoformat(entry['expires_at']).timestamp()
+                except (KeyError, TypeError, ValueError):
+                    continue
+                items.append([key, entry.get('value'), expires_wall, now_wall])
+
+        for key, value, expires_wall, created_wall in items:
+            remaining = expires_wall - now_wall
+            if remaining > 0:
+                self._store(key, value, now_mono + remaining, created_wall)
+        self._enforce_budget()
+        print(f"[ContextCache] ✅ Loaded {len(self.memory)} cached items")
+
+    def _store(self, key: str, value: Any, expires_at: float, created_at: float = None):
+        old = self.memory.pop(key, None)
+        if old is not None:
+            self.current_bytes -= old.size
+        entry = CacheEntry(value, expires_at, estimate_size(value) + len(key), created_at)
+        self.memory[key] = entry
+        self.current_bytes += entry.size
+        heapq.heappush(self.expiry_heap, (expires_at, key))
+
+    def _remove(self, key: str) -> Optional[CacheEntry]:
+        entry = self.memory.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry.size
+            self._dirty = True
+        return entry
+
+    def _enforce_budget(self):
+        """Evict least recently used entries until both budgets are met"""
+        while self.memory and (len(self.memory) > self.max_cache_size or self.current_bytes > self.max_cache_bytes):
+            key, entry = self.memory.popitem(last=False)
+            self.current_bytes -= entry.size
+            self.stats['evictions'] += 1
+        # Drop stale heap items once they dominate
+        if len(self.expiry_heap) > 2 * len(self.memory) + 64:
+            self.expiry_heap = [(e.expires_at, k) for k, e in self.memory.items()]
+            heapq.heapify(self.expiry_heap)
+
+    def _purge_expired(self, now: float = None) -> int:
+        """Pop expired entries off the heap; cost is proportional to what expired"""
+        now = now if now is not None else time.monotonic()
+        heap = self.expiry_heap
+        purged = 0
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            entry = self.memory.get(key)
+            if entry is not None and entry.expires_at == expires_at:
+                self._remove(key)
+                self.stats['expirations'] += 1
+                purged += 1
+        return purged
+
     def set_context(self, key: str, value: Any, ttl_seconds: int = None):
         """Cache a context value"""
         ttl = ttl_seconds or self.ttl_seconds
-        expires_at = (get_now_pst() + timedelta(seconds=ttl)).isoformat()
-        
-        self.memory[key] = {
-            'value': value,
-            'expires_at': expires_at,
-            'created_at': get_now_pst().isoformat(),
-            'access_count': 0
-        }
-        
-        # Enforce max cache size
-        if len(self.memory) > self.max_cache_size:
-            # Remove oldest accessed items
-            sorted_items = sorted(
-                self.memory.items(),
-                key=lambda x: x[1].get('access_count', 0)
-            )
-            for key_to_remove, _ in sorted_items[:100]:
-                del self.memory[key_to_remove]
-        
-        self.save_cache()
-    
+        now = time.monotonic()
+        self._store(key, value, now + ttl)
+        self.stats['sets'] += 1
+        self._dirty = True
+        self._purge_expired(now)
+        self._enforce_budget()
+
     def get_context(self, key: str) -> Optional[Any]:
         """Retrieve cached context"""
-        if key not in self.memory:
-            self.access_stats[key] = self.access_stats.get(key, 0)
+        entry = self.memory.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
             return None
-        
-        entry = self.memory[key]
-        
+
         # Check expiration
-        expires_at = datetime.fromisoformat(entry['expires_at'])
-        if get_now_pst() > expires_at:
-            del self.memory[key]
+        if time.monotonic() >= entry.expires_at:
+            self._remove(key)
+            self.stats['expirations'] += 1
+            self.stats['misses'] += 1
             return None
-        
-        # Update access count
-        entry['access_count'] = entry.get('access_count', 0) + 1
-        self.access_stats[key] = self.access_stats.get(key, 0) + 1
-        
-        return entry['value']
-    
+
+        # Mark as most recently used
+        self.memory.move_to_end(key)
+        entry.access_count += 1
+        self.stats['hits'] += 1
+
+        return entry.value
+
     def invalidate_context(self, key: str):
         """Remove cached context"""
-        if key in self.memory:
-            del self.memory[key]
-            self.save_cache()
-    
+        if self._remove(key) is not None:
+            self.stats['invalidations'] += 1
+
     def clear_context_pattern(self, pattern: str):
         """Clear all contexts matching pattern"""
         import re
         regex = re.compile(pattern)
         to_remove = [k for k in self.memory.keys() if regex.search(k)]
-        
+
         for key in to_remove:
-            del self.memory[key]
-        
-        self.save_cache()
+            self._remove(key)
+        self.stats['invalidations'] += len(to_remove)
+
         return len(to_remove)
-    
-    @tasks.loop(minutes=30)
+
+    def get_statistics(self) -> Dict:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'items': len(self.memory),
+            'bytes': self.current_bytes,
+            'hit_rate': self.stats['hits'] / lookups * 100 if lookups else 0.0
+        }
+
+    def _snapshot(self) -> Dict:
+        """Capture entries on the event loop with wall-clock expiry"""
+        offset = time.time() - time.monotonic()
+        return {
+            'entries': [
+                [key, entry.value, entry.expires_at + offset, entry.created_at]
+                for key, entry in self.memory.items()
+            ]
+        }
+
+    def _write_snapshot(self, snapshot: Dict):
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'), default=str)
+        os.replace(tmp_file, self.cache_file)
+
+    @tasks.loop(minutes=1)
     async def cleanup_expired(self):
         """Remove expired cache entries"""
-        now = get_now_pst()
-        expired = []
-        
-        for key, entry in self.memory.items():
-            expires_at = datetime.fromisoformat(entry['expires_at'])
-            if now > expires_at:
-                expired.append(key)
-        
-        for key in expired:
-            del self.memory[key]
-        
+        expired = self._purge_expired()
         if expired:
-            self.save_cache()
-            print(f"[ContextCache] Cleaned up {len(expired)} expired entries")
-    
+            print(f"[ContextCache] Cleaned up {expired} expired entries")
+
+    @tasks.loop(minutes=5)
+    async def snapshot_cache(self):
+        """Persist the cache off the event loop when it changed"""
+        if not self.snapshot_enabled or not self._dirty:
+            return
+        self._dirty = False
+        snapshot = self._snapshot()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_snapshot, snapshot)
+            self.stats['snapshots'] += 1
+        except Exception as e:
+            self._dirty = True
+            print(f"[ContextCache] ❌ Snapshot failed: {e}")
+
     @commands.command(name='cachestats')
     async def cache_stats(self, ctx):
         """View cache statistics (owner only)"""
         if ctx.author.id != self.bot.owner_id:
             return
-        
-        # Calculate hit/miss rate
-        total_access = sum(self.access_stats.values())
-        hit_rate = (sum(v for k, v in self.access_stats.items() if k in self.memory) / total_access * 100) if total_access > 0 else 0
-        
+
+        stats = self.get_statistics()
+
         embed = discord.Embed(
             title="📊 Context Cache Statistics",
             color=discord.Color.blue(),
             timestamp=get_now_pst()
         )
-        
-        embed.add_field(name="Cached Items", value=str(len(self.memory)), inline=True)
+
+        embed.add_field(name="Cached Items", value=str(stats['items']), inline=True)
         embed.add_field(name="Max Size", value=str(self.max_cache_size), inline=True)
-        embed.add_field(name="Cache Utilization", value=f"{(len(self.memory) / self.max_cache_size * 100):.1f}%", inline=True)
-        
-        embed.add_field(name="Total Access Count", value=str(total_access), inline=True)
-        embed.add_field(name="Unique Keys Accessed", value=str(len(self.access_stats)), inline=True)
-        embed.add_field(name="Hit Rate (est)", value=f"{hit_rate:.1f}%", inline=True)
-        
-        embed.add_field(name="Default TTL", value=f"{self.ttl_seconds // 3600}h", inline=False)
-        
+        embed.add_field(name="Cache Utilization", value=f"{(stats['items'] / self.max_cache_size * 100):.1f}%", inline=True)
+
+        embed.add_field(
+            name="Memory",
+            value=f"{stats['bytes'] / 1024:.1f} KB / {self.max_cache_bytes / 1024 / 1024:.0f} MB",
+            inline=True
+        )
+        embed.add_field(name="Hit Rate", value=f"{stats['hit_rate']:.1f}%", inline=True)
+        embed.add_field(name="Hits / Misses", value=f"{stats['hits']} / {stats['misses']}", inline=True)
+
+        embed.add_field(name="Evictions (LRU)", value=str(stats['evictions']), inline=True)
+        embed.add_field(name="Expirations", value=str(stats['expirations']), inline=True)
+        embed.add_field(name="Invalidations", value=str(stats['invalidations']), inline=True)
+
+        embed.add_field(name="Default TTL", value=f"{self.ttl_seconds // 3600}h", inline=True)
+        embed.add_field(
+            name="Snapshots",
+            value=f"{stats['snapshots']} (every 5m)" if self.snapshot_enabled else "Disabled",
+            inline=True
+        )
+
         await ctx.send(embed=embed)
 
 async def setup(bot):
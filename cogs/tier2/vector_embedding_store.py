@@ -4,143 +4,390 @@ Stores and retrieves high-dimensional vector embeddings for semantic search
 """
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from datetime import datetime
+import asyncio
+import heapq
 import json
 import os
+from collections import OrderedDict
 from typing import Dict, List, Optional
 import hashlib
 from cogs.core.pst_timezone import get_now_pst
 
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+MAX_EMBEDDINGS = 50000
+INITIAL_CAPACITY = 1024
+
+
+class VectorIndex:
+    """Fixed-dimension matrix of unit-normalized float32 rows with O(1) slot reuse.
+
+    With NumPy the matrix is a memory-mapped .npy file (grown by doubling) and
+    queries are a single matrix product plus argpartition. Without NumPy rows
+    are plain lists and queries fall back to a heap over dot products.
+    """
+
+    def __init__(self, dim: int, path: str):
+        self.dim = dim
+        self.path = path
+        self.slot_ids: List[Optional[str]] = []
+        self.free_slots: List[int] = []
+        self.matrix = None
+        self.active = None
+        self.rows: List[Optional[List[float]]] = []
+
+    @property
+    def size(self) -> int:
+        return len(self.slot_ids) - len(self.free_slots)
+
+    # ---- storage ----
+
+    def open(self, slot_ids: List[Optional[str]]):
+        """Attach to an existing .npy file described by persisted slot ids."""
+        self.slot_ids = list(slot_ids)
+        self.free_slots = [i for i, embed_id in enumerate(self.slot_ids) if embed_id is None]
+        if not HAS_NUMPY:
+            self.rows = [None] * len(self.slot_ids)
+        elif self.slot_ids:
+            self.matrix = np.lib.format.open_memmap(self.path, mode='r+')
+            if self.matrix.shape[0] < len(self.slot_ids) or self.matrix.shape[1] != self.dim:
+                raise ValueError(f"{self.path} does not match its metadata")
+            self.active = np.zeros(self.matrix.shape[0], dtype=bool)
+            self.active[:len(self.slot_ids)] = [embed_id is not None for embed_id in self.slot_ids]
+
+    def _ensure_capacity(self, needed: int):
+        if self.matrix is not None and self.matrix.shape[0] >= needed:
+            return
+        capacity = max(INITIAL_CAPACITY, needed, (self.matrix.shape[0] * 2) if self.matrix is not None else 0)
+        capacity = min(capacity, max(needed, MAX_EMBEDDINGS + 1))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.grow.npy"
+        grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(capacity, self.dim))
+        active = np.zeros(capacity, dtype=bool)
+        if self.matrix is not None:
+            old_capacity = self.matrix.shape[0]
+            grown[:old_capacity] = self.matrix
+            active[:old_capacity] = self.active
+            del self.matrix
+        grown.flush()
+        del grown
+        os.replace(tmp_path, self.path)
+        self.matrix = np.lib.format.open_memmap(self.path, mode='r+')
+        self.active = active
+
+    def flush(self):
+        if HAS_NUMPY and self.matrix is not None:
+            self.matrix.flush()
+
+    # ---- mutation ----
+
+    def add(self, embed_id: str, vector: List[float], slot: Optional[int] = None):
+        """Write a normalized vector into `slot` (or a free/new one). Returns (slot, norm)."""
+        if slot is None:
+            if self.free_slots:
+                slot = self.free_slots.pop()
+            else:
+                slot = len(self.slot_ids)
+                self.slot_ids.append(None)
+                if HAS_NUMPY:
+                    self._ensure_capacity(slot + 1)
+                else:
+                    self.rows.append(None)
+        self.slot_ids[slot] = embed_id
+
+        if HAS_NUMPY:
+            row = np.asarray(vector, dtype=np.float32)
+            norm = float(np.linalg.norm(row))
+            self.matrix[slot] = row / norm if norm else 0.0
+            self.active[slot] = True
+        else:
+            norm = sum(x * x for x in vector) ** 0.5
+            self.rows[slot] = [x / norm for x in vector] if norm else [0.0] * self.dim
+        return slot, norm
+
+    def remove(self, slot: int):
+        self.slot_ids[slot] = None
+        self.free_slots.append(slot)
+        if HAS_NUMPY:
+            self.active[slot] = False
+        else:
+            self.rows[slot] = None
+
+    def get_vector(self, slot: int, norm: float) -> List[float]:
+        if HAS_NUMPY:
+            return (self.matrix[slot] * norm).tolist()
+        return [x * norm for x in self.rows[slot]]
+
+    # ---- search ----
+
+    def search(self, queries: List[List[float]], limit: int, threshold: float) -> List[List[tuple]]:
+        """Return [(slot, similarity), ...] per query, best first."""
+        used = len(self.slot_ids)
+        if not used or limit <= 0:
+            return [[] for _ in queries]
+
+        if HAS_NUMPY:
+            q = np.asarray(queries, dtype=np.float32)
+            norms = np.linalg.norm(q, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            scores = (q / norms) @ self.matrix[:used].T  # (queries, slots)
+            scores[:, ~self.active[:used]] = -np.inf
+            k = min(limit, used)
+            results = []
+            for row in scores:
+                top = np.argpartition(-row, k - 1)[:k] if k < used else np.arange(used)
+                top = top[np.argsort(-row[top])]
+                results.append([(int(slot), float(row[slot])) for slot in top if row[slot] >= threshold])
+            return results
+
+        results = []
+        for query in queries:
+            norm = sum(x * x for x in query) ** 0.5 or 1.0
+            unit = [x / norm for x in query]
+            scored = (
+                (slot, sum(a * b for a, b in zip(unit, row)))
+                for slot, row in enumerate(self.rows) if row is not None
+            )
+            best = heapq.nlargest(limit, scored, key=lambda item: item[1])
+            results.append([(slot, score) for slot, score in best if score >= threshold])
+        return results
+
+
 class VectorEmbeddingStore(commands.Cog):
     """Vector embedding storage and similarity search"""
-    
+
     def __init__(self, bot):
         self.bot = bot
-        self.data_file = 'data/vector_embeddings.json'
-        self.embeddings = {}  # id -> {vector, metadata}
+        self.legacy_file = 'data/vector_embeddings.json'
+        self.store_dir = 'data/vector_embeddings'
+        self.meta_file = os.path.join(self.store_dir, 'metadata.json')
+        # id -> {id, text, metadata, stored_at, dimension, slot, norm}; insertion order is FIFO order
+        self.embeddings: "OrderedDict[str, Dict]" = OrderedDict()
+        self.indexes: Dict[int, VectorIndex] = {}
+        self._dirty = False
         self.load_embeddings()
-    
+        self.persist_embeddings.start()
+
+    def cog_unload(self):
+        self.persist_embeddings.cancel()
+        if self._dirty:
+            self._write_metadata(self._snapshot())
+
+    def _index_for(self, dim: int) -> VectorIndex:
+        index = self.indexes.get(dim)
+        if index is None:
+            index = VectorIndex(dim, os.path.join(self.store_dir, f'vectors_{dim}.npy'))
+            self.indexes[dim] = index
+        return index
+
     def load_embeddings(self):
         """Load embeddings"""
-        if os.path.exists(self.data_file):
+        if os.path.exists(self.meta_file):
             try:
-                with open(self.data_file, 'r') as f:
+                with open(self.meta_file, 'r') as f:
                     data = json.load(f)
-                    self.embeddings = data.get('embeddings', {})
-                    print(f"[VectorStore] ✅ Loaded {len(self.embeddings)} embeddings")
-            except:
-                self.embeddings = {}
-    
-    def store_embedding(self, text: str, vector: List[float], metadata: Dict = None) -> str:
-        """Store text embedding with metadata"""
-        embed_id = hashlib.md5(text.encode()).hexdigest()[:12]
-        
+                for dim, slot_ids in data.get('indexes', {}).items():
+                    self._index_for(int(dim)).open(slot_ids)
+                for entry in data.get('embeddings', []):
+                    self.embeddings[entry['id']] = entry
+                if not HAS_NUMPY:
+                    # Without NumPy the vectors live in the metadata file
+                    for entry in self.embeddings.values():
+                        index = self._index_for(entry['dimension'])
+                        index.add(entry['id'], entry.pop('vector', []), slot=entry['slot'])
+                print(f"[VectorStore] ✅ Loaded {len(self.embeddings)} embeddings")
+                return
+            except Exception as e:
+                print(f"[VectorStore] ⚠️ Error loading vector index: {e}")
+                self.embeddings = OrderedDict()
+                self.indexes = {}
+
+        if os.path.exists(self.legacy_file):
+            try:
+                with open(self.legacy_file, 'r') as f:
+                    legacy = json.load(f).get('embeddings', {})
+                entries = sorted(legacy.values(), key=lambda e: e.get('stored_at', ''))
+                for entry in entries:
+                    self._insert(entry['id'], entry.get('text', ''), entry.get('vector', []),
+                                 entry.get('metadata'), entry.get('stored_at'))
+                self._dirty = True
+                print(f"[VectorStore] ✅ Migrated {len(self.embeddings)} embeddings from {self.legacy_file}")
+            except Exception as e:
+                print(f"[VectorStore] ⚠️ Error migrating embeddings: {e}")
+
+    def _insert(self, embed_id: str, text: str, vector: List[float], metadata: Optional[Dict], stored_at: str):
+        dim = len(vector)
+        existing = self.embeddings.pop(embed_id, None)
+        slot = None
+        if existing is not None:
+            if existing['dimension'] == dim:
+                slot = existing['slot']
+            else:
+                self.indexes[existing['dimension']].remove(existing['slot'])
+
+        slot, norm = self._index_for(dim).add(embed_id, vector, slot=slot)
         self.embeddings[embed_id] = {
             'id': embed_id,
             'text': text[:500],  # Store first 500 chars
-            'vector': vector,
             'metadata': metadata or {},
-            'stored_at': get_now_pst().isoformat(),
-            'dimension': len(vector)
+            'stored_at': stored_at,
+            'dimension': dim,
+            'slot': slot,
+            'norm': norm
         }
-        
-        # Keep last 50000 embeddings
-        if len(self.embeddings) > 50000:
-            # Remove oldest
-            oldest_key = min(
-                self.embeddings.keys(),
-                key=lambda k: self.embeddings[k].get('stored_at', '')
-            )
-            del self.embeddings[oldest_key]
-        
-        self._save_embeddings()
+
+        # FIFO eviction: the first key is the oldest insertion
+        while len(self.embeddings) > MAX_EMBEDDINGS:
+            _, oldest = self.embeddings.popitem(last=False)
+            self.indexes[oldest['dimension']].remove(oldest['slot'])
+
+    def store_embedding(self, text: str, vector: List[float], metadata: Dict = None) -> str:
+        """Store text embedding with metadata"""
+        embed_id = hashlib.md5(text.encode()).hexdigest()[:12]
+        self._insert(embed_id, text, vector, metadata, get_now_pst().isoformat())
+        self._dirty = True
         return embed_id
-    
+
     def cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between vectors"""
         if not vec1 or not vec2:
             return 0.0
-        
+
         if len(vec1) != len(vec2):
             return 0.0
-        
+
         dot_product = sum(a * b for a, b in zip(vec1, vec2))
         magnitude1 = sum(x ** 2 for x in vec1) ** 0.5
         magnitude2 = sum(x ** 2 for x in vec2) ** 0.5
-        
+
         if magnitude1 == 0 or magnitude2 == 0:
             return 0.0
-        
+
         return dot_product / (magnitude1 * magnitude2)
-    
+
     def find_similar_embeddings(self, query_vector: List[float], limit: int = 10, threshold: float = 0.7) -> List[Dict]:
         """Find similar embeddings"""
-        similarities = []
-        
-        for embed_id, embedding in self.embeddings.items():
-            similarity = self.cosine_similarity(query_vector, embedding['vector'])
-            
-            if similarity >= threshold:
-                similarities.append({
-                    'id': embed_id,
-                    'text': embedding['text'],
-                    'similarity': similarity,
-                    'metadata': embedding.get('metadata')
-                })
-        
-        # Sort by similarity
-        similarities.sort(key=lambda x: x['similarity'], reverse=True)
-        return similarities[:limit]
-    
+        return self.find_similar_batch([query_vector], limit, threshold)[0]
+
+    def find_similar_batch(self, query_vectors: List[List[float]], limit: int = 10, threshold: float = 0.7) -> List[List[Dict]]:
+        """Find similar embeddings for several queries at once (one matrix product per dimension)"""
+        results: List[List[Dict]] = [[] for _ in query_vectors]
+        by_dim: Dict[int, List[int]] = {}
+        for position, query in enumerate(query_vectors):
+            if query:
+                by_dim.setdefault(len(query), []).append(position)
+
+        for dim, positions in by_dim.items():
+            index = self.indexes.get(dim)
+            if not index or not index.size:
+                continue
+            matches = index.search([query_vectors[p] for p in positions], limit, threshold)
+            for position, hits in zip(positions, matches):
+                for slot, similarity in hits:
+                    embedding = self.embeddings[index.slot_ids[slot]]
+                    results[position].append({
+                        'id': embedding['id'],
+                        'text': embedding['text'],
+                        'similarity': similarity,
+                        'metadata': embedding.get('metadata')
+                    })
+        return results
+
     def get_embedding(self, embed_id: str) -> Optional[Dict]:
         """Get embedding by ID"""
-        return self.embeddings.get(embed_id)
-    
+        embedding = self.embeddings.get(embed_id)
+        if not embedding:
+            return None
+        vector = self.indexes[embedding['dimension']].get_vector(embedding['slot'], embedding['norm'])
+        return {**embedding, 'vector': vector}
+
     def delete_embedding(self, embed_id: str):
         """Delete embedding"""
-        if embed_id in self.embeddings:
-            del self.embeddings[embed_id]
-            self._save_embeddings()
-    
+        embedding = self.embeddings.pop(embed_id, None)
+        if embedding:
+            self.indexes[embedding['dimension']].remove(embedding['slot'])
+            self._dirty = True
+
     def get_statistics(self) -> Dict:
         """Get vector store statistics"""
         if not self.embeddings:
             return {}
-        
-        dimensions = set(e.get('dimension', 0) for e in self.embeddings.values())
-        
+
         return {
             'total_embeddings': len(self.embeddings),
-            'dimensions': list(dimensions),
-            'oldest_embedding': min((e.get('stored_at', '') for e in self.embeddings.values())),
-            'newest_embedding': max((e.get('stored_at', '') for e in self.embeddings.values()))
+            'dimensions': sorted(dim for dim, index in self.indexes.items() if index.size),
+            'oldest_embedding': next(iter(self.embeddings.values())).get('stored_at', ''),
+            'newest_embedding': next(reversed(self.embeddings.values())).get('stored_at', ''),
+            'backend': 'numpy' if HAS_NUMPY else 'python',
+            'free_slots': sum(len(index.free_slots) for index in self.indexes.values())
         }
-    
+
+    def _snapshot(self) -> Dict:
+        """Capture metadata on the event loop; entries are replaced, never mutated, so a shallow copy is enough"""
+        entries = list(self.embeddings.values())
+        if not HAS_NUMPY:
+            entries = [
+                {**e, 'vector': self.indexes[e['dimension']].get_vector(e['slot'], 1.0)} for e in entries
+            ]
+        return {
+            'indexes': {str(dim): list(index.slot_ids) for dim, index in self.indexes.items()},
+            'embeddings': entries
+        }
+
+    def _write_metadata(self, snapshot: Dict):
+        """Flush the mapped matrices, then atomically replace the metadata file"""
+        os.makedirs(self.store_dir, exist_ok=True)
+        for index in list(self.indexes.values()):
+            index.flush()
+        tmp_path = f"{self.meta_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'), default=str)
+        os.replace(tmp_path, self.meta_file)
+
     def _save_embeddings(self):
         """Save embeddings"""
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        with open(self.data_file, 'w') as f:
-            json.dump({'embeddings': self.embeddings}, f, indent=2, default=str)
-    
+        self._write_metadata(self._snapshot())
+        self._dirty = False
+
+    @tasks.loop(seconds=30)
+    async def persist_embeddings(self):
+        """Write metadata off the event loop when the store changed"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        snapshot = self._snapshot()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_metadata, snapshot)
+        except Exception as e:
+            self._dirty = True
+            print(f"[VectorStore] ❌ Error saving embeddings: {e}")
+
     @commands.command(name='vectorstats')
     async def vector_stats(self, ctx):
         """View vector embedding store statistics"""
         stats = self.get_statistics()
-        
+
         if not stats:
             await ctx.send("❌ No embeddings stored yet")
             return
-        
+
         embed = discord.Embed(
             title="📊 Vector Embedding Store Statistics",
             color=discord.Color.blue(),
             timestamp=get_now_pst()
         )
-        
+
         embed.add_field(name="Total Embeddings", value=str(stats['total_embeddings']), inline=True)
         embed.add_field(name="Dimensions", value=str(stats['dimensions']), inline=True)
-        
+        embed.add_field(name="Search Backend", value=stats['backend'], inline=True)
+        embed.add_field(name="Free Slots", value=str(stats['free_slots']), inline=True)
+
         await ctx.send(embed=embed)
 
 async def setup(bot):
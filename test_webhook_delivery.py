@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Webhook delivery engine test against a local stub HTTP server
+
+Run: python test_webhook_delivery.py
+Starts an aiohttp server on 127.0.0.1 and checks batching, 429 Retry-After handling,
+5xx retries, 4xx rejection, spilling and spill replay.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.getcwd())
+
+from aiohttp import web
+
+import cogs.core.webhook_delivery as delivery
+from cogs.core.webhook_delivery import WebhookDeliveryEngine
+
+delivery.RETRY_BASE_DELAY = 0.05  # Keep the test fast
+received = {'discord': [], 'slack': [], 'ratelimited': [], 'flaky': [], 'bad': []}
+attempts = {'ratelimited': 0, 'flaky': 0}
+
+
+async def discord_hook(request):
+    received['discord'].append(await request.json())
+    return web.Response(status=204)
+
+
+async def slack_hook(request):
+    received['slack'].append(await request.json())
+    return web.Response(text="ok")
+
+
+async def ratelimited_hook(request):
+    attempts['ratelimited'] += 1
+    if attempts['ratelimited'] == 1:
+        return web.json_response({'retry_after': 0.2}, status=429, headers={'Retry-After': '0.2'})
+    received['ratelimited'].append(await request.json())
+    return web.Response(status=204)
+
+
+async def flaky_hook(request):
+    attempts['flaky'] += 1
+    if attempts['flaky'] <= 2:
+        return web.Response(status=503)
+    received['flaky'].append(await request.json())
+    return web.Response(status=200)
+
+
+async def bad_hook(request):
+    received['bad'].append(await request.json())
+    return web.Response(status=400)
+
+
+def check(name, condition):
+    print(f"{'✅' if condition else '❌'} {name}")
+    return condition
+
+
+async def main():
+    app = web.Application()
+    app.router.add_post('/discord', discord_hook)
+    app.router.add_post('/slack', slack_hook)
+    app.router.add_post('/ratelimited', ratelimited_hook)
+    app.router.add_post('/flaky', flaky_hook)
+    app.router.add_post('/bad', bad_hook)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+
+    spill_file = os.path.join(tempfile.mkdtemp(), 'webhook_spill.jsonl')
+    engine = WebhookDeliveryEngine(spill_file=spill_file)
+    results = []
+
+    # 12 embeds -> 2 requests (10 + 2)
+    futures = [engine.enqueue('discord', f"{base}/discord", {'message': f"alert {i}", 'embed': {'title': str(i)}})
+               for i in range(12)]
+    results.append(check("Discord payloads delivered", all(await asyncio.gather(*futures))))
+    results.append(check(f"Discord batched into {len(received['discord'])} requests",
+                         len(received['discord']) == 2 and len(received['discord'][0]['embeds']) == 10))
+
+    futures = [engine.enqueue('slack', f"{base}/slack", {'message': f"notice {i}"}) for i in range(5)]
+    await asyncio.gather(*futures)
+    results.append(check("Slack batched into one message of blocks",
+                         len(received['slack']) == 1 and len(received['slack'][0]['blocks']) == 9))
+
+    results.append(check("429 retried after Retry-After",
+                         await engine.deliver('json', f"{base}/ratelimited", {'event': 'x'})
+                         and attempts['ratelimited'] == 2))
+    results.append(check("5xx retried with backoff",
+                         await engine.deliver('json', f"{base}/flaky", {'event': 'y'}) and attempts['flaky'] == 3))
+    results.append(check("4xx rejected without retry",
+                         not await engine.deliver('json', f"{base}/bad", {'event': 'z'}) and len(received['bad']) == 1))
+
+    # Nothing listens on this port: the payload is spilled after all attempts fail
+    delivery.MAX_ATTEMPTS = 2
+    dead_url = "http://127.0.0.1:9/unreachable"
+    results.append(check("Unreachable endpoint spilled",
+                         not await engine.deliver('json', dead_url, {'event': 'lost'})
+                         and os.path.exists(spill_file)))
+
+    # Replay re-queues the spilled payload (pointed back at a live endpoint here)
+    with open(spill_file, 'r') as f:
+        spilled = f.read().replace(dead_url, f"{base}/flaky")
+    with open(spill_file, 'w') as f:
+        f.write(spilled)
+    before = len(received['flaky'])
+    results.append(check("Spill replay re-queued", engine.replay_spill() == 1))
+    await asyncio.sleep(0.5)
+    results.append(check("Replayed payload delivered", len(received['flaky']) == before + 1))
+
+    stats = engine.get_stats()
+    print(f"📊 {stats}")
+    await engine.close()
+    await runner.cleanup()
+
+    print(f"\n{'✅ ALL WEBHOOK DELIVERY CHECKS PASSED' if all(results) else '❌ SOME CHECKS FAILED'}")
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)